@@ -239,7 +239,7 @@ class Requestify(wsgi.Middleware):
 
         LOG.debug(_('action: %s'), action)
         for key, value in args.items():
-            LOG.debug(_('arg: %(key)s\t\tval: %(value)s') % locals())
+            LOG.debug(_('arg: %(key)s\t\tval: %(value)s'), locals())
 
         # Success!
         api_request = apirequest.APIRequest(self.controller, action,
@@ -34,6 +34,7 @@ from nova import utils
 from nova.api.ec2 import ec2utils
 from nova.auth import manager
 from nova.compute import vm_states
+from nova.heartbeat import api as heartbeat
 
 
 FLAGS = flags.FLAGS
@@ -63,21 +64,20 @@ def project_dict(project):
         return {}
 
 
-def host_dict(host, compute_service, instances, volume_service, volumes, now):
-    """Convert a host model object to a result dict"""
+def host_dict(host, compute_service, instances, volume_service, volumes, up):
+    """Convert a host model object to a result dict
+
+    up is the set of ids of the services the heartbeat driver reports up.
+    """
     rv = {'hostname': host, 'instance_count': len(instances),
           'volume_count': len(volumes)}
     if compute_service:
-        latest = compute_service['updated_at'] or compute_service['created_at']
-        delta = now - latest
-        if delta.seconds <= FLAGS.service_down_time:
+        if compute_service['id'] in up:
             rv['compute'] = 'up'
         else:
             rv['compute'] = 'down'
     if volume_service:
-        latest = volume_service['updated_at'] or volume_service['created_at']
-        delta = now - latest
-        if delta.seconds <= FLAGS.service_down_time:
+        if volume_service['id'] in up:
             rv['volume'] = 'up'
         else:
             rv['volume'] = 'down'
@@ -314,7 +314,7 @@ class AdminController(object):
             * Volume Count
         """
         services = db.service_get_all(context, False)
-        now = utils.utcnow()
+        up = set(service['id'] for service in heartbeat.filter_up(services))
         hosts = []
         rv = []
         for host in [service['host'] for service in services]:
@@ -332,7 +332,7 @@ class AdminController(object):
                 volume = volume[0]
             volumes = db.volume_get_all_by_host(context, host)
             rv.append(host_dict(host, compute, instances, volume, volumes,
-                                now))
+                                up))
         return {'hosts': rv}
 
     def _provider_fw_rule_exists(self, context, rule):
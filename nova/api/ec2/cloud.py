@@ -48,12 +48,12 @@ from nova import volume
 from nova.api.ec2 import ec2utils
 from nova.compute import instance_types
 from nova.compute import vm_states
+from nova.heartbeat import api as heartbeat
 from nova.image import s3
 
 
 FLAGS = flags.FLAGS
 flags.DECLARE('dhcp_domain', 'nova.network.manager')
-flags.DECLARE('service_down_time', 'nova.scheduler.driver')
 
 LOG = logging.getLogger("nova.api.cloud")
 
@@ -448,7 +448,7 @@ class CloudController(object):
                                         'zoneState': 'available'}]}
 
         services = db.service_get_all(context, False)
-        now = utils.utcnow()
+        up = set(service['id'] for service in heartbeat.filter_up(services))
         hosts = []
         for host in [service['host'] for service in services]:
             if not host in hosts:
@@ -459,9 +459,7 @@ class CloudController(object):
             hsvcs = [service for service in services \
                      if service['host'] == host]
             for svc in hsvcs:
-                delta = now - (svc['updated_at'] or svc['created_at'])
-                alive = (delta.seconds <= FLAGS.service_down_time)
-                art = (alive and ":-)") or "XXX"
+                art = (svc['id'] in up and ":-)") or "XXX"
                 active = 'enabled'
                 if svc['disabled']:
                     active = 'disabled'
@@ -181,7 +181,7 @@ class AuthMiddleware(wsgi.Middleware):
             res.headers['X-CDN-Management-Url'] = token['cdn_management_url']
             res.content_type = 'text/plain'
             res.status = '204'
-            LOG.debug(_("Successfully authenticated '%s'") % username)
+            LOG.debug(_("Successfully authenticated '%s'"), username)
             return res
         else:
             return faults.Fault(webob.exc.HTTPUnauthorized())
@@ -90,7 +90,7 @@ def status_from_state(vm_state, task_state='default'):
     task_map = _STATE_MAP.get(vm_state, dict(default='UNKNOWN_STATE'))
     status = task_map.get(task_state, task_map['default'])
     LOG.debug("Generated %(status)s from vm_state=%(vm_state)s "
-              "task_state=%(task_state)s." % locals())
+              "task_state=%(task_state)s.", locals())
     return status
 
 
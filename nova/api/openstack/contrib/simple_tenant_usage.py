@@ -19,12 +19,13 @@ import urlparse
 import webob
 
 from datetime import datetime
+from datetime import timedelta
+from nova import db
 from nova import exception
 from nova import flags
-from nova.compute import api
+from nova.api.openstack import common
 from nova.api.openstack import extensions
 from nova.api.openstack import views
-from nova.db.sqlalchemy.session import get_session
 from webob import exc
 
 
@@ -61,75 +62,119 @@ class SimpleTenantUsageController(object):
                 stop = period_stop
             dt = stop - start
             seconds = dt.days * 3600 * 24 + dt.seconds\
-                      + dt.microseconds / 100000.0
+                      + dt.microseconds / 1000000.0
 
             return seconds / 3600.0
         else:
             # instance hasn't launched, so no charge
             return 0
 
-    def _tenant_usages_for_period(self, context, period_start,
-                                  period_stop, tenant_id=None, detailed=True):
-
-        compute_api = api.API()
-        instances = compute_api.get_active_by_window(context,
-                                                     period_start,
-                                                     period_stop,
-                                                     tenant_id)
-        from nova import log as logging
-        logging.info(instances)
-        rval = {}
-        flavors = {}
+    def _usage_by_type(self, context, period_start, period_stop,
+                       tenant_id=None):
+        """Sum instance hours per tenant and flavor in the database.
+
+        Whole hours already rolled up by the scheduler are read from the
+        rollup table; the rest of the period is aggregated from instances.
+        """
+        windows = [(period_start, period_stop)]
+        rollups = []
+        first, last = db.instance_usage_rollup_get_bounds(context)
+        if first is not None:
+            first_hour = period_start.replace(minute=0, second=0,
+                                              microsecond=0)
+            if first_hour < period_start:
+                first_hour += timedelta(hours=1)
+            first_hour = max(first_hour, first)
+            last_hour = min(period_stop.replace(minute=0, second=0,
+                                                microsecond=0),
+                            last + timedelta(hours=1))
+            if first_hour < last_hour:
+                rollups = db.instance_usage_rollup_get_by_window(context,
+                                                                 first_hour,
+                                                                 last_hour,
+                                                                 tenant_id)
+                windows = [(period_start, first_hour),
+                           (last_hour, period_stop)]
+
+        totals = {}
+        for begin, end in windows:
+            if begin >= end:
+                continue
+            rollups.extend(db.instance_usage_get_by_window(context, begin,
+                                                           end, tenant_id))
+        for usage in rollups:
+            key = (usage['project_id'], usage['instance_type_id'])
+            totals[key] = totals.get(key, 0.0) + usage['hours']
+        return totals
+
+    def _get_flavor(self, context, flavors, flavor_type):
+        if flavor_type not in flavors:
+            try:
+                flavors[flavor_type] = db.instance_type_get(context,
+                                                            flavor_type)
+            except exception.InstanceTypeNotFound:
+                # can't bill if there is no instance type
+                flavors[flavor_type] = None
+        return flavors[flavor_type]
 
-        for instance in instances:
-            info = {}
-            info['hours'] = self._hours_for(instance,
-                                            period_start,
-                                            period_stop)
-            flavor_type = instance['instance_type_id']
-
-            if not flavors.get(flavor_type):
-                try:
-                    it_ref = compute_api.get_instance_type(context,
-                                                           flavor_type)
-                    flavors[flavor_type] = it_ref
-                except exception.InstanceTypeNotFound:
-                    # can't bill if there is no instance type
-                    continue
+    def _server_usage(self, instance, flavor, period_start, period_stop):
+        info = {}
+        info['hours'] = self._hours_for(instance,
+                                        period_start,
+                                        period_stop)
+        info['instance_id'] = instance['id']
+        info['name'] = instance['display_name']
 
-            flavor = flavors[flavor_type]
+        info['memory_mb'] = flavor['memory_mb']
+        info['local_gb'] = flavor['local_gb']
+        info['vcpus'] = flavor['vcpus']
 
-            info['name'] = instance['display_name']
+        info['tenant_id'] = instance['project_id']
 
-            info['memory_mb'] = flavor['memory_mb']
-            info['local_gb'] = flavor['local_gb']
-            info['vcpus'] = flavor['vcpus']
+        info['flavor'] = flavor['name']
 
-            info['tenant_id'] = instance['project_id']
+        info['started_at'] = instance['launched_at']
 
-            info['flavor'] = flavor['name']
+        info['ended_at'] = instance['terminated_at']
 
-            info['started_at'] = instance['launched_at']
+        if info['ended_at']:
+            info['state'] = 'terminated'
+        else:
+            info['state'] = instance['vm_state']
 
-            info['ended_at'] = instance['terminated_at']
+        now = datetime.utcnow()
 
-            if info['ended_at']:
-                info['state'] = 'terminated'
-            else:
-                info['state'] = instance['vm_state']
+        if info['state'] == 'terminated':
+            delta = info['ended_at'] - info['started_at']
+        else:
+            delta = now - info['started_at']
 
-            now = datetime.utcnow()
+        info['uptime'] = delta.days * 24 * 60 + delta.seconds
+        return info
 
-            if info['state'] == 'terminated':
-                delta = info['ended_at'] - info['started_at']
-            else:
-                delta = now - info['started_at']
+    def _tenant_usages_for_period(self, context, period_start,
+                                  period_stop, tenant_id=None, detailed=True,
+                                  marker=None, limit=None):
+        """Build the usage summaries of each tenant for a period.
+
+        Totals are aggregated in the database. In detailed mode at most
+        limit servers with an id above marker are listed, so clients page
+        through large reports with the instance_id of the last server.
+        """
+        context = context.elevated()
+        rval = {}
+        flavors = {}
 
-            info['uptime'] = delta.days * 24 * 60 + delta.seconds
+        totals = self._usage_by_type(context, period_start, period_stop,
+                                     tenant_id)
+        for (project_id, flavor_type), hours in sorted(totals.items()):
+            flavor = self._get_flavor(context, flavors, flavor_type)
+            if flavor is None:
+                continue
 
-            if not info['tenant_id'] in rval:
+            if not project_id in rval:
                 summary = {}
-                summary['tenant_id'] = info['tenant_id']
+                summary['tenant_id'] = project_id
                 if detailed:
                     summary['server_usages'] = []
                 summary['total_local_gb_usage'] = 0
@@ -138,19 +183,53 @@ class SimpleTenantUsageController(object):
                 summary['total_hours'] = 0
                 summary['start'] = period_start
                 summary['stop'] = period_stop
-                rval[info['tenant_id']] = summary
+                rval[project_id] = summary
+
+            summary = rval[project_id]
+            summary['total_local_gb_usage'] += flavor['local_gb'] * hours
+            summary['total_vcpus_usage'] += flavor['vcpus'] * hours
+            summary['total_memory_mb_usage'] += flavor['memory_mb'] * hours
+            summary['total_hours'] += hours
+
+        if detailed:
+            instances = db.instance_get_all_in_window(context,
+                                                      period_start,
+                                                      period_stop,
+                                                      tenant_id,
+                                                      marker,
+                                                      limit)
+            for instance in instances:
+                summary = rval.get(instance['project_id'])
+                flavor = self._get_flavor(context, flavors,
+                                          instance['instance_type_id'])
+                if summary is None or flavor is None:
+                    continue
+                summary['server_usages'].append(
+                        self._server_usage(instance, flavor,
+                                           period_start, period_stop))
 
-            summary = rval[info['tenant_id']]
-            summary['total_local_gb_usage'] += info['local_gb'] * info['hours']
-            summary['total_vcpus_usage'] += info['vcpus'] * info['hours']
-            summary['total_memory_mb_usage'] += info['memory_mb']\
-                                                * info['hours']
+        return rval.values()
 
-            summary['total_hours'] += info['hours']
-            if detailed:
-                summary['server_usages'].append(info)
+    def _get_pagination(self, req):
+        """Return the marker and limit for server_usages.
 
-        return rval.values()
+        Both are None, and every server usage is listed, unless the request
+        asks for a page with the limit or marker parameters.
+
+        """
+        params = common.get_pagination_params(req)
+        if not params:
+            return (None, None)
+        limit = min(params.get('limit') or FLAGS.osapi_max_limit,
+                    FLAGS.osapi_max_limit)
+        marker = params.get('marker')
+        if marker is not None:
+            try:
+                marker = int(marker)
+            except ValueError:
+                msg = _('marker param must be an instance id')
+                raise exc.HTTPBadRequest(explanation=msg)
+        return (marker, limit)
 
     def _parse_datetime(self, dtstr):
         if isinstance(dtstr, datetime):
@@ -182,10 +261,13 @@ class SimpleTenantUsageController(object):
             return webob.Response(status_int=403)
 
         (period_start, period_stop, detailed) = self._get_datetime_range(req)
+        (marker, limit) = self._get_pagination(req)
         usages = self._tenant_usages_for_period(context,
                                                 period_start,
                                                 period_stop,
-                                                detailed=detailed)
+                                                detailed=detailed,
+                                                marker=marker,
+                                                limit=limit)
         return {'tenant_usages': usages}
 
     def show(self, req, id):
@@ -198,11 +280,14 @@ class SimpleTenantUsageController(object):
                 return webob.Response(status_int=403)
 
         (period_start, period_stop, ignore) = self._get_datetime_range(req)
+        (marker, limit) = self._get_pagination(req)
         usage = self._tenant_usages_for_period(context,
                                                period_start,
                                                period_stop,
                                                tenant_id=tenant_id,
-                                               detailed=True)
+                                               detailed=True,
+                                               marker=marker,
+                                               limit=limit)
         if len(usage):
             usage = usage[0]
         else:
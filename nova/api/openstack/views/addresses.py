@@ -33,8 +33,9 @@ class ViewBuilder(object):
             chain = network[key]
         else:
             chain = itertools.chain(network['ips'], network['floating_ips'])
+        use_ipv6 = FLAGS.use_ipv6
         for ip in chain:
-            if not FLAGS.use_ipv6 and ip['version'] == 6:
+            if not use_ipv6 and ip['version'] == 6:
                 continue
             yield ip
 
@@ -41,6 +41,15 @@ class ViewBuilder(object):
         self.base_url = base_url
         self.project_id = project_id
 
+        # Builders are created per request, and a page of servers
+        # shares a handful of images, flavors and hosts; build the
+        # views of those once and reuse them for every server
+        self._image_refs = {}
+        self._flavor_refs = {}
+        self._host_ids = {}
+        self._servers_href = os.path.join(base_url, project_id, "servers")
+        self._servers_bookmark = None
+
     def build(self, inst, is_detail=False):
         """Return a dict that represenst a server."""
         if inst.get('_is_precooked', False):
@@ -78,8 +87,13 @@ class ViewBuilder(object):
         inst_dict['metadata'] = metadata
 
         inst_dict['hostId'] = ''
-        if inst.get('host'):
-            inst_dict['hostId'] = hashlib.sha224(inst['host']).hexdigest()
+        host = inst.get('host')
+        if host:
+            try:
+                inst_dict['hostId'] = self._host_ids[host]
+            except KeyError:
+                host_id = hashlib.sha224(host).hexdigest()
+                inst_dict['hostId'] = self._host_ids[host] = host_id
 
         self._build_image(inst_dict, inst)
         self._build_flavor(inst_dict, inst)
@@ -108,8 +122,12 @@ class ViewBuilder(object):
     def _build_image(self, response, inst):
         if inst.get("image_ref", None):
             image_href = inst['image_ref']
-            image_id = str(common.get_id_from_href(image_href))
-            _bookmark = self.image_builder.generate_bookmark(image_id)
+            try:
+                image_id, _bookmark = self._image_refs[image_href]
+            except KeyError:
+                image_id = str(common.get_id_from_href(image_href))
+                _bookmark = self.image_builder.generate_bookmark(image_id)
+                self._image_refs[image_href] = (image_id, _bookmark)
             response['image'] = {
                 "id": image_id,
                 "links": [
@@ -123,10 +141,16 @@ class ViewBuilder(object):
     def _build_flavor(self, response, inst):
         if inst.get("instance_type", None):
             flavor_id = inst["instance_type"]['flavorid']
-            flavor_ref = self.flavor_builder.generate_href(flavor_id)
-            flavor_bookmark = self.flavor_builder.generate_bookmark(flavor_id)
+            try:
+                flavor_ref, flavor_bookmark = self._flavor_refs[flavor_id]
+            except KeyError:
+                flavor_ref = self.flavor_builder.generate_href(flavor_id)
+                flavor_ref = str(common.get_id_from_href(flavor_ref))
+                flavor_bookmark = self.flavor_builder.generate_bookmark(
+                        flavor_id)
+                self._flavor_refs[flavor_id] = (flavor_ref, flavor_bookmark)
             response["flavor"] = {
-                "id": str(common.get_id_from_href(flavor_ref)),
+                "id": flavor_ref,
                 "links": [
                     {
                         "rel": "bookmark",
@@ -173,16 +197,17 @@ class ViewBuilder(object):
     def generate_next_link(self, server_id, params, is_detail=False):
         """ Return an href string with proper limit and marker params"""
         params['marker'] = server_id
-        return "%s?%s" % (
-            os.path.join(self.base_url, self.project_id, "servers"),
-            common.dict_to_query_str(params))
+        return "%s?%s" % (self._servers_href,
+                          common.dict_to_query_str(params))
 
     def generate_href(self, server_id):
         """Create an url that refers to a specific server id."""
-        return os.path.join(self.base_url, self.project_id,
-                            "servers", str(server_id))
+        return os.path.join(self._servers_href, str(server_id))
 
     def generate_bookmark(self, server_id):
         """Create an url that refers to a specific flavor id."""
-        return os.path.join(common.remove_version_from_href(self.base_url),
-            self.project_id, "servers", str(server_id))
+        if self._servers_bookmark is None:
+            self._servers_bookmark = os.path.join(
+                    common.remove_version_from_href(self.base_url),
+                    self.project_id, "servers")
+        return os.path.join(self._servers_bookmark, str(server_id))
@@ -15,6 +15,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import itertools
 import json
 from lxml import etree
 import webob
@@ -436,6 +437,29 @@ class ResponseHeadersSerializer(ActionDispatcher):
         response.status_int = 200
 
 
+def _serialize_into(response, serializer, data, **kwargs):
+    """Serialize data into the response body.
+
+    Serializers which can produce their output incrementally stream
+    documents of more than one batch through the response's app_iter.
+    The first batch is always rendered here, so a render error fails
+    the request and a document that fits in one batch is set as the
+    body, with its Content-Length.
+    """
+
+    if not hasattr(serializer, 'serialize_iter'):
+        response.body = serializer.serialize(data, **kwargs)
+        return
+
+    chunks = iter(serializer.serialize_iter(data, **kwargs))
+    first = list(itertools.islice(chunks, 2))
+    if len(first) < 2:
+        response.body = ''.join(first)
+    else:
+        response.app_iter = itertools.chain(first, chunks)
+        response.content_length = None
+
+
 class ResponseSerializer(object):
     """Encode the necessary pieces into a response object"""
 
@@ -480,7 +504,7 @@ class ResponseSerializer(object):
                     template = serializer.get_template(action)
                     request.environ['nova.template'] = template
             else:
-                response.body = serializer.serialize(data, action)
+                _serialize_into(response, serializer, data, action=action)
 
     def get_body_serializer(self, content_type):
         try:
@@ -510,8 +534,8 @@ class LazySerializationMiddleware(wsgi.Middleware):
             kwargs['template'] = req.environ['nova.template']
 
         # Re-serialize the body
-        response.body = serializer.serialize(utils.loads(response.body),
-                                             **kwargs)
+        _serialize_into(response, serializer, utils.loads(response.body),
+                        **kwargs)
 
         return response
 
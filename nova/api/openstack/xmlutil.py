@@ -27,6 +27,9 @@ XMLNS_V10 = 'http://docs.rackspacecloud.com/servers/api/v1.0'
 XMLNS_V11 = 'http://docs.openstack.org/compute/api/v1.1'
 XMLNS_ATOM = 'http://www.w3.org/2005/Atom'
 
+# Number of child elements serialized per chunk by serialize_iter()
+STREAM_BATCH_SIZE = 50
+
 
 def validate_schema(xml, schema_name):
     if type(xml) is str:
@@ -475,6 +478,137 @@ class TemplateElement(object):
                 (' '.join(contents), ''.join(children), self.tag))
 
 
+def _is_overridden(elem, name):
+    """Determine whether a TemplateElement subclass overrides a hook."""
+
+    method = getattr(type(elem), name)
+    return method.im_func is not getattr(TemplateElement, name).im_func
+
+
+class _CompiledElement(object):
+    """A template element and its siblings, compiled for rendering.
+
+    Merging a template element with the matching elements of its
+    sibling templates, and splitting the attributes into simple keys
+    and selector callables, is done once, when the template is
+    compiled, rather than for every datum the template renders.
+    """
+
+    __slots__ = ('tag', 'selector', 'will_render', 'text', 'attrib',
+                 'appliers', 'children')
+
+    def __init__(self, siblings):
+        """Compile a template element.
+
+        :param siblings: The TemplateElement instances to merge; the
+                         first is the primary element and the rest
+                         are applied as patches.
+        """
+
+        primary = siblings[0]
+        self.tag = primary.tag
+        self.selector = primary.selector
+        self.will_render = primary.will_render
+
+        # Elements which override apply() are called as-is; the text
+        # and attributes of the others are folded into flat lists
+        self.text = None
+        self.attrib = []
+        self.appliers = []
+        for sibling in siblings:
+            if _is_overridden(sibling, 'apply'):
+                self.appliers.append(sibling.apply)
+                continue
+
+            if sibling.text is not None:
+                self.text = sibling.text
+            for key, value in sibling.attrib.items():
+                chain = getattr(value, 'chain', None)
+                if (type(value) is Selector and len(chain) == 1 and
+                    not callable(chain[0])):
+                    # Plain datum[key] lookup; no need for a call
+                    self.attrib.append((key, chain[0], None))
+                else:
+                    self.attrib.append((key, None, value))
+
+        # Merge the children of all the siblings by tag
+        self.children = []
+        seen = set()
+        for idx, sibling in enumerate(siblings):
+            for child in sibling:
+                if child.tag in seen:
+                    continue
+                seen.add(child.tag)
+
+                nieces = [child]
+                for sib in siblings[idx + 1:]:
+                    if child.tag in sib:
+                        nieces.append(sib[child.tag])
+                self.children.append(_CompiledElement(nieces))
+
+    def data(self, obj, parent):
+        """Return the list of data this element renders for obj."""
+
+        data = None if obj is None else self.selector(obj)
+
+        if not self.will_render(data):
+            return []
+        elif data is None or not isinstance(data, list):
+            return [data]
+        elif parent is None:
+            raise ValueError(_('root element selecting a list'))
+        return data
+
+    def element(self, parent, datum, nsmap=None, children=True):
+        """Render an etree.Element for a single datum.
+
+        :param parent: The parent etree.Element instance, or None.
+        :param datum: The datum associated with the element.
+        :param nsmap: An optional namespace dictionary; only used for
+                      the root element.
+        :param children: If False, child elements are not rendered.
+        """
+
+        tagname = self.tag(datum) if callable(self.tag) else self.tag
+        if parent is None:
+            elem = etree.Element(tagname, nsmap=nsmap)
+        else:
+            elem = etree.SubElement(parent, tagname)
+
+        if datum is not None:
+            if self.text is not None:
+                elem.text = unicode(self.text(datum))
+
+            for key, index, selector in self.attrib:
+                # Attributes with no value are not included
+                if selector is None:
+                    try:
+                        value = datum[index]
+                    except (KeyError, IndexError):
+                        continue
+                else:
+                    try:
+                        value = selector(datum, True)
+                    except KeyError:
+                        continue
+                elem.set(key, unicode(value))
+
+            for apply in self.appliers:
+                apply(elem, datum)
+
+        if children:
+            for child in self.children:
+                child.render(elem, datum)
+
+        return elem
+
+    def render(self, parent, obj):
+        """Render all the elements selected from obj under parent."""
+
+        for datum in self.data(obj, parent):
+            self.element(parent, datum)
+
+
 def SubTemplateElement(parent, tag, attrib=None, selector=None, **extra):
     """Create a template element as a child of another.
 
@@ -511,6 +645,9 @@ class Template(object):
         self.root = root.unwrap() if root is not None else None
         self.nsmap = nsmap or {}
 
+        # Compiled render plans, keyed by the root siblings
+        self._plans = {}
+
     def _serialize(self, parent, obj, siblings, nsmap=None):
         """Internal serialization.
 
@@ -585,12 +722,84 @@ class Template(object):
         if self.root is None:
             return None
 
-        # Get the siblings and nsmap of the root element
-        siblings = self._siblings()
-        nsmap = self._nsmap()
+        plan = self._compile()
+        for datum in plan.data(obj, None):
+            return plan.element(None, datum, self._nsmap())
+
+    def serialize_iter(self, obj, encoding=None, xml_declaration=False):
+        """Serialize an object incrementally.
+
+        Returns an iterator over chunks of the serialized XML; joined,
+        they are identical to the output of serialize().  The children
+        of the root element are rendered and serialized a batch at a
+        time, so a long list is never held as a single element tree.
 
-        # Form the element tree
-        return self._serialize(None, obj, siblings, nsmap)
+        :param obj: The object to serialize.
+        :param encoding: The encoding passed to etree.tostring().
+        :param xml_declaration: Whether to emit an XML declaration.
+        """
+
+        # If the template is empty, there's nothing to stream
+        if self.root is None:
+            return
+
+        plan = self._compile()
+        for datum in plan.data(obj, None):
+            root = plan.element(None, datum, self._nsmap(), children=False)
+            break
+        else:
+            return
+
+        # Split the serialized root at a placeholder child; every
+        # chunk is then the serialized root with the head and tail
+        # cut off
+        kwargs = dict(encoding=encoding, xml_declaration=xml_declaration)
+        placeholder = etree.Comment('children')
+        root.append(placeholder)
+        head, tail = etree.tostring(root, **kwargs).split(
+            etree.tostring(placeholder), 1)
+        root.remove(placeholder)
+
+        started = False
+        for child in plan.children:
+            for child_datum in child.data(datum, root):
+                child.element(root, child_datum)
+                if len(root) >= STREAM_BATCH_SIZE:
+                    if not started:
+                        yield head
+                        started = True
+                    yield self._drain(root, head, tail, kwargs)
+
+        if not started:
+            # Everything fit in one batch
+            yield etree.tostring(root, **kwargs)
+            return
+        if len(root):
+            yield self._drain(root, head, tail, kwargs)
+        yield tail
+
+    @staticmethod
+    def _drain(root, head, tail, kwargs):
+        """Serialize and remove the children rendered into root."""
+
+        chunk = etree.tostring(root, **kwargs)
+        for elem in list(root):
+            root.remove(elem)
+        return chunk[len(head):len(chunk) - len(tail)]
+
+    def _compile(self):
+        """Return the compiled render plan for the template.
+
+        Plans are built once for each set of root siblings and cached;
+        templates must not be modified once they have been rendered.
+        """
+
+        siblings = tuple(self._siblings())
+        try:
+            return self._plans[siblings]
+        except KeyError:
+            plan = self._plans[siblings] = _CompiledElement(siblings)
+            return plan
 
     def _siblings(self):
         """Hook method for computing root siblings.
@@ -732,9 +941,11 @@ class MasterTemplate(Template):
     def copy(self):
         """Return a copy of this master template."""
 
-        # Return a copy of the MasterTemplate
+        # Return a copy of the MasterTemplate; the copy shares the
+        # compiled render plans
         tmp = self.__class__(self.root, self.version, self.nsmap)
         tmp.slaves = self.slaves[:]
+        tmp._plans = self._plans
         return tmp
 
 
@@ -874,6 +1085,24 @@ class XMLTemplateSerializer(wsgi.ActionDispatcher):
         return template.serialize(data, encoding='UTF-8',
                                   xml_declaration=True)
 
+    def serialize_iter(self, data, action='default', template=None):
+        """Serialize data incrementally.
+
+        As serialize(), but returns an iterator over chunks of the
+        serialized XML, suitable for use as a response app_iter.
+        """
+
+        # No template provided, look one up
+        if template is None:
+            template = self.get_template(action)
+
+        # The base XMLDictSerializer can't stream
+        if template is None:
+            return [self.serialize(data, action)]
+
+        return template.serialize_iter(data, encoding='UTF-8',
+                                       xml_declaration=True)
+
     def default(self):
         """Retrieve the default template to use."""
 
@@ -184,8 +184,8 @@ class LdapDriver(object):
                 cache_key = key_fmt % (arg,)
                 try:
                     res = self.__cache[cache_key]
-                    LOG.debug('Local cache hit for %s by key %s' %
-                              (fn.__name__, cache_key))
+                    LOG.debug('Local cache hit for %s by key %s',
+                              fn.__name__, cache_key)
                     return res
                 except KeyError:
                     res = fn(self, arg, **kwargs)
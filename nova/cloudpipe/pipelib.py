@@ -92,7 +92,7 @@ class CloudPipe(object):
         return encoded
 
     def launch_vpn_instance(self, project_id, user_id):
-        LOG.debug(_("Launching VPN for %s") % (project_id))
+        LOG.debug(_("Launching VPN for %s"), project_id)
         ctxt = context.RequestContext(user_id=user_id,
                                       project_id=project_id)
         key_name = self.setup_key_pair(ctxt)
@@ -213,20 +213,6 @@ class API(base.Base):
 
         block_device_mapping = block_device_mapping or []
 
-        num_instances = quota.allowed_instances(context, max_count,
-                                                instance_type)
-        if num_instances < min_count:
-            pid = context.project_id
-            LOG.warn(_("Quota exceeded for %(pid)s,"
-                    " tried to run %(min_count)s instances") % locals())
-            if num_instances <= 0:
-                message = _("Instance quota exceeded. You cannot run any "
-                            "more instances of this type.")
-            else:
-                message = _("Instance quota exceeded. You can only run %s "
-                            "more instances of this type.") % num_instances
-            raise quota.QuotaError(message, "InstanceLimitExceeded")
-
         self._check_metadata_properties_quota(context, metadata)
         self._check_injected_file_quota(context, injected_files)
         self._check_requested_networks(context, requested_networks)
@@ -270,8 +256,8 @@ class API(base.Base):
             ramdisk_id = None
             LOG.debug(_("Creating a raw instance"))
         # Make sure we have access to kernel and ramdisk (if not raw)
-        logging.debug("Using Kernel=%s, Ramdisk=%s" %
-                       (kernel_id, ramdisk_id))
+        logging.debug("Using Kernel=%s, Ramdisk=%s",
+                       kernel_id, ramdisk_id)
         if kernel_id:
             image_service.show(context, kernel_id)
         if ramdisk_id:
@@ -288,6 +274,24 @@ class API(base.Base):
         if reservation_id is None:
             reservation_id = utils.generate_uid('r')
 
+        # NOTE: the quota held here is handed over to the instance rows as
+        # the scheduler creates them with this reservation_id, and the
+        # scheduler gives back whatever is left once it is done.  It is only
+        # given back here if the request never reaches the scheduler.
+        num_instances, reservations = quota.reserve_instances(context,
+                min_count, max_count, instance_type, reservation_id)
+        if num_instances < min_count:
+            pid = context.project_id
+            LOG.warn(_("Quota exceeded for %(pid)s,"
+                    " tried to run %(min_count)s instances") % locals())
+            if num_instances <= 0:
+                message = _("Instance quota exceeded. You cannot run any "
+                            "more instances of this type.")
+            else:
+                message = _("Instance quota exceeded. You can only run %s "
+                            "more instances of this type.") % num_instances
+            raise quota.QuotaError(message, "InstanceLimitExceeded")
+
         root_device_name = block_device.properties_root_device_name(
             image['properties'])
 
@@ -323,7 +327,7 @@ class API(base.Base):
             'root_device_name': root_device_name,
             'managed_disk': managed_disk}
 
-        LOG.debug(_("Going to run %s instances...") % num_instances)
+        LOG.debug(_("Going to run %s instances..."), num_instances)
 
         if wait_for_instances:
             rpc_method = rpc.call
@@ -335,14 +339,18 @@ class API(base.Base):
         # Otherwise, we could exceed the AMQP max message size limit.
         # This would require the schedulers' schedule_run_instances
         # methods to return an iterator vs a list.
-        instances = self._schedule_run_instance(
-                rpc_method,
-                context, base_options,
-                instance_type, zone_blob,
-                availability_zone, injected_files,
-                admin_password, image,
-                num_instances, requested_networks,
-                block_device_mapping, security_group)
+        try:
+            instances = self._schedule_run_instance(
+                    rpc_method,
+                    context, base_options,
+                    instance_type, zone_blob,
+                    availability_zone, injected_files,
+                    admin_password, image,
+                    num_instances, requested_networks,
+                    block_device_mapping, security_group)
+        except Exception:
+            quota.release(context, reservations)
+            raise
 
         return (instances, reservation_id)
 
@@ -502,7 +510,7 @@ class API(base.Base):
         pid = context.project_id
         uid = context.user_id
 
-        LOG.debug(_("Sending create to scheduler for %(pid)s/%(uid)s's") %
+        LOG.debug(_("Sending create to scheduler for %(pid)s/%(uid)s's"),
                 locals())
 
         request_spec = {
@@ -946,7 +954,7 @@ class API(base.Base):
         if search_opts is None:
             search_opts = {}
 
-        LOG.debug(_("Searching by: %s") % str(search_opts))
+        LOG.debug(_("Searching by: %s"), str(search_opts))
 
         # Fixups for the DB call
         filters = {}
@@ -1276,7 +1284,7 @@ class API(base.Base):
         current_instance_type_name = current_instance_type['name']
         new_instance_type_name = new_instance_type['name']
         LOG.debug(_("Old instance type %(current_instance_type_name)s, "
-                " new instance type %(new_instance_type_name)s") % locals())
+                " new instance type %(new_instance_type_name)s"), locals())
         if not new_instance_type:
             raise exception.FlavorNotFound(flavor_id=flavor_id)
 
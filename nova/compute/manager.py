@@ -86,6 +86,13 @@ flags.DEFINE_integer("resize_confirm_window", 0,
                      " Set to 0 to disable.")
 flags.DEFINE_integer('host_state_interval', 120,
                      'Interval in seconds for querying the host status')
+flags.DEFINE_integer('host_usage_reconcile_interval', 600,
+                     'Seconds between recounting the resource usage of this'
+                     ' host that the scheduler sorts by, 0 to disable')
+flags.DEFINE_bool('power_state_events', False,
+                  'Update instance power states from hypervisor lifecycle '
+                  'events when the driver supports them, in addition to '
+                  'the periodic sync')
 
 LOG = logging.getLogger('nova.compute.manager')
 
@@ -146,8 +153,8 @@ class ComputeManager(manager.SchedulerDependentManager):
 
         self.network_api = network.API()
         self.network_manager = utils.import_object(FLAGS.network_manager)
-        self._last_host_check = 0
-        self._last_bw_usage_poll = 0
+        self._host_inventory = None
+        self._instance_ids_by_name = {}
         super(ComputeManager, self).__init__(service_name="compute",
                                              *args, **kwargs)
 
@@ -186,6 +193,32 @@ class ComputeManager(manager.SchedulerDependentManager):
                     LOG.warning(_('Hypervisor driver does not '
                             'support firewall rules'))
 
+        if FLAGS.power_state_events:
+            try:
+                self.driver.register_power_state_listener(
+                        self._handle_power_state_event)
+            except NotImplementedError:
+                LOG.warning(_('Hypervisor driver does not support power '
+                              'state events, relying on periodic sync'))
+
+    def _handle_power_state_event(self, vm_instance):
+        """Record a power state change reported by the hypervisor."""
+        context = nova.context.get_admin_context()
+        instance_id = self._instance_ids_by_name.get(vm_instance.name)
+        if instance_id is None:
+            # an instance we haven't seen yet, so refresh the names
+            self._get_host_inventory(context, refresh=True)
+            instance_id = self._instance_ids_by_name.get(vm_instance.name)
+            if instance_id is None:
+                return
+        try:
+            instance = self.db.instance_get(context, instance_id)
+        except exception.InstanceNotFound:
+            return
+        if instance['power_state'] != vm_instance.state:
+            self.db.instance_update_power_states(context,
+                    {instance_id: vm_instance.state})
+
     def _get_power_state(self, context, instance):
         """Retrieve the power state for the given instance."""
         LOG.debug(_('Checking state of %s'), instance['name'])
@@ -356,7 +389,7 @@ class ComputeManager(manager.SchedulerDependentManager):
 
             LOG.debug(_("image_id=%(image_id)s, image_size_bytes="
                         "%(size_bytes)d, allowed_size_bytes="
-                        "%(allowed_size_bytes)d") % locals())
+                        "%(allowed_size_bytes)d"), locals())
 
             if size_bytes > allowed_size_bytes:
                 LOG.info(_("Image '%(image_id)s' size %(size_bytes)d exceeded"
@@ -536,7 +569,7 @@ class ComputeManager(manager.SchedulerDependentManager):
         bdms = self.db.block_device_mapping_get_all_by_instance(context,
                                                                 instance_id)
         for bdm in bdms:
-            LOG.debug(_("terminating bdm %s") % bdm)
+            LOG.debug(_("terminating bdm %s"), bdm)
             if bdm['volume_id'] and bdm['delete_on_termination']:
                 volume_api.delete(context, bdm['volume_id'])
             # NOTE(vish): bdms will be deleted on instance destroy
@@ -788,17 +821,17 @@ class ComputeManager(manager.SchedulerDependentManager):
 
         images = fetch_images()
         num_images = len(images)
-        LOG.debug(_("Found %(num_images)d images (rotation: %(rotation)d)"
-                    % locals()))
+        LOG.debug(_("Found %(num_images)d images (rotation: %(rotation)d)"),
+                  locals())
         if num_images > rotation:
             # NOTE(sirp): this deletes all backups that exceed the rotation
             # limit
             excess = len(images) - rotation
-            LOG.debug(_("Rotating out %d backups" % excess))
+            LOG.debug(_("Rotating out %d backups"), excess)
             for i in xrange(excess):
                 image = images.pop()
                 image_id = image['id']
-                LOG.debug(_("Deleting image %s" % image_id))
+                LOG.debug(_("Deleting image %s"), image_id)
                 image_service.delete(context, image_id)
 
     @exception.wrap_exception(notifier=notifier, publisher_id=publisher_id())
@@ -1463,7 +1496,7 @@ class ComputeManager(manager.SchedulerDependentManager):
         fd, tmp_file = tempfile.mkstemp(dir=dirpath)
         LOG.debug(_("Creating tmpfile %s to notify to other "
                     "compute nodes that they should mount "
-                    "the same storage.") % tmp_file)
+                    "the same storage."), tmp_file)
         os.close(fd)
         return os.path.basename(tmp_file)
 
@@ -1775,93 +1808,85 @@ class ComputeManager(manager.SchedulerDependentManager):
 
     def periodic_tasks(self, context=None):
         """Tasks to be run at a periodic interval."""
-        error_list = super(ComputeManager, self).periodic_tasks(context)
-        if error_list is None:
-            error_list = []
-
-        try:
-            if FLAGS.reboot_timeout > 0:
-                self.driver.poll_rebooting_instances(FLAGS.reboot_timeout)
-        except Exception as ex:
-            LOG.warning(_("Error during poll_rebooting_instances: %s"),
-                    unicode(ex))
-            error_list.append(ex)
-
-        try:
-            if FLAGS.rescue_timeout > 0:
-                self.driver.poll_rescued_instances(FLAGS.rescue_timeout)
-        except Exception as ex:
-            LOG.warning(_("Error during poll_rescued_instances: %s"),
-                    unicode(ex))
-            error_list.append(ex)
-
-        try:
-            if FLAGS.resize_confirm_window > 0:
-                self.driver.poll_unconfirmed_resizes(
-                        FLAGS.resize_confirm_window)
-        except Exception as ex:
-            LOG.warning(_("Error during poll_unconfirmed_resizes: %s"),
-                    unicode(ex))
-            error_list.append(ex)
-
+        # Tasks below share one snapshot of this host's instances per run.
+        self._host_inventory = None
+        return super(ComputeManager, self).periodic_tasks(context)
+
+    @manager.periodic_task
+    def _poll_rebooting_instances(self, context):
+        if FLAGS.reboot_timeout > 0:
+            self.driver.poll_rebooting_instances(FLAGS.reboot_timeout)
+
+    @manager.periodic_task
+    def _poll_rescued_instances(self, context):
+        if FLAGS.rescue_timeout > 0:
+            self.driver.poll_rescued_instances(FLAGS.rescue_timeout)
+
+    @manager.periodic_task
+    def _poll_unconfirmed_resizes(self, context):
+        if FLAGS.resize_confirm_window > 0:
+            self.driver.poll_unconfirmed_resizes(FLAGS.resize_confirm_window)
+
+    @manager.periodic_task(interval='bandwith_poll_interval', jitter=True)
+    def _poll_bandwidth_usage(self, context):
+        start_time = utils.current_audit_period()[1]
         try:
-            self._report_driver_status()
-        except Exception as ex:
-            LOG.warning(_("Error during report_driver_status(): %s"),
-                    unicode(ex))
-            error_list.append(ex)
-
-        try:
-            self._sync_power_states(context)
-        except Exception as ex:
-            LOG.warning(_("Error during power_state sync: %s"), unicode(ex))
-            error_list.append(ex)
-
-        try:
-            self._reclaim_queued_deletes(context)
-        except Exception as ex:
-            LOG.warning(_("Error during reclamation of queued deletes: %s"),
-                        unicode(ex))
-            error_list.append(ex)
-        try:
-            start = utils.current_audit_period()[1]
-            self._update_bandwidth_usage(context, start)
+            bw_usage = self.driver.get_all_bw_usage(start_time)
         except NotImplementedError:
             # Not all hypervisors have bandwidth polling implemented yet.
             # If they don't id doesn't break anything, they just don't get the
             # info in the usage events. (mdragon)
-            pass
-        except Exception as ex:
-            LOG.warning(_("Error updating bandwidth usage: %s"),
-                        unicode(ex))
-            error_list.append(ex)
-
-        return error_list
-
-    def _update_bandwidth_usage(self, context, start_time, stop_time=None):
-        curr_time = time.time()
-        if curr_time - self._last_bw_usage_poll > FLAGS.bandwith_poll_interval:
-            self._last_bw_usage_poll = curr_time
-            LOG.info(_("Updating bandwidth usage cache"))
-            bw_usage = self.driver.get_all_bw_usage(start_time, stop_time)
-            for usage in bw_usage:
-                vif = usage['virtual_interface']
-                self.db.bw_usage_update(context,
-                                        vif.instance_id,
-                                        vif.network.label,
-                                        start_time,
-                                        usage['bw_in'], usage['bw_out'])
-
-    def _report_driver_status(self):
-        curr_time = time.time()
-        if curr_time - self._last_host_check > FLAGS.host_state_interval:
-            self._last_host_check = curr_time
-            LOG.info(_("Updating host status"))
-            # This will grab info about the host and queue it
-            # to be sent to the Schedulers.
-            self.update_service_capabilities(
-                self.driver.get_host_stats(refresh=True))
-
+            return
+        LOG.info(_("Updating bandwidth usage cache"))
+        for usage in bw_usage:
+            vif = usage['virtual_interface']
+            self.db.bw_usage_update(context,
+                                    vif.instance_id,
+                                    vif.network.label,
+                                    start_time,
+                                    usage['bw_in'], usage['bw_out'])
+
+    @manager.periodic_task(interval='host_state_interval')
+    def _report_driver_status(self, context):
+        LOG.info(_("Updating host status"))
+        # This will grab info about the host and queue it
+        # to be sent to the Schedulers.
+        self.update_service_capabilities(
+            self.driver.get_host_stats(refresh=True))
+
+    @manager.periodic_task(interval='host_usage_reconcile_interval',
+                           jitter=True)
+    def _reconcile_host_usage(self, context):
+        """Recount the usage counters of this host from its rows.
+
+        The counters are kept up to date as instances, volumes and networks
+        change, so this only corrects drift from changes made behind the
+        DB API's back.
+        """
+        if not FLAGS.host_usage_reconcile_interval:
+            return
+        drift = self.db.host_usage_reconcile(context, self.host)
+        for counter, (counted, actual) in drift.iteritems():
+            LOG.warn(_('Corrected %(counter)s usage of host %(host)s from '
+                       '%(counted)s to %(actual)s'),
+                     {'counter': counter, 'host': self.host,
+                      'counted': counted, 'actual': actual})
+
+    def _get_host_inventory(self, context, refresh=False):
+        """Return the id, name and state of every instance on this host.
+
+        The list is fetched once per periodic_tasks run and shared by the
+        tasks that need it.
+        """
+        if self._host_inventory is None or refresh:
+            self._host_inventory = self.db.instance_get_all_states_by_host(
+                    context, self.host)
+            self._instance_ids_by_name = dict(
+                    (instance['name'], instance['id'])
+                    for instance in self._host_inventory)
+        return self._host_inventory
+
+    @manager.periodic_task
     def _sync_power_states(self, context):
         """Align power states between the database and the hypervisor.
 
@@ -1874,7 +1899,7 @@ class ComputeManager(manager.SchedulerDependentManager):
         """
         vm_instances = self.driver.list_instances_detail()
         vm_instances = dict((vm.name, vm) for vm in vm_instances)
-        db_instances = self.db.instance_get_all_by_host(context, self.host)
+        db_instances = self._get_host_inventory(context)
 
         num_vm_instances = len(vm_instances)
         num_db_instances = len(db_instances)
@@ -1883,6 +1908,7 @@ class ComputeManager(manager.SchedulerDependentManager):
             LOG.info(_("Found %(num_db_instances)s in the database and "
                        "%(num_vm_instances)s on the hypervisor.") % locals())
 
+        changed = {}
         for db_instance in db_instances:
             name = db_instance["name"]
             db_power_state = db_instance['power_state']
@@ -1896,14 +1922,17 @@ class ComputeManager(manager.SchedulerDependentManager):
             if vm_power_state == db_power_state:
                 continue
 
-            self._instance_update(context,
-                                  db_instance["id"],
-                                  power_state=vm_power_state)
+            changed[db_instance["id"]] = vm_power_state
+            db_instance['power_state'] = vm_power_state
+
+        if changed:
+            self.db.instance_update_power_states(context, changed)
 
+    @manager.periodic_task
     def _reclaim_queued_deletes(self, context):
         """Reclaim instances that are queued for deletion."""
 
-        instances = self.db.instance_get_all_by_host(context, self.host)
+        instances = self._get_host_inventory(context)
 
         queue_time = datetime.timedelta(
                          seconds=FLAGS.reclaim_instance_interval)
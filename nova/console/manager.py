@@ -89,7 +89,7 @@ class ConsoleProxyManager(manager.Manager):
             console = self.db.console_get(context, console_id)
         except exception.NotFound:
             logging.debug(_('Tried to remove non-existant console '
-                            '%(console_id)s.') %
+                            '%(console_id)s.'),
                             {'console_id': console_id})
             return
         self.db.console_delete(context, console_id)
@@ -114,10 +114,10 @@ class ConsoleVMRCManager(manager.Manager):
             console = self.db.console_get(context, console_id)
         except exception.NotFound:
             LOG.debug(_('Tried to remove non-existent console '
-                        '%(console_id)s.') % {'console_id': console_id})
+                        '%(console_id)s.'), {'console_id': console_id})
             return
         LOG.debug(_('Removing console '
-                    '%(console_id)s.') % {'console_id': console_id})
+                    '%(console_id)s.'), {'console_id': console_id})
         self.db.console_delete(context, console_id)
         self.driver.teardown_console(context, console)
 
@@ -108,7 +108,7 @@ class XVPConsoleProxy(object):
         self._xvp_restart()
 
     def _write_conf(self, config):
-        logging.debug(_('Re-wrote %s') % FLAGS.console_xvp_conf)
+        logging.debug(_('Re-wrote %s'), FLAGS.console_xvp_conf)
         with open(FLAGS.console_xvp_conf, 'w') as cfile:
             cfile.write(config)
 
@@ -51,6 +51,9 @@ flags.DEFINE_string('snapshot_name_template', 'snapshot-%08x',
                     'Template string to be used to generate snapshot names')
 flags.DEFINE_string('vsa_name_template', 'vsa-%08x',
                     'Template string to be used to generate VSA names')
+flags.DEFINE_integer('archive_batch_size', 1000,
+                     'Rows moved per transaction when archiving or purging'
+                     ' soft-deleted rows')
 
 IMPL = utils.LazyPluggable(FLAGS['db_backend'],
                            sqlalchemy='nova.db.sqlalchemy.api')
@@ -105,9 +108,9 @@ def service_get_all_compute_by_host(context, host):
 
 
 def service_get_all_compute_sorted(context):
-    """Get all compute services sorted by instance count.
+    """Get all compute services sorted by instance cores.
 
-    :returns: a list of (Service, instance_count) tuples.
+    :returns: a list of (Service, instance_cores) tuples.
 
     """
     return IMPL.service_get_all_compute_sorted(context)
@@ -123,9 +126,9 @@ def service_get_all_network_sorted(context):
 
 
 def service_get_all_volume_sorted(context):
-    """Get all volume services sorted by volume count.
+    """Get all volume services sorted by volume gigabytes.
 
-    :returns: a list of (Service, volume_count) tuples.
+    :returns: a list of (Service, volume_gigabytes) tuples.
 
     """
     return IMPL.service_get_all_volume_sorted(context)
@@ -150,6 +153,15 @@ def service_update(context, service_id, values):
     return IMPL.service_update(context, service_id, values)
 
 
+def service_heartbeat(context, service_id):
+    """Bump report_count and updated_at of a service in one statement.
+
+    Raises ServiceNotFound if service does not exist.
+
+    """
+    return IMPL.service_heartbeat(context, service_id)
+
+
 ###################
 
 
@@ -176,6 +188,28 @@ def compute_node_update(context, compute_id, values):
 ###################
 
 
+def host_usage_get(context, host):
+    """Get the usage counters of a host.
+
+    Raises HostUsageNotFound if no usage is recorded for the host.
+
+    """
+    return IMPL.host_usage_get(context, host)
+
+
+def host_usage_reconcile(context, host):
+    """Recount the usage counters of a host from its rows.
+
+    :returns: a dict of counter: (counted, actual) for the counters
+              that were wrong.
+
+    """
+    return IMPL.host_usage_reconcile(context, host)
+
+
+###################
+
+
 def certificate_create(context, values):
     """Create a certificate from the values dictionary."""
     return IMPL.certificate_create(context, values)
@@ -532,6 +566,46 @@ def instance_get_active_by_window(context, begin, end=None, project_id=None):
     return IMPL.instance_get_active_by_window(context, begin, end, project_id)
 
 
+def instance_get_all_in_window(context, begin, end, project_id=None,
+                               marker=None, limit=None):
+    """Get instances running at any time in a window, ordered by id.
+
+    Only instances with an id above marker are returned, at most limit.
+    """
+    return IMPL.instance_get_all_in_window(context, begin, end, project_id,
+                                           marker, limit)
+
+
+def instance_usage_get_by_window(context, begin, end, project_id=None):
+    """Get instance hours in a window summed per project and type."""
+    return IMPL.instance_usage_get_by_window(context, begin, end, project_id)
+
+
+def instance_usage_rollup_hour(context, period_start):
+    """Store the instance usage of the hour starting at period_start.
+
+    Rolling up an hour again replaces its rows.  Concurrent rollups of the
+    same hour wait for each other on the row of the hour in
+    instance_usage_rollup_periods.
+    """
+    return IMPL.instance_usage_rollup_hour(context, period_start)
+
+
+def instance_usage_rollup_get_by_window(context, begin, end,
+                                        project_id=None):
+    """Get rolled up instance hours summed per project and type."""
+    return IMPL.instance_usage_rollup_get_by_window(context, begin, end,
+                                                    project_id)
+
+
+def instance_usage_rollup_get_bounds(context):
+    """Get the starts of the first and last rolled up hours.
+
+    Both are None when nothing has been rolled up.
+    """
+    return IMPL.instance_usage_rollup_get_bounds(context)
+
+
 def instance_get_active_by_window_joined(context, begin, end=None,
                                          project_id=None):
     """Get instances and joins active during a certain time window.
@@ -556,6 +630,11 @@ def instance_get_all_by_host(context, host):
     return IMPL.instance_get_all_by_host(context, host)
 
 
+def instance_get_all_states_by_host(context, host):
+    """Get id, uuid, name and state columns of all instances on a host."""
+    return IMPL.instance_get_all_states_by_host(context, host)
+
+
 def instance_get_all_by_reservation(context, reservation_id):
     """Get all instances belonging to a reservation."""
     return IMPL.instance_get_all_by_reservation(context, reservation_id)
@@ -605,6 +684,11 @@ def instance_update(context, instance_id, values):
     return IMPL.instance_update(context, instance_id, values)
 
 
+def instance_update_power_states(context, power_states):
+    """Set power_state for many instances from an id -> state dict."""
+    return IMPL.instance_update_power_states(context, power_states)
+
+
 def instance_add_security_group(context, instance_id, security_group_id):
     """Associate the given security group with the given instance."""
     return IMPL.instance_add_security_group(context, instance_id,
@@ -887,6 +971,50 @@ def quota_destroy_all_by_project(context, project_id):
     return IMPL.quota_get_all_by_project(context, project_id)
 
 
+def quota_usage_get_all_by_project(context, project_id):
+    """Retrieve in_use and reserved of each resource used by a project."""
+    return IMPL.quota_usage_get_all_by_project(context, project_id)
+
+
+def quota_reserve(context, project_id, deltas, quotas, min_units, max_units,
+                  expire, request_id=None):
+    """Hold quota for up to max_units of deltas until expire.
+
+    :returns: the number of units held and the ids of the reservations
+              holding them; nothing is held when fewer than min_units fit.
+
+    """
+    return IMPL.quota_reserve(context, project_id, deltas, quotas,
+                              min_units, max_units, expire,
+                              request_id=request_id)
+
+
+def reservation_release(context, reservations):
+    """Give back the quota still held by the given reservations."""
+    return IMPL.reservation_release(context, reservations)
+
+
+def reservation_release_by_request(context, project_id, request_id):
+    """Give back the quota still held for a request of project_id."""
+    return IMPL.reservation_release_by_request(context, project_id,
+                                               request_id)
+
+
+def reservation_expire(context):
+    """Give back the quota held by expired reservations."""
+    return IMPL.reservation_expire(context)
+
+
+def quota_usage_reconcile(context):
+    """Recount in_use of every project from the resource rows.
+
+    :returns: a dict of (project_id, resource): (counted, actual) for the
+              usages that were wrong.
+
+    """
+    return IMPL.quota_usage_reconcile(context)
+
+
 ###################
 
 
@@ -960,6 +1088,11 @@ def volume_get_iscsi_target_num(context, volume_id):
     return IMPL.volume_get_iscsi_target_num(context, volume_id)
 
 
+def volume_get_iscsi_target_nums_by_host(context, host):
+    """Get a dict mapping volume ids to the tids allocated on host."""
+    return IMPL.volume_get_iscsi_target_nums_by_host(context, host)
+
+
 def volume_update(context, volume_id, values):
     """Set the given properties on an volume and update it.
 
@@ -1611,3 +1744,33 @@ def s3_image_get_by_uuid(context, image_uuid):
 def s3_image_create(context, image_uuid):
     """Create local s3 image represented by provided uuid"""
     return IMPL.s3_image_create(context, image_uuid)
+
+
+###################
+
+
+def archive_deleted_rows(context, max_rows=None, before=None):
+    """Move soft-deleted rows into the shadow tables.
+
+    Rows are moved in batches of archive_batch_size, each in its own
+    transaction.  Rows still referenced by other rows are left in place.
+    History rows of an archived instance take its deleted_at.
+
+    Usage reports such as os-simple-tenant-usage only read the live
+    tables, so archived instances drop out of the usage of every period
+    they ran in; archive only rows deleted before the oldest period that
+    is still reported on.
+
+    :param max_rows: Most rows to move, or None for no limit.
+    :param before: Only move rows deleted before this datetime.
+    :returns: A dict of table name to the number of rows archived.
+    """
+    return IMPL.archive_deleted_rows(context, max_rows, before)
+
+
+def purge_shadow_rows(context, before, max_rows=None):
+    """Delete archived rows deleted before a datetime from shadow tables.
+
+    :returns: A dict of table name to the number of rows purged.
+    """
+    return IMPL.purge_shadow_rows(context, before, max_rows)
@@ -32,13 +32,21 @@ from nova import log as logging
 from nova.compute import vm_states
 from nova.db.sqlalchemy import models
 from nova.db.sqlalchemy.session import get_session
+from sqlalchemy import and_
 from sqlalchemy import or_
+from sqlalchemy import MetaData
+from sqlalchemy import Table
+from sqlalchemy import DateTime
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm import joinedload_all
 from sqlalchemy.sql import func
+from sqlalchemy.sql.expression import case
 from sqlalchemy.sql.expression import desc
+from sqlalchemy.sql.expression import exists
+from sqlalchemy.sql.expression import literal
 from sqlalchemy.sql.expression import literal_column
+from sqlalchemy.sql.expression import select
 
 FLAGS = flags.FLAGS
 LOG = logging.getLogger("nova.db.sqlalchemy")
@@ -149,6 +157,16 @@ def require_volume_exists(f):
     return wrapper
 
 
+def _is_duplicate(error):
+    """Indicates if a flush failed on a unique constraint.
+
+    Session flushes wrap the IntegrityError in a DBError.
+
+    """
+    return isinstance(getattr(error, 'inner_exception', error),
+                      IntegrityError)
+
+
 ###################
 
 
@@ -241,77 +259,37 @@ def service_get_all_compute_by_host(context, host):
     return result
 
 
-@require_admin_context
-def _service_get_all_topic_subquery(context, session, topic, subq, label):
-    sort_value = getattr(subq.c, label)
-    return session.query(models.Service, func.coalesce(sort_value, 0)).\
+def _service_get_all_topic_sorted(context, session, topic, counter):
+    usage = getattr(models.HostUsage, counter)
+    return session.query(models.Service, usage).\
                    filter_by(topic=topic).\
                    filter_by(deleted=False).\
                    filter_by(disabled=False).\
-                   outerjoin((subq, models.Service.host == subq.c.host)).\
-                   order_by(sort_value).\
+                   join((models.HostUsage,
+                         models.Service.host == models.HostUsage.host)).\
+                   order_by(usage).\
                    all()
 
 
 @require_admin_context
 def service_get_all_compute_sorted(context):
     session = get_session()
-    with session.begin():
-        # NOTE(vish): The intended query is below
-        #             SELECT services.*, COALESCE(inst_cores.instance_cores,
-        #                                         0)
-        #             FROM services LEFT OUTER JOIN
-        #             (SELECT host, SUM(instances.vcpus) AS instance_cores
-        #              FROM instances GROUP BY host) AS inst_cores
-        #             ON services.host = inst_cores.host
-        topic = 'compute'
-        label = 'instance_cores'
-        subq = session.query(models.Instance.host,
-                             func.sum(models.Instance.vcpus).label(label)).\
-                       filter_by(deleted=False).\
-                       group_by(models.Instance.host).\
-                       subquery()
-        return _service_get_all_topic_subquery(context,
-                                               session,
-                                               topic,
-                                               subq,
-                                               label)
+    return _service_get_all_topic_sorted(context, session, 'compute',
+                                         'vcpus')
 
 
 @require_admin_context
 def service_get_all_network_sorted(context):
     session = get_session()
-    with session.begin():
-        topic = 'network'
-        label = 'network_count'
-        subq = session.query(models.Network.host,
-                             func.count(models.Network.id).label(label)).\
-                       filter_by(deleted=False).\
-                       group_by(models.Network.host).\
-                       subquery()
-        return _service_get_all_topic_subquery(context,
-                                               session,
-                                               topic,
-                                               subq,
-                                               label)
+    return _service_get_all_topic_sorted(context, session, 'network',
+                                         'network_count')
 
 
 @require_admin_context
 def service_get_all_volume_sorted(context):
     session = get_session()
-    with session.begin():
-        topic = 'volume'
-        label = 'volume_gigabytes'
-        subq = session.query(models.Volume.host,
-                             func.sum(models.Volume.size).label(label)).\
-                       filter_by(deleted=False).\
-                       group_by(models.Volume.host).\
-                       subquery()
-        return _service_get_all_topic_subquery(context,
-                                               session,
-                                               topic,
-                                               subq,
-                                               label)
+    return _service_get_all_topic_sorted(context, session, 'volume',
+                                         'volume_gigabytes')
 
 
 @require_admin_context
@@ -334,7 +312,11 @@ def service_create(context, values):
     service_ref.update(values)
     if not FLAGS.enable_new_services:
         service_ref.disabled = True
-    service_ref.save()
+    session = get_session()
+    with session.begin():
+        service_ref.save(session=session)
+        # Make sure the host is listed by the *_sorted calls
+        _host_usage_add(session, service_ref['host'], {})
     return service_ref
 
 
@@ -347,6 +329,21 @@ def service_update(context, service_id, values):
         service_ref.save(session=session)
 
 
+@require_admin_context
+def service_heartbeat(context, service_id):
+    session = get_session()
+    with session.begin():
+        report_count = models.Service.report_count + 1
+        count = session.query(models.Service).\
+                        filter_by(id=service_id).\
+                        filter_by(deleted=False).\
+                        update({'report_count': report_count,
+                                'updated_at': utils.utcnow()},
+                               synchronize_session=False)
+    if not count:
+        raise exception.ServiceNotFound(service_id=service_id)
+
+
 ###################
 
 
@@ -386,6 +383,421 @@ def compute_node_update(context, compute_id, values):
 ###################
 
 
+_HOST_USAGE_COUNTERS = ('vcpus', 'memory_mb', 'local_gb',
+                        'volume_gigabytes', 'network_count')
+
+
+def _host_usage_add(session, host, usage, sign=1):
+    """Add usage to the counters of host, creating them if needed."""
+    if not host:
+        return
+    values = dict((counter, getattr(models.HostUsage, counter) +
+                            sign * amount)
+                  for counter, amount in usage.iteritems() if amount)
+    if values:
+        count = session.query(models.HostUsage).\
+                        filter_by(host=host).\
+                        update(values, synchronize_session=False)
+    else:
+        count = session.query(models.HostUsage.id).\
+                        filter_by(host=host).\
+                        count()
+    if not count:
+        usage_ref = models.HostUsage()
+        usage_ref.host = host
+        for counter in _HOST_USAGE_COUNTERS:
+            usage_ref[counter] = sign * usage.get(counter, 0)
+        session.add(usage_ref)
+
+
+def _host_usage_move(session, old, new):
+    """Move usage between (host, usage) pairs, before and after a change."""
+    if old != new:
+        _host_usage_add(session, old[0], old[1], sign=-1)
+        _host_usage_add(session, new[0], new[1])
+
+
+def _instance_usage(instance_ref):
+    if not instance_ref or instance_ref['deleted']:
+        return (None, {})
+    return (instance_ref['host'],
+            {'vcpus': instance_ref['vcpus'] or 0,
+             'memory_mb': instance_ref['memory_mb'] or 0,
+             'local_gb': instance_ref['local_gb'] or 0})
+
+
+def _volume_usage(volume_ref):
+    if not volume_ref or volume_ref['deleted']:
+        return (None, {})
+    return (volume_ref['host'],
+            {'volume_gigabytes': volume_ref['size'] or 0})
+
+
+def _network_usage(network_ref):
+    if not network_ref or network_ref['deleted']:
+        return (None, {})
+    return (network_ref['host'], {'network_count': 1})
+
+
+@require_admin_context
+def host_usage_get(context, host, session=None):
+    if not session:
+        session = get_session()
+    result = session.query(models.HostUsage).\
+                     filter_by(host=host).\
+                     first()
+    if not result:
+        raise exception.HostUsageNotFound(host=host)
+    return result
+
+
+@require_admin_context
+def host_usage_reconcile(context, host):
+    session = get_session()
+    with session.begin():
+        # NOTE: lock the row before counting; a concurrent change then
+        #       waits to apply its delta until the new totals are stored
+        usage_ref = session.query(models.HostUsage).\
+                            filter_by(host=host).\
+                            with_lockmode('update').\
+                            first()
+        if not usage_ref:
+            usage_ref = models.HostUsage()
+            usage_ref.host = host
+            for counter in _HOST_USAGE_COUNTERS:
+                usage_ref[counter] = 0
+
+        actual = dict.fromkeys(_HOST_USAGE_COUNTERS, 0)
+        row = session.query(func.sum(models.Instance.vcpus),
+                            func.sum(models.Instance.memory_mb),
+                            func.sum(models.Instance.local_gb)).\
+                      filter_by(host=host).\
+                      filter_by(deleted=False).\
+                      first()
+        actual['vcpus'] = row[0] or 0
+        actual['memory_mb'] = row[1] or 0
+        actual['local_gb'] = row[2] or 0
+        actual['volume_gigabytes'] = session.query(
+                                             func.sum(models.Volume.size)).\
+                                             filter_by(host=host).\
+                                             filter_by(deleted=False).\
+                                             scalar() or 0
+        actual['network_count'] = session.query(models.Network.id).\
+                                          filter_by(host=host).\
+                                          filter_by(deleted=False).\
+                                          count()
+
+        drift = {}
+        for counter, value in actual.iteritems():
+            if usage_ref[counter] != value:
+                drift[counter] = (usage_ref[counter], value)
+                usage_ref[counter] = value
+        if drift or not usage_ref.id:
+            usage_ref.save(session=session)
+        return drift
+
+
+###################
+
+
+def _quota_usage_insert(session, project_id, resource, in_use=0):
+    """Insert the usage row of a resource, returning False if another
+    transaction has just inserted it.
+
+    This is a single statement rather than a flush, so losing the race on
+    the unique (project_id, resource) key only fails the statement and the
+    session can go on to use the row that won.
+    """
+    try:
+        session.execute(models.QuotaUsage.__table__.insert().values(
+                project_id=project_id,
+                resource=resource,
+                in_use=in_use,
+                reserved=0))
+    except IntegrityError:
+        return False
+    return True
+
+
+def _quota_usage_add(session, project_id, usage, sign=1):
+    """Add usage to the in_use of project_id, creating rows if needed."""
+    if not project_id:
+        return
+
+    def update(resource, amount):
+        return session.query(models.QuotaUsage).\
+                       filter_by(project_id=project_id).\
+                       filter_by(resource=resource).\
+                       update({'in_use': models.QuotaUsage.in_use + amount},
+                              synchronize_session=False)
+
+    for resource, amount in usage.iteritems():
+        if not update(resource, sign * amount) and \
+           not _quota_usage_insert(session, project_id, resource,
+                                   sign * amount):
+            update(resource, sign * amount)
+
+
+def _quota_usage_move(session, old, new):
+    """Move usage between (project_id, usage) pairs around a change."""
+    if old == new:
+        return
+    if old[0] == new[0]:
+        diff = dict((resource, new[1].get(resource, 0) -
+                               old[1].get(resource, 0))
+                    for resource in set(old[1]) | set(new[1]))
+        _quota_usage_add(session, new[0],
+                         dict((resource, amount)
+                              for resource, amount in diff.iteritems()
+                              if amount))
+    else:
+        _quota_usage_add(session, old[0], old[1], sign=-1)
+        _quota_usage_add(session, new[0], new[1])
+
+
+def _instance_quota_usage(instance_ref):
+    if not instance_ref or instance_ref['deleted']:
+        return (None, {})
+    return (instance_ref['project_id'],
+            {'instances': 1,
+             'cores': instance_ref['vcpus'] or 0,
+             'ram': instance_ref['memory_mb'] or 0})
+
+
+def _volume_quota_usage(volume_ref):
+    if not volume_ref or volume_ref['deleted']:
+        return (None, {})
+    return (volume_ref['project_id'],
+            {'volumes': 1, 'gigabytes': volume_ref['size'] or 0})
+
+
+def _floating_ip_quota_usage(floating_ip_ref):
+    if (not floating_ip_ref or floating_ip_ref['deleted'] or
+        floating_ip_ref['auto_assigned']):
+        return (None, {})
+    return (floating_ip_ref['project_id'], {'floating_ips': 1})
+
+
+def _reservation_drop(session, reservation_ref, amount=None):
+    """Give back amount (all by default) of a reservation's hold."""
+    if amount is None or amount >= reservation_ref.delta:
+        amount = reservation_ref.delta
+        session.delete(reservation_ref)
+    else:
+        reservation_ref.delta -= amount
+        session.add(reservation_ref)
+    session.query(models.QuotaUsage).\
+            filter_by(id=reservation_ref.usage_id).\
+            update({'reserved': models.QuotaUsage.reserved - amount},
+                   synchronize_session=False)
+
+
+def _reservation_consume(session, project_id, request_id, usage):
+    """Take usage that has just become in use off the request's holds."""
+    if not project_id or not request_id:
+        return
+    reservations = session.query(models.Reservation).\
+                           filter_by(project_id=project_id).\
+                           filter_by(request_id=request_id).\
+                           filter_by(deleted=False).\
+                           with_lockmode('update').\
+                           all()
+    for reservation_ref in reservations:
+        amount = usage.get(reservation_ref.resource, 0)
+        if amount > 0:
+            _reservation_drop(session, reservation_ref, amount)
+
+
+@require_context
+def quota_usage_get_all_by_project(context, project_id):
+    authorize_project_context(context, project_id)
+    session = get_session()
+    result = {'project_id': project_id}
+    rows = session.query(models.QuotaUsage).\
+                   filter_by(project_id=project_id).\
+                   filter_by(deleted=False).\
+                   all()
+    for row in rows:
+        result[row.resource] = dict(in_use=row.in_use, reserved=row.reserved)
+    return result
+
+
+@require_context
+def quota_reserve(context, project_id, deltas, quotas, min_units, max_units,
+                  expire, request_id=None):
+    """Hold up to max_units of deltas for project_id within quotas.
+
+    deltas maps resources to the amount one unit needs and quotas maps them
+    to their limits, None being unlimited.  Returns the number of units
+    held and the ids of the reservations holding them; nothing is held
+    when fewer than min_units fit.
+    """
+    authorize_project_context(context, project_id)
+    session = get_session()
+    with session.begin():
+        query = session.query(models.QuotaUsage).\
+                        filter_by(project_id=project_id).\
+                        filter(models.QuotaUsage.resource.in_(deltas.keys())).\
+                        filter_by(deleted=False)
+        existing = set(row.resource for row in query.all())
+        for resource in set(deltas) - existing:
+            _quota_usage_insert(session, project_id, resource)
+        rows = query.with_lockmode('update').all()
+        usages = dict((row.resource, row) for row in rows)
+
+        units = max_units
+        for resource, delta in deltas.iteritems():
+            limit = quotas.get(resource)
+            if limit is None or delta <= 0:
+                continue
+            used = 0
+            if resource in usages:
+                used = usages[resource].in_use + usages[resource].reserved
+            units = min(units, max(limit - used, 0) // delta)
+        if units < min_units:
+            return (units, [])
+
+        reservations = []
+        for resource, delta in deltas.iteritems():
+            if delta * units <= 0:
+                continue
+            usage_ref = usages[resource]
+            usage_ref.reserved += delta * units
+            usage_ref.save(session=session)
+
+            reservation_ref = models.Reservation()
+            reservation_ref.usage_id = usage_ref.id
+            reservation_ref.project_id = project_id
+            reservation_ref.resource = resource
+            reservation_ref.delta = delta * units
+            reservation_ref.request_id = request_id
+            reservation_ref.expire = expire
+            reservation_ref.save(session=session)
+            reservations.append(reservation_ref.id)
+        return (units, reservations)
+
+
+@require_context
+def reservation_release(context, reservations):
+    if not reservations:
+        return
+    session = get_session()
+    with session.begin():
+        reservation_refs = session.query(models.Reservation).\
+                               filter(models.Reservation.id.in_(
+                                   reservations)).\
+                               filter_by(deleted=False).\
+                               with_lockmode('update').\
+                               all()
+        for reservation_ref in reservation_refs:
+            _reservation_drop(session, reservation_ref)
+
+
+@require_context
+def reservation_release_by_request(context, project_id, request_id):
+    authorize_project_context(context, project_id)
+    session = get_session()
+    with session.begin():
+        reservation_refs = session.query(models.Reservation).\
+                               filter_by(project_id=project_id).\
+                               filter_by(request_id=request_id).\
+                               filter_by(deleted=False).\
+                               with_lockmode('update').\
+                               all()
+        for reservation_ref in reservation_refs:
+            _reservation_drop(session, reservation_ref)
+        return len(reservation_refs)
+
+
+@require_admin_context
+def reservation_expire(context):
+    session = get_session()
+    with session.begin():
+        reservation_refs = session.query(models.Reservation).\
+                               filter(models.Reservation.expire <
+                                      utils.utcnow()).\
+                               filter_by(deleted=False).\
+                               with_lockmode('update').\
+                               all()
+        for reservation_ref in reservation_refs:
+            _reservation_drop(session, reservation_ref)
+        return len(reservation_refs)
+
+
+@require_admin_context
+def quota_usage_reconcile(context):
+    """Recount in_use for every project, returning what had drifted.
+
+    Each project is recounted in its own transaction, with its usage rows
+    locked before counting so that no concurrent change lands in between.
+    """
+    session = get_session()
+    project_ids = set()
+    for model in (models.QuotaUsage, models.Instance, models.Volume,
+                  models.FloatingIp):
+        project_ids.update(row[0] for row in
+                           session.query(model.project_id).\
+                                   filter_by(deleted=False).\
+                                   distinct())
+    project_ids.discard(None)
+
+    drift = {}
+    for project_id in project_ids:
+        drift.update(_quota_usage_reconcile_project(session, project_id))
+    return drift
+
+
+def _quota_usage_reconcile_project(session, project_id):
+    with session.begin():
+        usage_refs = session.query(models.QuotaUsage).\
+                             filter_by(project_id=project_id).\
+                             filter_by(deleted=False).\
+                             with_lockmode('update').\
+                             all()
+
+        actual = {}
+        row = session.query(func.count(models.Instance.id),
+                            func.sum(models.Instance.vcpus),
+                            func.sum(models.Instance.memory_mb)).\
+                      filter_by(project_id=project_id).\
+                      filter_by(deleted=False).\
+                      one()
+        actual['instances'] = row[0] or 0
+        actual['cores'] = row[1] or 0
+        actual['ram'] = row[2] or 0
+        row = session.query(func.count(models.Volume.id),
+                            func.sum(models.Volume.size)).\
+                      filter_by(project_id=project_id).\
+                      filter_by(deleted=False).\
+                      one()
+        actual['volumes'] = row[0] or 0
+        actual['gigabytes'] = row[1] or 0
+        actual['floating_ips'] = session.query(models.FloatingIp.id).\
+                                         filter_by(project_id=project_id).\
+                                         filter_by(auto_assigned=False).\
+                                         filter_by(deleted=False).\
+                                         count()
+
+        drift = {}
+        for usage_ref in usage_refs:
+            value = actual.pop(usage_ref.resource, 0)
+            if usage_ref.in_use != value:
+                drift[(project_id, usage_ref.resource)] = (usage_ref.in_use,
+                                                           value)
+                usage_ref.in_use = value
+                usage_ref.save(session=session)
+        for resource, value in actual.iteritems():
+            # a row another transaction has just inserted holds a count
+            # made after ours, so it is left for the next run
+            if value and _quota_usage_insert(session, project_id, resource,
+                                             value):
+                drift[(project_id, resource)] = (0, value)
+        return drift
+
+
+###################
+
+
 @require_admin_context
 def certificate_get(context, certificate_id, session=None):
     if not session:
@@ -506,6 +918,7 @@ def floating_ip_allocate_address(context, project_id):
             raise exception.NoMoreFloatingIps()
         floating_ip_ref['project_id'] = project_id
         session.add(floating_ip_ref)
+        _quota_usage_add(session, *_floating_ip_quota_usage(floating_ip_ref))
     return floating_ip_ref['address']
 
 
@@ -513,7 +926,10 @@ def floating_ip_allocate_address(context, project_id):
 def floating_ip_create(context, values):
     floating_ip_ref = models.FloatingIp()
     floating_ip_ref.update(values)
-    floating_ip_ref.save()
+    session = get_session()
+    with session.begin():
+        floating_ip_ref.save(session=session)
+        _quota_usage_add(session, *_floating_ip_quota_usage(floating_ip_ref))
     return floating_ip_ref['address']
 
 
@@ -552,6 +968,8 @@ def floating_ip_deallocate(context, address):
         floating_ip_ref = floating_ip_get_by_address(context,
                                                      address,
                                                      session=session)
+        _quota_usage_add(session, *_floating_ip_quota_usage(floating_ip_ref),
+                         sign=-1)
         floating_ip_ref['project_id'] = None
         floating_ip_ref['host'] = None
         floating_ip_ref['auto_assigned'] = False
@@ -565,6 +983,8 @@ def floating_ip_destroy(context, address):
         floating_ip_ref = floating_ip_get_by_address(context,
                                                      address,
                                                      session=session)
+        _quota_usage_add(session, *_floating_ip_quota_usage(floating_ip_ref),
+                         sign=-1)
         floating_ip_ref.delete(session=session)
 
 
@@ -593,6 +1013,8 @@ def floating_ip_set_auto_assigned(context, address):
         floating_ip_ref = floating_ip_get_by_address(context,
                                                      address,
                                                      session=session)
+        _quota_usage_add(session, *_floating_ip_quota_usage(floating_ip_ref),
+                         sign=-1)
         floating_ip_ref.auto_assigned = True
         floating_ip_ref.save(session=session)
 
@@ -682,9 +1104,12 @@ def floating_ip_update(context, address, values):
     session = get_session()
     with session.begin():
         floating_ip_ref = floating_ip_get_by_address(context, address, session)
+        old_usage = _floating_ip_quota_usage(floating_ip_ref)
         for (key, value) in values.iteritems():
             floating_ip_ref[key] = value
         floating_ip_ref.save(session=session)
+        _quota_usage_move(session, old_usage,
+                          _floating_ip_quota_usage(floating_ip_ref))
 
 
 ###################
@@ -1139,6 +1564,11 @@ def instance_create(context, values):
     session = get_session()
     with session.begin():
         instance_ref.save(session=session)
+        _host_usage_add(session, *_instance_usage(instance_ref))
+        project_id, usage = _instance_quota_usage(instance_ref)
+        _quota_usage_add(session, project_id, usage)
+        _reservation_consume(session, project_id,
+                             instance_ref['reservation_id'], usage)
     return instance_ref
 
 
@@ -1159,6 +1589,13 @@ def instance_data_get_for_project(context, project_id):
 def instance_destroy(context, instance_id):
     session = get_session()
     with session.begin():
+        instance_ref = session.query(models.Instance).\
+                               filter_by(id=instance_id).\
+                               filter_by(deleted=False).\
+                               first()
+        _host_usage_add(session, *_instance_usage(instance_ref), sign=-1)
+        _quota_usage_add(session, *_instance_quota_usage(instance_ref),
+                         sign=-1)
         session.query(models.Instance).\
                 filter_by(id=instance_id).\
                 update({'deleted': True,
@@ -1185,6 +1622,11 @@ def instance_destroy(context, instance_id):
 def instance_stop(context, instance_id):
     session = get_session()
     with session.begin():
+        instance_ref = session.query(models.Instance).\
+                               filter_by(id=instance_id).\
+                               filter_by(deleted=False).\
+                               first()
+        _host_usage_add(session, *_instance_usage(instance_ref), sign=-1)
         session.query(models.Instance).\
                 filter_by(id=instance_id).\
                 update({'host': None,
@@ -1391,6 +1833,138 @@ def instance_get_active_by_window(context, begin, end=None, project_id=None):
     return query.all()
 
 
+def _instance_in_window_query(session, begin, end, *columns):
+    query = session.query(*columns).\
+                    filter(models.Instance.launched_at != None).\
+                    filter(models.Instance.launched_at < end).\
+                    filter(or_(models.Instance.terminated_at == None,
+                               models.Instance.terminated_at > begin))
+    return query
+
+
+def _hours_between(session, start, stop):
+    """SQL expression for the hours from start to stop."""
+    dialect = session.bind.dialect.name
+    if dialect == 'sqlite':
+        return (func.julianday(stop) - func.julianday(start)) * 24
+    elif dialect == 'mysql':
+        return func.timestampdiff(literal_column('SECOND'),
+                                  start, stop) / 3600.0
+    return func.extract('epoch', stop - start) / 3600.0
+
+
+@require_admin_context
+def instance_get_all_in_window(context, begin, end, project_id=None,
+                               marker=None, limit=None):
+    session = get_session()
+    query = _instance_in_window_query(session, begin, end, models.Instance)
+    if project_id:
+        query = query.filter_by(project_id=project_id)
+    if marker is not None:
+        query = query.filter(models.Instance.id > marker)
+    query = query.order_by(models.Instance.id)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+@require_admin_context
+def instance_usage_get_by_window(context, begin, end, project_id=None):
+    session = get_session()
+    instance = models.Instance
+    start = case([(instance.launched_at > begin, instance.launched_at)],
+                 else_=literal(begin, DateTime))
+    stop = case([(and_(instance.terminated_at != None,
+                       instance.terminated_at < end),
+                  instance.terminated_at)],
+                else_=literal(end, DateTime))
+    query = _instance_in_window_query(session, begin, end,
+                    instance.project_id,
+                    instance.instance_type_id,
+                    func.count(instance.id),
+                    func.sum(_hours_between(session, start, stop)))
+    if project_id:
+        query = query.filter_by(project_id=project_id)
+    query = query.group_by(instance.project_id, instance.instance_type_id)
+    return [{'project_id': project_id,
+             'instance_type_id': instance_type_id,
+             'instances': count,
+             'hours': hours or 0.0}
+            for project_id, instance_type_id, count, hours in query.all()]
+
+
+@require_admin_context
+def instance_usage_rollup_hour(context, period_start):
+    try:
+        return _instance_usage_rollup_hour(context, period_start)
+    except (IntegrityError, exception.DBError), e:
+        if not _is_duplicate(e):
+            raise
+        # NOTE: a concurrent rollup created the period row first; the
+        #       retry locks it and so waits for that rollup to finish.
+        return _instance_usage_rollup_hour(context, period_start)
+
+
+def _instance_usage_rollup_hour(context, period_start):
+    period_end = period_start + datetime.timedelta(hours=1)
+    session = get_session()
+    with session.begin():
+        period = session.query(models.InstanceUsageRollupPeriod).\
+                         filter_by(period_start=period_start).\
+                         with_lockmode('update').\
+                         first()
+        if period is None:
+            period = models.InstanceUsageRollupPeriod()
+            period.period_start = period_start
+            session.add(period)
+            session.flush()
+        usages = instance_usage_get_by_window(context, period_start,
+                                              period_end)
+        session.query(models.InstanceUsageRollup).\
+                filter_by(period_start=period_start).\
+                filter_by(deleted=False).\
+                update({'deleted': True,
+                        'deleted_at': utils.utcnow(),
+                        'updated_at': literal_column('updated_at')})
+        for usage in usages:
+            rollup = models.InstanceUsageRollup()
+            rollup.update(usage)
+            rollup.period_start = period_start
+            session.add(rollup)
+    return usages
+
+
+@require_admin_context
+def instance_usage_rollup_get_by_window(context, begin, end,
+                                        project_id=None):
+    session = get_session()
+    rollup = models.InstanceUsageRollup
+    query = session.query(rollup.project_id,
+                          rollup.instance_type_id,
+                          func.max(rollup.instances),
+                          func.sum(rollup.hours)).\
+                    filter(rollup.period_start >= begin).\
+                    filter(rollup.period_start < end).\
+                    filter_by(deleted=False)
+    if project_id:
+        query = query.filter_by(project_id=project_id)
+    query = query.group_by(rollup.project_id, rollup.instance_type_id)
+    return [{'project_id': project_id,
+             'instance_type_id': instance_type_id,
+             'instances': count,
+             'hours': hours or 0.0}
+            for project_id, instance_type_id, count, hours in query.all()]
+
+
+@require_admin_context
+def instance_usage_rollup_get_bounds(context):
+    session = get_session()
+    period_start = models.InstanceUsageRollupPeriod.period_start
+    return session.query(func.min(period_start), func.max(period_start)).\
+                   filter_by(deleted=False).\
+                   one()
+
+
 @require_admin_context
 def instance_get_active_by_window_joined(context, begin, end=None,
                                          project_id=None):
@@ -1440,6 +2014,70 @@ def instance_get_all_by_host(context, host):
                    all()
 
 
+class _TemplateKeys(dict):
+    """Records the keys a %-template looks up."""
+
+    def __missing__(self, key):
+        self.setdefault('_keys', set()).add(key)
+        return 0
+
+
+def _instance_name_columns():
+    """Return the instance columns instance_name_template refers to."""
+    keys = _TemplateKeys()
+    try:
+        FLAGS.instance_name_template % keys
+    except (TypeError, ValueError):
+        pass
+    columns = set(models.Instance.__table__.columns.keys())
+    return ['id', 'uuid'] + sorted((keys.get('_keys', set()) & columns) -
+                                   set(['id', 'uuid']))
+
+
+@require_admin_context
+def instance_get_all_states_by_host(context, host):
+    """Return id, uuid, name, power_state, vm_state and deleted_at for every
+    instance on a host, without loading the full instance rows."""
+    fields = ['power_state', 'vm_state', 'deleted_at']
+    # name is built by the model from instance_name_template, so load the
+    # columns the template refers to as well.
+    name_columns = _instance_name_columns()
+    session = get_session()
+    query = session.query(*[getattr(models.Instance, column)
+                            for column in fields + name_columns])
+    rows = query.filter_by(host=host).\
+                 filter_by(deleted=can_read_deleted(context)).\
+                 all()
+    states = []
+    for row in rows:
+        state = dict(zip(fields + name_columns, row))
+        state['name'] = models.Instance(**dict((column, state[column])
+                                        for column in name_columns)).name
+        states.append(state)
+    return states
+
+
+@require_admin_context
+def instance_update_power_states(context, power_states):
+    """Set power_state for many instances at once.
+
+    power_states maps instance id to its new power state; one UPDATE is
+    issued per distinct power state.
+    """
+    by_state = {}
+    for instance_id, state in power_states.iteritems():
+        by_state.setdefault(state, []).append(instance_id)
+
+    session = get_session()
+    with session.begin():
+        for state, instance_ids in by_state.iteritems():
+            session.query(models.Instance).\
+                    filter(models.Instance.id.in_(instance_ids)).\
+                    update({'power_state': state,
+                            'updated_at': utils.utcnow()},
+                            synchronize_session=False)
+
+
 @require_context
 def instance_get_all_by_project(context, project_id):
     authorize_project_context(context, project_id)
@@ -1573,8 +2211,13 @@ def instance_update(context, instance_id, values):
                                                 session=session)
         else:
             instance_ref = instance_get(context, instance_id, session=session)
+        old_usage = _instance_usage(instance_ref)
+        old_quota_usage = _instance_quota_usage(instance_ref)
         instance_ref.update(values)
         instance_ref.save(session=session)
+        _host_usage_move(session, old_usage, _instance_usage(instance_ref))
+        _quota_usage_move(session, old_quota_usage,
+                          _instance_quota_usage(instance_ref))
         return instance_ref
 
 
@@ -1793,8 +2436,11 @@ def network_count_reserved_ips(context, network_id):
 def network_create_safe(context, values):
     network_ref = models.Network()
     network_ref.update(values)
+    session = get_session()
     try:
-        network_ref.save()
+        with session.begin():
+            network_ref.save(session=session)
+            _host_usage_add(session, *_network_usage(network_ref))
         return network_ref
     except IntegrityError:
         return None
@@ -1806,6 +2452,7 @@ def network_delete_safe(context, network_id):
     with session.begin():
         network_ref = network_get(context, network_id=network_id, \
                                   session=session)
+        _host_usage_add(session, *_network_usage(network_ref), sign=-1)
         session.delete(network_ref)
 
 
@@ -1983,14 +2630,16 @@ def network_get_all_by_host(context, host):
     with session.begin():
         # NOTE(vish): return networks that have host set
         #             or that have a fixed ip with host set
+        fixed_ip_query = session.query(models.FixedIp.network_id).\
+                                 filter_by(host=host).\
+                                 filter_by(deleted=False).\
+                                 subquery()
         host_filter = or_(models.Network.host == host,
-                          models.FixedIp.host == host)
+                          models.Network.id.in_(fixed_ip_query))
 
         return session.query(models.Network).\
                        filter_by(deleted=False).\
-                       join(models.Network.fixed_ips).\
                        filter(host_filter).\
-                       filter_by(deleted=False).\
                        all()
 
 
@@ -2011,6 +2660,7 @@ def network_set_host(context, network_id, host_id):
         if not network_ref['host']:
             network_ref['host'] = host_id
             session.add(network_ref)
+            _host_usage_add(session, *_network_usage(network_ref))
 
     return network_ref['host']
 
@@ -2020,8 +2670,10 @@ def network_update(context, network_id, values):
     session = get_session()
     with session.begin():
         network_ref = network_get(context, network_id, session=session)
+        old_usage = _network_usage(network_ref)
         network_ref.update(values)
         network_ref.save(session=session)
+        _host_usage_move(session, old_usage, _network_usage(network_ref))
         return network_ref
 
 
@@ -2213,6 +2865,8 @@ def volume_create(context, values):
     session = get_session()
     with session.begin():
         volume_ref.save(session=session)
+        _host_usage_add(session, *_volume_usage(volume_ref))
+        _quota_usage_add(session, *_volume_quota_usage(volume_ref))
     return volume_ref
 
 
@@ -2232,6 +2886,12 @@ def volume_data_get_for_project(context, project_id):
 def volume_destroy(context, volume_id):
     session = get_session()
     with session.begin():
+        volume_ref = session.query(models.Volume).\
+                             filter_by(id=volume_id).\
+                             filter_by(deleted=False).\
+                             first()
+        _host_usage_add(session, *_volume_usage(volume_ref), sign=-1)
+        _quota_usage_add(session, *_volume_quota_usage(volume_ref), sign=-1)
         session.query(models.Volume).\
                 filter_by(id=volume_id).\
                 update({'deleted': True,
@@ -2367,6 +3027,18 @@ def volume_get_iscsi_target_num(context, volume_id):
     return result.target_num
 
 
+@require_admin_context
+def volume_get_iscsi_target_nums_by_host(context, host):
+    session = get_session()
+    result = session.query(models.IscsiTarget.volume_id,
+                           models.IscsiTarget.target_num).\
+                     filter_by(host=host).\
+                     filter_by(deleted=False).\
+                     filter(models.IscsiTarget.volume_id != None).\
+                     all()
+    return dict(result)
+
+
 @require_context
 def volume_update(context, volume_id, values):
     session = get_session()
@@ -2378,8 +3050,13 @@ def volume_update(context, volume_id, values):
                                 delete=True)
     with session.begin():
         volume_ref = volume_get(context, volume_id, session=session)
+        old_usage = _volume_usage(volume_ref)
+        old_quota_usage = _volume_quota_usage(volume_ref)
         volume_ref.update(values)
         volume_ref.save(session=session)
+        _host_usage_move(session, old_usage, _volume_usage(volume_ref))
+        _quota_usage_move(session, old_quota_usage,
+                          _volume_quota_usage(volume_ref))
 
 
 ####################
@@ -4056,3 +4733,174 @@ def s3_image_create(context, image_uuid):
         raise exception.DBError(e)
 
     return s3_image_ref
+
+
+####################
+
+
+# Tables with shadow tables, in the order they are archived: rows are
+# only archived once nothing references them, so referencing tables
+# come first.  Some tables hold the history of an instance and are never
+# soft-deleted themselves; their rows are archived along with the
+# instance they belong to, given as (column, table, column).
+_ARCHIVE_TABLES = (
+    ('instance_metadata', None),
+    ('block_device_mapping', None),
+    ('security_group_instance_association', None),
+    ('security_group_rules', None),
+    ('virtual_interfaces', None),
+    ('fixed_ips', None),
+    ('instance_actions', ('instance_id', 'instances', 'id')),
+    ('migrations', ('instance_uuid', 'instances', 'uuid')),
+    ('instances', None),
+    ('security_groups', None),
+    ('volume_metadata', None),
+    ('snapshots', None),
+    ('volumes', None),
+    ('instance_usage_rollups', None),
+)
+
+# References which aren't declared as foreign keys in the models, as
+# (table, column, referenced table, referenced column)
+_ARCHIVE_EXTRA_REFERENCES = (
+    ('virtual_interfaces', 'instance_id', 'instances', 'id'),
+    ('consoles', 'instance_id', 'instances', 'id'),
+)
+
+_ARCHIVE_META = None
+
+
+def _archive_references(name):
+    """Return (table, column, referenced column) for references to name."""
+    references = []
+    for table in models.BASE.metadata.sorted_tables:
+        for fk in table.foreign_keys:
+            if fk.column.table.name == name:
+                references.append((fk.parent.table.name, fk.parent.name,
+                                   fk.column.name))
+    for table_name, column, ref_name, ref_column in \
+            _ARCHIVE_EXTRA_REFERENCES:
+        if ref_name == name:
+            references.append((table_name, column, ref_column))
+    return references
+
+
+def _archive_tables(session):
+    """Reflect the archived tables, their shadows and references, once."""
+    global _ARCHIVE_META
+
+    if _ARCHIVE_META is None:
+        names = set()
+        for name, _owner in _ARCHIVE_TABLES:
+            names.update([name, 'shadow_' + name])
+            names.update(ref[0] for ref in _archive_references(name))
+        meta = MetaData()
+        for name in names:
+            Table(name, meta, autoload=True, autoload_with=session.bind)
+        _ARCHIVE_META = meta
+    return _ARCHIVE_META.tables
+
+
+def _archivable(tables, name, owner, before):
+    """Return the where clause selecting the archivable rows of name."""
+    table = tables[name]
+    if owner is not None:
+        column, owner_name, owner_column = owner
+        owner_table = tables[owner_name]
+        criteria = [owner_table.c[owner_column] == table.c[column],
+                    owner_table.c.deleted == True]
+        if before is not None:
+            criteria.append(owner_table.c.deleted_at < before)
+        return exists([literal(1)], and_(*criteria))
+
+    criteria = [table.c.deleted == True]
+    if before is not None:
+        criteria.append(table.c.deleted_at < before)
+    for ref_name, ref_column, column in _archive_references(name):
+        ref_table = tables[ref_name]
+        criteria.append(~exists([literal(1)],
+                                ref_table.c[ref_column] == table.c[column]))
+    return and_(*criteria)
+
+
+@require_admin_context
+def archive_deleted_rows(context, max_rows=None, before=None):
+    session = get_session()
+    tables = _archive_tables(session)
+    archived = {}
+    remaining = max_rows
+    for name, owner in _ARCHIVE_TABLES:
+        table = tables[name]
+        shadow = tables['shadow_' + name]
+        where = _archivable(tables, name, owner, before)
+        count = 0
+        while remaining is None or remaining > 0:
+            batch = FLAGS.archive_batch_size
+            if remaining is not None:
+                batch = min(batch, remaining)
+            # Each batch is moved in its own short transaction
+            with session.begin():
+                ids = [row[0] for row in session.execute(
+                       select([table.c.id], where).\
+                             order_by(table.c.id).\
+                             limit(batch))]
+                if not ids:
+                    break
+                rows = [dict(row) for row in
+                        session.execute(table.select(table.c.id.in_(ids)))]
+                if owner is not None:
+                    # History rows are never deleted themselves; they
+                    # take the deletion time of their owner so that
+                    # purge_shadow_rows ages them out along with it
+                    column, owner_name, owner_column = owner
+                    owner_table = tables[owner_name]
+                    owners = dict(tuple(owner_row) for owner_row in
+                                  session.execute(select(
+                                      [owner_table.c[owner_column],
+                                       owner_table.c.deleted_at],
+                                      owner_table.c[owner_column].in_(
+                                          [row[column] for row in rows]))))
+                    for row in rows:
+                        if not row['deleted']:
+                            row['deleted'] = True
+                            row['deleted_at'] = owners.get(row[column])
+                session.execute(shadow.insert(), rows)
+                session.execute(table.delete(table.c.id.in_(ids)))
+            count += len(ids)
+            if remaining is not None:
+                remaining -= len(ids)
+        if count:
+            archived[name] = count
+            LOG.info(_('Archived %(count)d deleted rows from %(name)s'),
+                     {'count': count, 'name': name})
+    return archived
+
+
+@require_admin_context
+def purge_shadow_rows(context, before, max_rows=None):
+    session = get_session()
+    tables = _archive_tables(session)
+    purged = {}
+    remaining = max_rows
+    for name, _owner in _ARCHIVE_TABLES:
+        shadow = tables['shadow_' + name]
+        count = 0
+        while remaining is None or remaining > 0:
+            batch = FLAGS.archive_batch_size
+            if remaining is not None:
+                batch = min(batch, remaining)
+            with session.begin():
+                ids = [row[0] for row in session.execute(
+                       select([shadow.c.id], shadow.c.deleted_at < before).\
+                             limit(batch))]
+                if not ids:
+                    break
+                session.execute(shadow.delete(shadow.c.id.in_(ids)))
+            count += len(ids)
+            if remaining is not None:
+                remaining -= len(ids)
+        if count:
+            purged[name] = count
+            LOG.info(_('Purged %(count)d archived rows from shadow_%(name)s'),
+                     {'count': count, 'name': name})
+    return purged
@@ -0,0 +1,68 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import sqlalchemy
+
+from nova import log as logging
+
+
+meta = sqlalchemy.MetaData()
+
+
+instance_usage_rollups = sqlalchemy.Table('instance_usage_rollups', meta,
+                sqlalchemy.Column('created_at',
+                                  sqlalchemy.DateTime(timezone=False)),
+                sqlalchemy.Column('updated_at',
+                                  sqlalchemy.DateTime(timezone=False)),
+                sqlalchemy.Column('deleted_at',
+                                  sqlalchemy.DateTime(timezone=False)),
+                sqlalchemy.Column('deleted',
+                       sqlalchemy.Boolean(create_constraint=True, name=None)),
+                sqlalchemy.Column('id', sqlalchemy.Integer(),
+                                  primary_key=True,
+                                  nullable=False,
+                                  autoincrement=True),
+                sqlalchemy.Column('period_start',
+                                  sqlalchemy.DateTime(timezone=False),
+                                  nullable=False,
+                                  index=True),
+                sqlalchemy.Column('project_id',
+                       sqlalchemy.String(length=255, convert_unicode=False,
+                                         assert_unicode=None,
+                                         unicode_error=None,
+                                         _warn_on_bytestring=False)),
+                sqlalchemy.Column('instance_type_id', sqlalchemy.Integer()),
+                sqlalchemy.Column('instances', sqlalchemy.Integer()),
+                sqlalchemy.Column('hours', sqlalchemy.Float()))
+
+
+def upgrade(migrate_engine):
+    meta.bind = migrate_engine
+
+    try:
+        instance_usage_rollups.create()
+    except Exception:
+        logging.exception("Exception while creating table "
+                          "'instance_usage_rollups'")
+        meta.drop_all(tables=[instance_usage_rollups])
+        raise
+
+
+def downgrade(migrate_engine):
+    meta.bind = migrate_engine
+
+    instance_usage_rollups.drop()
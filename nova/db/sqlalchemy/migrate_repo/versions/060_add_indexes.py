@@ -0,0 +1,108 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import sqlalchemy
+
+from nova import log as logging
+
+
+LOG = logging.getLogger('nova.db.sqlalchemy.migrate_repo.versions')
+
+meta = sqlalchemy.MetaData()
+
+
+# (table, index name, columns) for the lookups and joins issued by
+# nova.db.sqlalchemy.api; nova/tests/test_db_query_plans.py checks that
+# the hot queries use them
+INDEXES = (
+    ('instances', 'instances_uuid_idx', ('uuid',)),
+    ('instances', 'instances_host_deleted_idx', ('host', 'deleted')),
+    ('instances', 'instances_project_id_deleted_idx',
+     ('project_id', 'deleted')),
+    ('instances', 'instances_reservation_id_idx', ('reservation_id',)),
+    ('instance_metadata', 'instance_metadata_instance_id_idx',
+     ('instance_id',)),
+    ('block_device_mapping', 'block_device_mapping_instance_id_idx',
+     ('instance_id',)),
+    ('volumes', 'volumes_instance_id_idx', ('instance_id',)),
+    ('fixed_ips', 'fixed_ips_address_idx', ('address',)),
+    ('fixed_ips', 'fixed_ips_network_id_host_deleted_idx',
+     ('network_id', 'host', 'deleted')),
+    ('fixed_ips', 'fixed_ips_host_idx', ('host',)),
+    ('fixed_ips', 'fixed_ips_instance_id_idx', ('instance_id',)),
+    ('fixed_ips', 'fixed_ips_virtual_interface_id_idx',
+     ('virtual_interface_id',)),
+    ('floating_ips', 'floating_ips_address_idx', ('address',)),
+    ('floating_ips', 'floating_ips_fixed_ip_id_idx', ('fixed_ip_id',)),
+    ('floating_ips', 'floating_ips_host_idx', ('host',)),
+    ('floating_ips', 'floating_ips_project_id_idx', ('project_id',)),
+    ('virtual_interfaces', 'virtual_interfaces_instance_id_idx',
+     ('instance_id',)),
+    ('virtual_interfaces', 'virtual_interfaces_network_id_idx',
+     ('network_id',)),
+    ('networks', 'networks_host_idx', ('host',)),
+    ('networks', 'networks_bridge_idx', ('bridge',)),
+    ('security_group_instance_association',
+     'security_group_instance_association_instance_id_idx',
+     ('instance_id',)),
+    ('security_group_instance_association',
+     'security_group_instance_association_security_group_id_idx',
+     ('security_group_id',)),
+    ('security_group_rules', 'security_group_rules_parent_group_id_idx',
+     ('parent_group_id',)),
+    ('services', 'services_host_topic_idx', ('host', 'topic')),
+    ('services', 'services_topic_idx', ('topic',)),
+    ('compute_nodes', 'compute_nodes_service_id_idx', ('service_id',)),
+)
+
+
+def _indexes():
+    tables = {}
+    for table_name, index_name, columns in INDEXES:
+        if table_name not in tables:
+            tables[table_name] = sqlalchemy.Table(table_name, meta,
+                                                  autoload=True)
+        table = tables[table_name]
+        yield sqlalchemy.Index(index_name,
+                               *[table.c[column] for column in columns])
+
+
+def upgrade(migrate_engine):
+    meta.bind = migrate_engine
+
+    created = []
+    try:
+        for index in _indexes():
+            index.create(migrate_engine)
+            created.append(index)
+    except Exception:
+        LOG.exception("Exception while creating indexes")
+        for index in created:
+            index.drop(migrate_engine)
+        raise
+
+
+def downgrade(migrate_engine):
+    meta.bind = migrate_engine
+
+    for index in _indexes():
+        try:
+            index.drop(migrate_engine)
+        except Exception:
+            # NOTE: MySQL refuses to drop an index that has replaced the
+            #       implicit index backing a foreign key
+            LOG.warning("Unable to drop index %s", index.name)
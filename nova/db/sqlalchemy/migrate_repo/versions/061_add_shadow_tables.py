@@ -0,0 +1,69 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import sqlalchemy
+
+from nova import log as logging
+
+
+LOG = logging.getLogger('nova.db.sqlalchemy.migrate_repo.versions')
+
+meta = sqlalchemy.MetaData()
+
+
+# Tables whose soft-deleted rows nova-manage db archive_deleted_rows
+# moves into shadow_<table>.  Later migrations that change one of these
+# tables must change its shadow table the same way.
+TABLES = ('block_device_mapping', 'fixed_ips', 'instance_actions',
+          'instance_metadata', 'instance_usage_rollups', 'instances',
+          'migrations', 'security_group_instance_association',
+          'security_group_rules', 'security_groups', 'snapshots',
+          'virtual_interfaces', 'volume_metadata', 'volumes')
+
+
+def _shadow_table(table):
+    """Copy a table's columns, without any of its constraints."""
+    columns = []
+    for column in table.columns:
+        columns.append(sqlalchemy.Column(column.name, column.type,
+                                         index=(column.name == 'deleted_at')))
+    return sqlalchemy.Table('shadow_' + table.name, meta, *columns,
+                            mysql_engine='InnoDB')
+
+
+def upgrade(migrate_engine):
+    meta.bind = migrate_engine
+
+    created = []
+    try:
+        for name in TABLES:
+            table = sqlalchemy.Table(name, meta, autoload=True)
+            shadow = _shadow_table(table)
+            shadow.create()
+            created.append(shadow)
+    except Exception:
+        LOG.exception("Exception while creating shadow tables")
+        meta.drop_all(tables=created)
+        raise
+
+
+def downgrade(migrate_engine):
+    meta.bind = migrate_engine
+
+    for name in TABLES:
+        shadow = sqlalchemy.Table('shadow_' + name, meta, autoload=True)
+        shadow.drop()
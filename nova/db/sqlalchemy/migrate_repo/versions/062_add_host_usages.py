@@ -0,0 +1,122 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import sqlalchemy
+
+from nova import log as logging
+
+
+meta = sqlalchemy.MetaData()
+
+
+host_usages = sqlalchemy.Table('host_usages', meta,
+                sqlalchemy.Column('created_at',
+                                  sqlalchemy.DateTime(timezone=False)),
+                sqlalchemy.Column('updated_at',
+                                  sqlalchemy.DateTime(timezone=False)),
+                sqlalchemy.Column('deleted_at',
+                                  sqlalchemy.DateTime(timezone=False)),
+                sqlalchemy.Column('deleted',
+                       sqlalchemy.Boolean(create_constraint=True, name=None)),
+                sqlalchemy.Column('id', sqlalchemy.Integer(),
+                                  primary_key=True,
+                                  nullable=False,
+                                  autoincrement=True),
+                sqlalchemy.Column('host',
+                       sqlalchemy.String(length=255, convert_unicode=False,
+                                         assert_unicode=None,
+                                         unicode_error=None,
+                                         _warn_on_bytestring=False),
+                                  nullable=False,
+                                  unique=True),
+                sqlalchemy.Column('vcpus', sqlalchemy.Integer(),
+                                  nullable=False, index=True),
+                sqlalchemy.Column('memory_mb', sqlalchemy.Integer(),
+                                  nullable=False),
+                sqlalchemy.Column('local_gb', sqlalchemy.Integer(),
+                                  nullable=False),
+                sqlalchemy.Column('volume_gigabytes', sqlalchemy.Integer(),
+                                  nullable=False, index=True),
+                sqlalchemy.Column('network_count', sqlalchemy.Integer(),
+                                  nullable=False, index=True),
+                mysql_engine='InnoDB')
+
+
+def _usages():
+    """Add up the current usage of every host."""
+    usages = {}
+
+    def usage(host):
+        if host not in usages:
+            usages[host] = dict(vcpus=0, memory_mb=0, local_gb=0,
+                                volume_gigabytes=0, network_count=0)
+        return usages[host]
+
+    services = sqlalchemy.Table('services', meta, autoload=True)
+    for (host,) in sqlalchemy.select([services.c.host],
+                                     services.c.deleted == False,
+                                     distinct=True).execute():
+        usage(host)
+
+    instances = sqlalchemy.Table('instances', meta, autoload=True)
+    for row in sqlalchemy.select([instances.c.host,
+                                  sqlalchemy.func.sum(instances.c.vcpus),
+                                  sqlalchemy.func.sum(instances.c.memory_mb),
+                                  sqlalchemy.func.sum(instances.c.local_gb)],
+                                 instances.c.deleted == False).\
+                          group_by(instances.c.host).execute():
+        usage(row[0]).update(vcpus=row[1] or 0, memory_mb=row[2] or 0,
+                             local_gb=row[3] or 0)
+
+    volumes = sqlalchemy.Table('volumes', meta, autoload=True)
+    for row in sqlalchemy.select([volumes.c.host,
+                                  sqlalchemy.func.sum(volumes.c.size)],
+                                 volumes.c.deleted == False).\
+                          group_by(volumes.c.host).execute():
+        usage(row[0])['volume_gigabytes'] = row[1] or 0
+
+    networks = sqlalchemy.Table('networks', meta, autoload=True)
+    for row in sqlalchemy.select([networks.c.host,
+                                  sqlalchemy.func.count(networks.c.id)],
+                                 networks.c.deleted == False).\
+                          group_by(networks.c.host).execute():
+        usage(row[0])['network_count'] = row[1]
+
+    usages.pop(None, None)
+    return usages
+
+
+def upgrade(migrate_engine):
+    meta.bind = migrate_engine
+
+    try:
+        host_usages.create()
+    except Exception:
+        logging.exception("Exception while creating table 'host_usages'")
+        meta.drop_all(tables=[host_usages])
+        raise
+
+    rows = [dict(host=host, deleted=False, **usage)
+            for host, usage in _usages().iteritems()]
+    if rows:
+        host_usages.insert().execute(rows)
+
+
+def downgrade(migrate_engine):
+    meta.bind = migrate_engine
+
+    host_usages.drop()
@@ -0,0 +1,139 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import sqlalchemy
+
+from nova import log as logging
+
+
+meta = sqlalchemy.MetaData()
+
+
+def _string(**kwargs):
+    return sqlalchemy.String(length=255, convert_unicode=False,
+                             assert_unicode=None, unicode_error=None,
+                             _warn_on_bytestring=False, **kwargs)
+
+
+def _base_columns():
+    return [sqlalchemy.Column('created_at',
+                              sqlalchemy.DateTime(timezone=False)),
+            sqlalchemy.Column('updated_at',
+                              sqlalchemy.DateTime(timezone=False)),
+            sqlalchemy.Column('deleted_at',
+                              sqlalchemy.DateTime(timezone=False)),
+            sqlalchemy.Column('deleted',
+                   sqlalchemy.Boolean(create_constraint=True, name=None)),
+            sqlalchemy.Column('id', sqlalchemy.Integer(),
+                              primary_key=True,
+                              nullable=False,
+                              autoincrement=True)]
+
+
+quota_usages = sqlalchemy.Table('quota_usages', meta,
+                *(_base_columns() + [
+                sqlalchemy.Column('project_id', _string(), nullable=False),
+                sqlalchemy.Column('resource', _string(), nullable=False),
+                sqlalchemy.Column('in_use', sqlalchemy.Integer(),
+                                  nullable=False),
+                sqlalchemy.Column('reserved', sqlalchemy.Integer(),
+                                  nullable=False),
+                sqlalchemy.UniqueConstraint('project_id', 'resource')]),
+                mysql_engine='InnoDB')
+
+
+reservations = sqlalchemy.Table('reservations', meta,
+                *(_base_columns() + [
+                sqlalchemy.Column('usage_id', sqlalchemy.Integer(),
+                                  sqlalchemy.ForeignKey('quota_usages.id'),
+                                  nullable=False),
+                sqlalchemy.Column('project_id', _string(), nullable=False),
+                sqlalchemy.Column('resource', _string(), nullable=False),
+                sqlalchemy.Column('delta', sqlalchemy.Integer(),
+                                  nullable=False),
+                sqlalchemy.Column('request_id', _string(), index=True),
+                sqlalchemy.Column('expire',
+                                  sqlalchemy.DateTime(timezone=False),
+                                  nullable=False, index=True)]),
+                mysql_engine='InnoDB')
+
+
+def _usages():
+    """Add up what every project uses now, by resource."""
+    usages = {}
+
+    def add(project_id, resource, amount):
+        if project_id is not None:
+            key = (project_id, resource)
+            usages[key] = usages.get(key, 0) + (amount or 0)
+
+    instances = sqlalchemy.Table('instances', meta, autoload=True)
+    for row in sqlalchemy.select([instances.c.project_id,
+                                  sqlalchemy.func.count(instances.c.id),
+                                  sqlalchemy.func.sum(instances.c.vcpus),
+                                  sqlalchemy.func.sum(instances.c.memory_mb)],
+                                 instances.c.deleted == False).\
+                          group_by(instances.c.project_id).execute():
+        add(row[0], 'instances', row[1])
+        add(row[0], 'cores', row[2])
+        add(row[0], 'ram', row[3])
+
+    volumes = sqlalchemy.Table('volumes', meta, autoload=True)
+    for row in sqlalchemy.select([volumes.c.project_id,
+                                  sqlalchemy.func.count(volumes.c.id),
+                                  sqlalchemy.func.sum(volumes.c.size)],
+                                 volumes.c.deleted == False).\
+                          group_by(volumes.c.project_id).execute():
+        add(row[0], 'volumes', row[1])
+        add(row[0], 'gigabytes', row[2])
+
+    floating_ips = sqlalchemy.Table('floating_ips', meta, autoload=True)
+    for row in sqlalchemy.select([floating_ips.c.project_id,
+                                  sqlalchemy.func.count(floating_ips.c.id)],
+                                 sqlalchemy.and_(
+                                     floating_ips.c.deleted == False,
+                                     floating_ips.c.auto_assigned == False)).\
+                          group_by(floating_ips.c.project_id).execute():
+        add(row[0], 'floating_ips', row[1])
+
+    return usages
+
+
+def upgrade(migrate_engine):
+    meta.bind = migrate_engine
+
+    tables = [quota_usages, reservations]
+    try:
+        for table in tables:
+            table.create()
+    except Exception:
+        logging.exception("Exception while creating quota usage tables")
+        meta.drop_all(tables=tables)
+        raise
+
+    rows = [dict(project_id=project_id, resource=resource, in_use=in_use,
+                 reserved=0, deleted=False)
+            for (project_id, resource), in_use in _usages().iteritems()]
+    if rows:
+        quota_usages.insert().execute(rows)
+
+
+def downgrade(migrate_engine):
+    meta.bind = migrate_engine
+
+    reservations.drop()
+    quota_usages.drop()
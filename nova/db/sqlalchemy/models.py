@@ -150,6 +150,23 @@ class ComputeNode(BASE, NovaBase):
     cpu_info = Column(Text, nullable=True)
 
 
+class HostUsage(BASE, NovaBase):
+    """Resources used by the instances, volumes and networks of a host.
+
+    Kept up to date by the DB API as rows are created, moved, resized and
+    deleted, so that schedulers can sort hosts by an index.
+    """
+
+    __tablename__ = 'host_usages'
+    id = Column(Integer, primary_key=True)
+    host = Column(String(255), nullable=False, unique=True)
+    vcpus = Column(Integer, nullable=False, default=0)
+    memory_mb = Column(Integer, nullable=False, default=0)
+    local_gb = Column(Integer, nullable=False, default=0)
+    volume_gigabytes = Column(Integer, nullable=False, default=0)
+    network_count = Column(Integer, nullable=False, default=0)
+
+
 class Certificate(BASE, NovaBase):
     """Represents a an x509 certificate"""
     __tablename__ = 'certificates'
@@ -349,6 +366,7 @@ class Volume(BASE, NovaBase):
     attach_time = Column(String(255))  # TODO(vish): datetime
     status = Column(String(255))  # TODO(vish): enum?
     attach_status = Column(String(255))  # TODO(vish): enum
+    progress = Column(Integer)
 
     scheduled_at = Column(DateTime)
     launched_at = Column(DateTime)
@@ -422,6 +440,39 @@ class Quota(BASE, NovaBase):
     hard_limit = Column(Integer, nullable=True)
 
 
+class QuotaUsage(BASE, NovaBase):
+    """Represents what a project uses of a quota resource.
+
+    in_use is kept up to date by the DB API as the resources themselves are
+    created, resized and deleted; reserved is what outstanding reservations
+    hold on top of that.
+    """
+
+    __tablename__ = 'quota_usages'
+    id = Column(Integer, primary_key=True)
+
+    project_id = Column(String(255), nullable=False)
+    resource = Column(String(255), nullable=False)
+
+    in_use = Column(Integer, nullable=False, default=0)
+    reserved = Column(Integer, nullable=False, default=0)
+
+
+class Reservation(BASE, NovaBase):
+    """Represents quota held for a request until it is used or expires."""
+
+    __tablename__ = 'reservations'
+    id = Column(Integer, primary_key=True)
+
+    usage_id = Column(Integer, ForeignKey('quota_usages.id'), nullable=False)
+    project_id = Column(String(255), nullable=False)
+    resource = Column(String(255), nullable=False)
+    delta = Column(Integer, nullable=False)
+
+    request_id = Column(String(255), index=True)
+    expire = Column(DateTime, nullable=False, index=True)
+
+
 class Snapshot(BASE, NovaBase):
     """Represents a block storage device that can be attached to a vm."""
     __tablename__ = 'snapshots'
@@ -873,6 +924,24 @@ class BandwidthUsage(BASE, NovaBase):
     bw_out = Column(BigInteger)
 
 
+class InstanceUsageRollup(BASE, NovaBase):
+    """Instance hours of one project and instance type during one hour"""
+    __tablename__ = 'instance_usage_rollups'
+    id = Column(Integer, primary_key=True, nullable=False, autoincrement=True)
+    period_start = Column(DateTime, nullable=False)
+    project_id = Column(String(255))
+    instance_type_id = Column(Integer)
+    instances = Column(Integer)
+    hours = Column(Float)
+
+
+class InstanceUsageRollupPeriod(BASE, NovaBase):
+    """An hour whose instance usage has been rolled up"""
+    __tablename__ = 'instance_usage_rollup_periods'
+    id = Column(Integer, primary_key=True, nullable=False, autoincrement=True)
+    period_start = Column(DateTime, nullable=False, unique=True)
+
+
 class S3Image(BASE, NovaBase):
     """Compatibility layer for the S3 image service talking to Glance"""
     __tablename__ = 's3_images'
@@ -586,6 +586,10 @@ class ComputeHostNotFound(HostNotFound):
     message = _("Compute host %(host)s could not be found.")
 
 
+class HostUsageNotFound(HostNotFound):
+    message = _("No usage is recorded for host %(host)s.")
+
+
 class HostBinaryNotFound(NotFound):
     message = _("Could not find binary %(binary)s on host %(host)s.")
 
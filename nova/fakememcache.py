@@ -35,6 +35,15 @@ class Client(object):
             return value
         return None
 
+    def get_multi(self, keys):
+        """Retrieves the values for the keys that are set."""
+        values = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                values[key] = value
+        return values
+
     def set(self, key, value, time=0, min_compress_len=0):
         """Sets the value for a key."""
         timeout = 0
@@ -43,6 +52,11 @@ class Client(object):
         self.cache[key] = (timeout, value)
         return True
 
+    def delete(self, key, time=0):
+        """Deletes the value for a key."""
+        self.cache.pop(key, None)
+        return 1
+
     def add(self, key, value, time=0, min_compress_len=0):
         """Sets the value for a key if it doesn't exist."""
         if not self.get(key) is None:
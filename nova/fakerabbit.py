@@ -48,7 +48,7 @@ class Exchange(object):
     def publish(self, message, routing_key=None):
         nm = self.name
         LOG.debug(_('(%(nm)s) publish (key: %(routing_key)s)'
-                ' %(message)s') % locals())
+                ' %(message)s'), locals())
         if routing_key in self._routes:
             for f in self._routes[routing_key]:
                 LOG.debug(_('Publishing to route %s'), f)
@@ -94,7 +94,7 @@ class Backend(base.BaseBackend):
         global EXCHANGES
         global QUEUES
         LOG.debug(_('Binding %(queue)s to %(exchange)s with'
-                ' key %(routing_key)s') % locals())
+                ' key %(routing_key)s'), locals())
         EXCHANGES[exchange].bind(QUEUES[queue].push, routing_key)
 
     def declare_consumer(self, queue, callback, consumer_tag, *args, **kwargs):
@@ -130,7 +130,7 @@ class Backend(base.BaseBackend):
                           content_type=content_type,
                           content_encoding=content_encoding)
         message.result = True
-        LOG.debug(_('Getting from %(queue)s: %(message)s') % locals())
+        LOG.debug(_('Getting from %(queue)s: %(message)s'), locals())
         return message
 
     def prepare_message(self, message_data, delivery_mode,
@@ -0,0 +1,82 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Service liveness
+
+Every service reports a heartbeat each report_interval seconds, and the
+schedulers and admin tools ask whether services are up.  Both go through
+the driver named by the heartbeat_driver flag:
+
+* nova.heartbeat.db_driver.DbDriver bumps the services row in a single
+  UPDATE and judges liveness by its updated_at.
+* nova.heartbeat.memory_driver.MemoryDriver fans the heartbeat out to the
+  schedulers and keeps liveness in their memory only.  It is meant for
+  the schedulers alone: nova-manage service list and the EC2 admin API
+  see every service as down with it.
+* nova.heartbeat.memcache_driver.MemcacheDriver stores an expiring key per
+  service in memcached_servers.
+"""
+
+from nova import flags
+from nova import utils
+
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string('heartbeat_driver', 'nova.heartbeat.db_driver.DbDriver',
+                    'Driver that records service heartbeats and decides '
+                    'whether services are up.  MemoryDriver only knows '
+                    'liveness inside the schedulers, elsewhere every '
+                    'service reads as down')
+flags.DEFINE_integer('service_down_time', 60,
+                     'maximum time since last checkin for up service')
+
+
+_drivers = {}
+
+
+def _get_driver():
+    """Return the heartbeat driver, importing it only once."""
+    name = FLAGS.heartbeat_driver
+    driver = _drivers.get(name)
+    if driver is None:
+        driver = _drivers[name] = utils.import_object(name)
+    return driver
+
+
+def heartbeat(context, service):
+    """Record that service (a nova.service.Service) is alive.
+
+    Raises ServiceNotFound if the driver finds no record of the service.
+
+    """
+    _get_driver().heartbeat(context, service)
+
+
+def service_is_up(service):
+    """Check whether the service described by a services row is up."""
+    return _get_driver().is_up(service)
+
+
+def filter_up(services):
+    """Return the services rows that are up, in order, in one lookup."""
+    return _get_driver().filter_up(services)
+
+
+def set_zone_manager(zone_manager):
+    """Hand the scheduler's ZoneManager to drivers that feed off it."""
+    _get_driver().set_zone_manager(zone_manager)
@@ -0,0 +1,50 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Heartbeats kept in the services table
+"""
+
+from nova import db
+from nova import flags
+from nova import utils
+from nova.heartbeat import driver
+
+
+FLAGS = flags.FLAGS
+
+
+class DbDriver(driver.HeartbeatDriver):
+    """Bumps report_count and updated_at of the services row."""
+
+    def heartbeat(self, context, service):
+        db.service_heartbeat(context, service.service_id)
+
+    def is_up(self, service):
+        return self._is_up(service, utils.utcnow())
+
+    def filter_up(self, services):
+        # The rows carry their heartbeat, so there is nothing to look up.
+        now = utils.utcnow()
+        return [service for service in services if self._is_up(service, now)]
+
+    @staticmethod
+    def _is_up(service, now):
+        last_heartbeat = service['updated_at'] or service['created_at']
+        # Timestamps in DB are UTC.
+        elapsed = utils.total_seconds(now - last_heartbeat)
+        return abs(elapsed) <= FLAGS.service_down_time
@@ -0,0 +1,45 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Heartbeat driver base class that all heartbeat drivers inherit from
+"""
+
+
+class HeartbeatDriver(object):
+    """Records service heartbeats and decides whether services are up."""
+
+    def heartbeat(self, context, service):
+        """Record that service (a nova.service.Service) is alive."""
+        raise NotImplementedError()
+
+    def is_up(self, service):
+        """Check whether the service described by a services row is up."""
+        raise NotImplementedError()
+
+    def filter_up(self, services):
+        """Return the services rows that are up, in order.
+
+        Drivers that look heartbeats up remotely override this to fetch
+        the whole list at once.
+
+        """
+        return [service for service in services if self.is_up(service)]
+
+    def set_zone_manager(self, zone_manager):
+        """Called by schedulers to supply their ZoneManager."""
+        pass
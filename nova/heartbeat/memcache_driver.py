@@ -0,0 +1,55 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Heartbeats kept in memcached
+"""
+
+from nova import flags
+from nova import utils
+from nova.heartbeat import driver
+
+
+FLAGS = flags.FLAGS
+
+
+class MemcacheDriver(driver.HeartbeatDriver):
+    """Stores a key per service that expires after service_down_time."""
+
+    def __init__(self):
+        if FLAGS.memcached_servers:
+            import memcache
+        else:
+            from nova import fakememcache as memcache
+        self.mc = memcache.Client(FLAGS.memcached_servers, debug=0)
+
+    @staticmethod
+    def _key(service):
+        return str('heartbeat-%s-%s' % (service['topic'], service['host']))
+
+    def heartbeat(self, context, service):
+        key = self._key({'topic': service.topic, 'host': service.host})
+        self.mc.set(key, utils.utcnow_ts(), time=FLAGS.service_down_time)
+
+    def is_up(self, service):
+        return self.mc.get(self._key(service)) is not None
+
+    def filter_up(self, services):
+        alive = self.mc.get_multi([self._key(service)
+                                   for service in services])
+        return [service for service in services
+                if self._key(service) in alive]
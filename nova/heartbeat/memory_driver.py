@@ -0,0 +1,67 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Heartbeats kept in the memory of the schedulers
+"""
+
+import datetime
+
+from nova import flags
+from nova import utils
+from nova.heartbeat import driver
+from nova.scheduler import api as scheduler_api
+
+
+FLAGS = flags.FLAGS
+
+
+class MemoryDriver(driver.HeartbeatDriver):
+    """Judges liveness by the heartbeats schedulers receive.
+
+    Each heartbeat is fanned out to the schedulers, whose ZoneManager
+    stamps it apart from the service capabilities.  Only schedulers know
+    which services are up: anywhere else, such as nova-manage or the EC2
+    admin API, every service reads as down.
+
+    """
+
+    def __init__(self):
+        self.zone_manager = None
+
+    def heartbeat(self, context, service):
+        scheduler_api.service_heartbeat(context, service.topic, service.host)
+
+    def set_zone_manager(self, zone_manager):
+        self.zone_manager = zone_manager
+
+    def is_up(self, service):
+        return self._is_up(service, utils.utcnow())
+
+    def filter_up(self, services):
+        now = utils.utcnow()
+        return [service for service in services if self._is_up(service, now)]
+
+    def _is_up(self, service, now):
+        if self.zone_manager is None:
+            return False
+        last_heartbeat = self.zone_manager.service_heartbeats.get(
+                (service['host'], service['topic']))
+        if last_heartbeat is None:
+            return False
+        elapsed = now - last_heartbeat
+        return elapsed <= datetime.timedelta(seconds=FLAGS.service_down_time)
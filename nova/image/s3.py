@@ -19,13 +19,13 @@
 """Proxy AMI-related calls from cloud controller to objectstore service."""
 
 import binascii
-import os
-import shutil
+import collections
+import itertools
 import tarfile
-import tempfile
 from xml.etree import ElementTree
 
 import boto.s3.connection
+from Crypto.Cipher import AES
 import eventlet
 
 from nova import crypto
@@ -46,6 +46,49 @@ flags.DEFINE_string('s3_access_key', 'notchecked',
                     'access key to use for s3 server for images')
 flags.DEFINE_string('s3_secret_key', 'notchecked',
                     'secret key to use for s3 server for images')
+flags.DEFINE_integer('s3_image_download_concurrency', 4,
+                     'number of image parts to download from s3 at once')
+flags.DEFINE_integer('s3_image_progress_interval', 10,
+                     'seconds between image_progress updates while an image'
+                     ' is being registered')
+
+CHUNK_SIZE = 65536
+
+
+class _StageFailed(Exception):
+    """A stage of the registration pipeline failed."""
+
+    def __init__(self, image_state):
+        super(_StageFailed, self).__init__(image_state)
+        self.image_state = image_state
+
+
+class _ChunkReader(object):
+    """File-like object reading from an iterator of strings."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.chunk = ''
+        self.offset = 0
+
+    def read(self, size=-1):
+        pieces = []
+        while size != 0:
+            if self.offset >= len(self.chunk):
+                try:
+                    self.chunk = self.chunks.next()
+                except StopIteration:
+                    break
+                self.offset = 0
+                continue
+            if size < 0:
+                piece = self.chunk[self.offset:]
+            else:
+                piece = self.chunk[self.offset:self.offset + size]
+                size -= len(piece)
+            self.offset += len(piece)
+            pieces.append(piece)
+        return ''.join(pieces)
 
 
 class S3ImageService(object):
@@ -151,11 +194,29 @@ class S3ImageService(object):
                                                host=FLAGS.s3_host)
 
     @staticmethod
-    def _download_file(bucket, filename, local_dir):
+    def _download_part(bucket, filename):
         key = bucket.get_key(filename)
-        local_filename = os.path.join(local_dir, filename)
-        key.get_contents_to_filename(local_filename)
-        return local_filename
+        return key.get_contents_as_string()
+
+    def _fetch_parts(self, bucket, filenames):
+        """Yield the contents of the part files in order, downloading up to
+        s3_image_download_concurrency of them at once."""
+        pool = eventlet.GreenPool(FLAGS.s3_image_download_concurrency)
+        filenames = iter(filenames)
+        downloads = collections.deque(
+            pool.spawn(self._download_part, bucket, filename)
+            for filename in itertools.islice(
+                filenames, FLAGS.s3_image_download_concurrency))
+        try:
+            while downloads:
+                part = downloads.popleft().wait()
+                for filename in itertools.islice(filenames, 1):
+                    downloads.append(pool.spawn(self._download_part,
+                                                bucket, filename))
+                yield part
+        finally:
+            for download in downloads:
+                download.kill()
 
     def _s3_parse_manifest(self, context, metadata, manifest):
         manifest = ElementTree.fromstring(manifest)
@@ -247,8 +308,6 @@ class S3ImageService(object):
     def _s3_create(self, context, metadata):
         """Gets a manifext from s3 and makes an image."""
 
-        image_path = tempfile.mkdtemp(dir=FLAGS.image_decryption_dir)
-
         image_location = metadata['properties']['image_location']
         bucket_name = image_location.split('/')[0]
         manifest_path = image_location[len(bucket_name) + 1:]
@@ -261,97 +320,119 @@ class S3ImageService(object):
                                                               manifest)
 
         def delayed_create():
-            """This handles the fetching and decrypting of the part files."""
-            log_vars = {'image_location': image_location,
-                        'image_path': image_path}
+            """This streams the part files through decryption and untarring
+            into the image service."""
+            log_vars = {'image_location': image_location}
             metadata['properties']['image_state'] = 'downloading'
             self.service.update(context, image_uuid, metadata)
 
-            try:
-                parts = []
-                elements = manifest.find('image').getiterator('filename')
-                for fn_element in elements:
-                    part = self._download_file(bucket,
-                                               fn_element.text,
-                                               image_path)
-                    parts.append(part)
-
-                # NOTE(vish): this may be suboptimal, should we use cat?
-                enc_filename = os.path.join(image_path, 'image.encrypted')
-                with open(enc_filename, 'w') as combined:
-                    for filename in parts:
-                        with open(filename) as part:
-                            shutil.copyfileobj(part, combined)
-
-            except Exception:
-                LOG.exception(_("Failed to download %(image_location)s "
-                                "to %(image_path)s"), log_vars)
-                metadata['properties']['image_state'] = 'failed_download'
-                self.service.update(context, image_uuid, metadata)
-                return
-
-            metadata['properties']['image_state'] = 'decrypting'
-            self.service.update(context, image_uuid, metadata)
-
-            try:
-                hex_key = manifest.find('image/ec2_encrypted_key').text
-                encrypted_key = binascii.a2b_hex(hex_key)
-                hex_iv = manifest.find('image/ec2_encrypted_iv').text
-                encrypted_iv = binascii.a2b_hex(hex_iv)
-
-                # FIXME(vish): grab key from common service so this can run on
-                #              any host.
-                cloud_pk = crypto.key_path(context.project_id)
-
-                dec_filename = os.path.join(image_path, 'image.tar.gz')
-                self._decrypt_image(enc_filename, encrypted_key,
-                                    encrypted_iv, cloud_pk,
-                                    dec_filename)
-            except Exception:
-                LOG.exception(_("Failed to decrypt %(image_location)s "
-                                "to %(image_path)s"), log_vars)
-                metadata['properties']['image_state'] = 'failed_decrypt'
-                self.service.update(context, image_uuid, metadata)
-                return
-
-            metadata['properties']['image_state'] = 'untarring'
-            self.service.update(context, image_uuid, metadata)
+            filenames = [fn_element.text for fn_element in
+                         manifest.find('image').getiterator('filename')]
+            progress = {'parts': 0, 'total_parts': len(filenames),
+                        'decrypted': 0, 'uploaded': 0}
+            reported = [utils.utcnow()]
+
+            def report():
+                now = utils.utcnow()
+                if utils.is_older_than(reported[0],
+                                       FLAGS.s3_image_progress_interval):
+                    reported[0] = now
+                    self._update_progress(context, image_uuid, metadata,
+                                          progress)
+
+            def stage(chunks, failed_state, message, counter=None):
+                try:
+                    for chunk in chunks:
+                        if counter == 'parts':
+                            progress[counter] += 1
+                        elif counter:
+                            progress[counter] += len(chunk)
+                        if counter:
+                            report()
+                        yield chunk
+                except _StageFailed:
+                    raise
+                except Exception:
+                    LOG.exception(message, log_vars)
+                    raise _StageFailed(failed_state)
 
             try:
-                unz_filename = self._untarzip_image(image_path, dec_filename)
-            except Exception:
-                LOG.exception(_("Failed to untar %(image_location)s "
-                                "to %(image_path)s"), log_vars)
-                metadata['properties']['image_state'] = 'failed_untar'
-                self.service.update(context, image_uuid, metadata)
-                return
-
-            metadata['properties']['image_state'] = 'uploading'
-            self.service.update(context, image_uuid, metadata)
-            try:
-                with open(unz_filename) as image_file:
-                    self.service.update(context, image_uuid,
-                                        metadata, image_file)
-            except Exception:
-                LOG.exception(_("Failed to upload %(image_location)s "
-                                "to %(image_path)s"), log_vars)
-                metadata['properties']['image_state'] = 'failed_upload'
+                try:
+                    hex_key = manifest.find('image/ec2_encrypted_key').text
+                    encrypted_key = binascii.a2b_hex(hex_key)
+                    hex_iv = manifest.find('image/ec2_encrypted_iv').text
+                    encrypted_iv = binascii.a2b_hex(hex_iv)
+
+                    # FIXME(vish): grab key from common service so this can
+                    #              run on any host.
+                    cloud_pk = crypto.key_path(context.project_id)
+                    key, iv = self._decrypt_key_and_iv(encrypted_key,
+                                                       encrypted_iv, cloud_pk)
+                except Exception:
+                    LOG.exception(_("Failed to decrypt the key of "
+                                    "%(image_location)s"), log_vars)
+                    raise _StageFailed('failed_decrypt')
+
+                parts = stage(self._fetch_parts(bucket, filenames),
+                              'failed_download',
+                              _("Failed to download %(image_location)s"),
+                              'parts')
+                decrypted = stage(self._decrypt_chunks(parts, key, iv),
+                                  'failed_decrypt',
+                                  _("Failed to decrypt %(image_location)s"),
+                                  'decrypted')
+                untarred = stage(self._untarzip_chunks(
+                                     _ChunkReader(decrypted)),
+                                 'failed_untar',
+                                 _("Failed to untar %(image_location)s"),
+                                 'uploaded')
+                try:
+                    self.service.update(context, image_uuid, metadata,
+                                        _ChunkReader(untarred))
+                except _StageFailed:
+                    raise
+                except Exception:
+                    LOG.exception(_("Failed to upload %(image_location)s"),
+                                  log_vars)
+                    raise _StageFailed('failed_upload')
+            except _StageFailed, e:
+                metadata['properties']['image_state'] = e.image_state
+                metadata['properties']['image_progress'] = \
+                    self._format_progress(progress)
                 self.service.update(context, image_uuid, metadata)
                 return
 
             metadata['properties']['image_state'] = 'available'
+            metadata['properties']['image_progress'] = \
+                self._format_progress(progress)
             metadata['status'] = 'active'
             self.service.update(context, image_uuid, metadata)
 
-            shutil.rmtree(image_path)
-
         eventlet.spawn_n(delayed_create)
 
         return image
 
     @staticmethod
-    def _decrypt_image(encrypted_filename, encrypted_key, encrypted_iv,
-                       cloud_private_key, decrypted_filename):
+    def _format_progress(progress):
+        return (_('downloaded %(parts)d/%(total_parts)d parts, decrypted '
+                  '%(decrypted)d bytes, uploaded %(uploaded)d bytes')
+                % progress)
+
+    def _update_progress(self, context, image_uuid, metadata, progress):
+        """Record progress in image_progress, leaving the status alone as
+        the image service changes it while the upload is under way."""
+        metadata['properties']['image_progress'] = \
+            self._format_progress(progress)
+        progress_metadata = dict(metadata)
+        progress_metadata.pop('status', None)
+        try:
+            self.service.update(context, image_uuid, progress_metadata)
+        except Exception:
+            LOG.exception(_("Failed to update the progress of image %s"),
+                          image_uuid)
+
+    @staticmethod
+    def _decrypt_key_and_iv(encrypted_key, encrypted_iv, cloud_private_key):
         key, err = utils.execute('openssl',
                                  'rsautl',
                                  '-decrypt',
@@ -370,24 +451,45 @@ class S3ImageService(object):
         if err:
             raise exception.Error(_('Failed to decrypt initialization '
                                     'vector: %s') % err)
+        return binascii.a2b_hex(key.strip()), binascii.a2b_hex(iv.strip())
 
-        _out, err = utils.execute('openssl', 'enc',
-                                  '-d', '-aes-128-cbc',
-                                  '-in', '%s' % (encrypted_filename,),
-                                  '-K', '%s' % (key,),
-                                  '-iv', '%s' % (iv,),
-                                  '-out', '%s' % (decrypted_filename,),
-                                  check_exit_code=False)
-        if err:
-            raise exception.Error(_('Failed to decrypt image file '
-                                    '%(image_file)s: %(err)s') %
-                                    {'image_file': encrypted_filename,
-                                     'err': err})
+    @staticmethod
+    def _decrypt_chunks(chunks, key, iv):
+        """Decrypt AES-128-CBC encrypted chunks as openssl enc -d would,
+        holding back the last block until its padding can be removed."""
+        cipher = AES.new(key, AES.MODE_CBC, iv)
+        buffered = ''
+        for chunk in chunks:
+            buffered += chunk
+            length = len(buffered) // AES.block_size * AES.block_size
+            if length == len(buffered):
+                length -= AES.block_size
+            if length > 0:
+                yield cipher.decrypt(buffered[:length])
+                buffered = buffered[length:]
+        if len(buffered) != AES.block_size:
+            raise exception.Error(_('Encrypted image is not a whole number '
+                                    'of blocks'))
+        last_block = cipher.decrypt(buffered)
+        padding = ord(last_block[-1])
+        if not 0 < padding <= AES.block_size or \
+           last_block[-padding:] != last_block[-1] * padding:
+            raise exception.Error(_('Bad padding in decrypted image'))
+        yield last_block[:-padding]
 
     @staticmethod
-    def _untarzip_image(path, filename):
-        tar_file = tarfile.open(filename, 'r|gz')
-        tar_file.extractall(path)
-        image_file = tar_file.getnames()[0]
-        tar_file.close()
-        return os.path.join(path, image_file)
+    def _untarzip_chunks(fileobj):
+        """Yield the contents of the first file in a tar.gz stream."""
+        tar_file = tarfile.open(fileobj=fileobj, mode='r|gz')
+        try:
+            member = tar_file.next()
+            if member is None:
+                raise exception.Error(_('Image bundle is an empty tarball'))
+            image_file = tar_file.extractfile(member)
+            while True:
+                chunk = image_file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            tar_file.close()
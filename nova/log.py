@@ -34,6 +34,7 @@ import logging.handlers
 import os
 import stat
 import sys
+import time
 import traceback
 
 import nova
@@ -67,6 +68,9 @@ flags.DEFINE_list('default_log_levels',
 flags.DEFINE_bool('use_syslog', False, 'output to syslog')
 flags.DEFINE_bool('publish_errors', False, 'publish error events')
 flags.DEFINE_string('logfile', None, 'output to named file')
+flags.DEFINE_integer('logging_debug_rate_limit', 0,
+                     'most DEBUG messages emitted per second from each line '
+                     'of code, 0 for no limit')
 
 
 # A list of things we want to replicate from logging.
@@ -114,6 +118,41 @@ def _dictify_context(context):
     return context
 
 
+_nova_version = None
+
+
+def _get_nova_version():
+    global _nova_version
+    if _nova_version is None:
+        _nova_version = version.version_string_with_vcs()
+    return _nova_version
+
+
+_debug_sites = {}
+
+
+def _debug_rate_limited(record):
+    """Whether a DEBUG record exceeds logging_debug_rate_limit.
+
+    The first record let through after some were dropped says how many.
+    """
+    now = time.time()
+    key = (record.pathname, record.lineno)
+    site = _debug_sites.get(key)
+    if site is None or now - site[0] >= 1:
+        suppressed = site[2] if site else 0
+        _debug_sites[key] = [now, 1, 0]
+        if suppressed:
+            record.msg = '%s (%d similar messages suppressed)' % (record.msg,
+                                                                  suppressed)
+        return False
+    if site[1] < FLAGS.logging_debug_rate_limit:
+        site[1] += 1
+        return False
+    site[2] += 1
+    return True
+
+
 def _get_binary_name():
     return os.path.basename(inspect.stack()[-1][1])
 
@@ -149,14 +188,25 @@ class NovaLogger(logging.Logger):
         self.setLevel(level)
 
     def _log(self, level, msg, args, exc_info=None, extra=None, context=None):
-        """Extract context from any log call."""
+        """Extract context from any log call.
+
+        The context is only turned into record attributes when a handler
+        formats the record.
+        """
         if not extra:
             extra = {}
         if context:
-            extra.update(_dictify_context(context))
-        extra.update({"nova_version": version.version_string_with_vcs()})
+            extra['nova_context'] = context
+        extra['nova_version'] = _get_nova_version()
         return logging.Logger._log(self, level, msg, args, exc_info, extra)
 
+    def handle(self, record):
+        """Drop DEBUG records over logging_debug_rate_limit."""
+        if (record.levelno == DEBUG and FLAGS.logging_debug_rate_limit and
+            _debug_rate_limited(record)):
+            return
+        return logging.Logger.handle(self, record)
+
     def addHandler(self, handler):
         """Each handler gets our custom formatter."""
         handler.setFormatter(_formatter)
@@ -202,6 +252,9 @@ class NovaFormatter(logging.Formatter):
 
     def format(self, record):
         """Uses contextstring if request_id is set, otherwise default."""
+        context = record.__dict__.pop('nova_context', None)
+        if context:
+            record.__dict__.update(_dictify_context(context))
         if record.__dict__.get('request_id', None):
             self._fmt = FLAGS.logging_context_format_string
         else:
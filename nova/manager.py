@@ -49,10 +49,14 @@ level(LinuxNetDriver vs CiscoNetDriver).
 Managers will often provide methods for initial setup of a host or periodic
 tasksto a wrapping service.
 
-This module provides Manager, a base class for managers.
+This module provides Manager, a base class for managers, and the
+periodic_task decorator used to declare a manager's periodic work.
 
 """
 
+import random
+import time
+
 from nova import flags
 from nova import log as logging
 from nova import utils
@@ -66,16 +70,123 @@ FLAGS = flags.FLAGS
 LOG = logging.getLogger('nova.manager')
 
 
+def periodic_task(*args, **kwargs):
+    """Decorator to mark a manager method as a periodic task.
+
+    Use it bare, as ``@periodic_task``, to run the method on every tick of
+    the service's periodic timer, or with keyword arguments:
+
+    :interval: minimum seconds between runs, or the name of an integer
+               flag holding it.  0 runs the task on every tick.
+    :jitter: if True, delay the first run by a random part of the
+             interval so hosts started together don't run in lockstep.
+    :budget: warning threshold in seconds.  Runs that take longer are
+             logged and counted as overruns after they finish; they are
+             not interrupted.
+
+    The decorated method is called with the admin context the service
+    passes to periodic_tasks.
+    """
+    def decorator(f):
+        f._periodic_task = True
+        f._periodic_interval = kwargs.get('interval', 0)
+        f._periodic_jitter = kwargs.get('jitter', False)
+        f._periodic_budget = kwargs.get('budget')
+        return f
+
+    if args and callable(args[0]) and not kwargs:
+        return decorator(args[0])
+    return decorator
+
+
+class ManagerMeta(type):
+    """Collect the periodic tasks declared on a manager and its bases."""
+
+    def __init__(cls, names, bases, dict_):
+        super(ManagerMeta, cls).__init__(names, bases, dict_)
+        tasks = list(getattr(cls, '_periodic_tasks', []))
+        declared = [value for value in dict_.values()
+                    if getattr(value, '_periodic_task', False)]
+        declared.sort(key=lambda f: f.func_code.co_firstlineno)
+        for task in declared:
+            if task.__name__ not in tasks:
+                tasks.append(task.__name__)
+        cls._periodic_tasks = tasks
+
+
 class Manager(base.Base):
+    __metaclass__ = ManagerMeta
+
     def __init__(self, host=None, db_driver=None):
         if not host:
             host = FLAGS.host
         self.host = host
+        self._periodic_state = {}
         super(Manager, self).__init__(db_driver)
 
+    def _periodic_task_state(self, task_name, task):
+        state = self._periodic_state.get(task_name)
+        if state is None:
+            interval = self._periodic_task_interval(task)
+            next_run = time.time()
+            if interval and getattr(task, '_periodic_jitter', False):
+                next_run += random.uniform(0, interval)
+            state = {'next_run': next_run,
+                     'runs': 0,
+                     'errors': 0,
+                     'overruns': 0,
+                     'last_duration': None,
+                     'max_duration': 0.0,
+                     'total_duration': 0.0}
+            self._periodic_state[task_name] = state
+        return state
+
+    def _periodic_task_interval(self, task):
+        interval = getattr(task, '_periodic_interval', 0)
+        if isinstance(interval, basestring):
+            interval = FLAGS[interval].value
+        return interval or 0
+
     def periodic_tasks(self, context=None):
-        """Tasks to be run at a periodic interval."""
-        pass
+        """Run the periodic tasks that are due, one after another.
+
+        Returns a list of the exceptions raised by tasks that failed.
+        """
+        error_list = []
+        for task_name in self._periodic_tasks:
+            task = getattr(self, task_name)
+            state = self._periodic_task_state(task_name, task)
+            now = time.time()
+            if now < state['next_run']:
+                continue
+
+            try:
+                task(context)
+            except Exception as ex:
+                state['errors'] += 1
+                LOG.warning(_('Error during %(task_name)s: %(ex)s'),
+                            {'task_name': task_name, 'ex': unicode(ex)})
+                error_list.append(ex)
+            finally:
+                duration = time.time() - now
+                state['next_run'] = now + self._periodic_task_interval(task)
+                state['runs'] += 1
+                state['last_duration'] = duration
+                state['total_duration'] += duration
+                state['max_duration'] = max(state['max_duration'], duration)
+
+            budget = getattr(task, '_periodic_budget', None)
+            if budget and duration > budget:
+                state['overruns'] += 1
+                LOG.warning(_('Periodic task %(task_name)s took %(duration).2f'
+                              ' seconds, over its %(budget)s second budget'),
+                            locals())
+        return error_list
+
+    def get_periodic_task_stats(self):
+        """Return run counts and timings for each periodic task."""
+        return dict((task_name, dict(state))
+                    for task_name, state in self._periodic_state.iteritems())
 
     def init_host(self):
         """Handle initialization if this is a standalone service.
@@ -105,11 +216,10 @@ class SchedulerDependentManager(Manager):
         """Remember these capabilities to send on next periodic update."""
         self.last_capabilities = capabilities
 
-    def periodic_tasks(self, context=None):
+    @periodic_task
+    def _publish_service_capabilities(self, context):
         """Pass data back to the scheduler at a periodic interval."""
         if self.last_capabilities:
             LOG.debug(_('Notifying Schedulers of capabilities ...'))
             api.update_service_capabilities(context, self.service_name,
                                 self.host, self.last_capabilities)
-
-        super(SchedulerDependentManager, self).periodic_tasks(context)
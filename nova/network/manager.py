@@ -287,16 +287,19 @@ class FloatingIP(object):
     def allocate_floating_ip(self, context, project_id):
         """Gets an floating ip from the pool."""
         # NOTE(tr3buchet): all network hosts in zone now use the same pool
-        LOG.debug("QUOTA: %s" % quota.allowed_floating_ips(context, 1))
-        if quota.allowed_floating_ips(context, 1) < 1:
+        num_floating_ips, reservations = quota.reserve_floating_ip(context)
+        if num_floating_ips < 1:
             LOG.warn(_('Quota exceeded for %s, tried to allocate '
                        'address'),
                      context.project_id)
             raise quota.QuotaError(_('Address quota exceeded. You cannot '
                                      'allocate any more addresses'))
         # TODO(vish): add floating ips through manage command
-        return self.db.floating_ip_allocate_address(context,
-                                                    project_id)
+        try:
+            return self.db.floating_ip_allocate_address(context,
+                                                        project_id)
+        finally:
+            quota.release(context, reservations)
 
     def deallocate_floating_ip(self, context, address,
                                affect_auto_assigned=False):
@@ -501,9 +504,8 @@ class NetworkManager(manager.SchedulerDependentManager):
         for network in self.db.network_get_all_by_host(ctxt, self.host):
             self._setup_network(ctxt, network)
 
-    def periodic_tasks(self, context=None):
-        """Tasks to be run at a periodic interval."""
-        super(NetworkManager, self).periodic_tasks(context)
+    @manager.periodic_task
+    def _disassociate_stale_fixed_ips(self, context):
         if self.timeout_fixed_ips:
             now = utils.utcnow()
             timeout = FLAGS.fixed_ip_disassociate_timeout
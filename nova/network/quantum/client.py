@@ -172,8 +172,8 @@ class Client(object):
 
             if self.logger:
                 self.logger.debug(
-                    _("Quantum Client Request:\n%(method)s %(action)s\n" %
-                                    locals()))
+                    _("Quantum Client Request:\n%(method)s %(action)s\n"),
+                    locals())
                 if body:
                     self.logger.debug(body)
 
@@ -183,8 +183,8 @@ class Client(object):
             data = res.read()
 
             if self.logger:
-                self.logger.debug("Quantum Client Reply (code = %s) :\n %s" \
-                        % (str(status_code), data))
+                self.logger.debug("Quantum Client Reply (code = %s) :\n %s", \
+                        str(status_code), data)
 
             if status_code == httplib.NOT_FOUND:
                 raise QuantumNotFoundException(
@@ -13,8 +13,17 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import errno
+import glob
+import json
+import os
+import re
+import sys
 import uuid
 
+from eventlet import greenthread
+from eventlet import queue
+
 from nova import flags
 from nova import utils
 from nova import log as logging
@@ -27,6 +36,18 @@ flags.DEFINE_string('default_notification_level', 'INFO',
                     'Default notification level for outgoing notifications')
 flags.DEFINE_string('default_publisher_id', FLAGS.host,
                     'Default publisher_id for outgoing notifications')
+flags.DEFINE_integer('notification_queue_size', 0,
+                     'Notifications buffered for a background sender, '
+                     '0 to send each one from the notifying greenthread')
+flags.DEFINE_integer('notification_batch_size', 100,
+                     'Most buffered notifications sent to the driver at once')
+flags.DEFINE_string('notification_overflow', 'drop_oldest',
+                    'What to do when the notification buffer is full: '
+                    'drop_oldest, block or spill to notification_spill_path')
+flags.DEFINE_string('notification_spill_path',
+                    '$state_path/notifications.spill',
+                    'Prefix of the files holding notifications that '
+                    'overflowed the buffer, one per process')
 
 
 WARN = 'WARN'
@@ -72,6 +93,233 @@ def publisher_id(service, host=None):
     return "%s.%s" % (service, host)
 
 
+_drivers = {}
+_pipeline = None
+
+
+def _get_driver():
+    """Return the notification driver, importing it only once."""
+    name = FLAGS.notification_driver
+    driver = _drivers.get(name)
+    if driver is None:
+        driver = _drivers[name] = utils.import_object(name)
+    return driver
+
+
+def _send(messages):
+    """Hand messages to the driver, batched when the driver supports it.
+
+    A batch the driver fails on is sent again one message at a time, so
+    only the messages that fail on their own are lost.  Returns how many
+    were sent.
+    """
+    driver = _get_driver()
+    if len(messages) > 1 and hasattr(driver, 'notify_many'):
+        try:
+            driver.notify_many(messages)
+            return len(messages)
+        except Exception, e:
+            LOG.exception(_("Problem '%(e)s' attempting to send %(count)d "
+                            "notifications to the notification system, "
+                            "sending them one at a time.") %
+                          {'e': e, 'count': len(messages)})
+
+    sent = 0
+    for msg in messages:
+        try:
+            driver.notify(msg)
+            sent += 1
+        except Exception, e:
+            payload = msg['payload']
+            LOG.exception(_("Problem '%(e)s' attempting to "
+                            "send to notification system. Payload=%(payload)s"
+                            % locals()))
+    return sent
+
+
+class NotificationPipeline(object):
+    """Buffers notifications for a background sender greenthread.
+
+    The sender drains up to notification_batch_size messages at a time.
+    When the buffer is full, notification_overflow decides whether the
+    oldest message is dropped, the notifier blocks, or the message is
+    appended to the spill file of this process to be sent once the buffer
+    empties again.  Spill files left by processes that are gone are sent
+    too.
+    """
+
+    def __init__(self, size):
+        self.queue = queue.Queue(size)
+        self.stats = {'queued': 0, 'sent': 0, 'dropped': 0, 'spilled': 0,
+                      'errors': 0}
+        self._sender = None
+        self._unspilling = False
+        self._sending = []
+        self._claimed = 0
+        self._orphans_checked = False
+
+    def put(self, msg):
+        self.stats['queued'] += 1
+        self._start()
+        overflow = FLAGS.notification_overflow
+        if overflow == 'block':
+            self.queue.put(msg)
+            return
+        try:
+            self.queue.put_nowait(msg)
+        except queue.Full:
+            if overflow == 'spill':
+                self._spill(msg)
+                return
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.stats['dropped'] += 1
+            self.queue.put_nowait(msg)
+
+    def _start(self):
+        if self._sender is None:
+            self._sender = greenthread.spawn_n(self._run)
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self.queue.get()]
+                self._drain(batch)
+            except Exception:
+                LOG.exception(_('Unexpected error in the notification '
+                                'sender'))
+
+    def _drain(self, batch):
+        while len(batch) < FLAGS.notification_batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        self._send(batch)
+        if self.queue.empty():
+            self._unspill()
+
+    def _send(self, batch):
+        sent = _send(batch)
+        self.stats['sent'] += sent
+        self.stats['errors'] += len(batch) - sent
+        self.stats['dropped'] += len(batch) - sent
+
+    def _spill_path(self):
+        """Return the spill file of this process.
+
+        Each process appends to and renames only its own file, so processes
+        sharing notification_spill_path never lose each other's messages.
+
+        """
+        return '%s.%s.%d' % (FLAGS.notification_spill_path,
+                             os.path.basename(sys.argv[0]), os.getpid())
+
+    def _spill(self, msg):
+        path = self._spill_path()
+        try:
+            with open(path, 'a') as spill:
+                spill.write(json.dumps(msg) + '\n')
+            self.stats['spilled'] += 1
+        except (IOError, OSError), e:
+            LOG.error(_('Dropping notification, unable to spill it to '
+                        '%(path)s: %(e)s'), {'path': path, 'e': e})
+            self.stats['dropped'] += 1
+
+    def _orphaned_spills(self):
+        """Return the spill files of processes that are no longer running."""
+        orphans = []
+        for path in sorted(glob.glob(FLAGS.notification_spill_path + '.*')):
+            match = re.search(r'\.(\d+)(\.sending\.\d+)?$', path)
+            if match is None or int(match.group(1)) == os.getpid():
+                continue
+            try:
+                os.kill(int(match.group(1)), 0)
+            except OSError, e:
+                if e.errno == errno.ESRCH:
+                    orphans.append(path)
+        return orphans
+
+    def _claim(self, path):
+        """Rename path to a new .sending file of this process."""
+        self._claimed += 1
+        sending = '%s.sending.%d' % (self._spill_path(), self._claimed)
+        try:
+            os.rename(path, sending)
+        except OSError:
+            # NOTE: another process claimed the orphan first
+            return
+        self._sending.append(sending)
+
+    def _unspill(self):
+        if self._unspilling:
+            return
+        self._unspilling = True
+        try:
+            if not self._orphans_checked:
+                self._orphans_checked = True
+                for orphan in self._orphaned_spills():
+                    self._claim(orphan)
+            path = self._spill_path()
+            if os.path.exists(path):
+                self._claim(path)
+            # NOTE: a file stays in _sending until it has been sent, so one
+            #       interrupted by an error is sent again by the next call
+            while self._sending:
+                self._send_spilled(self._sending[0])
+                self._sending.pop(0)
+        finally:
+            self._unspilling = False
+
+    def _send_spilled(self, sending):
+        batch = []
+        with open(sending) as spill:
+            for line in spill:
+                try:
+                    batch.append(json.loads(line))
+                except ValueError:
+                    LOG.error(_('Dropping unreadable notification spilled '
+                                'to %s'), sending)
+                    self.stats['dropped'] += 1
+                    continue
+                if len(batch) >= FLAGS.notification_batch_size:
+                    self._send(batch)
+                    batch = []
+        if batch:
+            self._send(batch)
+        os.unlink(sending)
+
+    def flush(self):
+        """Send everything buffered or spilled from this greenthread."""
+        while not self.queue.empty():
+            self._drain([])
+        self._unspill()
+
+
+def _get_pipeline():
+    global _pipeline
+    if _pipeline is None and FLAGS.notification_queue_size > 0:
+        _pipeline = NotificationPipeline(FLAGS.notification_queue_size)
+    return _pipeline
+
+
+def get_notification_stats():
+    """Return counts of queued, sent, dropped and spilled notifications."""
+    pipeline = _get_pipeline()
+    if pipeline is None:
+        return {}
+    return dict(pipeline.stats)
+
+
+def flush():
+    """Send all buffered notifications before returning."""
+    pipeline = _get_pipeline()
+    if pipeline is not None:
+        pipeline.flush()
+
+
 def notify(publisher_id, event_type, priority, payload):
     """
     Sends a notification using the specified driver
@@ -111,16 +359,14 @@ def notify(publisher_id, event_type, priority, payload):
     # Ensure everything is JSON serializable.
     payload = utils.to_primitive(payload, convert_instances=True)
 
-    driver = utils.import_object(FLAGS.notification_driver)
     msg = dict(message_id=str(uuid.uuid4()),
                    publisher_id=publisher_id,
                    event_type=event_type,
                    priority=priority,
                    payload=payload,
                    timestamp=str(utils.utcnow()))
-    try:
-        driver.notify(msg)
-    except Exception, e:
-        LOG.exception(_("Problem '%(e)s' attempting to "
-                        "send to notification system. Payload=%(payload)s" %
-                        locals()))
+    pipeline = _get_pipeline()
+    if pipeline is None:
+        _send([msg])
+    else:
+        pipeline.put(msg)
@@ -26,11 +26,29 @@ flags.DEFINE_string('notification_topic', 'notifications',
                     'RabbitMQ topic used for Nova notifications')
 
 
-def notify(message):
-    """Sends a notification to the RabbitMQ"""
-    context = nova.context.get_admin_context()
+def _topic_for(message):
     priority = message.get('priority',
                            FLAGS.default_notification_level)
     priority = priority.lower()
-    topic = '%s.%s' % (FLAGS.notification_topic, priority)
-    rpc.cast(context, topic, message)
+    return '%s.%s' % (FLAGS.notification_topic, priority)
+
+
+def notify(message):
+    """Sends a notification to the RabbitMQ"""
+    context = nova.context.get_admin_context()
+    rpc.cast(context, _topic_for(message), message)
+
+
+def notify_many(messages):
+    """Sends notifications to the RabbitMQ, one batch per topic"""
+    context = nova.context.get_admin_context()
+    batches = {}
+    topics = []
+    for message in messages:
+        topic = _topic_for(message)
+        if topic not in batches:
+            batches[topic] = []
+            topics.append(topic)
+        batches[topic].append(message)
+    for topic in topics:
+        rpc.cast_many(context, topic, batches[topic])
@@ -34,11 +34,11 @@ S3 client with this module:
 
 """
 
-import bisect
 import datetime
 import hashlib
 import os
 import os.path
+import sqlite3
 import urllib
 
 import routes
@@ -53,6 +53,30 @@ from nova import wsgi
 FLAGS = flags.FLAGS
 flags.DEFINE_string('buckets_path', '$state_path/buckets',
                     'path to s3 buckets')
+flags.DEFINE_integer('s3_chunk_size', 65536,
+                     'bytes read or written at a time when streaming objects')
+
+LOG = logging.getLogger('nova.objectstore.s3server')
+
+# Uploads are written next to the object under this prefix and renamed into
+# place once complete, so readers never see a partial object.
+UPLOAD_PREFIX = '.s3upload-'
+
+# Each bucket keeps a sorted index of its objects in this sqlite file.
+INDEX_NAME = '.s3index'
+
+
+def is_reserved(object_name):
+    """Object names that would clash with the index or uploads in the
+    bucket directory, which are refused."""
+    file_name = os.path.basename(object_name)
+    return file_name.startswith(INDEX_NAME) or \
+           file_name.startswith(UPLOAD_PREFIX)
+
+
+class IncompleteBody(Exception):
+    """The client sent less of a body than its Content-Length."""
+    pass
 
 
 def get_wsgi_server():
@@ -62,6 +86,78 @@ def get_wsgi_server():
                        host=FLAGS.s3_host)
 
 
+def _read_chunks(object_file, start, length, chunk_size):
+    """Yield length bytes of object_file from start, chunk_size at a time."""
+    object_file.seek(start)
+    while length > 0:
+        chunk = object_file.read(min(chunk_size, length))
+        if not chunk:
+            break
+        length -= len(chunk)
+        yield chunk
+
+
+def _file_iter(object_file, start, length, chunk_size):
+    """Like _read_chunks, but closes object_file when done."""
+    try:
+        for chunk in _read_chunks(object_file, start, length, chunk_size):
+            yield chunk
+    finally:
+        object_file.close()
+
+
+def _multipart_iter(object_file, parts, trailer, chunk_size):
+    """Yield a multipart/byteranges body for (header, start, stop) parts."""
+    try:
+        for header, start, stop in parts:
+            yield header
+            for chunk in _read_chunks(object_file, start, stop - start,
+                                      chunk_size):
+                yield chunk
+            yield '\r\n'
+        yield trailer
+    finally:
+        object_file.close()
+
+
+def parse_range(header, size):
+    """Return the [(start, stop), ...] byte ranges of an object of size
+    bytes asked for by a Range header.
+
+    Returns None if the header is malformed, in which case it is ignored and
+    the whole object is sent, and [] if none of the ranges can be satisfied.
+
+    """
+    units, sep, specs = header.partition('=')
+    if units.strip().lower() != 'bytes' or not sep:
+        return None
+    ranges = []
+    for spec in specs.split(','):
+        first, sep, last = spec.strip().partition('-')
+        if not sep:
+            return None
+        try:
+            if not first:
+                suffix = int(last)
+                if not suffix:
+                    continue
+                start, stop = max(size - suffix, 0), size
+            else:
+                start = int(first)
+                stop = size
+                if last:
+                    if int(last) < start:
+                        return None
+                    stop = min(int(last) + 1, size)
+        except ValueError:
+            return None
+        if start < 0:
+            return None
+        if start < stop:
+            ranges.append((start, stop))
+    return ranges
+
+
 class S3Application(wsgi.Router):
     """Implementation of an S3-like storage server based on local files.
 
@@ -85,8 +181,142 @@ class S3Application(wsgi.Router):
         if not os.path.exists(self.directory):
             os.makedirs(self.directory)
         self.bucket_depth = bucket_depth
+        self.indexes = {}
         super(S3Application, self).__init__(mapper)
 
+    def object_path(self, bucket, object_name):
+        if self.bucket_depth < 1:
+            return os.path.abspath(os.path.join(
+                self.directory, bucket, object_name))
+        hash = hashlib.md5(object_name).hexdigest()
+        path = os.path.abspath(os.path.join(self.directory, bucket))
+        for i in range(self.bucket_depth):
+            path = os.path.join(path, hash[:2 * (i + 1)])
+        return os.path.join(path, object_name)
+
+    def bucket_index(self, bucket_name):
+        """Return the index of an existing bucket, opening it on first use."""
+        if bucket_name not in self.indexes:
+            self.indexes[bucket_name] = BucketIndex(self, bucket_name)
+        return self.indexes[bucket_name]
+
+    def remove_bucket_index(self, bucket_name):
+        index = self.indexes.pop(bucket_name, None)
+        if index:
+            index.close()
+        path = os.path.join(self.directory, bucket_name)
+        for file_name in os.listdir(path):
+            if file_name.startswith(INDEX_NAME):
+                os.unlink(os.path.join(path, file_name))
+
+
+class BucketIndex(object):
+    """Sorted (name, size, mtime) index of the objects in a bucket.
+
+    Listing a page of a bucket is then a range scan of the index rather than
+    a walk and stat of the whole bucket.  Names are recorded as pending
+    before their files change and cleared once the index has caught up, so
+    the entries a crash left stale are refreshed when the index is next
+    opened.  A bucket without an index is indexed from scratch.
+
+    """
+
+    def __init__(self, application, bucket_name):
+        self.application = application
+        self.bucket_name = bucket_name
+        self.path = os.path.join(application.directory, bucket_name)
+        index_path = os.path.join(self.path, INDEX_NAME)
+        exists = os.path.exists(index_path)
+        self.db = sqlite3.connect(index_path, check_same_thread=False)
+        self.db.text_factory = str
+        with self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS objects ('
+                            'name TEXT PRIMARY KEY, size INTEGER, '
+                            'mtime REAL)')
+            self.db.execute('CREATE TABLE IF NOT EXISTS pending (name TEXT)')
+        if exists:
+            self.recover()
+        else:
+            self.rebuild()
+
+    def close(self):
+        self.db.close()
+
+    def rebuild(self):
+        """Index every object in the bucket."""
+        skip = len(self.path) + 1
+        for i in range(self.application.bucket_depth):
+            skip += 2 * (i + 1) + 1
+        rows = []
+        for root, dirs, files in os.walk(self.path):
+            for file_name in files:
+                if file_name.startswith(UPLOAD_PREFIX) or \
+                   file_name.startswith(INDEX_NAME):
+                    continue
+                path = os.path.join(root, file_name)
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                rows.append((utils.utf8(path[skip:]), info.st_size,
+                             info.st_mtime))
+        with self.db:
+            self.db.execute('DELETE FROM objects')
+            self.db.execute('DELETE FROM pending')
+            self.db.executemany('INSERT INTO objects VALUES (?, ?, ?)', rows)
+        LOG.info(_('Indexed %(count)d objects in bucket %(bucket)s'),
+                 {'count': len(rows), 'bucket': self.bucket_name})
+
+    def recover(self):
+        """Refresh the entries of changes that never finished."""
+        names = [row[0] for row in
+                 self.db.execute('SELECT DISTINCT name FROM pending')]
+        with self.db:
+            for name in names:
+                self._refresh(name)
+            self.db.execute('DELETE FROM pending')
+
+    def begin(self, object_name):
+        """Note that an object is about to change, returning a handle for
+        finish."""
+        with self.db:
+            cursor = self.db.execute('INSERT INTO pending VALUES (?)',
+                                     (utils.utf8(object_name),))
+        return cursor.lastrowid
+
+    def finish(self, object_name, pending_id):
+        """Record an object as it now is on disk."""
+        with self.db:
+            self._refresh(object_name)
+            self.db.execute('DELETE FROM pending WHERE rowid = ?',
+                            (pending_id,))
+
+    def _refresh(self, object_name):
+        name = utils.utf8(object_name)
+        path = self.application.object_path(self.bucket_name, object_name)
+        try:
+            info = os.stat(path)
+        except OSError:
+            self.db.execute('DELETE FROM objects WHERE name = ?', (name,))
+            return
+        self.db.execute('INSERT OR REPLACE INTO objects VALUES (?, ?, ?)',
+                        (name, info.st_size, info.st_mtime))
+
+    def list(self, prefix, marker, limit):
+        """Return up to limit (name, size, mtime) rows of the objects after
+        marker whose names start with prefix."""
+        prefix = utils.utf8(prefix)
+        rows = self.db.execute('SELECT name, size, mtime FROM objects '
+                               'WHERE name > ? AND name >= ? '
+                               'ORDER BY name LIMIT ?',
+                               (utils.utf8(marker), prefix, limit))
+        results = []
+        for row in rows:
+            if not row[0].startswith(prefix):
+                break
+            results.append(row)
+        return results
+
 
 class BaseRequestHandler(object):
     """Base class emulating Tornado's web framework pattern in WSGI.
@@ -147,6 +377,28 @@ class BaseRequestHandler(object):
     def finish(self, body=''):
         self.response.body = utils.utf8(body)
 
+    def stream(self, app_iter, length):
+        """Respond with the length bytes app_iter yields."""
+        self.response.app_iter = app_iter
+        self.response.content_length = length
+
+    def read_body(self):
+        """Yield the request body s3_chunk_size bytes at a time."""
+        body_file = self.request.body_file
+        remaining = self.request.content_length
+        while remaining is None or remaining > 0:
+            chunk_size = FLAGS.s3_chunk_size
+            if remaining is not None:
+                chunk_size = min(chunk_size, remaining)
+            chunk = body_file.read(chunk_size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+        if remaining:
+            raise IncompleteBody()
+
     def invalid(self, **kwargs):
         pass
 
@@ -168,6 +420,8 @@ class BaseRequestHandler(object):
 
         if isinstance(value, basestring):
             parts.append(utils.xhtml_escape(value))
+        elif isinstance(value, bool):
+            parts.append(str(value).lower())
         elif isinstance(value, int) or isinstance(value, long):
             parts.append(str(value))
         elif isinstance(value, datetime.datetime):
@@ -184,15 +438,7 @@ class BaseRequestHandler(object):
             raise Exception("Unknown S3 value type %r", value)
 
     def _object_path(self, bucket, object_name):
-        if self.application.bucket_depth < 1:
-            return os.path.abspath(os.path.join(
-                self.application.directory, bucket, object_name))
-        hash = hashlib.md5(object_name).hexdigest()
-        path = os.path.abspath(os.path.join(
-            self.application.directory, bucket))
-        for i in range(self.application.bucket_depth):
-            path = os.path.join(path, hash[:2 * (i + 1)])
-        return os.path.join(path, object_name)
+        return self.application.object_path(bucket, object_name)
 
 
 class RootHandler(BaseRequestHandler):
@@ -224,38 +470,20 @@ class BucketHandler(BaseRequestHandler):
            not os.path.isdir(path):
             self.set_status(404)
             return
-        object_names = []
-        for root, dirs, files in os.walk(path):
-            for file_name in files:
-                object_names.append(os.path.join(root, file_name))
-        skip = len(path) + 1
-        for i in range(self.application.bucket_depth):
-            skip += 2 * (i + 1) + 1
-        object_names = [n[skip:] for n in object_names]
-        object_names.sort()
+        index = self.application.bucket_index(bucket_name)
         contents = []
 
-        start_pos = 0
-        if marker:
-            start_pos = bisect.bisect_right(object_names, marker, start_pos)
-        if prefix:
-            start_pos = bisect.bisect_left(object_names, prefix, start_pos)
-
         truncated = False
-        for object_name in object_names[start_pos:]:
-            if not object_name.startswith(prefix):
-                break
+        for object_name, size, mtime in index.list(prefix, marker,
+                                                   max_keys + 1):
             if len(contents) >= max_keys:
                 truncated = True
                 break
-            object_path = self._object_path(bucket_name, object_name)
             c = {"Key": object_name}
             if not terse:
-                info = os.stat(object_path)
                 c.update({
-                    "LastModified": datetime.datetime.utcfromtimestamp(
-                        info.st_mtime),
-                    "Size": info.st_size,
+                    "LastModified": datetime.datetime.utcfromtimestamp(mtime),
+                    "Size": size,
                 })
             contents.append(c)
             marker = object_name
@@ -285,9 +513,11 @@ class BucketHandler(BaseRequestHandler):
            not os.path.isdir(path):
             self.set_status(404)
             return
-        if len(os.listdir(path)) > 0:
+        if [name for name in os.listdir(path)
+            if not name.startswith(INDEX_NAME)]:
             self.set_status(403)
             return
+        self.application.remove_bucket_index(bucket_name)
         os.rmdir(path)
         self.set_status(204)
         self.finish()
@@ -298,18 +528,58 @@ class ObjectHandler(BaseRequestHandler):
         object_name = urllib.unquote(object_name)
         path = self._object_path(bucket, object_name)
         if not path.startswith(self.application.directory) or \
-           not os.path.isfile(path):
+           not os.path.isfile(path) or is_reserved(object_name):
             self.set_status(404)
             return
         info = os.stat(path)
         self.set_header("Content-Type", "application/unknown")
         self.set_header("Last-Modified", datetime.datetime.utcfromtimestamp(
             info.st_mtime))
-        object_file = open(path, "r")
-        try:
-            self.finish(object_file.read())
-        finally:
-            object_file.close()
+        self.set_header("Accept-Ranges", "bytes")
+        size = info.st_size
+        ranges = None
+        if self.request.headers.get('Range'):
+            ranges = parse_range(self.request.headers['Range'], size)
+        if ranges == []:
+            self.set_status(416)
+            self.set_header("Content-Range", "bytes */%d" % size)
+            return
+        object_file = open(path, "rb")
+        if not ranges:
+            file_wrapper = self.request.environ.get('wsgi.file_wrapper')
+            if file_wrapper:
+                app_iter = file_wrapper(object_file, FLAGS.s3_chunk_size)
+            else:
+                app_iter = _file_iter(object_file, 0, size,
+                                      FLAGS.s3_chunk_size)
+            self.stream(app_iter, size)
+        elif len(ranges) == 1:
+            start, stop = ranges[0]
+            self.set_status(206)
+            self.set_header("Content-Range",
+                            "bytes %d-%d/%d" % (start, stop - 1, size))
+            self.stream(_file_iter(object_file, start, stop - start,
+                                   FLAGS.s3_chunk_size), stop - start)
+        else:
+            self._stream_ranges(object_file, ranges, size)
+
+    def _stream_ranges(self, object_file, ranges, size):
+        boundary = utils.gen_uuid().hex
+        parts = []
+        length = 0
+        for start, stop in ranges:
+            header = ("--%s\r\nContent-Type: application/unknown\r\n"
+                      "Content-Range: bytes %d-%d/%d\r\n\r\n" %
+                      (boundary, start, stop - 1, size))
+            parts.append((header, start, stop))
+            length += len(header) + stop - start + 2
+        trailer = "--%s--\r\n" % boundary
+        self.set_status(206)
+        self.set_header("Content-Type",
+                        "multipart/byteranges; boundary=%s" % boundary)
+        self.stream(_multipart_iter(object_file, parts, trailer,
+                                    FLAGS.s3_chunk_size),
+                    length + len(trailer))
 
     def put(self, bucket, object_name):
         object_name = urllib.unquote(object_name)
@@ -319,6 +589,9 @@ class ObjectHandler(BaseRequestHandler):
            not os.path.isdir(bucket_dir):
             self.set_status(404)
             return
+        if is_reserved(object_name):
+            self.set_status(400)
+            return
         path = self._object_path(bucket, object_name)
         if not path.startswith(bucket_dir) or os.path.isdir(path):
             self.set_status(403)
@@ -326,20 +599,43 @@ class ObjectHandler(BaseRequestHandler):
         directory = os.path.dirname(path)
         if not os.path.exists(directory):
             os.makedirs(directory)
-        object_file = open(path, "w")
-        object_file.write(self.request.body)
-        object_file.close()
-        self.set_header('ETag',
-                        '"%s"' % hashlib.md5(self.request.body).hexdigest())
+        md5 = hashlib.md5()
+        upload_path = os.path.join(directory,
+                                   UPLOAD_PREFIX + utils.gen_uuid().hex)
+        try:
+            with open(upload_path, "wb") as object_file:
+                for chunk in self.read_body():
+                    md5.update(chunk)
+                    object_file.write(chunk)
+            index = self.application.bucket_index(bucket)
+            pending_id = index.begin(object_name)
+            try:
+                os.rename(upload_path, path)
+            finally:
+                index.finish(object_name, pending_id)
+        except IncompleteBody:
+            os.unlink(upload_path)
+            self.set_status(400)
+            return
+        except Exception:
+            if os.path.exists(upload_path):
+                os.unlink(upload_path)
+            raise
+        self.set_header('ETag', '"%s"' % md5.hexdigest())
         self.finish()
 
     def delete(self, bucket, object_name):
         object_name = urllib.unquote(object_name)
         path = self._object_path(bucket, object_name)
         if not path.startswith(self.application.directory) or \
-           not os.path.isfile(path):
+           not os.path.isfile(path) or is_reserved(object_name):
             self.set_status(404)
             return
-        os.unlink(path)
+        index = self.application.bucket_index(bucket)
+        pending_id = index.begin(object_name)
+        try:
+            os.unlink(path)
+        finally:
+            index.finish(object_name, pending_id)
         self.set_status(204)
         self.finish()
@@ -18,9 +18,12 @@
 
 """Quotas for instances, volumes, and floating ips."""
 
+import datetime
+
 from nova import db
 from nova import exception
 from nova import flags
+from nova import utils
 
 
 FLAGS = flags.FLAGS
@@ -44,6 +47,9 @@ flags.DEFINE_integer('quota_max_injected_file_content_bytes', 10 * 1024,
                      'number of bytes allowed per injected file')
 flags.DEFINE_integer('quota_max_injected_file_path_bytes', 255,
                      'number of bytes allowed per injected file path')
+flags.DEFINE_integer('reservation_expire', 600,
+                     'seconds until a quota reservation that was never '
+                     'used or released is given back')
 
 
 def _get_default_quotas():
@@ -81,14 +87,24 @@ def _get_request_allotment(requested, used, quota):
     return quota - used
 
 
+def _get_project_usages(context, project_id):
+    """Return what project_id uses or holds of each resource."""
+    usages = db.quota_usage_get_all_by_project(context, project_id)
+    del usages['project_id']
+    return dict((resource, usage['in_use'] + usage['reserved'])
+                for resource, usage in usages.iteritems())
+
+
 def allowed_instances(context, requested_instances, instance_type):
     """Check quota and return min(requested_instances, allowed_instances)."""
     project_id = context.project_id
     context = context.elevated()
     requested_cores = requested_instances * instance_type['vcpus']
     requested_ram = requested_instances * instance_type['memory_mb']
-    usage = db.instance_data_get_for_project(context, project_id)
-    used_instances, used_cores, used_ram = usage
+    usages = _get_project_usages(context, project_id)
+    used_instances = usages.get('instances', 0)
+    used_cores = usages.get('cores', 0)
+    used_ram = usages.get('ram', 0)
     quota = get_project_quotas(context, project_id)
     allowed_instances = _get_request_allotment(requested_instances,
                                                used_instances,
@@ -108,8 +124,9 @@ def allowed_volumes(context, requested_volumes, size):
     context = context.elevated()
     size = int(size)
     requested_gigabytes = requested_volumes * size
-    used_volumes, used_gigabytes = db.volume_data_get_for_project(context,
-                                                                  project_id)
+    usages = _get_project_usages(context, project_id)
+    used_volumes = usages.get('volumes', 0)
+    used_gigabytes = usages.get('gigabytes', 0)
     quota = get_project_quotas(context, project_id)
     allowed_volumes = _get_request_allotment(requested_volumes, used_volumes,
                                              quota['volumes'])
@@ -126,7 +143,8 @@ def allowed_floating_ips(context, requested_floating_ips):
     """Check quota and return min(requested, allowed) floating ips."""
     project_id = context.project_id
     context = context.elevated()
-    used_floating_ips = db.floating_ip_count_by_project(context, project_id)
+    used_floating_ips = _get_project_usages(context,
+                                            project_id).get('floating_ips', 0)
     quota = get_project_quotas(context, project_id)
     allowed_floating_ips = _get_request_allotment(requested_floating_ips,
                                                   used_floating_ips,
@@ -134,6 +152,71 @@ def allowed_floating_ips(context, requested_floating_ips):
     return min(requested_floating_ips, allowed_floating_ips)
 
 
+def _reserve(context, deltas, min_units, max_units, request_id=None):
+    """Hold quota for between min_units and max_units of deltas.
+
+    Returns the number of units held and the reservations holding them,
+    which are used up as the resources are created and otherwise have to be
+    given back with release() or left to expire.
+    """
+    project_id = context.project_id
+    if project_id is None:
+        # NOTE: only projects have quotas, so there is nothing to hold.
+        return (max_units, [])
+    context = context.elevated()
+    quotas = get_project_quotas(context, project_id)
+    expire = utils.utcnow() + datetime.timedelta(
+            seconds=FLAGS.reservation_expire)
+    return db.quota_reserve(context, project_id, deltas, quotas,
+                            min_units, max_units, expire,
+                            request_id=request_id)
+
+
+def reserve_instances(context, min_count, max_count, instance_type,
+                      reservation_id):
+    """Hold quota for as many instances as fit, up to max_count.
+
+    Instances created with reservation_id use up the hold.  Returns the
+    number of instances held and the reservations; nothing is held when
+    fewer than min_count fit.
+    """
+    deltas = {'instances': 1,
+              'cores': instance_type['vcpus'],
+              'ram': instance_type['memory_mb']}
+    return _reserve(context, deltas, min_count, max_count,
+                    request_id=reservation_id)
+
+
+def reserve_volume(context, size):
+    """Hold quota for one volume of size gigabytes.
+
+    Returns the number of volumes held, 0 or 1, and the reservations.
+    """
+    deltas = {'volumes': 1, 'gigabytes': int(size)}
+    return _reserve(context, deltas, 1, 1)
+
+
+def reserve_floating_ip(context):
+    """Hold quota for one floating ip.
+
+    Returns the number of floating ips held, 0 or 1, and the reservations.
+    """
+    return _reserve(context, {'floating_ips': 1}, 1, 1)
+
+
+def release(context, reservations):
+    """Give back whatever reservations still hold."""
+    db.reservation_release(context.elevated(), reservations)
+
+
+def release_request(context, request_id):
+    """Give back whatever the reservations of a request still hold."""
+    if context.project_id is None or not request_id:
+        return
+    db.reservation_release_by_request(context.elevated(), context.project_id,
+                                      request_id)
+
+
 def _calculate_simple_quota(context, resource, requested):
     """Check quota for resource; return min(requested, allowed)."""
     quota = get_project_quotas(context, context.project_id)
@@ -49,6 +49,10 @@ def cast(context, topic, msg):
     return get_impl().cast(context, topic, msg)
 
 
+def cast_many(context, topic, msgs):
+    return get_impl().cast_many(context, topic, msgs)
+
+
 def fanout_cast(context, topic, msg):
     return get_impl().fanout_cast(context, topic, msg)
 
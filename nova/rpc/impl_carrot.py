@@ -232,7 +232,7 @@ class AdapterConsumer(Consumer):
     """Calls methods on a proxy object based on method and args."""
 
     def __init__(self, connection=None, topic='broadcast', proxy=None):
-        LOG.debug(_('Initing the Adapter Consumer for %s') % topic)
+        LOG.debug(_('Initing the Adapter Consumer for %s'), topic)
         self.proxy = proxy
         self.pool = greenpool.GreenPool(FLAGS.rpc_thread_pool_size)
         super(AdapterConsumer, self).__init__(connection=connection,
@@ -252,7 +252,7 @@ class AdapterConsumer(Consumer):
         Example: {'method': 'echo', 'args': {'value': 42}}
 
         """
-        LOG.debug(_('received %s') % message_data)
+        LOG.debug(_('received %s'), message_data)
         # This will be popped off in _unpack_context
         msg_id = message_data.get('_msg_id', None)
         ctxt = _unpack_context(message_data)
@@ -517,7 +517,7 @@ def multicall(context, topic, msg):
     LOG.debug(_('Making asynchronous call on %s ...'), topic)
     msg_id = uuid.uuid4().hex
     msg.update({'_msg_id': msg_id})
-    LOG.debug(_('MSG_ID is %s') % (msg_id))
+    LOG.debug(_('MSG_ID is %s'), msg_id)
     _pack_context(msg, context)
 
     con_conn = ConnectionPool.get()
@@ -600,6 +600,18 @@ def cast(context, topic, msg):
         publisher.close()
 
 
+def cast_many(context, topic, msgs):
+    """Sends several messages on a topic without waiting for responses."""
+    LOG.debug(_('Making %(count)d asynchronous casts on %(topic)s...'),
+              {'count': len(msgs), 'topic': topic})
+    with ConnectionPool.item() as conn:
+        publisher = TopicPublisher(connection=conn, topic=topic)
+        for msg in msgs:
+            _pack_context(msg, context)
+            publisher.send(msg)
+        publisher.close()
+
+
 def fanout_cast(context, topic, msg):
     """Sends a message on a fanout exchange without waiting for a response."""
     LOG.debug(_('Making asynchronous fanout cast...'))
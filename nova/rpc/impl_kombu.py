@@ -424,13 +424,18 @@ class Connection(object):
                 pass
             self.consumer_thread = None
 
-    def publisher_send(self, cls, topic, msg):
-        """Send to a publisher based on the publisher class"""
+    def publisher_send(self, cls, topic, *msgs):
+        """Send messages to a publisher based on the publisher class"""
+        msgs = list(msgs)
         while True:
             publisher = None
             try:
                 publisher = cls(self.channel, topic)
-                publisher.send(msg)
+                while msgs:
+                    publisher.send(msgs[0])
+                    # NOTE: only forget a message once it is sent, so a
+                    # reconnect resends the rest of the batch.
+                    msgs.pop(0)
                 return
             except self.connection.connection_errors, e:
                 LOG.exception(_('Failed to publish message %s' % str(e)))
@@ -464,6 +469,10 @@ class Connection(object):
         """Send a 'topic' message"""
         self.publisher_send(TopicPublisher, topic, msg)
 
+    def topic_send_many(self, topic, msgs):
+        """Send several 'topic' messages through one publisher"""
+        self.publisher_send(TopicPublisher, topic, *msgs)
+
     def fanout_send(self, topic, msg):
         """Send a 'fanout' message"""
         self.publisher_send(FanoutPublisher, topic, msg)
@@ -597,7 +606,7 @@ class ProxyCallback(object):
         Example: {'method': 'echo', 'args': {'value': 42}}
 
         """
-        LOG.debug(_('received %s') % message_data)
+        LOG.debug(_('received %s'), message_data)
         ctxt = _unpack_context(message_data)
         method = message_data.get('method')
         args = message_data.get('args', {})
@@ -721,7 +730,7 @@ def multicall(context, topic, msg):
     LOG.debug(_('Making asynchronous call on %s ...'), topic)
     msg_id = uuid.uuid4().hex
     msg.update({'_msg_id': msg_id})
-    LOG.debug(_('MSG_ID is %s') % (msg_id))
+    LOG.debug(_('MSG_ID is %s'), msg_id)
     _pack_context(msg, context)
 
     conn = ConnectionContext()
@@ -749,6 +758,16 @@ def cast(context, topic, msg):
         conn.topic_send(topic, msg)
 
 
+def cast_many(context, topic, msgs):
+    """Sends several messages on a topic without waiting for responses."""
+    LOG.debug(_('Making %(count)d asynchronous casts on %(topic)s...'),
+              {'count': len(msgs), 'topic': topic})
+    for msg in msgs:
+        _pack_context(msg, context)
+    with ConnectionContext() as conn:
+        conn.topic_send_many(topic, msgs)
+
+
 def fanout_cast(context, topic, msg):
     """Sends a message on a fanout exchange without waiting for a response."""
     LOG.debug(_('Making asynchronous fanout cast...'))
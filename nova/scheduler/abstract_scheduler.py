@@ -25,7 +25,6 @@ import operator
 
 import M2Crypto
 
-from novaclient import v1_1 as novaclient
 from novaclient import exceptions as novaclient_exceptions
 
 from nova import crypto
@@ -38,6 +37,7 @@ from nova import rpc
 from nova.compute import api as compute_api
 from nova.scheduler import api
 from nova.scheduler import driver
+from nova.scheduler import zone_client
 
 FLAGS = flags.FLAGS
 LOG = logging.getLogger('nova.scheduler.abstract_scheduler')
@@ -101,12 +101,11 @@ class AbstractScheduler(driver.Scheduler):
         zone = db.zone_get(context.elevated(), child_zone)
         url = zone.api_url
         LOG.debug(_("Forwarding instance create call to child zone %(url)s"
-                ". ReservationID=%(reservation_id)s") % locals())
+                ". ReservationID=%(reservation_id)s"), locals())
+        client_pool = zone_client.get_pool()
         nova = None
         try:
-            nova = novaclient.Client(zone.username, zone.password, None, url,
-                                     token=context.auth_token)
-            nova.authenticate()
+            nova = client_pool.get_client(zone, context.auth_token)
         except novaclient_exceptions.BadRequest, e:
             raise exception.NotAuthorized(_("Bad credentials attempting "
                     "to talk to zone at %(url)s.") % locals())
@@ -118,9 +117,12 @@ class AbstractScheduler(driver.Scheduler):
         #            arguments are passed as keyword arguments
         #            (there's a reasonable default for ipgroups in the
         #            novaclient call).
-        instance = nova.servers.create(name, image_ref, flavor_id,
+        instance = client_pool.call(zone, nova.servers.create, name,
+                            image_ref, flavor_id,
                             meta=meta, files=files, zone_blob=child_blob,
                             reservation_id=reservation_id)
+        # Later requests for this instance can go straight to the child.
+        client_pool.set_location(instance._info.get('uuid'), zone.id)
         return driver.encode_instance(instance._info, local=False)
 
     def _provision_resource_from_blob(self, context, build_plan_item,
@@ -212,7 +214,7 @@ class AbstractScheduler(driver.Scheduler):
             return [instance]
 
         num_instances = request_spec.get('num_instances', 1)
-        LOG.debug(_("Attempting to build %(num_instances)d instance(s)") %
+        LOG.debug(_("Attempting to build %(num_instances)d instance(s)"),
                 locals())
 
         # Create build plan and provision ...
@@ -28,6 +28,7 @@ from nova import flags
 from nova import log as logging
 from nova import rpc
 from nova import utils
+from nova.scheduler import zone_client
 
 from eventlet import greenpool
 
@@ -105,6 +106,13 @@ def update_service_capabilities(context, service_name, host, capabilities):
     return rpc.fanout_cast(context, 'scheduler', kwargs)
 
 
+def service_heartbeat(context, service_name, host):
+    """Tell all the scheduler services that this service is alive."""
+    kwargs = dict(method='service_heartbeat',
+                  args=dict(service_name=service_name, host=host))
+    return rpc.fanout_cast(context, 'scheduler', kwargs)
+
+
 def call_zone_method(context, method_name, errors_to_ignore=None,
                      novaclient_collection_name='zones', zones=None,
                      *args, **kwargs):
@@ -113,37 +121,37 @@ def call_zone_method(context, method_name, errors_to_ignore=None,
         # This will also handle the default None
         errors_to_ignore = [errors_to_ignore]
 
+    def _error_trap(zone, collection_method, *args, **kwargs):
+        try:
+            return client_pool.call(zone, collection_method, *args, **kwargs)
+        except Exception as e:
+            if type(e) in errors_to_ignore:
+                return None
+            raise
+
+    client_pool = zone_client.get_pool()
     pool = greenpool.GreenPool()
     results = []
     if zones is None:
         zones = db.zone_get_all(context.elevated())
     for zone in zones:
+        if not client_pool.is_online(zone):
+            LOG.debug(_("Skipping offline zone %s"), zone.api_url)
+            continue
         try:
             # Do this on behalf of the user ...
-            nova = novaclient.Client(zone.username, zone.password, None,
-                    zone.api_url, region_name=zone.name,
-                    token=context.auth_token)
-            nova.authenticate()
+            nova = client_pool.get_client(zone, context.auth_token)
         except novaclient_exceptions.BadRequest, e:
             url = zone.api_url
             name = zone.name
             LOG.warn(_("Authentication failed to zone "
                        "'%(name)s' URL=%(url)s: %(e)s") % locals())
-            #TODO (dabo) - add logic for failure counts per zone,
-            # with escalation after a given number of failures.
             continue
         novaclient_collection = getattr(nova, novaclient_collection_name)
         collection_method = getattr(novaclient_collection, method_name)
 
-        def _error_trap(*args, **kwargs):
-            try:
-                return collection_method(*args, **kwargs)
-            except Exception as e:
-                if type(e) in errors_to_ignore:
-                    return None
-                raise
-
-        res = pool.spawn(_error_trap, *args, **kwargs)
+        res = pool.spawn(_error_trap, zone, collection_method,
+                         *args, **kwargs)
         results.append((zone, res))
     pool.waitall()
     return [(zone.id, res.wait()) for zone, res in results]
@@ -156,14 +164,16 @@ def child_zone_helper(context, zone_list, func):
     be whatever the response from server.pause() is. One entry
     per child zone called."""
 
+    client_pool = zone_client.get_pool()
+
     def _process(func, context, zone):
         """Worker stub for green thread pool. Give the worker
         an authenticated nova client and zone info."""
+        if not client_pool.is_online(zone):
+            LOG.debug(_("Skipping offline zone %s"), zone.api_url)
+            return exception.ZoneRequestError()
         try:
-            nova = novaclient.Client(zone.username, zone.password, None,
-                    zone.api_url, region_name=zone.name,
-                    token=context.auth_token)
-            nova.authenticate()
+            nova = client_pool.get_client(zone, context.auth_token)
         except novaclient_exceptions.BadRequest, e:
             url = zone.api_url
             LOG.warn(_("Failed request to zone; URL=%(url)s: %(e)s")
@@ -175,8 +185,7 @@ def child_zone_helper(context, zone_list, func):
             return exception.ZoneRequestError()
         else:
             try:
-                answer = func(nova, zone)
-                return answer
+                return client_pool.call(zone, func, nova, zone)
             except Exception, e:
                 return e
 
@@ -206,8 +215,8 @@ def _issue_novaclient_command(nova, zone, collection,
         except novaclient_exceptions.NotFound:
             url = zone.api_url
             LOG.debug(_("%(collection)s.%(method_name)s didn't find "
-                    "anything matching '%(kwargs)s' on '%(url)s'" %
-                    locals()))
+                    "anything matching '%(kwargs)s' on '%(url)s'"),
+                    locals())
             return None
 
     args = list(args)
@@ -217,8 +226,8 @@ def _issue_novaclient_command(nova, zone, collection,
         result = manager.get(item)
     except novaclient_exceptions.NotFound, e:
         url = zone.api_url
-        LOG.debug(_("%(collection)s '%(item)s' not found on '%(url)s'" %
-                                                locals()))
+        LOG.debug(_("%(collection)s '%(item)s' not found on '%(url)s'"),
+                  locals())
         raise e
 
     if method_name.lower() != 'get':
@@ -280,11 +289,31 @@ class reroute_compute(object):
         if not zones:
             raise exception.InstanceNotFound(instance_id=item_uuid)
 
-        # Ask the children to provide an answer ...
-        LOG.debug(_("Asking child zones ..."))
-        result = self._call_child_zones(context, zones,
-                    wrap_novaclient_function(_issue_novaclient_command,
-                           collection, self.method_name, item_uuid))
+        function = wrap_novaclient_function(_issue_novaclient_command,
+                           collection, self.method_name, item_uuid)
+        client_pool = zone_client.get_pool()
+
+        # Ask the child zone it was last found in, if we know it ...
+        zone_id = client_pool.get_location(item_uuid)
+        located = [zone for zone in zones if zone.id == zone_id]
+        if located:
+            LOG.debug(_("Asking child zone %s ..."), zone_id)
+            result = self._call_child_zones(context, located, function)
+            if all(isinstance(response, BaseException)
+                   for response in result):
+                client_pool.forget_location(item_uuid)
+                located = []
+
+        if not located:
+            # Ask the children to provide an answer ...
+            LOG.debug(_("Asking child zones ..."))
+            result = self._call_child_zones(context, zones, function)
+            for zone, response in zip(zones, result):
+                if response is not None and \
+                        not isinstance(response, BaseException):
+                    client_pool.set_location(item_uuid, zone.id)
+                    break
+
         # Scrub the results and raise another exception
         # so the API layers can bail out gracefully ...
         raise RedirectResult(self.unmarshall_result(result))
@@ -304,7 +333,7 @@ class reroute_compute(object):
                     # to reroute to a child zone
                     attempt_reroute = True
                     LOG.debug(_("Instance %(item_uuid)s not found "
-                                        "locally: '%(e)s'" % locals()))
+                                        "locally: '%(e)s'"), locals())
                 else:
                     # NOTE(sirp): since we're not re-routing in this case, and
                     # we we were passed a UUID, we need to replace that UUID
@@ -31,12 +31,11 @@ from nova.compute import api as compute_api
 from nova.compute import power_state
 from nova.compute import vm_states
 from nova.api.ec2 import ec2utils
+from nova.heartbeat import api as heartbeat
 
 
 FLAGS = flags.FLAGS
 LOG = logging.getLogger('nova.scheduler.driver')
-flags.DEFINE_integer('service_down_time', 60,
-                     'maximum time since last checkin for up service')
 flags.DECLARE('instances_path', 'nova.compute.manager')
 
 
@@ -52,7 +51,7 @@ def cast_to_volume_host(context, host, method, update_db=True, **kwargs):
     rpc.cast(context,
             db.queue_get_for(context, 'volume', host),
             {"method": method, "args": kwargs})
-    LOG.debug(_("Casted '%(method)s' to volume '%(host)s'") % locals())
+    LOG.debug(_("Casted '%(method)s' to volume '%(host)s'"), locals())
 
 
 def cast_to_compute_host(context, host, method, update_db=True, **kwargs):
@@ -67,7 +66,7 @@ def cast_to_compute_host(context, host, method, update_db=True, **kwargs):
     rpc.cast(context,
             db.queue_get_for(context, 'compute', host),
             {"method": method, "args": kwargs})
-    LOG.debug(_("Casted '%(method)s' to compute '%(host)s'") % locals())
+    LOG.debug(_("Casted '%(method)s' to compute '%(host)s'"), locals())
 
 
 def cast_to_network_host(context, host, method, update_db=False, **kwargs):
@@ -76,7 +75,7 @@ def cast_to_network_host(context, host, method, update_db=False, **kwargs):
     rpc.cast(context,
             db.queue_get_for(context, 'network', host),
             {"method": method, "args": kwargs})
-    LOG.debug(_("Casted '%(method)s' to network '%(host)s'") % locals())
+    LOG.debug(_("Casted '%(method)s' to network '%(host)s'"), locals())
 
 
 def cast_to_host(context, topic, host, method, update_db=True, **kwargs):
@@ -94,8 +93,8 @@ def cast_to_host(context, topic, host, method, update_db=True, **kwargs):
         rpc.cast(context,
             db.queue_get_for(context, topic, host),
                 {"method": method, "args": kwargs})
-        LOG.debug(_("Casted '%(method)s' to %(topic)s '%(host)s'")
-                % locals())
+        LOG.debug(_("Casted '%(method)s' to %(topic)s '%(host)s'"),
+                locals())
 
 
 def encode_instance(instance, local=True):
@@ -135,22 +134,23 @@ class Scheduler(object):
     def set_zone_manager(self, zone_manager):
         """Called by the Scheduler Service to supply a ZoneManager."""
         self.zone_manager = zone_manager
+        heartbeat.set_zone_manager(zone_manager)
 
     @staticmethod
     def service_is_up(service):
         """Check whether a service is up based on last heartbeat."""
-        last_heartbeat = service['updated_at'] or service['created_at']
-        # Timestamps in DB are UTC.
-        elapsed = utils.total_seconds(utils.utcnow() - last_heartbeat)
-        return abs(elapsed) <= FLAGS.service_down_time
+        return heartbeat.service_is_up(service)
+
+    @staticmethod
+    def services_up(services):
+        """Return the services that are up, checking them all at once."""
+        return heartbeat.filter_up(services)
 
     def hosts_up(self, context, topic):
         """Return the list of hosts that have a running service for topic."""
 
         services = db.service_get_all_by_topic(context, topic)
-        return [service.host
-                for service in services
-                if self.service_is_up(service)]
+        return [service.host for service in self.services_up(services)]
 
     def create_instance_db_entry(self, context, request_spec):
         """Create instance DB entry based on request_spec"""
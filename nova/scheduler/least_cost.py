@@ -169,5 +169,5 @@ class LeastCostScheduler(base_scheduler.BaseScheduler):
                     capabilities=caps)
             weighted.append(weight_dict)
 
-        LOG.debug(_("Weighted Costs => %s") % weight_log)
+        LOG.debug(_("Weighted Costs => %s"), weight_log)
         return weighted
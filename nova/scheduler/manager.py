@@ -21,12 +21,14 @@
 Scheduler Service
 """
 
+import datetime
 import functools
 
 from nova import db
 from nova import flags
 from nova import log as logging
 from nova import manager
+from nova import quota
 from nova import rpc
 from nova import utils
 from nova.scheduler import zone_manager
@@ -36,6 +38,28 @@ FLAGS = flags.FLAGS
 flags.DEFINE_string('scheduler_driver',
                     'nova.scheduler.multi.MultiScheduler',
                     'Default driver to use for the scheduler')
+flags.DEFINE_integer('usage_rollup_interval', 0,
+                     'Seconds between rolling up finished hours of instance'
+                     ' usage for os-simple-tenant-usage, 0 to disable')
+flags.DEFINE_integer('usage_rollup_max_hours', 24,
+                     'Most hours of instance usage to roll up in one run')
+flags.DEFINE_integer('archive_deleted_rows_interval', 0,
+                     'Seconds between archiving soft-deleted rows into the'
+                     ' shadow tables, 0 to disable')
+flags.DEFINE_integer('archive_deleted_rows_age', 30,
+                     'Days a row must have been deleted to be archived;'
+                     ' archived instances no longer count in usage reports')
+flags.DEFINE_integer('archive_deleted_rows_max', 10000,
+                     'Most soft-deleted rows to archive in one run')
+flags.DEFINE_integer('purge_shadow_rows_age', 0,
+                     'Days after deletion to purge archived rows from the'
+                     ' shadow tables, 0 to keep them')
+flags.DEFINE_integer('reservation_expire_interval', 60,
+                     'Seconds between giving back the quota held by expired'
+                     ' reservations, 0 to disable')
+flags.DEFINE_integer('quota_usage_reconcile_interval', 3600,
+                     'Seconds between recounting the quota usage of every'
+                     ' project, 0 to disable')
 
 
 class SchedulerManager(manager.Manager):
@@ -56,6 +80,69 @@ class SchedulerManager(manager.Manager):
     def periodic_tasks(self, context=None):
         """Poll child zones periodically to get status."""
         self.zone_manager.ping(context)
+        return super(SchedulerManager, self).periodic_tasks(context)
+
+    @manager.periodic_task(interval='usage_rollup_interval', jitter=True)
+    def _rollup_instance_usage(self, context):
+        """Roll up instance usage of the hours finished since the last run.
+
+        Hours are rolled up in order without gaps, at most
+        usage_rollup_max_hours per run.  Schedulers running this
+        concurrently wait for each other on each hour and repeat the work.
+        """
+        if not FLAGS.usage_rollup_interval:
+            return
+        current_hour = utils.utcnow().replace(minute=0, second=0,
+                                              microsecond=0)
+        hour = datetime.timedelta(hours=1)
+        first, last = db.instance_usage_rollup_get_bounds(context)
+        if last is None:
+            period_start = current_hour - hour
+        else:
+            period_start = last + hour
+        for i in xrange(FLAGS.usage_rollup_max_hours):
+            if period_start >= current_hour:
+                break
+            db.instance_usage_rollup_hour(context, period_start)
+            LOG.debug(_('Rolled up instance usage for %s'), period_start)
+            period_start += hour
+
+    @manager.periodic_task(interval='archive_deleted_rows_interval',
+                           jitter=True)
+    def _archive_deleted_rows(self, context):
+        """Archive old soft-deleted rows, and purge old archived rows."""
+        if not FLAGS.archive_deleted_rows_interval:
+            return
+        now = utils.utcnow()
+        before = now - datetime.timedelta(days=FLAGS.archive_deleted_rows_age)
+        db.archive_deleted_rows(context, FLAGS.archive_deleted_rows_max,
+                                before)
+        if FLAGS.purge_shadow_rows_age:
+            before = now - datetime.timedelta(days=FLAGS.purge_shadow_rows_age)
+            db.purge_shadow_rows(context, before,
+                                 FLAGS.archive_deleted_rows_max)
+
+    @manager.periodic_task(interval='reservation_expire_interval',
+                           jitter=True)
+    def _expire_reservations(self, context):
+        """Give back the quota held by reservations that were never used."""
+        if not FLAGS.reservation_expire_interval:
+            return
+        expired = db.reservation_expire(context)
+        if expired:
+            LOG.debug(_('Expired %d quota reservations'), expired)
+
+    @manager.periodic_task(interval='quota_usage_reconcile_interval',
+                           jitter=True)
+    def _reconcile_quota_usages(self, context):
+        """Recount quota usage, in case anything bypassed the DB API."""
+        if not FLAGS.quota_usage_reconcile_interval:
+            return
+        drift = db.quota_usage_reconcile(context)
+        for (project_id, resource), (counted, actual) in drift.iteritems():
+            LOG.warn(_('Quota usage of %(resource)s for project '
+                       '%(project_id)s was %(counted)s, recounted as '
+                       '%(actual)s') % locals())
 
     def get_host_list(self, context=None):
         """Get a list of hosts from the ZoneManager."""
@@ -77,10 +164,30 @@ class SchedulerManager(manager.Manager):
         self.zone_manager.update_service_capabilities(service_name,
                             host, capabilities)
 
+    def service_heartbeat(self, context=None, service_name=None, host=None):
+        """Record a heartbeat from a service node."""
+        self.zone_manager.service_heartbeat(service_name, host)
+
     def select(self, context=None, *args, **kwargs):
         """Select a list of hosts best matching the provided specs."""
         return self.driver.select(context, *args, **kwargs)
 
+    def run_instance(self, context, topic, *args, **kwargs):
+        """Schedule the instances of a request, then give back whatever
+        quota the request still holds.
+
+        The instances use up the reservations of their reservation_id as
+        they are created, so what is left once scheduling has finished or
+        failed would otherwise stay held until it expires.
+        """
+        try:
+            return self._schedule('run_instance', context, topic,
+                                  *args, **kwargs)
+        finally:
+            request_spec = kwargs.get('request_spec') or {}
+            properties = request_spec.get('instance_properties') or {}
+            quota.release_request(context, properties.get('reservation_id'))
+
     def _schedule(self, method, context, topic, *args, **kwargs):
         """Tries to call schedule_* method on the driver to retrieve host.
 
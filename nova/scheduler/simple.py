@@ -39,6 +39,11 @@ flags.DEFINE_integer("max_networks", 1000,
 class SimpleScheduler(chance.ChanceScheduler):
     """Implements Naive Scheduler that tries to find least loaded host."""
 
+    def _up_service_ids(self, results):
+        """Ids of the services in (service, load) results that are up."""
+        services = [service for service, load in results]
+        return set(service['id'] for service in self.services_up(services))
+
     def _schedule_instance(self, context, instance_opts, *_args, **_kwargs):
         """Picks a host that is up and has the fewest running instances."""
 
@@ -54,11 +59,12 @@ class SimpleScheduler(chance.ChanceScheduler):
             return host
 
         results = db.service_get_all_compute_sorted(context)
+        up = self._up_service_ids(results)
         for result in results:
             (service, instance_cores) = result
             if instance_cores + instance_opts['vcpus'] > FLAGS.max_cores:
                 raise driver.NoValidHost(_("All hosts have too many cores"))
-            if self.service_is_up(service):
+            if service['id'] in up:
                 return service['host']
         raise driver.NoValidHost(_("Scheduler was unable to locate a host"
                                    " for this request. Is the appropriate"
@@ -99,12 +105,13 @@ class SimpleScheduler(chance.ChanceScheduler):
                     volume_id=volume_id, **_kwargs)
             return None
         results = db.service_get_all_volume_sorted(context)
+        up = self._up_service_ids(results)
         for result in results:
             (service, volume_gigabytes) = result
             if volume_gigabytes + volume_ref['size'] > FLAGS.max_gigabytes:
                 raise driver.NoValidHost(_("All hosts have too many "
                                            "gigabytes"))
-            if self.service_is_up(service):
+            if service['id'] in up:
                 driver.cast_to_volume_host(context, service['host'],
                         'create_volume', volume_id=volume_id, **_kwargs)
                 return None
@@ -116,11 +123,12 @@ class SimpleScheduler(chance.ChanceScheduler):
         """Picks a host that is up and has the fewest networks."""
 
         results = db.service_get_all_network_sorted(context)
+        up = self._up_service_ids(results)
         for result in results:
             (service, instance_count) = result
             if instance_count >= FLAGS.max_networks:
                 raise driver.NoValidHost(_("All hosts have too many networks"))
-            if self.service_is_up(service):
+            if service['id'] in up:
                 driver.cast_to_network_host(context, service['host'],
                         'set_network_host', **_kwargs)
                 return None
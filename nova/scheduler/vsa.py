@@ -228,7 +228,7 @@ class VsaScheduler(simple.SimpleScheduler):
         request_spec = {}
         selected_hosts = []
 
-        LOG.debug(_("volume_params %(volume_params)s") % locals())
+        LOG.debug(_("volume_params %(volume_params)s"), locals())
 
         i = 1
         for vol in volume_params:
@@ -271,7 +271,7 @@ class VsaScheduler(simple.SimpleScheduler):
                                 availability_zone=None, *_args, **_kwargs):
         """Picks hosts for hosting multiple volumes."""
         num_volumes = request_spec.get('num_volumes')
-        LOG.debug(_("Attempting to spawn %(num_volumes)d volume(s)") %
+        LOG.debug(_("Attempting to spawn %(num_volumes)d volume(s)"),
                 locals())
 
         vsa_id = request_spec.get('vsa_id')
@@ -40,9 +40,8 @@ class ZoneScheduler(driver.Scheduler):
 
         services = db.service_get_all_by_topic(context, topic)
         return [service.host
-                for service in services
-                if self.service_is_up(service)
-                and service.availability_zone == zone]
+                for service in self.services_up(services)
+                if service.availability_zone == zone]
 
     def _schedule(self, context, topic, request_spec, **kwargs):
         """Picks a host that is up at random in selected
@@ -0,0 +1,206 @@
+# Copyright (c) 2011 Openstack, LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Pooled novaclient sessions for talking to child zones.
+
+Authenticating costs a round trip to the child zone's auth service, so
+the auth token and management url it hands out are kept per zone and
+credentials until zone_client_ttl runs out.  A novaclient holds an open
+connection and can't be shared between greenthreads, so every caller gets
+a fresh one set up with the kept session.  The pool also keeps latency
+and error counts per zone, which take a zone offline after
+zone_failures_to_offline consecutive failures, and remembers which child
+zone each instance uuid lives in.
+"""
+
+import datetime
+import time
+
+from novaclient import v1_1 as novaclient
+from novaclient import exceptions as novaclient_exceptions
+
+from nova import flags
+from nova import log as logging
+from nova import utils
+
+
+FLAGS = flags.FLAGS
+flags.DEFINE_integer('zone_failures_to_offline', 3,
+             'Number of consecutive errors before marking zone offline')
+flags.DEFINE_integer('zone_offline_retry_interval', 60,
+             'Seconds before a zone marked offline is tried again')
+flags.DEFINE_integer('zone_client_ttl', 3600,
+             'Seconds to reuse an authenticated session with a child zone')
+flags.DEFINE_integer('zone_location_cache_ttl', 600,
+             'Seconds to remember which child zone an instance is in,'
+             ' 0 to disable')
+
+LOG = logging.getLogger('nova.scheduler.zone_client')
+
+
+class ZoneMetrics(object):
+    """Latency and errors of the requests made to one child zone."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.failures = 0
+        self.total_latency = 0.0
+        self.last_latency = None
+        self.last_error = None
+        self.last_error_time = None
+
+    def record(self, latency, error=None):
+        """Count a request that took latency seconds and failed with error,
+        if any."""
+        self.requests += 1
+        self.total_latency += latency
+        self.last_latency = latency
+        if error is None:
+            self.failures = 0
+        else:
+            self.errors += 1
+            self.failures += 1
+            self.last_error = error
+            self.last_error_time = utils.utcnow()
+
+    @property
+    def average_latency(self):
+        if not self.requests:
+            return None
+        return self.total_latency / self.requests
+
+    def is_online(self):
+        """A zone is offline after zone_failures_to_offline consecutive
+        failures, until zone_offline_retry_interval lets one through."""
+        if self.failures < FLAGS.zone_failures_to_offline:
+            return True
+        retry_time = self.last_error_time + datetime.timedelta(
+                seconds=FLAGS.zone_offline_retry_interval)
+        return utils.utcnow() >= retry_time
+
+    def to_dict(self):
+        return dict(requests=self.requests, errors=self.errors,
+                    failures=self.failures,
+                    average_latency=self.average_latency,
+                    last_latency=self.last_latency,
+                    is_online=self.is_online())
+
+
+class ZoneClientPool(object):
+    """Authenticated novaclients, metrics and instance locations of the
+    child zones."""
+
+    def __init__(self):
+        # { (api_url, username, token) : (auth_token, management_url,
+        #                                 expires) }
+        self.sessions = {}
+        self.metrics = {}  # { api_url : ZoneMetrics }
+        if FLAGS.memcached_servers:
+            import memcache
+        else:
+            from nova import fakememcache as memcache
+        self.mc = memcache.Client(FLAGS.memcached_servers, debug=0)
+
+    def get_metrics(self, zone):
+        if zone.api_url not in self.metrics:
+            self.metrics[zone.api_url] = ZoneMetrics()
+        return self.metrics[zone.api_url]
+
+    def is_online(self, zone):
+        return self.get_metrics(zone).is_online()
+
+    def call(self, zone, func, *args, **kwargs):
+        """Call func, recording its latency and any failure against zone.
+
+        NotFound is the child zone answering that it doesn't have
+        something, so it doesn't count as a failure.
+        """
+        metrics = self.get_metrics(zone)
+        start = time.time()
+        try:
+            result = func(*args, **kwargs)
+        except novaclient_exceptions.NotFound:
+            metrics.record(time.time() - start)
+            raise
+        except Exception, e:
+            metrics.record(time.time() - start, e)
+            raise
+        metrics.record(time.time() - start)
+        return result
+
+    def get_client(self, zone, token=None):
+        """Return a new novaclient for zone, authenticated with the session
+        last made with the same credentials until zone_client_ttl runs out.
+        """
+        key = (zone.api_url, zone.username, token)
+        now = utils.utcnow()
+        for cached_key, session in self.sessions.items():
+            if now >= session[2]:
+                del self.sessions[cached_key]
+
+        client = novaclient.Client(zone.username, zone.password, None,
+                                   zone.api_url, region_name=zone.name,
+                                   token=token)
+        if key in self.sessions:
+            auth_token, management_url, expires = self.sessions[key]
+            client.client.auth_token = auth_token
+            client.client.management_url = management_url
+            return client
+        self.call(zone, client.authenticate)
+        expires = now + datetime.timedelta(seconds=FLAGS.zone_client_ttl)
+        self.sessions[key] = (client.client.auth_token,
+                              client.client.management_url, expires)
+        return client
+
+    def forget_client(self, zone, token=None):
+        self.sessions.pop((zone.api_url, zone.username, token), None)
+
+    @staticmethod
+    def _location_key(item_uuid):
+        return str('zone-location-%s' % item_uuid)
+
+    def get_location(self, item_uuid):
+        """Return the id of the child zone item_uuid was last found in."""
+        if not FLAGS.zone_location_cache_ttl:
+            return None
+        return self.mc.get(self._location_key(item_uuid))
+
+    def set_location(self, item_uuid, zone_id):
+        if not FLAGS.zone_location_cache_ttl or not item_uuid:
+            return
+        self.mc.set(self._location_key(item_uuid), zone_id,
+                    time=FLAGS.zone_location_cache_ttl)
+
+    def forget_location(self, item_uuid):
+        if FLAGS.zone_location_cache_ttl:
+            self.mc.delete(self._location_key(item_uuid))
+
+
+_POOL = None
+
+
+def get_pool():
+    global _POOL
+    if _POOL is None:
+        _POOL = ZoneClientPool()
+    return _POOL
+
+
+def reset():
+    """Drop the pooled clients, metrics and locations."""
+    global _POOL
+    _POOL = None
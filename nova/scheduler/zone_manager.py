@@ -21,20 +21,17 @@ import datetime
 import thread
 import traceback
 
-from novaclient import v1_1 as novaclient
-
 from eventlet import greenpool
 
 from nova import db
 from nova import flags
 from nova import log as logging
 from nova import utils
+from nova.scheduler import zone_client
 
 FLAGS = flags.FLAGS
 flags.DEFINE_integer('zone_db_check_interval', 60,
                     'Seconds between getting fresh zone info from db.')
-flags.DEFINE_integer('zone_failures_to_offline', 3,
-             'Number of consecutive errors before marking zone offline')
 
 
 class ZoneState(object):
@@ -95,16 +92,16 @@ def _call_novaclient(zone):
     """Call novaclient. Broken out for testing purposes. Note that
     we have to use the admin credentials for this since there is no
     available context."""
-    client = novaclient.Client(zone.username, zone.password, None,
-                               zone.api_url, region_name=zone.name)
-    return client.zones.info()._info
+    pool = zone_client.get_pool()
+    client = pool.get_client(zone)
+    return pool.call(zone, client.zones.info)._info
 
 
 def _poll_zone(zone):
     """Eventlet worker to poll a zone."""
     name = zone.name
     url = zone.api_url
-    logging.debug(_("Polling zone: %(name)s @ %(url)s") % locals())
+    logging.debug(_("Polling zone: %(name)s @ %(url)s"), locals())
     try:
         zone.update_metadata(_call_novaclient(zone))
     except Exception, e:
@@ -117,6 +114,7 @@ class ZoneManager(object):
         self.last_zone_db_check = datetime.datetime.min
         self.zone_states = {}  # { <zone_id> : ZoneState }
         self.service_states = {}  # { <host> : { <service> : { cap k : v }}}
+        self.service_heartbeats = {}  # { (<host>, <service>) : datetime }
         self.green_pool = greenpool.GreenPool()
 
     def get_zone_list(self):
@@ -205,12 +203,17 @@ class ZoneManager(object):
     def update_service_capabilities(self, service_name, host, capabilities):
         """Update the per-service capabilities based on this notification."""
         logging.debug(_("Received %(service_name)s service update from "
-                "%(host)s.") % locals())
+                "%(host)s."), locals())
         service_caps = self.service_states.get(host, {})
         capabilities["timestamp"] = utils.utcnow()  # Reported time
         service_caps[service_name] = capabilities
         self.service_states[host] = service_caps
 
+    def service_heartbeat(self, service_name, host):
+        """Stamp the last heartbeat of a service, leaving its capabilities
+        as they are."""
+        self.service_heartbeats[(host, service_name)] = utils.utcnow()
+
     def host_service_caps_stale(self, host, service):
         """Check if host service capabilites are not recent enough."""
         allowed_time_diff = FLAGS.periodic_interval * 3
@@ -21,6 +21,7 @@
 
 import inspect
 import os
+import random
 
 import eventlet
 import greenlet
@@ -34,6 +35,8 @@ from nova import rpc
 from nova import utils
 from nova import version
 from nova import wsgi
+from nova.heartbeat import api as heartbeat
+from nova.notifier import api as notifier_api
 
 
 LOG = logging.getLogger('nova.service')
@@ -45,6 +48,10 @@ flags.DEFINE_integer('report_interval', 10,
 flags.DEFINE_integer('periodic_interval', 60,
                      'seconds between running periodic tasks',
                      lower_bound=1)
+flags.DEFINE_integer('periodic_fuzzy_delay', 60,
+                     'range of seconds to randomly delay the first run of '
+                     'periodic tasks by, so services restarted together '
+                     'do not run them in lockstep (0 to disable)')
 flags.DEFINE_string('ec2_manager', 'nova.api.manager.EC2Manager',
                     'EC2 API service manager')
 flags.DEFINE_string('ec2_listen', "0.0.0.0",
@@ -99,6 +106,7 @@ class Launcher(object):
         """
         for service in self._services:
             service.kill()
+        notifier_api.flush()
 
     def wait(self):
         """Waits until all services have been stopped, and then returns.
@@ -118,10 +126,11 @@ class Service(object):
 
     A service takes a manager and enables rpc by listening to queues based
     on topic. It also periodically runs tasks on the manager and reports
-    it state to the database services table."""
+    its heartbeat to the heartbeat driver."""
 
     def __init__(self, host, binary, topic, manager, report_interval=None,
-                 periodic_interval=None, *args, **kwargs):
+                 periodic_interval=None, periodic_fuzzy_delay=None,
+                 *args, **kwargs):
         self.host = host
         self.binary = binary
         self.topic = topic
@@ -130,6 +139,7 @@ class Service(object):
         self.manager = manager_class(host=self.host, *args, **kwargs)
         self.report_interval = report_interval
         self.periodic_interval = periodic_interval
+        self.periodic_fuzzy_delay = periodic_fuzzy_delay
         super(Service, self).__init__(*args, **kwargs)
         self.saved_args, self.saved_kwargs = args, kwargs
         self.timers = []
@@ -153,7 +163,7 @@ class Service(object):
             self.manager.update_available_resource(ctxt)
 
         self.conn = rpc.create_connection(new=True)
-        logging.debug("Creating Consumer connection for Service %s" %
+        logging.debug("Creating Consumer connection for Service %s",
                       self.topic)
 
         # Share this same connection for these Consumers
@@ -173,8 +183,14 @@ class Service(object):
             self.timers.append(pulse)
 
         if self.periodic_interval:
+            if self.periodic_fuzzy_delay:
+                initial_delay = random.randint(0, self.periodic_fuzzy_delay)
+            else:
+                initial_delay = None
+
             periodic = utils.LoopingCall(self.periodic_tasks)
-            periodic.start(interval=self.periodic_interval, now=False)
+            periodic.start(interval=self.periodic_interval, now=False,
+                           initial_delay=initial_delay)
             self.timers.append(periodic)
 
     def _create_service_ref(self, context):
@@ -193,7 +209,8 @@ class Service(object):
 
     @classmethod
     def create(cls, host=None, binary=None, topic=None, manager=None,
-               report_interval=None, periodic_interval=None):
+               report_interval=None, periodic_interval=None,
+               periodic_fuzzy_delay=None):
         """Instantiates class and passes back application object.
 
         :param host: defaults to FLAGS.host
@@ -202,6 +219,7 @@ class Service(object):
         :param manager: defaults to FLAGS.<topic>_manager
         :param report_interval: defaults to FLAGS.report_interval
         :param periodic_interval: defaults to FLAGS.periodic_interval
+        :param periodic_fuzzy_delay: defaults to FLAGS.periodic_fuzzy_delay
 
         """
         if not host:
@@ -216,8 +234,11 @@ class Service(object):
             report_interval = FLAGS.report_interval
         if not periodic_interval:
             periodic_interval = FLAGS.periodic_interval
+        if periodic_fuzzy_delay is None:
+            periodic_fuzzy_delay = FLAGS.periodic_fuzzy_delay
         service_obj = cls(host, binary, topic, manager,
-                          report_interval, periodic_interval)
+                          report_interval, periodic_interval,
+                          periodic_fuzzy_delay)
 
         return service_obj
 
@@ -255,20 +276,16 @@ class Service(object):
         self.manager.periodic_tasks(context.get_admin_context())
 
     def report_state(self):
-        """Update the state of this service in the datastore."""
+        """Report that this service is alive to the heartbeat driver."""
         ctxt = context.get_admin_context()
         try:
             try:
-                service_ref = db.service_get(ctxt, self.service_id)
+                heartbeat.heartbeat(ctxt, self)
             except exception.NotFound:
                 logging.debug(_('The service database object disappeared, '
                                 'Recreating it.'))
                 self._create_service_ref(ctxt)
-                service_ref = db.service_get(ctxt, self.service_id)
-
-            db.service_update(ctxt,
-                             self.service_id,
-                             {'report_count': service_ref['report_count'] + 1})
+                heartbeat.heartbeat(ctxt, self)
 
             # TODO(termie): make this pattern be more elegant.
             if getattr(self, 'model_disconnected', False):
@@ -380,7 +397,7 @@ def wait():
     logging.debug(_('Full set of FLAGS:'))
     for flag in FLAGS:
         flag_get = FLAGS.get(flag, None)
-        logging.debug('%(flag)s : %(flag_get)s' % locals())
+        logging.debug('%(flag)s : %(flag_get)s', locals())
     try:
         _launcher.wait()
     except KeyboardInterrupt:
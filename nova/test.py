@@ -42,6 +42,7 @@ from nova import log
 from nova import rpc
 from nova import utils
 from nova import service
+from nova.scheduler import zone_client
 from nova.virt import fake
 
 
@@ -152,6 +153,9 @@ class TestCase(unittest.TestCase):
             if FLAGS.image_service == 'nova.image.fake.FakeImageService':
                 nova.image.fake.FakeImageService_reset()
 
+            # Drop pooled child zone clients, which may be fakes
+            zone_client.reset()
+
             # Reset any overriden flags
             self.reset_flags()
 
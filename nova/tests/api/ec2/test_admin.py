@@ -77,15 +77,13 @@ class AdminTestCase(test.TestCase):
     def test_project_dict_no_project(self):
         self.assertEqual({}, admin.project_dict(None))
 
-    def test_host_dict_using_updated_at(self):
+    def test_host_dict_services_up(self):
         # instances and volumes only used for count
         instances = range(2)
         volumes = range(3)
 
-        now = datetime.datetime.now()
-        updated_at = now - datetime.timedelta(seconds=10)
-        compute_service = {'updated_at': updated_at}
-        volume_service = {'updated_at': updated_at}
+        compute_service = {'id': 1}
+        volume_service = {'id': 2}
 
         expected_host_dict = {'hostname': 'server',
                               'instance_count': 2,
@@ -95,19 +93,16 @@ class AdminTestCase(test.TestCase):
 
         self.assertEqual(expected_host_dict,
                          admin.host_dict('server', compute_service, instances,
-                                         volume_service, volumes, now))
+                                         volume_service, volumes,
+                                         set([1, 2])))
 
-    def test_host_dict_service_down_using_created_at(self):
+    def test_host_dict_services_down(self):
         # instances and volumes only used for count
         instances = range(2)
         volumes = range(3)
 
-        # service_down_time is 60 by defualt so we set to 70 to simulate
-        # services been down
-        now = datetime.datetime.now()
-        created_at = now - datetime.timedelta(seconds=70)
-        compute_service = {'created_at': created_at, 'updated_at': None}
-        volume_service = {'created_at': created_at, 'updated_at': None}
+        compute_service = {'id': 1}
+        volume_service = {'id': 2}
 
         expected_host_dict = {'hostname': 'server',
                               'instance_count': 2,
@@ -117,7 +112,7 @@ class AdminTestCase(test.TestCase):
 
         self.assertEqual(expected_host_dict,
                          admin.host_dict('server', compute_service, instances,
-                                         volume_service, volumes, now))
+                                         volume_service, volumes, set()))
 
     def test_instance_dict(self):
         inst = {'name': 'this_inst',
@@ -355,6 +350,7 @@ class AdminControllerTestCase(test.TestCase):
             'availability_zone': "zone1"})
         hosts = self._ac.describe_hosts(self._c)['hosts']
         self.assertEqual('host1', hosts[0]['hostname'])
+        self.assertEqual('up', hosts[0]['compute'])
 
     def test_describe_hosts_volume(self):
         db.service_create(self._c, {'host': 'volume1',
@@ -17,12 +17,14 @@
 
 import datetime
 import json
+import mox
 import webob
 
 from nova import context
+from nova import db
 from nova import flags
 from nova import test
-from nova.compute import api
+from nova.api.openstack.contrib import simple_tenant_usage
 from nova.tests.api.openstack import fakes
 
 
@@ -38,42 +40,9 @@ STOP = datetime.datetime.utcnow()
 START = STOP - datetime.timedelta(hours=HOURS)
 
 
-def fake_instance_type_get(self, context, instance_type_id):
-    return {'id': 1,
-            'vcpus': VCPUS,
-            'local_gb': LOCAL_GB,
-            'memory_mb': MEMORY_MB,
-            'name':
-            'fakeflavor'}
-
-
-def get_fake_db_instance(start, end, instance_id, tenant_id):
-    return  {'id': instance_id,
-             'image_ref': '1',
-             'project_id': tenant_id,
-             'user_id': 'fakeuser',
-             'display_name': 'name',
-             'state_description': 'state',
-             'instance_type_id': 1,
-             'launched_at': start,
-             'terminated_at': end}
-
-
-def fake_instance_get_active_by_window(self, context, begin, end, project_id):
-            return [get_fake_db_instance(START,
-                                         STOP,
-                                         x,
-                                         "faketenant_%s" % (x / SERVERS))
-                                         for x in xrange(TENANTS * SERVERS)]
-
-
 class SimpleTenantUsageTest(test.TestCase):
     def setUp(self):
         super(SimpleTenantUsageTest, self).setUp()
-        self.stubs.Set(api.API, "get_instance_type",
-                       fake_instance_type_get)
-        self.stubs.Set(api.API, "get_active_by_window",
-                       fake_instance_get_active_by_window)
         self.admin_context = context.RequestContext('fakeadmin_0',
                                                     'faketenant_0',
                                                     is_admin=True)
@@ -84,6 +53,30 @@ class SimpleTenantUsageTest(test.TestCase):
                                                       'faketenant_1',
                                                        is_admin=False)
         FLAGS.allow_admin_api = True
+        self.instance_type = db.instance_type_create(self.admin_context,
+                                                     {'name': 'fakeflavor',
+                                                      'memory_mb': MEMORY_MB,
+                                                      'vcpus': VCPUS,
+                                                      'local_gb': LOCAL_GB,
+                                                      'flavorid': 'fake'})
+        for x in xrange(TENANTS * SERVERS):
+            self._create_instance("faketenant_%s" % (x / SERVERS),
+                                  START, STOP)
+        # neither launched nor running in the period
+        self._create_instance('faketenant_0', None, None)
+        self._create_instance('faketenant_0',
+                              START - datetime.timedelta(hours=2),
+                              START - datetime.timedelta(hours=1))
+
+    def _create_instance(self, tenant_id, launched_at, terminated_at):
+        return db.instance_create(self.admin_context,
+                                  {'project_id': tenant_id,
+                                   'user_id': 'fakeuser',
+                                   'display_name': 'name',
+                                   'instance_type_id':
+                                       self.instance_type['id'],
+                                   'launched_at': launched_at,
+                                   'terminated_at': terminated_at})
 
     def test_verify_index(self):
         req = webob.Request.blank(
@@ -98,8 +91,7 @@ class SimpleTenantUsageTest(test.TestCase):
         self.assertEqual(res.status_int, 200)
         res_dict = json.loads(res.body)
         usages = res_dict['tenant_usages']
-        from nova import log as logging
-        logging.warn(usages)
+        usages.sort(key=lambda usage: usage['tenant_id'])
         for i in xrange(TENANTS):
             self.assertEqual(int(usages[i]['total_hours']),
                              SERVERS * HOURS)
@@ -124,6 +116,7 @@ class SimpleTenantUsageTest(test.TestCase):
         self.assertEqual(res.status_int, 200)
         res_dict = json.loads(res.body)
         usages = res_dict['tenant_usages']
+        usages.sort(key=lambda usage: usage['tenant_id'])
         for i in xrange(TENANTS):
             servers = usages[i]['server_usages']
             for j in xrange(SERVERS):
@@ -141,6 +134,8 @@ class SimpleTenantUsageTest(test.TestCase):
         self.assertEqual(res.status_int, 403)
 
     def test_verify_show(self):
+        # without limit or marker every server is listed
+        self.flags(osapi_max_limit=SERVERS - 1)
         req = webob.Request.blank(
                   '/v1.1/faketenant_0/os-simple-tenant-usage/'
                   'faketenant_0?start=%s&end=%s' %
@@ -170,3 +165,57 @@ class SimpleTenantUsageTest(test.TestCase):
         res = req.get_response(fakes.wsgi_app(
                                fake_auth_context=self.alt_user_context))
         self.assertEqual(res.status_int, 403)
+
+    def test_verify_show_pages_servers(self):
+        url = ('/v1.1/faketenant_0/os-simple-tenant-usage/'
+               'faketenant_0?start=%s&end=%s&limit=3' %
+               (START.isoformat(), STOP.isoformat()))
+        req = webob.Request.blank(url)
+        res = req.get_response(fakes.wsgi_app(
+                               fake_auth_context=self.user_context))
+        self.assertEqual(res.status_int, 200)
+        usage = json.loads(res.body)['tenant_usage']
+        servers = usage['server_usages']
+        self.assertEqual(len(servers), 3)
+        self.assertEqual(int(usage['total_hours']), SERVERS * HOURS)
+
+        req = webob.Request.blank(url + '&marker=%s' %
+                                  servers[-1]['instance_id'])
+        res = req.get_response(fakes.wsgi_app(
+                               fake_auth_context=self.user_context))
+        self.assertEqual(res.status_int, 200)
+        servers = json.loads(res.body)['tenant_usage']['server_usages']
+        self.assertEqual(len(servers), SERVERS - 3)
+
+    def test_verify_show_bad_marker(self):
+        req = webob.Request.blank(
+                  '/v1.1/faketenant_0/os-simple-tenant-usage/'
+                  'faketenant_0?start=%s&end=%s&marker=abc' %
+                  (START.isoformat(), STOP.isoformat()))
+        res = req.get_response(fakes.wsgi_app(
+                               fake_auth_context=self.user_context))
+        self.assertEqual(res.status_int, 400)
+
+    def test_usage_uses_rollups(self):
+        hour = datetime.timedelta(hours=1)
+        first = START.replace(minute=0, second=0, microsecond=0) + hour
+        for i in xrange(HOURS - 1):
+            db.instance_usage_rollup_hour(self.admin_context, first + i * hour)
+        self.mox.StubOutWithMock(db, 'instance_usage_get_by_window')
+        db.instance_usage_get_by_window(mox.IgnoreArg(), START, first,
+                                        'faketenant_0').AndReturn([])
+        db.instance_usage_get_by_window(mox.IgnoreArg(),
+                                        first + (HOURS - 1) * hour, STOP,
+                                        'faketenant_0').AndReturn([])
+        self.mox.ReplayAll()
+
+        controller = simple_tenant_usage.SimpleTenantUsageController()
+        usages = controller._tenant_usages_for_period(self.admin_context,
+                                                      START, STOP,
+                                                      'faketenant_0',
+                                                      detailed=False)
+        self.assertEqual(len(usages), 1)
+        self.assertAlmostEqual(usages[0]['total_hours'],
+                               SERVERS * (HOURS - 1), 3)
+        self.assertAlmostEqual(usages[0]['total_vcpus_usage'],
+                               SERVERS * (HOURS - 1) * VCPUS, 3)
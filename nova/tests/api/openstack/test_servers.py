@@ -2920,6 +2920,45 @@ class ServersViewBuilderTest(test.TestCase):
         output = self.view_builder.build(self.instance, True)
         self.assertDictMatch(output, expected_server)
 
+    def test_build_list_builds_shared_views_once(self):
+        calls = []
+
+        def counted(func):
+            def wrapped(*args):
+                calls.append(func.__name__)
+                return func(*args)
+            wrapped.__name__ = func.__name__
+            return wrapped
+
+        hashlib = nova.api.openstack.views.servers.hashlib
+        image_builder = self.view_builder.image_builder
+        flavor_builder = self.view_builder.flavor_builder
+        self.stubs.Set(image_builder, 'generate_bookmark',
+                       counted(image_builder.generate_bookmark))
+        self.stubs.Set(flavor_builder, 'generate_bookmark',
+                       counted(flavor_builder.generate_bookmark))
+        self.stubs.Set(hashlib, 'sha224', counted(hashlib.sha224))
+
+        instances = []
+        for i in xrange(3):
+            instance = self._get_instance()
+            instance['uuid'] = str(utils.gen_uuid())
+            instance['host'] = 'host1'
+            instances.append(instance)
+        instances[2]['image_ref'] = 'http://localhost/images/6'
+
+        output = self.view_builder.build_list(instances, is_detail=True)
+        self.assertEqual(sorted(calls), ['generate_bookmark'] * 3 +
+                                        ['sha224'])
+
+        # The shared views match those built from scratch
+        for instance, server in zip(instances, output['servers']):
+            expected = self._get_view_builder().build(instance, True)
+            self.assertDictMatch(server, expected['server'])
+        self.assertEqual(output['servers'][2]['image']['id'], '6')
+        self.assertNotEqual(id(output['servers'][0]['image']),
+                            id(output['servers'][1]['image']))
+
 
 class ServerXMLSerializationTest(test.TestCase):
 
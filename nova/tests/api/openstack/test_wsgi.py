@@ -278,6 +278,42 @@ class ResponseSerializerTest(test.TestCase):
         self.assertEqual(response.body, '')
         self.assertEqual(response.status_int, 404)
 
+    def test_serialize_response_streamed(self):
+        class StreamingSerializer(object):
+            def serialize_iter(self, data, action='default'):
+                return iter(['pew', '_', 'stream'])
+
+        serializers = self.serializer.body_serializers
+        serializers['application/xml'] = StreamingSerializer()
+        request = wsgi.Request.blank('/')
+        response = self.serializer.serialize(request, {}, 'application/xml')
+        self.assertEqual(response.content_length, None)
+        self.assertEqual(response.body, 'pew_stream')
+
+    def test_serialize_response_single_chunk_keeps_length(self):
+        class StreamingSerializer(object):
+            def serialize_iter(self, data, action='default'):
+                return iter(['pew_xml'])
+
+        serializers = self.serializer.body_serializers
+        serializers['application/xml'] = StreamingSerializer()
+        request = wsgi.Request.blank('/')
+        response = self.serializer.serialize(request, {}, 'application/xml')
+        self.assertEqual(response.content_length, 7)
+        self.assertEqual(response.body, 'pew_xml')
+
+    def test_serialize_response_render_error_raises(self):
+        class StreamingSerializer(object):
+            def serialize_iter(self, data, action='default'):
+                raise ValueError('bad data')
+                yield 'pew'
+
+        serializers = self.serializer.body_serializers
+        serializers['application/xml'] = StreamingSerializer()
+        request = wsgi.Request.blank('/')
+        self.assertRaises(ValueError, self.serializer.serialize,
+                          request, {}, 'application/xml')
+
     def test_serialize_response_dict_to_unknown_content_type(self):
         request = wsgi.Request.blank('/')
         self.assertRaises(exception.InvalidContentType,
@@ -631,6 +631,83 @@ class TemplateTest(test.TestCase):
                          str(obj['test']['image']['id']))
         self.assertEqual(result[idx].text, obj['test']['image']['name'])
 
+    def _list_template(self):
+        root = xmlutil.TemplateElement('test', selector='test', name='name')
+        value = xmlutil.SubTemplateElement(root, 'value', selector='values')
+        value.set('id')
+        value.text = xmlutil.Selector('name')
+        xmlutil.make_links(root, 'links')
+        return xmlutil.MasterTemplate(root, 1,
+                                      nsmap={None: 'foo',
+                                             'atom': xmlutil.XMLNS_ATOM})
+
+    def _list_obj(self, count):
+        return dict(test=dict(name='foobar',
+                              values=[dict(id=i, name='value%d' % i)
+                                      for i in range(count)],
+                              links=[dict(rel='self', href='http://x')]))
+
+    def test_make_tree_matches__serialize(self):
+        master = self._list_template()
+        obj = self._list_obj(3)
+
+        expected = master._serialize(None, obj, master._siblings(),
+                                     master._nsmap())
+        self.assertEqual(etree.tostring(master.make_tree(obj)),
+                         etree.tostring(expected))
+
+    def test_compiled_plan_shared_by_copies(self):
+        master = self._list_template()
+        master.serialize(self._list_obj(1))
+
+        copy = master.copy()
+        self.assertEqual(copy._compile(), master._compile())
+
+        # Attaching a slave to the copy compiles a new plan
+        slave_root = xmlutil.TemplateElement('test', selector='test')
+        slave_root.set('extra')
+        copy.attach(xmlutil.SlaveTemplate(slave_root, 1))
+        self.assertNotEqual(copy._compile(), master._compile())
+
+        obj = self._list_obj(1)
+        obj['test']['extra'] = 'yes'
+        self.assertEqual(copy.make_tree(obj).get('extra'), 'yes')
+        self.assertEqual(master.make_tree(obj).get('extra'), None)
+
+    def test_compiled_plan_uses_apply_hook(self):
+        class UpperTemplateElement(xmlutil.TemplateElement):
+            def apply(self, elem, obj):
+                elem.text = obj.upper()
+
+        root = xmlutil.TemplateElement('test')
+        xmlutil.SubTemplateElement(root, 'name', selector='name')
+        slave_root = xmlutil.TemplateElement('test')
+        slave_root.append(UpperTemplateElement('name', selector='name'))
+
+        master = xmlutil.MasterTemplate(root, 1)
+        master.attach(xmlutil.SlaveTemplate(slave_root, 1))
+        self.assertEqual(master.make_tree(dict(name='foo'))[0].text, 'FOO')
+
+    def test_serialize_iter(self):
+        self.stubs.Set(xmlutil, 'STREAM_BATCH_SIZE', 2)
+        master = self._list_template()
+
+        for count in (0, 1, 2, 5):
+            obj = self._list_obj(count)
+            expected = master.serialize(obj, encoding='UTF-8',
+                                        xml_declaration=True)
+            chunks = list(master.serialize_iter(obj, encoding='UTF-8',
+                                                xml_declaration=True))
+            self.assertEqual(''.join(chunks), expected)
+
+        # Five values and a link, two per batch, plus head and tail
+        self.assertEqual(len(chunks), 5)
+
+    def test_serialize_iter_nothing_to_render(self):
+        master = self._list_template()
+        self.assertEqual(list(master.serialize_iter({})), [])
+        self.assertEqual(master.serialize({}), '')
+
 
 class MasterTemplateBuilder(xmlutil.TemplateBuilder):
     def construct(self):
@@ -761,3 +838,15 @@ class XMLTemplateSerializerTest(test.TestCase):
         result = self.tmpl_serializer.serialize(self.data_multi, 'test')
         result = result.replace('\n', '').replace(' ', '')
         self.assertEqual(result, expected_xml)
+
+    def test_serialize_iter(self):
+        tmpl = self.tmpl_serializer.get_template('test')
+        expected_xml = self.tmpl_serializer.serialize(self.data_multi,
+                                                      template=tmpl)
+        result = self.tmpl_serializer.serialize_iter(self.data_multi, 'test')
+        self.assertEqual(''.join(result), expected_xml)
+
+    def test_serialize_iter_default(self):
+        expected_xml = self.tmpl_serializer.serialize(self.data_multi)
+        result = self.tmpl_serializer.serialize_iter(self.data_multi)
+        self.assertEqual(''.join(result), expected_xml)
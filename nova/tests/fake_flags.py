@@ -24,6 +24,8 @@ flags.DECLARE('volume_driver', 'nova.volume.manager')
 FLAGS['volume_driver'].SetDefault('nova.volume.driver.FakeISCSIDriver')
 FLAGS['connection_type'].SetDefault('fake')
 FLAGS['fake_rabbit'].SetDefault(True)
+flags.DECLARE('periodic_fuzzy_delay', 'nova.service')
+FLAGS['periodic_fuzzy_delay'].SetDefault(0)
 flags.DECLARE('auth_driver', 'nova.auth.manager')
 FLAGS['auth_driver'].SetDefault('nova.auth.dbdriver.DbDriver')
 flags.DECLARE('network_size', 'nova.network.manager')
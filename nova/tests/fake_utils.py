@@ -78,7 +78,7 @@ def fake_execute(*cmd_parts, **kwargs):
     for fake_replier in _fake_execute_repliers:
         if re.match(fake_replier[0], cmd_str):
             reply_handler = fake_replier[1]
-            LOG.debug(_('Faked command matched %s') % fake_replier[0])
+            LOG.debug(_('Faked command matched %s'), fake_replier[0])
             break
 
     if isinstance(reply_handler, basestring):
@@ -94,13 +94,13 @@ def fake_execute(*cmd_parts, **kwargs):
                                   run_as_root=run_as_root,
                                   check_exit_code=check_exit_code)
         except exception.ProcessExecutionError as e:
-            LOG.debug(_('Faked command raised an exception %s' % str(e)))
+            LOG.debug(_('Faked command raised an exception %s'), e)
             raise
 
     stdout = reply[0]
     stderr = reply[1]
     LOG.debug(_("Reply to faked command is stdout='%(stdout)s' "
-                "stderr='%(stderr)s'") % locals())
+                "stderr='%(stderr)s'"), locals())
 
     # Replicate the sleep call in the real function
     greenthread.sleep(0)
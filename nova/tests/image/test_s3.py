@@ -15,6 +15,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import StringIO
+import tarfile
+
+from Crypto.Cipher import AES
+
 from nova import context
 import nova.db.api
 from nova import exception
@@ -55,6 +60,61 @@ ami_manifest_xml = """<?xml version="1.0" ?>
 """
 
 
+bundle_manifest_xml = """<?xml version="1.0" ?>
+<manifest>
+        <image>
+                <ec2_encrypted_key>00</ec2_encrypted_key>
+                <ec2_encrypted_iv>00</ec2_encrypted_iv>
+                <parts count="%(count)d">%(parts)s</parts>
+        </image>
+</manifest>
+"""
+
+IMAGE_KEY = '0123456789abcdef'
+IMAGE_IV = 'fedcba9876543210'
+
+
+def _bundle(contents, part_size):
+    """Return the tarred, gzipped, encrypted parts of an image bundle."""
+    tarball = StringIO.StringIO()
+    tar_file = tarfile.open(fileobj=tarball, mode='w:gz')
+    info = tarfile.TarInfo('image.img')
+    info.size = len(contents)
+    tar_file.addfile(info, StringIO.StringIO(contents))
+    tar_file.close()
+    data = tarball.getvalue()
+    padding = AES.block_size - len(data) % AES.block_size
+    data += chr(padding) * padding
+    data = AES.new(IMAGE_KEY, AES.MODE_CBC, IMAGE_IV).encrypt(data)
+    return [data[i:i + part_size] for i in xrange(0, len(data), part_size)]
+
+
+class FakeKey(object):
+    def __init__(self, contents):
+        self.contents = contents
+
+    def get_contents_as_string(self):
+        if isinstance(self.contents, Exception):
+            raise self.contents
+        return self.contents
+
+
+class FakeBucket(object):
+    def __init__(self, keys):
+        self.keys = keys
+
+    def get_key(self, name):
+        return FakeKey(self.keys[name])
+
+
+class FakeConnection(object):
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def get_bucket(self, name):
+        return self.bucket
+
+
 class TestS3ImageService(test.TestCase):
     def setUp(self):
         super(TestS3ImageService, self).setUp()
@@ -125,3 +185,79 @@ class TestS3ImageService(test.TestCase):
             {'device_name': '/dev/sdb0',
              'no_device': True}]
         self.assertEqual(block_device_mapping, expected_bdm)
+
+    def _register(self, parts):
+        filenames = ['image.part.%d' % i for i in xrange(len(parts))]
+        keys = dict(zip(filenames, parts))
+        keys['image.manifest.xml'] = bundle_manifest_xml % {
+            'count': len(parts),
+            'parts': ''.join('<part index="%d"><filename>%s</filename></part>'
+                             % (i, fn) for i, fn in enumerate(filenames))}
+        bucket = FakeBucket(keys)
+        self.stubs.Set(s3.S3ImageService, '_conn',
+                       staticmethod(lambda context: FakeConnection(bucket)))
+        self.stubs.Set(s3.S3ImageService, '_decrypt_key_and_iv',
+                       staticmethod(lambda *args: (IMAGE_KEY, IMAGE_IV)))
+        self.stubs.Set(s3.eventlet, 'spawn_n', lambda func: func())
+
+        uploaded = []
+        service = self.image_service.service
+        real_update = service.update
+
+        def fake_update(context, image_id, metadata, data=None):
+            if data is not None:
+                uploaded.append(data.read())
+            return real_update(context, image_id, metadata)
+
+        self.stubs.Set(service, 'update', fake_update)
+        metadata = {'properties': {
+            'image_location': 'bucket/image.manifest.xml'}}
+        image = self.image_service._s3_create(self.context, metadata)
+        image_uuid = self.image_service.get_image_uuid(self.context,
+                                                       image['id'])
+        return service.show(self.context, image_uuid), uploaded
+
+    def test_s3_create_streams_bundle(self):
+        self.flags(s3_image_download_concurrency=3)
+        contents = ''.join(chr(i % 251) for i in xrange(100000))
+        parts = _bundle(contents, 1000)
+        image, uploaded = self._register(parts)
+        self.assertEqual(uploaded, [contents])
+        self.assertEqual(image['status'], 'active')
+        properties = image['properties']
+        self.assertEqual(properties['image_state'], 'available')
+        self.assertTrue(properties['image_progress'].startswith(
+            'downloaded %d/%d parts' % (len(parts), len(parts))))
+
+    def test_s3_create_download_failure(self):
+        parts = _bundle('x' * 10000, 100)
+        parts[1] = IOError('boom')
+        image, uploaded = self._register(parts)
+        self.assertEqual(image['properties']['image_state'],
+                         'failed_download')
+
+    def test_s3_create_truncated_bundle(self):
+        parts = _bundle('x' * 10000, 100)
+        parts[-1] = parts[-1][:-1]
+        image, uploaded = self._register(parts)
+        self.assertEqual(image['properties']['image_state'],
+                         'failed_decrypt')
+
+    def test_s3_create_corrupt_tarball(self):
+        data = 'not a tarball' + chr(3) * 3
+        parts = [AES.new(IMAGE_KEY, AES.MODE_CBC, IMAGE_IV).encrypt(data)]
+        image, uploaded = self._register(parts)
+        self.assertEqual(image['properties']['image_state'], 'failed_untar')
+
+    def test_fetch_parts_keeps_order(self):
+        self.flags(s3_image_download_concurrency=2)
+        delays = {'a': 0.02, 'b': 0, 'c': 0.01, 'd': 0}
+
+        def fake_download(bucket, filename):
+            s3.eventlet.sleep(delays[filename])
+            return filename
+
+        self.stubs.Set(s3.S3ImageService, '_download_part',
+                       staticmethod(fake_download))
+        parts = self.image_service._fetch_parts(None, ['a', 'b', 'c', 'd'])
+        self.assertEqual(list(parts), ['a', 'b', 'c', 'd'])
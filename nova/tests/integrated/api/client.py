@@ -122,7 +122,7 @@ class TestOpenStackClient(object):
                                 headers=headers)
 
         http_status = response.status
-        LOG.debug(_("%(auth_uri)s => code %(http_status)s") % locals())
+        LOG.debug(_("%(auth_uri)s => code %(http_status)s"), locals())
 
         if http_status == 401:
             raise OpenStackApiAuthenticationException(response=response)
@@ -148,7 +148,7 @@ class TestOpenStackClient(object):
         response = self.request(full_uri, **kwargs)
 
         http_status = response.status
-        LOG.debug(_("%(relative_uri)s => code %(http_status)s") % locals())
+        LOG.debug(_("%(relative_uri)s => code %(http_status)s"), locals())
 
         if check_response_status:
             if not http_status in check_response_status:
@@ -165,7 +165,7 @@ class TestOpenStackClient(object):
 
     def _decode_json(self, response):
         body = response.read()
-        LOG.debug(_("Decoding JSON: %s") % (body))
+        LOG.debug(_("Decoding JSON: %s"), body)
         if body:
             return json.loads(body)
         else:
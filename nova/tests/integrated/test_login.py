@@ -28,4 +28,4 @@ class LoginTest(integrated_helpers._IntegratedTestBase):
         """Simple check - we list flavors - so we know we're logged in."""
         flavors = self.api.get_flavors()
         for flavor in flavors:
-            LOG.debug(_("flavor: %s") % flavor)
+            LOG.debug(_("flavor: %s"), flavor)
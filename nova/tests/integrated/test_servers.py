@@ -51,7 +51,7 @@ class ServersTest(integrated_helpers._IntegratedTestBase):
         """Simple check that listing servers works."""
         servers = self.api.get_servers()
         for server in servers:
-            LOG.debug("server: %s" % server)
+            LOG.debug("server: %s", server)
 
     def test_create_server_with_error(self):
         """Create a server which will enter error state."""
@@ -115,7 +115,7 @@ class ServersTest(integrated_helpers._IntegratedTestBase):
         server['name'] = good_server['name']
 
         created_server = self.api.post_server(post)
-        LOG.debug("created_server: %s" % created_server)
+        LOG.debug("created_server: %s", created_server)
         self.assertTrue(created_server['id'])
         created_server_id = created_server['id']
 
@@ -151,7 +151,7 @@ class ServersTest(integrated_helpers._IntegratedTestBase):
         server = self._build_minimal_create_server_request()
 
         created_server = self.api.post_server({'server': server})
-        LOG.debug("created_server: %s" % created_server)
+        LOG.debug("created_server: %s", created_server)
         self.assertTrue(created_server['id'])
         created_server_id = created_server['id']
 
@@ -193,7 +193,7 @@ class ServersTest(integrated_helpers._IntegratedTestBase):
         server = self._build_minimal_create_server_request()
 
         created_server = self.api.post_server({'server': server})
-        LOG.debug("created_server: %s" % created_server)
+        LOG.debug("created_server: %s", created_server)
         self.assertTrue(created_server['id'])
         created_server_id = created_server['id']
 
@@ -225,7 +225,7 @@ class ServersTest(integrated_helpers._IntegratedTestBase):
         server = self._build_minimal_create_server_request()
 
         created_server = self.api.post_server({'server': server})
-        LOG.debug("created_server: %s" % created_server)
+        LOG.debug("created_server: %s", created_server)
         self.assertTrue(created_server['id'])
         created_server_id = created_server['id']
 
@@ -258,7 +258,7 @@ class ServersTest(integrated_helpers._IntegratedTestBase):
                 LOG.debug("Got 404, proceeding")
                 break
 
-            LOG.debug("Found_server=%s" % found_server)
+            LOG.debug("Found_server=%s", found_server)
 
             # TODO(justinsb): Mock doesn't yet do accurate state changes
             #if found_server['status'] != 'deleting':
@@ -288,7 +288,7 @@ class ServersTest(integrated_helpers._IntegratedTestBase):
 
         post = {'server': server}
         created_server = self.api.post_server(post)
-        LOG.debug("created_server: %s" % created_server)
+        LOG.debug("created_server: %s", created_server)
         self.assertTrue(created_server['id'])
         created_server_id = created_server['id']
 
@@ -327,7 +327,7 @@ class ServersTest(integrated_helpers._IntegratedTestBase):
         server = self._build_minimal_create_server_request()
         server_post = {'server': server}
         created_server = self.api.post_server(server_post)
-        LOG.debug("created_server: %s" % created_server)
+        LOG.debug("created_server: %s", created_server)
         self.assertTrue(created_server['id'])
         created_server_id = created_server['id']
 
@@ -341,7 +341,7 @@ class ServersTest(integrated_helpers._IntegratedTestBase):
         }
 
         self.api.post_server_action(created_server_id, post)
-        LOG.debug("rebuilt server: %s" % created_server)
+        LOG.debug("rebuilt server: %s", created_server)
         self.assertTrue(created_server['id'])
 
         found_server = self.api.get_server(created_server_id)
@@ -362,7 +362,7 @@ class ServersTest(integrated_helpers._IntegratedTestBase):
         server = self._build_minimal_create_server_request()
         server_post = {'server': server}
         created_server = self.api.post_server(server_post)
-        LOG.debug("created_server: %s" % created_server)
+        LOG.debug("created_server: %s", created_server)
         self.assertTrue(created_server['id'])
         created_server_id = created_server['id']
 
@@ -382,7 +382,7 @@ class ServersTest(integrated_helpers._IntegratedTestBase):
         post['rebuild']['metadata'] = metadata
 
         self.api.post_server_action(created_server_id, post)
-        LOG.debug("rebuilt server: %s" % created_server)
+        LOG.debug("rebuilt server: %s", created_server)
         self.assertTrue(created_server['id'])
 
         found_server = self.api.get_server(created_server_id)
@@ -408,7 +408,7 @@ class ServersTest(integrated_helpers._IntegratedTestBase):
         server_post['server']['metadata'] = metadata
 
         created_server = self.api.post_server(server_post)
-        LOG.debug("created_server: %s" % created_server)
+        LOG.debug("created_server: %s", created_server)
         self.assertTrue(created_server['id'])
         created_server_id = created_server['id']
 
@@ -425,7 +425,7 @@ class ServersTest(integrated_helpers._IntegratedTestBase):
         post['rebuild']['metadata'] = metadata
 
         self.api.post_server_action(created_server_id, post)
-        LOG.debug("rebuilt server: %s" % created_server)
+        LOG.debug("rebuilt server: %s", created_server)
         self.assertTrue(created_server['id'])
 
         found_server = self.api.get_server(created_server_id)
@@ -443,7 +443,7 @@ class ServersTest(integrated_helpers._IntegratedTestBase):
         # Create a server
         server = self._build_minimal_create_server_request()
         created_server = self.api.post_server({'server': server})
-        LOG.debug("created_server: %s" % created_server)
+        LOG.debug("created_server: %s", created_server)
         server_id = created_server['id']
         self.assertTrue(server_id)
 
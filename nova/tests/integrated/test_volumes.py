@@ -42,13 +42,13 @@ class VolumesTest(integrated_helpers._IntegratedTestBase):
         """Simple check that listing volumes works."""
         volumes = self.api.get_volumes(False)
         for volume in volumes:
-            LOG.debug("volume: %s" % volume)
+            LOG.debug("volume: %s", volume)
 
     def test_get_volumes(self):
         """Simple check that listing volumes works."""
         volumes = self.api.get_volumes()
         for volume in volumes:
-            LOG.debug("volume: %s" % volume)
+            LOG.debug("volume: %s", volume)
 
     def _poll_while(self, volume_id, continue_states, max_retries=5):
         """Poll (briefly) while the state is in continue_states."""
@@ -61,7 +61,7 @@ class VolumesTest(integrated_helpers._IntegratedTestBase):
                 LOG.debug("Got 404, proceeding")
                 break
 
-            LOG.debug("Found %s" % found_volume)
+            LOG.debug("Found %s", found_volume)
 
             self.assertEqual(volume_id, found_volume['id'])
 
@@ -79,7 +79,7 @@ class VolumesTest(integrated_helpers._IntegratedTestBase):
 
         # Create volume
         created_volume = self.api.post_volume({'volume': {'size': 1}})
-        LOG.debug("created_volume: %s" % created_volume)
+        LOG.debug("created_volume: %s", created_volume)
         self.assertTrue(created_volume['id'])
         created_volume_id = created_volume['id']
 
@@ -107,12 +107,12 @@ class VolumesTest(integrated_helpers._IntegratedTestBase):
         # Should be gone
         self.assertFalse(found_volume)
 
-        LOG.debug("Logs: %s" % driver.LoggingVolumeDriver.all_logs())
+        LOG.debug("Logs: %s", driver.LoggingVolumeDriver.all_logs())
 
         create_actions = driver.LoggingVolumeDriver.logs_like(
                             'create_volume',
                             id=created_volume_id)
-        LOG.debug("Create_Actions: %s" % create_actions)
+        LOG.debug("Create_Actions: %s", create_actions)
 
         self.assertEquals(1, len(create_actions))
         create_action = create_actions[0]
@@ -144,12 +144,12 @@ class VolumesTest(integrated_helpers._IntegratedTestBase):
         # NOTE(justinsb): Create an extra server so that server_id != volume_id
         self.api.post_server(server_req)
         created_server = self.api.post_server(server_req)
-        LOG.debug("created_server: %s" % created_server)
+        LOG.debug("created_server: %s", created_server)
         server_id = created_server['id']
 
         # Create volume
         created_volume = self.api.post_volume({'volume': {'size': 1}})
-        LOG.debug("created_volume: %s" % created_volume)
+        LOG.debug("created_volume: %s", created_volume)
         volume_id = created_volume['id']
         self._poll_while(volume_id, ['creating'])
 
@@ -182,7 +182,7 @@ class VolumesTest(integrated_helpers._IntegratedTestBase):
         # Do a real attach
         attach_req['volumeId'] = volume_id
         attach_result = self.api.post_server_volume(server_id, post_req)
-        LOG.debug(_("Attachment = %s") % attach_result)
+        LOG.debug(_("Attachment = %s"), attach_result)
 
         attachment_id = attach_result['id']
         self.assertEquals(volume_id, attach_result['volumeId'])
@@ -248,7 +248,7 @@ class VolumesTest(integrated_helpers._IntegratedTestBase):
             try:
                 attachment = self.api.get_server_volume(server_id,
                                                         attachment_id)
-                LOG.debug("Attachment still there: %s" % attachment)
+                LOG.debug("Attachment still there: %s", attachment)
             except client.OpenStackApiNotFoundException:
                 LOG.debug("Got 404, delete done")
                 break
@@ -261,7 +261,7 @@ class VolumesTest(integrated_helpers._IntegratedTestBase):
         attachments = self.api.get_server_volumes(server_id)
         self.assertEquals([], attachments)
 
-        LOG.debug("Logs: %s" % driver.LoggingVolumeDriver.all_logs())
+        LOG.debug("Logs: %s", driver.LoggingVolumeDriver.all_logs())
 
         # prepare_attach and prepare_detach are called from compute
         #  on attach/detach
@@ -269,7 +269,7 @@ class VolumesTest(integrated_helpers._IntegratedTestBase):
         disco_moves = driver.LoggingVolumeDriver.logs_like(
                             'initialize_connection',
                             id=volume_id)
-        LOG.debug("initialize_connection actions: %s" % disco_moves)
+        LOG.debug("initialize_connection actions: %s", disco_moves)
 
         self.assertEquals(1, len(disco_moves))
         disco_move = disco_moves[0]
@@ -278,7 +278,7 @@ class VolumesTest(integrated_helpers._IntegratedTestBase):
         last_days_of_disco_moves = driver.LoggingVolumeDriver.logs_like(
                             'terminate_connection',
                             id=volume_id)
-        LOG.debug("terminate_connection actions: %s" %
+        LOG.debug("terminate_connection actions: %s",
                   last_days_of_disco_moves)
 
         self.assertEquals(1, len(last_days_of_disco_moves))
@@ -295,7 +295,7 @@ class VolumesTest(integrated_helpers._IntegratedTestBase):
         created_volume = self.api.post_volume(
             {'volume': {'size': 1,
                         'metadata': metadata}})
-        LOG.debug("created_volume: %s" % created_volume)
+        LOG.debug("created_volume: %s", created_volume)
         self.assertTrue(created_volume['id'])
         created_volume_id = created_volume['id']
 
@@ -35,7 +35,7 @@ class XmlTests(integrated_helpers._IntegratedTestBase):
 
         response = self.api.api_request('/limits', headers=headers)
         data = response.read()
-        LOG.debug("data: %s" % data)
+        LOG.debug("data: %s", data)
         root = etree.XML(data)
         self.assertEqual(root.nsmap.get(None), common.XML_NS_V11)
 
@@ -46,6 +46,6 @@ class XmlTests(integrated_helpers._IntegratedTestBase):
 
         response = self.api.api_request('/servers', headers=headers)
         data = response.read()
-        LOG.debug("data: %s" % data)
+        LOG.debug("data: %s", data)
         root = etree.XML(data)
         self.assertEqual(root.nsmap.get(None), common.XML_NS_V11)
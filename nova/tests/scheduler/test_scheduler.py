@@ -249,6 +249,62 @@ class SchedulerTestCase(test.TestCase):
         db.instance_destroy(ctxt, i_ref1['id'])
         db.instance_destroy(ctxt, i_ref2['id'])
 
+    def test_rollup_instance_usage_catches_up_in_order(self):
+        self.flags(usage_rollup_interval=60, usage_rollup_max_hours=2)
+        scheduler = manager.SchedulerManager()
+        ctxt = context.get_admin_context()
+        now = datetime.datetime(2011, 1, 1, 12, 30, 0)
+        self.mox.StubOutWithMock(utils, 'utcnow')
+        self.mox.StubOutWithMock(db, 'instance_usage_rollup_get_bounds')
+        self.mox.StubOutWithMock(db, 'instance_usage_rollup_hour')
+        utils.utcnow().AndReturn(now)
+        db.instance_usage_rollup_get_bounds(ctxt).AndReturn(
+                (datetime.datetime(2011, 1, 1, 0, 0, 0),
+                 datetime.datetime(2011, 1, 1, 8, 0, 0)))
+        db.instance_usage_rollup_hour(ctxt,
+                                      datetime.datetime(2011, 1, 1, 9, 0, 0))
+        db.instance_usage_rollup_hour(ctxt,
+                                      datetime.datetime(2011, 1, 1, 10, 0, 0))
+        self.mox.ReplayAll()
+        scheduler._rollup_instance_usage(ctxt)
+
+    def test_archive_deleted_rows_and_purge(self):
+        self.flags(archive_deleted_rows_interval=60,
+                   archive_deleted_rows_age=7,
+                   archive_deleted_rows_max=100,
+                   purge_shadow_rows_age=30)
+        scheduler = manager.SchedulerManager()
+        ctxt = context.get_admin_context()
+        now = datetime.datetime(2011, 3, 1, 12, 0, 0)
+        self.mox.StubOutWithMock(utils, 'utcnow')
+        self.mox.StubOutWithMock(db, 'archive_deleted_rows')
+        self.mox.StubOutWithMock(db, 'purge_shadow_rows')
+        utils.utcnow().AndReturn(now)
+        db.archive_deleted_rows(ctxt, 100,
+                                datetime.datetime(2011, 2, 22, 12, 0, 0))
+        db.purge_shadow_rows(ctxt, datetime.datetime(2011, 1, 30, 12, 0, 0),
+                             100)
+        self.mox.ReplayAll()
+        scheduler._archive_deleted_rows(ctxt)
+
+    def test_quota_usage_tasks(self):
+        self.flags(reservation_expire_interval=60,
+                   quota_usage_reconcile_interval=3600)
+        scheduler = manager.SchedulerManager()
+        ctxt = context.get_admin_context()
+        self.mox.StubOutWithMock(db, 'reservation_expire')
+        self.mox.StubOutWithMock(db, 'quota_usage_reconcile')
+        db.reservation_expire(ctxt).AndReturn(2)
+        db.quota_usage_reconcile(ctxt).AndReturn({('p-01', 'cores'): (4, 2)})
+        self.mox.ReplayAll()
+        scheduler._expire_reservations(ctxt)
+        scheduler._reconcile_quota_usages(ctxt)
+
+        self.flags(reservation_expire_interval=0,
+                   quota_usage_reconcile_interval=0)
+        scheduler._expire_reservations(ctxt)
+        scheduler._reconcile_quota_usages(ctxt)
+
 
 class ZoneSchedulerTestCase(test.TestCase):
     """Test case for zone scheduler"""
@@ -1117,6 +1173,14 @@ class MultiDriverTestCase(SimpleDriverTestCase):
         self.scheduler = manager.SchedulerManager()
 
 
+class FakeHTTPClient(object):
+    """The session a novaclient keeps once it has authenticated."""
+
+    def __init__(self):
+        self.auth_token = None
+        self.management_url = None
+
+
 class FakeZone(object):
     def __init__(self, id, api_url, username, password, name='child'):
         self.id = id
@@ -1256,6 +1320,7 @@ class ZoneRedirectTest(test.TestCase):
             def __init__(self, username, password, method, api_url,
                          token=None, region_name=None):
                 self.api_url = api_url
+                self.client = FakeHTTPClient()
 
             def authenticate(self):
                 if self.api_url == ZONE_API_URL2:
@@ -1288,6 +1353,7 @@ class ZoneRedirectTest(test.TestCase):
             def __init__(self, username, password, method, api_url,
                          token=None, region_name=None):
                 self.api_url = api_url
+                self.client = FakeHTTPClient()
 
             def authenticate(self):
                 if self.api_url == ZONE_API_URL2:
@@ -1321,7 +1387,7 @@ class ZoneRedirectTest(test.TestCase):
         class FakeNovaClientNoFailure(object):
             def __init__(self, username, password, method, api_url,
                          token=None, region_name=None):
-                pass
+                self.client = FakeHTTPClient()
 
             def authenticate(self):
                 return
@@ -1405,6 +1471,7 @@ class FakeZonesProxy(object):
 class FakeNovaClientZones(object):
     def __init__(self, *args, **kwargs):
         self.zones = FakeZonesProxy()
+        self.client = FakeHTTPClient()
 
     def authenticate(self):
         pass
@@ -0,0 +1,200 @@
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the pooled child zone clients.
+"""
+
+from novaclient import exceptions as novaclient_exceptions
+
+from nova import context
+from nova import db
+from nova import exception
+from nova import test
+from nova import utils
+from nova.scheduler import api
+from nova.scheduler import zone_client
+
+
+FAKE_UUID = 'aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa'
+
+
+class FakeZone(object):
+    def __init__(self, id, api_url, username='bob', password='xxx',
+                 name='child'):
+        self.id = id
+        self.api_url = api_url
+        self.username = username
+        self.password = password
+        self.name = name
+
+
+ZONES = [FakeZone(1, 'http://1.example.com'),
+         FakeZone(2, 'http://2.example.com')]
+
+
+class FakeHTTPClient(object):
+    def __init__(self):
+        self.auth_token = None
+        self.management_url = None
+
+
+class FakeNovaClient(object):
+    authenticated = []
+
+    def __init__(self, username, password, project_id, api_url,
+                 token=None, region_name=None):
+        self.api_url = api_url
+        self.client = FakeHTTPClient()
+
+    def authenticate(self):
+        if self.api_url == 'http://down.example.com':
+            raise novaclient_exceptions.BadRequest('down')
+        self.authenticated.append(self.api_url)
+        self.client.auth_token = 'auth-%d' % len(self.authenticated)
+        self.client.management_url = self.api_url + '/v1.1'
+
+
+class ZoneClientPoolTestCase(test.TestCase):
+    def setUp(self):
+        super(ZoneClientPoolTestCase, self).setUp()
+        self.flags(zone_client_ttl=60, zone_failures_to_offline=2,
+                   zone_offline_retry_interval=30)
+        self.stubs.Set(zone_client.novaclient, 'Client', FakeNovaClient)
+        FakeNovaClient.authenticated = []
+        utils.set_time_override()
+        self.pool = zone_client.get_pool()
+
+    def tearDown(self):
+        utils.clear_time_override()
+        super(ZoneClientPoolTestCase, self).tearDown()
+
+    def test_session_reused_until_ttl(self):
+        client = self.pool.get_client(ZONES[0], 'token')
+        self.assertEqual(client.client.auth_token, 'auth-1')
+        again = self.pool.get_client(ZONES[0], 'token')
+        self.assertFalse(again is client)
+        self.assertEqual((again.client.auth_token,
+                          again.client.management_url),
+                         ('auth-1', 'http://1.example.com/v1.1'))
+        self.pool.get_client(ZONES[0], 'other')
+        self.pool.get_client(ZONES[1], 'token')
+        self.assertEqual(len(FakeNovaClient.authenticated), 3)
+
+        utils.advance_time_seconds(61)
+        client = self.pool.get_client(ZONES[0], 'token')
+        self.assertEqual(client.client.auth_token, 'auth-4')
+        self.assertEqual(self.pool.sessions.keys(),
+                         [('http://1.example.com', 'bob', 'token')])
+
+    def test_failures_take_zone_offline(self):
+        zone = FakeZone(3, 'http://down.example.com')
+        for i in xrange(2):
+            self.assertTrue(self.pool.is_online(zone))
+            self.assertRaises(novaclient_exceptions.BadRequest,
+                              self.pool.get_client, zone)
+        self.assertFalse(self.pool.is_online(zone))
+        metrics = self.pool.get_metrics(zone)
+        self.assertEqual((metrics.requests, metrics.errors), (2, 2))
+
+        utils.advance_time_seconds(31)
+        self.assertTrue(self.pool.is_online(zone))
+
+    def test_not_found_is_not_a_failure(self):
+        def not_found():
+            raise novaclient_exceptions.NotFound(404)
+
+        for i in xrange(3):
+            self.assertRaises(novaclient_exceptions.NotFound,
+                              self.pool.call, ZONES[0], not_found)
+        self.assertTrue(self.pool.is_online(ZONES[0]))
+        self.assertEqual(self.pool.get_metrics(ZONES[0]).errors, 0)
+
+    def test_location_cache(self):
+        self.flags(zone_location_cache_ttl=10)
+        self.assertEqual(self.pool.get_location(FAKE_UUID), None)
+        self.pool.set_location(FAKE_UUID, 2)
+        self.assertEqual(self.pool.get_location(FAKE_UUID), 2)
+        utils.advance_time_seconds(11)
+        self.assertEqual(self.pool.get_location(FAKE_UUID), None)
+
+        self.flags(zone_location_cache_ttl=0)
+        self.pool.set_location(FAKE_UUID, 2)
+        self.assertEqual(self.pool.get_location(FAKE_UUID), None)
+
+
+class FakeServer(object):
+    def __init__(self, zone_id):
+        self.id = FAKE_UUID
+        self.zone = zone_id
+
+
+class LocatedRerouteTestCase(test.TestCase):
+    def setUp(self):
+        super(LocatedRerouteTestCase, self).setUp()
+        self.flags(enable_zone_routing=True)
+        self.stubs.Set(db, 'zone_get_all', lambda context: ZONES)
+        self.asked = []
+        self.found_in = 2
+
+        def fake_call_child_zones(decorator, context, zones, function):
+            self.asked.append([zone.id for zone in zones])
+            return [FakeServer(zone.id) if zone.id == self.found_in
+                    else novaclient_exceptions.NotFound(404)
+                    for zone in zones]
+
+        self.stubs.Set(api.reroute_compute, '_call_child_zones',
+                       fake_call_child_zones)
+
+        @api.reroute_compute('get')
+        def do_get(self, context, uuid):
+            pass
+
+        self.do_get = do_get
+        self.context = context.RequestContext('user', 'project')
+
+    def _get(self):
+        try:
+            self.do_get(None, self.context, FAKE_UUID)
+        except api.RedirectResult, e:
+            return e.results['server']['zone']
+        self.fail('Expected redirect result')
+
+    def test_asks_located_zone_only(self):
+        self.assertEqual(self._get(), 2)
+        self.assertEqual(self._get(), 2)
+        self.assertEqual(self.asked, [[1, 2], [2]])
+
+    def test_stale_location_falls_back_to_all_zones(self):
+        self.assertEqual(self._get(), 2)
+        self.found_in = 1
+        self.assertEqual(self._get(), 1)
+        self.assertEqual(self._get(), 1)
+        self.assertEqual(self.asked, [[1, 2], [2], [1, 2], [1]])
+
+    def test_child_zone_helper_skips_offline_zones(self):
+        self.stubs.Set(zone_client.novaclient, 'Client', FakeNovaClient)
+        self.flags(zone_failures_to_offline=1)
+        pool = zone_client.get_pool()
+        pool.get_metrics(ZONES[1]).record(1.0, Exception('boom'))
+        called = []
+
+        def func(nova, zone):
+            called.append(zone.id)
+            return zone.id
+
+        results = api.child_zone_helper(self.context, ZONES, func)
+        self.assertEqual(called, [1])
+        self.assertEqual(results[0], 1)
+        self.assertTrue(isinstance(results[1], exception.ZoneRequestError))
@@ -40,10 +40,12 @@ from nova.compute import manager as compute_manager
 from nova.compute import power_state
 from nova.compute import task_states
 from nova.compute import vm_states
+from nova.db.sqlalchemy import api as sqlalchemy_api
 from nova.db.sqlalchemy import models
 from nova.image import fake as fake_image
 from nova.notifier import test_notifier
 from nova.tests import fake_network
+from nova.virt import driver as virt_driver
 
 
 LOG = logging.getLogger('nova.tests.compute')
@@ -92,7 +94,7 @@ def rpc_cast_wrapper(context, topic, msg):
     rpc_call_wrapper(context, topic, msg, do_cast=True)
 
 
-def nop_report_driver_status(self):
+def nop_report_driver_status(self, context):
     pass
 
 
@@ -1486,6 +1488,57 @@ class ComputeTestCase(test.TestCase):
         self.assertEqual(i_ref['name'], i_ref['uuid'])
         db.instance_destroy(self.context, i_ref['id'])
 
+    def test_sync_power_states(self):
+        """Instances missing from the hypervisor are set to NOSTATE"""
+        instance_id = self._create_instance({'host': self.compute.host,
+                                 'power_state': power_state.RUNNING})
+        ctxt = context.get_admin_context()
+        self.compute._sync_power_states(ctxt)
+        i_ref = db.instance_get(ctxt, instance_id)
+        self.assertEqual(i_ref['power_state'], power_state.NOSTATE)
+
+    def test_periodic_tasks_share_host_inventory(self):
+        calls = []
+        orig_get_states = db.instance_get_all_states_by_host
+
+        def fake_get_states(context, host):
+            calls.append(host)
+            return orig_get_states(context, host)
+
+        self.stubs.Set(db, 'instance_get_all_states_by_host',
+                       fake_get_states)
+        self._create_instance({'host': self.compute.host})
+        self.compute.periodic_tasks(context.get_admin_context())
+        self.assertEqual(calls, [self.compute.host])
+
+    def test_reconcile_host_usage(self):
+        ctxt = context.get_admin_context()
+        self._create_instance({'host': self.compute.host, 'vcpus': 2})
+        session = sqlalchemy_api.get_session()
+        session.query(models.HostUsage).\
+                filter_by(host=self.compute.host).\
+                update({'vcpus': 7})
+        self.compute._reconcile_host_usage(ctxt)
+        usage = db.host_usage_get(ctxt, self.compute.host)
+        self.assertEqual(usage['vcpus'], 2)
+
+    def test_power_state_event(self):
+        instance_id = self._create_instance({'host': self.compute.host,
+                                 'power_state': power_state.RUNNING})
+        i_ref = db.instance_get(self.context, instance_id)
+        event = virt_driver.InstanceInfo(i_ref['name'],
+                                         power_state.SHUTDOWN)
+        self.compute._handle_power_state_event(event)
+        i_ref = db.instance_get(self.context, instance_id)
+        self.assertEqual(i_ref['power_state'], power_state.SHUTDOWN)
+
+        # known instances are looked up alone, not with the whole host
+        self.stubs.Set(db, 'instance_get_all_states_by_host', None)
+        event = virt_driver.InstanceInfo(i_ref['name'], power_state.RUNNING)
+        self.compute._handle_power_state_event(event)
+        i_ref = db.instance_get(self.context, instance_id)
+        self.assertEqual(i_ref['power_state'], power_state.RUNNING)
+
 
 class ComputeTestMinRamMinDisk(test.TestCase):
     def setUp(self):
@@ -20,10 +20,16 @@
 
 import datetime
 
+import sqlalchemy
+
 from nova import test
 from nova import context
 from nova import db
+from nova import exception
 from nova import flags
+from nova import utils
+from nova.db.sqlalchemy import api as sqlalchemy_api
+from nova.db.sqlalchemy import models
 
 FLAGS = flags.FLAGS
 
@@ -101,6 +107,35 @@ class DbApiTestCase(test.TestCase):
         else:
             self.assertTrue(result[1].deleted)
 
+    def test_instance_get_all_states_by_host(self):
+        ctxt = context.get_admin_context()
+        inst1 = db.instance_create(ctxt, {'host': 'host1',
+                                          'power_state': 1})
+        db.instance_create(ctxt, {'host': 'host2'})
+        result = db.instance_get_all_states_by_host(ctxt, 'host1')
+        self.assertEqual(1, len(result))
+        self.assertEqual(inst1.id, result[0]['id'])
+        self.assertEqual(inst1.name, result[0]['name'])
+        self.assertEqual(1, result[0]['power_state'])
+
+    def test_instance_get_all_states_by_host_name_template(self):
+        self.flags(instance_name_template='%(hostname)s-%(uuid)s')
+        ctxt = context.get_admin_context()
+        inst = db.instance_create(ctxt, {'host': 'host1',
+                                         'hostname': 'web'})
+        result = db.instance_get_all_states_by_host(ctxt, 'host1')
+        self.assertEqual(result[0]['name'], 'web-%s' % inst.uuid)
+
+    def test_instance_update_power_states(self):
+        ctxt = context.get_admin_context()
+        inst1 = db.instance_create(ctxt, {'power_state': 1})
+        inst2 = db.instance_create(ctxt, {'power_state': 1})
+        inst3 = db.instance_create(ctxt, {'power_state': 1})
+        db.instance_update_power_states(ctxt, {inst1.id: 4, inst2.id: 0})
+        self.assertEqual(4, db.instance_get(ctxt, inst1.id)['power_state'])
+        self.assertEqual(0, db.instance_get(ctxt, inst2.id)['power_state'])
+        self.assertEqual(1, db.instance_get(ctxt, inst3.id)['power_state'])
+
     def test_migration_get_all_unconfirmed(self):
         ctxt = context.get_admin_context()
 
@@ -147,3 +182,299 @@ class DbApiTestCase(test.TestCase):
         results = db.instance_get_all_hung_in_rebooting(ctxt, 10)
         self.assertEqual(0, len(results))
         db.instance_update(ctxt, instance.id, {"task_state": None})
+
+    def test_instance_usage_get_by_window(self):
+        ctxt = context.get_admin_context()
+        begin = datetime.datetime(2011, 1, 1, 10, 0, 0)
+        end = datetime.datetime(2011, 1, 1, 12, 0, 0)
+        # launched half an hour into the window, still running
+        db.instance_create(ctxt, {'project_id': 'p1', 'instance_type_id': 1,
+                                  'launched_at': begin +
+                                      datetime.timedelta(minutes=30)})
+        # running before the window, terminated an hour into it
+        db.instance_create(ctxt, {'project_id': 'p1', 'instance_type_id': 1,
+                                  'launched_at': begin -
+                                      datetime.timedelta(hours=5),
+                                  'terminated_at': begin +
+                                      datetime.timedelta(hours=1)})
+        # terminated before the window
+        db.instance_create(ctxt, {'project_id': 'p1', 'instance_type_id': 1,
+                                  'launched_at': begin -
+                                      datetime.timedelta(hours=5),
+                                  'terminated_at': begin})
+        # never launched
+        db.instance_create(ctxt, {'project_id': 'p1', 'instance_type_id': 1})
+        db.instance_create(ctxt, {'project_id': 'p2', 'instance_type_id': 2,
+                                  'launched_at': begin})
+
+        usages = db.instance_usage_get_by_window(ctxt, begin, end)
+        usages.sort(key=lambda usage: usage['project_id'])
+        self.assertEqual(len(usages), 2)
+        self.assertEqual(usages[0]['project_id'], 'p1')
+        self.assertEqual(usages[0]['instance_type_id'], 1)
+        self.assertEqual(usages[0]['instances'], 2)
+        self.assertAlmostEqual(usages[0]['hours'], 2.5, 3)
+        self.assertAlmostEqual(usages[1]['hours'], 2.0, 3)
+
+        usages = db.instance_usage_get_by_window(ctxt, begin, end, 'p2')
+        self.assertEqual([usage['project_id'] for usage in usages], ['p2'])
+
+        instances = db.instance_get_all_in_window(ctxt, begin, end, 'p1')
+        self.assertEqual(len(instances), 2)
+        instances = db.instance_get_all_in_window(ctxt, begin, end, 'p1',
+                                                  marker=instances[0]['id'])
+        self.assertEqual(len(instances), 1)
+
+    def test_instance_usage_rollup_hour(self):
+        ctxt = context.get_admin_context()
+        hour = datetime.datetime(2011, 1, 1, 10, 0, 0)
+        self.assertEqual(db.instance_usage_rollup_get_bounds(ctxt),
+                         (None, None))
+        db.instance_create(ctxt, {'project_id': 'p1', 'instance_type_id': 1,
+                                  'launched_at': hour -
+                                      datetime.timedelta(hours=1)})
+        db.instance_usage_rollup_hour(ctxt, hour)
+        # rolling up an hour again replaces its rows
+        db.instance_usage_rollup_hour(ctxt, hour)
+        db.instance_usage_rollup_hour(ctxt,
+                                      hour + datetime.timedelta(hours=1))
+
+        self.assertEqual(db.instance_usage_rollup_get_bounds(ctxt),
+                         (hour, hour + datetime.timedelta(hours=1)))
+        usages = db.instance_usage_rollup_get_by_window(ctxt, hour,
+                hour + datetime.timedelta(hours=2))
+        self.assertEqual(len(usages), 1)
+        self.assertEqual(usages[0]['instances'], 1)
+        self.assertAlmostEqual(usages[0]['hours'], 2.0, 3)
+
+    def test_instance_usage_rollup_hour_retries_duplicate_period(self):
+        ctxt = context.get_admin_context()
+        hour = datetime.datetime(2011, 1, 1, 10, 0, 0)
+        rollup_hour = sqlalchemy_api._instance_usage_rollup_hour
+        calls = []
+
+        def _racing_rollup_hour(context, period_start):
+            calls.append(period_start)
+            if len(calls) == 1:
+                rollup_hour(context, period_start)
+                raise exception.DBError(
+                        sqlalchemy.exc.IntegrityError('insert', {}, None))
+            return rollup_hour(context, period_start)
+        self.stubs.Set(sqlalchemy_api, '_instance_usage_rollup_hour',
+                       _racing_rollup_hour)
+        db.instance_usage_rollup_hour(ctxt, hour)
+        self.assertEqual(calls, [hour, hour])
+        self.assertEqual(db.instance_usage_rollup_get_bounds(ctxt),
+                         (hour, hour))
+
+    def test_network_get_all_by_host(self):
+        ctxt = context.get_admin_context()
+        net1 = db.network_create_safe(ctxt, {'host': 'host1'})
+        net2 = db.network_create_safe(ctxt, {})
+        db.network_create_safe(ctxt, {'host': 'host2'})
+        db.fixed_ip_create(ctxt, {'address': '192.168.99.2',
+                                  'network_id': net2['id'],
+                                  'host': 'host1'})
+        db.fixed_ip_create(ctxt, {'address': '10.0.0.3',
+                                  'network_id': net2['id'],
+                                  'host': 'host1'})
+
+        networks = db.network_get_all_by_host(ctxt, 'host1')
+        self.assertEqual(sorted(network['id'] for network in networks),
+                         [net1['id'], net2['id']])
+
+
+class HostUsageTestCase(test.TestCase):
+    def setUp(self):
+        super(HostUsageTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        for host in ('host1', 'host2'):
+            for topic in ('compute', 'volume', 'network'):
+                db.service_create(self.context, {'host': host,
+                                                 'binary': 'nova-' + topic,
+                                                 'topic': topic})
+
+    def _usage(self, host, counter):
+        return db.host_usage_get(self.context, host)[counter]
+
+    def _sorted(self, func):
+        return [(service['host'], usage)
+                for service, usage in func(self.context)]
+
+    def test_instances(self):
+        instance = db.instance_create(self.context, {'host': 'host1',
+                                                     'vcpus': 2,
+                                                     'memory_mb': 512,
+                                                     'local_gb': 10})
+        db.instance_create(self.context, {'host': 'host2', 'vcpus': 1})
+        self.assertEqual(self._usage('host1', 'memory_mb'), 512)
+        self.assertEqual(self._sorted(db.service_get_all_compute_sorted),
+                         [('host2', 1), ('host1', 2)])
+
+        # resize, then migrate
+        db.instance_update(self.context, instance['id'], {'vcpus': 4})
+        self.assertEqual(self._usage('host1', 'vcpus'), 4)
+        db.instance_update(self.context, instance['id'], {'host': 'host2'})
+        self.assertEqual(self._sorted(db.service_get_all_compute_sorted),
+                         [('host1', 0), ('host2', 5)])
+        self.assertEqual(self._usage('host2', 'local_gb'), 10)
+
+        db.instance_destroy(self.context, instance['id'])
+        db.instance_destroy(self.context, instance['id'])
+        self.assertEqual(self._usage('host2', 'vcpus'), 1)
+        self.assertEqual(self._usage('host2', 'local_gb'), 0)
+
+    def test_volumes(self):
+        volume = db.volume_create(self.context, {'host': 'host1',
+                                                 'size': 5})
+        db.volume_create(self.context, {'size': 3})
+        self.assertEqual(self._sorted(db.service_get_all_volume_sorted),
+                         [('host2', 0), ('host1', 5)])
+        db.volume_destroy(self.context, volume['id'])
+        self.assertEqual(self._usage('host1', 'volume_gigabytes'), 0)
+
+    def test_networks(self):
+        network = db.network_create_safe(self.context, {})
+        db.network_set_host(self.context, network['id'], 'host2')
+        self.assertEqual(self._sorted(db.service_get_all_network_sorted),
+                         [('host1', 0), ('host2', 1)])
+        db.network_disassociate(self.context, network['id'])
+        self.assertEqual(self._usage('host2', 'network_count'), 0)
+
+    def test_reconcile(self):
+        db.instance_create(self.context, {'host': 'host1', 'vcpus': 2})
+        db.volume_create(self.context, {'host': 'host1', 'size': 5})
+        self.assertEqual(db.host_usage_reconcile(self.context, 'host1'), {})
+
+        session = sqlalchemy_api.get_session()
+        session.query(models.HostUsage).\
+                filter_by(host='host1').\
+                update({'vcpus': 7, 'volume_gigabytes': 0})
+        self.assertEqual(db.host_usage_reconcile(self.context, 'host1'),
+                         {'vcpus': (7, 2), 'volume_gigabytes': (0, 5)})
+        self.assertEqual(self._usage('host1', 'vcpus'), 2)
+
+        self.assertRaises(exception.HostUsageNotFound,
+                          db.host_usage_get, self.context, 'host3')
+        db.host_usage_reconcile(self.context, 'host3')
+        self.assertEqual(self._usage('host3', 'vcpus'), 0)
+
+
+class ArchiveDeletedRowsTestCase(test.TestCase):
+    def setUp(self):
+        super(ArchiveDeletedRowsTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        self.read_deleted = context.get_admin_context(read_deleted=True)
+
+    def _deleted_instance(self):
+        instance = db.instance_create(self.context,
+                                      {'metadata': {'key': 'value'}})
+        db.instance_destroy(self.context, instance['id'])
+        return instance
+
+    def _live_ids(self, model):
+        session = sqlalchemy_api.get_session()
+        return set(row[0] for row in session.query(model.id))
+
+    def _shadow_ids(self, name):
+        session = sqlalchemy_api.get_session()
+        table = sqlalchemy_api._archive_tables(session)['shadow_' + name]
+        return set(row[0] for row in
+                   session.execute(sqlalchemy.select([table.c.id])))
+
+    def test_archive_deleted_instance(self):
+        live = db.instance_create(self.context, {})
+        instance = self._deleted_instance()
+
+        archived = db.archive_deleted_rows(self.context)
+
+        self.assertEqual(archived, {'instances': 1, 'instance_metadata': 1})
+        self.assertEqual(self._live_ids(models.Instance),
+                         set([live['id']]))
+        self.assertEqual(self._shadow_ids('instances'),
+                         set([instance['id']]))
+        self.assertRaises(exception.InstanceNotFound, db.instance_get,
+                          self.read_deleted, instance['id'])
+        self.assertEqual(db.archive_deleted_rows(self.context), {})
+
+    def test_referenced_instance_is_kept(self):
+        instance = self._deleted_instance()
+        network = db.network_create_safe(self.context, {})
+        db.fixed_ip_create(self.context, {'address': '192.168.99.2',
+                                          'network_id': network['id'],
+                                          'instance_id': instance['id']})
+
+        archived = db.archive_deleted_rows(self.context)
+
+        # The metadata goes, but fixed_ips still point at the instance
+        self.assertEqual(archived, {'instance_metadata': 1})
+        fixed_ip = db.fixed_ip_get_by_address(self.context, '192.168.99.2')
+        self.assertEqual(fixed_ip['instance_id'], instance['id'])
+        self.assertTrue(instance['id'] in self._live_ids(models.Instance))
+
+        db.fixed_ip_update(self.context, '192.168.99.2', {'instance_id': None})
+        self.assertEqual(db.archive_deleted_rows(self.context),
+                         {'instances': 1})
+
+    def test_live_rows_never_reference_archived_rows(self):
+        network = db.network_create_safe(self.context, {})
+        for i in xrange(4):
+            instance = self._deleted_instance()
+            if i % 2:
+                db.fixed_ip_create(self.context,
+                                   {'address': '192.168.99.%d' % (i + 2),
+                                    'network_id': network['id'],
+                                    'instance_id': instance['id']})
+
+        db.archive_deleted_rows(self.context)
+
+        instance_ids = self._live_ids(models.Instance)
+        self.assertEqual(len(instance_ids), 2)
+        session = sqlalchemy_api.get_session()
+        for model in (models.FixedIp, models.InstanceMetadata):
+            for row in session.query(model).filter(model.instance_id != None):
+                self.assertTrue(row.instance_id in instance_ids)
+
+    def test_max_rows_and_batches(self):
+        self.flags(archive_batch_size=2)
+        for i in xrange(3):
+            self._deleted_instance()
+
+        self.assertEqual(db.archive_deleted_rows(self.context, max_rows=5),
+                         {'instance_metadata': 3, 'instances': 2})
+        self.assertEqual(db.archive_deleted_rows(self.context, max_rows=5),
+                         {'instances': 1})
+
+    def test_before(self):
+        instance = self._deleted_instance()
+        deleted_at = db.instance_get(self.read_deleted,
+                                     instance['id'])['deleted_at']
+
+        self.assertEqual(db.archive_deleted_rows(self.context,
+                                                 before=deleted_at), {})
+        before = deleted_at + datetime.timedelta(seconds=1)
+        self.assertEqual(db.archive_deleted_rows(self.context,
+                                                 before=before),
+                         {'instances': 1, 'instance_metadata': 1})
+
+    def test_history_archived_with_instance_and_purged(self):
+        instance = self._deleted_instance()
+        db.migration_create(self.context, {'instance_uuid': instance['uuid'],
+                                           'status': 'finished'})
+
+        archived = db.archive_deleted_rows(self.context)
+        self.assertEqual(archived, {'instances': 1, 'instance_metadata': 1,
+                                    'migrations': 1})
+        session = sqlalchemy_api.get_session()
+        tables = sqlalchemy_api._archive_tables(session)
+        # the migration takes the deletion time of its instance
+        deleted_at = [session.execute(sqlalchemy.select(
+                              [tables[name].c.deleted_at])).scalar()
+                      for name in ('shadow_instances', 'shadow_migrations')]
+        self.assertEqual(deleted_at[0], deleted_at[1])
+
+        future = utils.utcnow() + datetime.timedelta(days=1)
+        self.assertEqual(db.purge_shadow_rows(self.context, future),
+                         {'instances': 1, 'instance_metadata': 1,
+                          'migrations': 1})
+        self.assertEqual(self._shadow_ids('instances'), set())
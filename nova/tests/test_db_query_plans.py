@@ -0,0 +1,174 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Query plan regression tests for the hot DB API calls.
+
+Each test runs a DB API call, captures the statements it issues and
+asks the database to EXPLAIN them, failing if any table is read with a
+full scan.  Only sqlite and MySQL plans are understood.
+"""
+
+import re
+
+from nova import context
+from nova import db
+from nova import exception
+from nova import test
+from nova import utils
+from nova.db.sqlalchemy import models
+from nova.db.sqlalchemy import session as db_session
+
+
+# sqlite reports e.g. 'SCAN instances' or 'SCAN TABLE instances', and
+# 'SEARCH x USING AUTOMATIC COVERING INDEX' for an index it builds
+# itself for the duration of the query
+_SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?')
+_SQLITE_AUTOMATIC = re.compile(r'^SEARCH (?:TABLE )?(\w+).*AUTOMATIC')
+
+
+class QueryPlanTestCase(test.TestCase):
+    """Checks that the hot DB API calls never scan a whole table."""
+
+    def setUp(self):
+        super(QueryPlanTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        self.user_context = context.RequestContext('fake', 'fake')
+        db_session.get_session()
+        self.engine = db_session._ENGINE
+        self.tables = set(models.BASE.metadata.tables)
+
+    def _capture(self, func, *args, **kwargs):
+        """Run func, returning the statements it issued."""
+        statements = []
+        dialect = self.engine.dialect
+        do_execute = dialect.do_execute
+
+        def capturing_execute(cursor, statement, parameters, context=None):
+            statements.append((statement, parameters))
+            return do_execute(cursor, statement, parameters, context)
+
+        self.stubs.Set(dialect, 'do_execute', capturing_execute)
+        try:
+            func(*args, **kwargs)
+        except exception.NotFound:
+            pass
+        finally:
+            self.stubs.UnsetAll()
+        return statements
+
+    def _full_scans(self, statement, parameters):
+        """Return the names of the tables statement reads in full."""
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            if self.engine.name == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+                scans = []
+                for row in cursor.fetchall():
+                    match = (_SQLITE_SCAN.match(row[-1]) or
+                             _SQLITE_AUTOMATIC.match(row[-1]))
+                    if match:
+                        scans.append(match.group(1))
+            elif self.engine.name == 'mysql':
+                cursor.execute('EXPLAIN ' + statement, parameters)
+                columns = [column[0] for column in cursor.description]
+                scans = [row[columns.index('table')]
+                         for row in cursor.fetchall()
+                         if row[columns.index('type')] == 'ALL']
+            else:
+                self.skipTest('No query plan support for %s' %
+                              self.engine.name)
+        finally:
+            connection.close()
+        # Joined eager loads alias tables as e.g. fixed_ips_1
+        tables = [re.sub(r'_\d+$', '', scan) for scan in scans]
+        return [table for table in tables if table in self.tables]
+
+    def assertIndexed(self, func, *args, **kwargs):
+        statements = self._capture(func, *args, **kwargs)
+        self.assertTrue(statements)
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith(('SELECT',
+                                                          'UPDATE',
+                                                          'DELETE')):
+                continue
+            scans = self._full_scans(statement, parameters)
+            self.assertFalse(scans, 'full scan of %s in %s' %
+                             (', '.join(scans), statement))
+
+    def test_instance_get(self):
+        self.assertIndexed(db.instance_get, self.context, 1)
+
+    def test_instance_get_by_uuid(self):
+        self.assertIndexed(db.instance_get_by_uuid, self.user_context,
+                           str(utils.gen_uuid()))
+
+    def test_instance_get_all_by_host(self):
+        self.assertIndexed(db.instance_get_all_by_host, self.context,
+                           'host1')
+
+    def test_instance_get_all_by_project(self):
+        self.assertIndexed(db.instance_get_all_by_project, self.context,
+                           'fake')
+
+    def test_instance_get_all_by_reservation(self):
+        self.assertIndexed(db.instance_get_all_by_reservation,
+                           self.user_context, 'r-fake')
+
+    def test_fixed_ip_get_by_address(self):
+        self.assertIndexed(db.fixed_ip_get_by_address, self.context,
+                           '10.0.0.2')
+
+    def test_fixed_ip_get_by_instance(self):
+        self.assertIndexed(db.fixed_ip_get_by_instance, self.context, 1)
+
+    def test_fixed_ip_get_by_network_host(self):
+        self.assertIndexed(db.fixed_ip_get_by_network_host, self.context,
+                           1, 'host1')
+
+    def test_floating_ip_get_by_address(self):
+        self.assertIndexed(db.floating_ip_get_by_address, self.context,
+                           '172.24.4.1')
+
+    def test_floating_ip_get_all_by_host(self):
+        self.assertIndexed(db.floating_ip_get_all_by_host, self.context,
+                           'host1')
+
+    def test_virtual_interface_get_by_instance(self):
+        instance = db.instance_create(self.context, {})
+        self.assertIndexed(db.virtual_interface_get_by_instance,
+                           self.context, instance['id'])
+
+    def test_security_group_get_by_instance(self):
+        self.assertIndexed(db.security_group_get_by_instance, self.context,
+                           1)
+
+    def test_network_get_all_by_host(self):
+        self.assertIndexed(db.network_get_all_by_host, self.context,
+                           'host1')
+
+    def test_service_get_by_host_and_topic(self):
+        self.assertIndexed(db.service_get_by_host_and_topic, self.context,
+                           'host1', 'compute')
+
+    def test_service_get_all_by_topic(self):
+        self.assertIndexed(db.service_get_all_by_topic, self.context,
+                           'compute')
+
+    def test_service_get_all_compute_by_host(self):
+        self.assertIndexed(db.service_get_all_compute_by_host,
+                           self.context, 'host1')
@@ -0,0 +1,157 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Tests for the service heartbeat drivers
+"""
+
+from nova import context
+from nova import db
+from nova import exception
+from nova import test
+from nova import utils
+from nova.heartbeat import api as heartbeat
+from nova.heartbeat import db_driver
+from nova.heartbeat import memcache_driver
+from nova.heartbeat import memory_driver
+from nova.scheduler import api as scheduler_api
+from nova.scheduler import zone_manager
+
+
+class FakeService(object):
+    def __init__(self, service_ref):
+        self.service_id = service_ref['id']
+        self.host = service_ref['host']
+        self.topic = service_ref['topic']
+
+
+class HeartbeatTestCase(test.TestCase):
+    def setUp(self):
+        super(HeartbeatTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        utils.set_time_override()
+        self.services = [db.service_create(self.context,
+                                           {'host': 'host%d' % i,
+                                            'binary': 'nova-compute',
+                                            'topic': 'compute',
+                                            'report_count': 0})
+                         for i in xrange(3)]
+
+    def tearDown(self):
+        utils.clear_time_override()
+        super(HeartbeatTestCase, self).tearDown()
+
+    def _beat(self, driver, service_ref):
+        driver.heartbeat(self.context, FakeService(service_ref))
+
+    def _up_hosts(self, driver):
+        services = db.service_get_all(self.context)
+        self.assertEqual([service['host'] for service in services
+                          if driver.is_up(service)],
+                         [service['host'] for service in
+                          driver.filter_up(services)])
+        return [service['host'] for service in driver.filter_up(services)]
+
+
+class DbDriverTestCase(HeartbeatTestCase):
+    def test_heartbeat_bumps_report_count(self):
+        driver = db_driver.DbDriver()
+        utils.advance_time_seconds(120)
+        self._beat(driver, self.services[1])
+        self._beat(driver, self.services[1])
+
+        service = db.service_get(self.context, self.services[1]['id'])
+        self.assertEqual(service['report_count'], 2)
+        self.assertEqual(service['updated_at'], utils.utcnow())
+        self.assertEqual(self._up_hosts(driver), ['host1'])
+
+    def test_heartbeat_missing_service(self):
+        driver = db_driver.DbDriver()
+        db.service_destroy(self.context, self.services[0]['id'])
+        self.assertRaises(exception.ServiceNotFound,
+                          self._beat, driver, self.services[0])
+
+    def test_api_uses_flagged_driver(self):
+        self.flags(heartbeat_driver='nova.heartbeat.db_driver.DbDriver')
+        self.assertEqual(len(heartbeat.filter_up(self.services)), 3)
+        utils.advance_time_seconds(120)
+        self.assertFalse(heartbeat.service_is_up(self.services[0]))
+
+
+class MemoryDriverTestCase(HeartbeatTestCase):
+    def setUp(self):
+        super(MemoryDriverTestCase, self).setUp()
+        self.zone_manager = zone_manager.ZoneManager()
+
+        def fake_heartbeat(context, service_name, host):
+            self.zone_manager.service_heartbeat(service_name, host)
+
+        self.stubs.Set(scheduler_api, 'service_heartbeat', fake_heartbeat)
+
+    def test_up_after_heartbeat(self):
+        driver = memory_driver.MemoryDriver()
+        driver.set_zone_manager(self.zone_manager)
+        self._beat(driver, self.services[0])
+        utils.advance_time_seconds(30)
+        self._beat(driver, self.services[2])
+        self.assertEqual(self._up_hosts(driver), ['host0', 'host2'])
+
+        utils.advance_time_seconds(45)
+        self.assertEqual(self._up_hosts(driver), ['host2'])
+
+    def test_heartbeat_keeps_capabilities(self):
+        driver = memory_driver.MemoryDriver()
+        driver.set_zone_manager(self.zone_manager)
+        self.zone_manager.update_service_capabilities('compute', 'host0',
+                                                      {'free_ram_mb': 512})
+        self._beat(driver, self.services[0])
+        states = self.zone_manager.service_states['host0']['compute']
+        self.assertEqual(states['free_ram_mb'], 512)
+        self.assertEqual(self._up_hosts(driver), ['host0'])
+
+    def test_down_without_zone_manager(self):
+        driver = memory_driver.MemoryDriver()
+        self._beat(driver, self.services[0])
+        self.assertEqual(self._up_hosts(driver), [])
+
+
+class MemcacheDriverTestCase(HeartbeatTestCase):
+    def setUp(self):
+        super(MemcacheDriverTestCase, self).setUp()
+        self.flags(memcached_servers=None)
+
+    def test_up_after_heartbeat(self):
+        driver = memcache_driver.MemcacheDriver()
+        self._beat(driver, self.services[1])
+        utils.advance_time_seconds(30)
+        self._beat(driver, self.services[2])
+        self.assertEqual(self._up_hosts(driver), ['host1', 'host2'])
+
+        utils.advance_time_seconds(45)
+        self.assertEqual(self._up_hosts(driver), ['host2'])
+
+    def test_filter_up_is_one_lookup(self):
+        driver = memcache_driver.MemcacheDriver()
+        self._beat(driver, self.services[0])
+        self.mox.StubOutWithMock(driver.mc, 'get')
+        self.mox.StubOutWithMock(driver.mc, 'get_multi')
+        driver.mc.get_multi(['heartbeat-compute-host0',
+                             'heartbeat-compute-host1',
+                             'heartbeat-compute-host2']).\
+                AndReturn({'heartbeat-compute-host0': 1})
+        self.mox.ReplayAll()
+        self.assertEqual(driver.filter_up(self.services), self.services[:1])
@@ -100,6 +100,21 @@ tgtadm --op delete --lld=iscsi --mode=target --tid=%(tid)s
         params['lun'] += 1
         return params
 
+    def test_list_targets(self):
+        output = ("Target 1: iqn.2010-10.org.openstack:volume-00000001\n"
+                  "    System information:\n"
+                  "        Driver: iscsi\n"
+                  "    LUN information:\n"
+                  "        LUN: 0\n"
+                  "            Backing store path: None\n"
+                  "        LUN: 1\n"
+                  "            Backing store path: /dev/nova/volume-1\n"
+                  "Target 12: iqn.2010-10.org.openstack:volume-0000000c\n")
+        tgtadm = iscsi.get_target_admin()
+        tgtadm.set_execute(lambda *cmd, **kwargs: (output, None))
+        self.assertEqual(tgtadm.list_targets(),
+                         {1: set(['/dev/nova/volume-1']), 12: set()})
+
 
 class IetAdmTestCase(test.TestCase, TargetAdminTestCase):
 
@@ -114,3 +129,12 @@ ietadm --op new --tid=%(tid)s --lun=%(lun)d --params Path=%(path)s,Type=fileio
 ietadm --op delete --tid=%(tid)s --lun=%(lun)d
 ietadm --op delete --tid=%(tid)s
 """
+
+    def test_list_targets(self):
+        output = ("tid:1 name:iqn.2010-10.org.openstack:volume-00000001\n"
+                  "\tlun:0 state:0 iotype:fileio path:/dev/nova/volume-1\n"
+                  "tid:7 name:iqn.2010-10.org.openstack:volume-00000007\n")
+        tgtadm = iscsi.get_target_admin()
+        tgtadm.set_execute(lambda *cmd, **kwargs: (output, None))
+        self.assertEqual(tgtadm.list_targets(),
+                         {1: set(['/dev/nova/volume-1']), 7: set()})
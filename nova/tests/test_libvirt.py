@@ -95,7 +95,7 @@ class LibvirtVolumeTestCase(test.TestCase):
 
     @staticmethod
     def fake_execute(*cmd, **kwargs):
-        LOG.debug("FAKE EXECUTE: %s" % ' '.join(cmd))
+        LOG.debug("FAKE EXECUTE: %s", ' '.join(cmd))
         return None, None
 
     def setUp(self):
@@ -1076,6 +1076,148 @@ class LibvirtConnTestCase(test.TestCase):
         self.assertRaises(NotImplementedError, compute_driver.reboot, *args)
 
 
+class FakeEventDomain(object):
+
+    def name(self):
+        return 'instance-00000001'
+
+    def info(self):
+        return [power_state.RUNNING, 2048, 2048, 1, 0]
+
+
+class LibvirtPowerEventTestCase(test.TestCase):
+
+    def setUp(self):
+        super(LibvirtPowerEventTestCase, self).setUp()
+        self.flags(libvirt_vif_driver="nova.tests.fake_network.FakeVIFDriver")
+        self.conn = connection.LibvirtConnection(True)
+
+    def test_domain_events_are_dispatched(self):
+        events = []
+        self.conn._event_listeners.append(events.append)
+        self.conn._event_queue = connection.native_Queue.Queue()
+        self.conn._event_notify_recv, self.conn._event_notify_send = \
+                os.pipe()
+        dispatcher = eventlet.spawn(self.conn._dispatch_domain_events)
+        event_thread = connection.native_threading.Thread(
+                target=self.conn._queue_domain_event,
+                args=(None, FakeEventDomain(), 0, 0, None))
+        event_thread.start()
+        event_thread.join()
+        for i in xrange(100):
+            if events:
+                break
+            eventlet.sleep(0.01)
+        dispatcher.kill()
+        os.close(self.conn._event_notify_recv)
+        os.close(self.conn._event_notify_send)
+        self.assertEqual([(info.name, info.state) for info in events],
+                         [('instance-00000001', power_state.RUNNING)])
+
+
+class FakeInventoryDomain(object):
+
+    def __init__(self, name, vcpus=1, xml=None):
+        self._name = name
+        self._vcpus = vcpus
+        self._xml = xml or """
+            <domain type='kvm'>
+                <devices>
+                    <disk type='file'>
+                        <target dev='vda' bus='virtio'/>
+                    </disk>
+                    <disk type='file'>
+                        <source file='nodev'/>
+                    </disk>
+                    <interface type='bridge'>
+                        <target dev='vnet0'/>
+                    </interface>
+                </devices>
+            </domain>
+        """
+        self.xml_calls = 0
+
+    def name(self):
+        return self._name
+
+    def info(self):
+        return [power_state.RUNNING, 2048, 2048, self._vcpus, 0]
+
+    def XMLDesc(self, flags):
+        self.xml_calls += 1
+        return self._xml
+
+
+class LibvirtDomainInventoryTestCase(test.TestCase):
+
+    def setUp(self):
+        super(LibvirtDomainInventoryTestCase, self).setUp()
+        self.domains = {1: FakeInventoryDomain('instance-00000001', 2),
+                        2: FakeInventoryDomain('instance-00000002', 4)}
+        self.lookups = 0
+
+        test_case = self
+
+        class FakeLibvirtConnection(object):
+            def listDomainsID(self):
+                return test_case.domains.keys()
+
+            def lookupByID(self, domain_id):
+                test_case.lookups += 1
+                return test_case.domains[domain_id]
+
+        self.flags(libvirt_vif_driver="nova.tests.fake_network.FakeVIFDriver")
+        self.mox.StubOutWithMock(connection.LibvirtConnection, '_conn')
+        connection.LibvirtConnection._conn = FakeLibvirtConnection()
+        self.conn = connection.LibvirtConnection(True)
+
+    def test_parse_domain_devices(self):
+        devices = self.conn._parse_domain_devices(
+                self.domains[1].XMLDesc(0))
+        self.assertEqual(devices, {'disks': ['vda'],
+                                   'interfaces': ['vnet0']})
+
+    def test_parse_domain_devices_bad_xml(self):
+        devices = self.conn._parse_domain_devices('<domain>')
+        self.assertEqual(devices, {'disks': [], 'interfaces': []})
+
+    def test_devices_parsed_once_per_snapshot(self):
+        for i in xrange(3):
+            self.assertEqual(self.conn.get_disks('instance-00000001'),
+                             ['vda'])
+            self.assertEqual(self.conn.get_interfaces('instance-00000001'),
+                             ['vnet0'])
+        self.assertEqual(self.domains[1].xml_calls, 1)
+        self.assertEqual(self.lookups, 2)
+
+    def test_invalidate_devices(self):
+        self.conn.get_disks('instance-00000001')
+        self.conn._invalidate_domain_inventory('instance-00000001')
+        self.conn.get_disks('instance-00000001')
+        self.assertEqual(self.domains[1].xml_calls, 2)
+        self.assertEqual(self.lookups, 2)
+
+    def test_inventory_expires(self):
+        self.flags(libvirt_domain_cache_ttl=0)
+        self.conn.get_vcpu_used()
+        self.conn._domain_inventory_time -= 1
+        self.conn.get_vcpu_used()
+        self.assertEqual(self.lookups, 4)
+
+    def test_get_vcpu_used(self):
+        self.assertEqual(self.conn.get_vcpu_used(), 6)
+
+    def test_list_instances_refreshes(self):
+        self.assertEqual(sorted(self.conn.list_instances()),
+                         ['instance-00000001', 'instance-00000002'])
+        del self.domains[2]
+        self.assertEqual(self.conn.list_instances(), ['instance-00000001'])
+        infos = self.conn.list_instances_detail()
+        self.assertEqual(len(infos), 1)
+        self.assertEqual(infos[0].name, 'instance-00000001')
+        self.assertEqual(infos[0].state, power_state.RUNNING)
+
+
 class NWFilterFakes:
     def __init__(self):
         self.filters = {}
@@ -110,6 +110,27 @@ class NovaFormatterTestCase(test.TestCase):
         self.log.debug("baz")
         self.assertEqual("NOCTXT: baz --DBG\n", self.stream.getvalue())
 
+    def test_context_is_read_when_formatting(self):
+        records = []
+        self.stubs.Set(self.log, 'handle', records.append)
+        ctxt = _fake_context()
+        self.log.info("qux", context=ctxt)
+        self.assertFalse('request_id' in records[0].__dict__)
+        self.assertEqual("HAS CONTEXT [%s]: qux" % ctxt.request_id,
+                         log._formatter.format(records[0]))
+
+    def test_debug_rate_limit(self):
+        self.flags(logging_debug_rate_limit=2)
+        now = [1000.0]
+        self.stubs.Set(log.time, 'time', lambda: now[0])
+        for i in xrange(6):
+            if i == 5:
+                now[0] += 1
+            self.log.debug("baz")
+        self.assertEqual("NOCTXT: baz --DBG\n" * 2 +
+                         "NOCTXT: baz (3 similar messages suppressed) "
+                         "--DBG\n", self.stream.getvalue())
+
 
 class NovaLoggerTestCase(test.TestCase):
     def setUp(self):
@@ -18,6 +18,7 @@ import commands
 import errno
 import os
 import select
+import tokenize
 
 from eventlet import greenpool
 from eventlet import greenthread
@@ -41,6 +42,47 @@ class ExceptionTestCase(test.TestCase):
 
 
 class ProjectTestCase(test.TestCase):
+    def _eager_debug_calls(self, path):
+        """Find debug log calls whose message is %-formatted by the caller,
+        anywhere in the first argument.
+
+        Formatting there costs time even when DEBUG is off; the arguments
+        belong in the call for logging to format them on demand.
+        """
+        calls = []
+        tokens = list(tokenize.generate_tokens(open(path).readline))
+        for i, token in enumerate(tokens[2:-1], 2):
+            if (token[1] != 'debug' or tokens[i - 1][1] != '.' or
+                tokens[i + 1][1] != '('):
+                continue
+            depth = 0
+            for kind, text, start, _end, _line in tokens[i + 1:]:
+                if kind != tokenize.OP:
+                    continue
+                if text in '([{':
+                    depth += 1
+                elif text in ')]}':
+                    depth -= 1
+                    if not depth:
+                        break
+                elif depth == 1 and text == ',':
+                    break
+                elif text == '%':
+                    calls.append('%s:%d' % (path, start[0]))
+                    break
+        return calls
+
+    def test_debug_logs_are_formatted_lazily(self):
+        novadir = os.path.normpath(os.path.dirname(__file__) + '/../')
+        calls = []
+        for dirpath, dirnames, filenames in os.walk(novadir):
+            for filename in filenames:
+                if filename.endswith('.py'):
+                    path = os.path.join(dirpath, filename)
+                    calls.extend(self._eager_debug_calls(path))
+        self.assertEqual(calls, [], 'debug messages formatted with %: ' +
+                                    ', '.join(calls))
+
     def test_authors_up_to_date(self):
         topdir = os.path.normpath(os.path.dirname(__file__) + '/../../')
         missing = set()
@@ -429,22 +429,26 @@ class VlanNetworkTestCase(test.TestCase):
             return {'address': '10.0.0.1'}
 
         def fake2(*args, **kwargs):
-            return 25
+            return (0, [])
 
         def fake3(*args, **kwargs):
-            return 0
+            return (1, [1])
+
+        def fake4(*args, **kwargs):
+            pass
 
         self.stubs.Set(self.network.db, 'floating_ip_allocate_address', fake1)
+        self.stubs.Set(self.network.db, 'reservation_release', fake4)
 
         # this time should raise
-        self.stubs.Set(self.network.db, 'floating_ip_count_by_project', fake2)
+        self.stubs.Set(self.network.db, 'quota_reserve', fake2)
         self.assertRaises(quota.QuotaError,
                           self.network.allocate_floating_ip,
                           ctxt,
                           ctxt.project_id)
 
         # this time should not
-        self.stubs.Set(self.network.db, 'floating_ip_count_by_project', fake3)
+        self.stubs.Set(self.network.db, 'quota_reserve', fake3)
         self.network.allocate_floating_ip(ctxt, ctxt.project_id)
 
     def test_deallocate_floating_ip(self):
@@ -13,6 +13,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import errno
+import json
+import os
+import shutil
+import tempfile
+
+import eventlet
 import stubout
 
 import nova
@@ -155,3 +162,145 @@ class NotifierTestCase(test.TestCase):
             pass
         self.assertEqual(3, example_api(1, 2))
         self.assertEqual(self.notify_called, True)
+
+
+class NotificationPipelineTestCase(test.TestCase):
+    """Test case for buffered notifications"""
+    def setUp(self):
+        super(NotificationPipelineTestCase, self).setUp()
+        self.spill_dir = tempfile.mkdtemp()
+        self.flags(notification_queue_size=2,
+                   notification_batch_size=10,
+                   notification_driver='nova.notifier.rabbit_notifier',
+                   notification_spill_path=os.path.join(self.spill_dir,
+                                                        'spill'))
+        self.casts = []
+
+        def mock_cast_many(context, topic, msgs):
+            self.casts.append((topic, [msg['payload']['a'] for msg in msgs]))
+
+        def mock_cast(context, topic, msg):
+            self.casts.append((topic, [msg['payload']['a']]))
+
+        self.stubs.Set(nova.rpc, 'cast_many', mock_cast_many)
+        self.stubs.Set(nova.rpc, 'cast', mock_cast)
+        self.stubs.Set(nova.notifier.api, '_pipeline', None)
+        # keep the background sender from draining the buffer
+        self.stubs.Set(nova.notifier.api.NotificationPipeline, '_start',
+                       lambda self: None)
+
+    def tearDown(self):
+        shutil.rmtree(self.spill_dir)
+        super(NotificationPipelineTestCase, self).tearDown()
+
+    def _notify(self, a, priority=nova.notifier.api.INFO):
+        notify('publisher_id', 'event_type', priority, dict(a=a))
+
+    def test_notifications_are_buffered_and_batched_per_topic(self):
+        self.flags(notification_queue_size=10)
+        self._notify(1)
+        self._notify(2, nova.notifier.api.ERROR)
+        self._notify(3)
+        self.assertEqual(self.casts, [])
+
+        nova.notifier.api.flush()
+        self.assertEqual(self.casts, [('notifications.info', [1, 3]),
+                                      ('notifications.error', [2])])
+        stats = nova.notifier.api.get_notification_stats()
+        self.assertEqual(stats['queued'], 3)
+        self.assertEqual(stats['sent'], 3)
+        self.assertEqual(stats['dropped'], 0)
+
+    def test_overflow_drops_oldest(self):
+        for a in xrange(4):
+            self._notify(a)
+        nova.notifier.api.flush()
+        self.assertEqual(self.casts, [('notifications.info', [2, 3])])
+        self.assertEqual(nova.notifier.api.get_notification_stats()[
+                         'dropped'], 2)
+
+    def test_overflow_spills_to_disk(self):
+        self.flags(notification_overflow='spill')
+        for a in xrange(4):
+            self._notify(a)
+        self.assertEqual(nova.notifier.api.get_notification_stats()[
+                         'spilled'], 2)
+        nova.notifier.api.flush()
+        self.assertEqual(self.casts, [('notifications.info', [0, 1]),
+                                      ('notifications.info', [2, 3])])
+        self.assertEqual(os.listdir(self.spill_dir), [])
+
+    def test_spills_of_gone_processes_are_sent(self):
+        def fake_kill(pid, signal):
+            raise OSError(errno.ESRCH, 'No such process')
+
+        self.stubs.Set(os, 'kill', fake_kill)
+        spill = os.path.join(self.spill_dir, 'spill.nova-compute.%d')
+        with open(spill % 1, 'w') as f:
+            f.write(json.dumps(dict(payload=dict(a=1),
+                                    priority='INFO')) + '\n')
+        # left by a process that died while sending its spill file
+        with open(spill % 2 + '.sending.1', 'w') as f:
+            f.write(json.dumps(dict(payload=dict(a=2),
+                                    priority='INFO')) + '\n{"trunc')
+        self._notify(3)
+        nova.notifier.api.flush()
+        self.assertEqual(sorted(self.casts),
+                         [('notifications.info', [1]),
+                          ('notifications.info', [2]),
+                          ('notifications.info', [3])])
+        self.assertEqual(nova.notifier.api.get_notification_stats()[
+                         'dropped'], 1)
+        self.assertEqual(os.listdir(self.spill_dir), [])
+
+    def test_sender_survives_errors(self):
+        pipeline = nova.notifier.api.NotificationPipeline(10)
+        calls = []
+
+        def flaky_send(batch):
+            calls.append(batch)
+            if len(calls) == 1:
+                raise Exception('unexpected')
+
+        self.stubs.Set(pipeline, '_send', flaky_send)
+        sender = eventlet.spawn(pipeline._run)
+        pipeline.put({'payload': {'a': 1}})
+        eventlet.sleep(0)
+        pipeline.put({'payload': {'a': 2}})
+        eventlet.sleep(0)
+        sender.kill()
+        self.assertEqual(len(calls), 2)
+
+    def test_failed_batch_is_sent_one_at_a_time(self):
+        def broken_cast_many(context, topic, msgs):
+            raise Exception('broker down')
+
+        self.stubs.Set(nova.rpc, 'cast_many', broken_cast_many)
+        self._notify(1)
+        self._notify(2)
+        nova.notifier.api.flush()
+        self.assertEqual(self.casts, [('notifications.info', [1]),
+                                      ('notifications.info', [2])])
+        stats = nova.notifier.api.get_notification_stats()
+        self.assertEqual(stats['sent'], 2)
+        self.assertEqual(stats['dropped'], 0)
+
+    def test_driver_errors_are_counted(self):
+        def broken_cast(context, topic, msg):
+            if msg['payload']['a'] == 2:
+                raise Exception('broker down')
+            self.casts.append((topic, [msg['payload']['a']]))
+
+        def broken_cast_many(context, topic, msgs):
+            raise Exception('broker down')
+
+        self.stubs.Set(nova.rpc, 'cast', broken_cast)
+        self.stubs.Set(nova.rpc, 'cast_many', broken_cast_many)
+        self._notify(1)
+        self._notify(2)
+        nova.notifier.api.flush()
+        self.assertEqual(self.casts, [('notifications.info', [1])])
+        stats = nova.notifier.api.get_notification_stats()
+        self.assertEqual(stats['sent'], 1)
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(stats['dropped'], 1)
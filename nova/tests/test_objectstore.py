@@ -21,9 +21,11 @@ Unittets for S3 objectstore clone.
 """
 
 import boto
+import hashlib
 import os
 import shutil
 import tempfile
+import webob
 
 from boto import exception as boto_exception
 from boto.s3 import connection as s3
@@ -59,6 +61,7 @@ class S3APITestCase(test.TestCase):
         os.mkdir(FLAGS.buckets_path)
 
         router = s3server.S3Application(FLAGS.buckets_path)
+        self.router = router
         self.server = wsgi.Server("S3 Objectstore",
                                   router,
                                   host=FLAGS.s3_host,
@@ -128,6 +131,135 @@ class S3APITestCase(test.TestCase):
 
         self._ensure_no_buckets(bucket.get_all_keys())
 
+    def _create_key(self, key_name, key_contents):
+        b = self.conn.create_bucket('testbucket')
+        k = b.new_key(key_name)
+        k.set_contents_from_string(key_contents)
+        return k
+
+    def test_put_streams_and_sets_etag(self):
+        self.flags(s3_chunk_size=7)
+        key_contents = 'x' * 50 + 'y' * 50
+        k = self._create_key('somekey', key_contents)
+        self.assertEquals(k.etag,
+                          '"%s"' % hashlib.md5(key_contents).hexdigest())
+        bucket_path = os.path.join(FLAGS.buckets_path, 'testbucket')
+        self.assertEquals([name for name in os.listdir(bucket_path)
+                           if name.startswith(s3server.UPLOAD_PREFIX)], [])
+
+        key = self.conn.get_bucket('testbucket').get_key('somekey')
+        self.assertEquals(key.get_contents_as_string(), key_contents)
+
+    def test_put_short_body_is_rejected(self):
+        self.conn.create_bucket('testbucket')
+        request = webob.Request.blank('/testbucket/somekey', method='PUT',
+                                      body='0123456789')
+        request.content_length = 20
+        self.assertEquals(request.get_response(self.router).status_int, 400)
+        bucket_path = os.path.join(FLAGS.buckets_path, 'testbucket')
+        self.assertEquals([name for name in os.listdir(bucket_path)
+                           if not name.startswith(s3server.INDEX_NAME)], [])
+
+    def test_reserved_names_are_refused(self):
+        self._create_key('somekey', '0123456789')
+        for name in (s3server.INDEX_NAME, s3server.INDEX_NAME + '-journal',
+                     s3server.UPLOAD_PREFIX + 'abc'):
+            path = '/testbucket/%s' % name
+            request = webob.Request.blank(path, method='PUT', body='x')
+            self.assertEquals(request.get_response(self.router).status_int,
+                              400)
+            for method in ('GET', 'DELETE'):
+                request = webob.Request.blank(path, method=method)
+                self.assertEquals(
+                        request.get_response(self.router).status_int, 404)
+        bucket = self.conn.get_bucket('testbucket')
+        self.assertEquals([key.name for key in bucket.get_all_keys()],
+                          ['somekey'])
+
+    def test_get_range(self):
+        key = self._create_key('somekey', '0123456789')
+        self.assertEquals(key.get_contents_as_string(
+                headers={'Range': 'bytes=2-5'}), '2345')
+        self.assertEquals(key.get_contents_as_string(
+                headers={'Range': 'bytes=7-'}), '789')
+        self.assertEquals(key.get_contents_as_string(
+                headers={'Range': 'bytes=-3'}), '789')
+        self.assertEquals(key.get_contents_as_string(
+                headers={'Range': 'bytes=8-100'}), '89')
+        self.assertEquals(key.get_contents_as_string(
+                headers={'Range': 'bytes=5-2'}), '0123456789')
+
+    def test_get_uses_file_wrapper(self):
+        self._create_key('somekey', '0123456789')
+        wrapped = []
+
+        def file_wrapper(object_file, block_size):
+            wrapped.append(block_size)
+            return iter(lambda: object_file.read(block_size), '')
+
+        request = webob.Request.blank('/testbucket/somekey')
+        request.environ['wsgi.file_wrapper'] = file_wrapper
+        response = request.get_response(self.router)
+        self.assertEquals(response.body, '0123456789')
+        self.assertEquals(response.headers['Accept-Ranges'], 'bytes')
+        self.assertEquals(wrapped, [FLAGS.s3_chunk_size])
+
+    def test_get_unsatisfiable_range(self):
+        key = self._create_key('somekey', '0123456789')
+        try:
+            key.get_contents_as_string(headers={'Range': 'bytes=10-'})
+        except boto_exception.S3ResponseError, e:
+            self.assertEquals(e.status, 416)
+        else:
+            self.fail('Expected 416 for a range past the end')
+
+    def test_get_multiple_ranges(self):
+        key = self._create_key('somekey', '0123456789')
+        key.open_read(headers={'Range': 'bytes=0-1,-2'})
+        response = key.resp
+        body = response.read()
+        key.close()
+        self.assertEquals(response.status, 206)
+        content_type = response.getheader('content-type')
+        self.assertTrue(content_type.startswith('multipart/byteranges'))
+        boundary = content_type.split('boundary=')[1]
+        self.assertEquals(int(response.getheader('content-length')),
+                          len(body))
+        parts = body.split('--%s' % boundary)
+        self.assertEquals(parts[0], '')
+        self.assertEquals(parts[-1], '--\r\n')
+        self.assertTrue('Content-Range: bytes 0-1/10' in parts[1])
+        self.assertTrue(parts[1].endswith('\r\n\r\n01\r\n'))
+        self.assertTrue('Content-Range: bytes 8-9/10' in parts[2])
+        self.assertTrue(parts[2].endswith('\r\n\r\n89\r\n'))
+
+    def test_list_keys_with_prefix_marker_and_max_keys(self):
+        b = self.conn.create_bucket('testbucket')
+        for key_name in ('a1', 'b1', 'b2', 'b3', 'c1'):
+            b.new_key(key_name).set_contents_from_string(key_name * 2)
+
+        def list_keys(**kwargs):
+            return [(key.name, key.size)
+                    for key in b.get_all_keys(**kwargs)]
+
+        self.assertEquals([name for name, size in list_keys()],
+                          ['a1', 'b1', 'b2', 'b3', 'c1'])
+        self.assertEquals(list_keys(prefix='b'),
+                          [('b1', 4), ('b2', 4), ('b3', 4)])
+        self.assertEquals(list_keys(prefix='b', marker='b1'),
+                          [('b2', 4), ('b3', 4)])
+        keys = b.get_all_keys(prefix='b', maxkeys=2)
+        self.assertEquals([key.name for key in keys], ['b1', 'b2'])
+        self.assertTrue(keys.is_truncated)
+
+        b.delete_key('b2')
+        self.assertEquals([name for name, size in list_keys(prefix='b')],
+                          ['b1', 'b3'])
+        for key_name in ('a1', 'b1', 'b3', 'c1'):
+            b.delete_key(key_name)
+        self.conn.delete_bucket('testbucket')
+        self._ensure_no_buckets(self.conn.get_all_buckets())
+
     def test_unknown_bucket(self):
         bucket_name = 'falalala'
         self.assertRaises(boto_exception.S3ResponseError,
@@ -138,3 +270,65 @@ class S3APITestCase(test.TestCase):
         """Tear down test server."""
         self.server.stop()
         super(S3APITestCase, self).tearDown()
+
+
+class BucketIndexTestCase(test.TestCase):
+    def setUp(self):
+        super(BucketIndexTestCase, self).setUp()
+        self.directory = tempfile.mkdtemp(prefix='test_oss-index-')
+        self.application = s3server.S3Application(self.directory,
+                                                  bucket_depth=1)
+        os.mkdir(os.path.join(self.directory, 'bucket'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(BucketIndexTestCase, self).tearDown()
+
+    def _write(self, object_name, contents):
+        path = self.application.object_path('bucket', object_name)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as object_file:
+            object_file.write(contents)
+
+    def _names(self, index):
+        return [(name, size) for name, size, mtime in index.list('', '', 10)]
+
+    def test_missing_index_is_rebuilt(self):
+        self._write('one', 'x')
+        self._write('two', 'xx')
+        index = self.application.bucket_index('bucket')
+        self.assertEqual(self._names(index), [('one', 1), ('two', 2)])
+
+    def test_pending_changes_are_recovered(self):
+        index = self.application.bucket_index('bucket')
+        self._write('one', 'x')
+        index.finish('one', index.begin('one'))
+        self._write('two', 'xx')
+        index.begin('two')
+        os.unlink(self.application.object_path('bucket', 'one'))
+        index.begin('one')
+        index.close()
+
+        index = s3server.BucketIndex(self.application, 'bucket')
+        self.assertEqual(self._names(index), [('two', 2)])
+
+
+class ParseRangeTestCase(test.TestCase):
+    def test_parse_range(self):
+        self.assertEqual(s3server.parse_range('bytes=0-4', 10), [(0, 5)])
+        self.assertEqual(s3server.parse_range('bytes=5-', 10), [(5, 10)])
+        self.assertEqual(s3server.parse_range('bytes=-4', 10), [(6, 10)])
+        self.assertEqual(s3server.parse_range('bytes=-40', 10), [(0, 10)])
+        self.assertEqual(s3server.parse_range('bytes=0-0, 9-20', 10),
+                         [(0, 1), (9, 10)])
+
+    def test_parse_unsatisfiable_range(self):
+        self.assertEqual(s3server.parse_range('bytes=10-', 10), [])
+        self.assertEqual(s3server.parse_range('bytes=-0', 10), [])
+        self.assertEqual(s3server.parse_range('bytes=0-', 0), [])
+
+    def test_parse_malformed_range(self):
+        for header in ('bytes=4-1', 'bytes=a-b', 'bytes=4', 'items=0-1',
+                       'bytes'):
+            self.assertEqual(s3server.parse_range(header, 10), None)
@@ -23,9 +23,14 @@ from nova import flags
 from nova import quota
 from nova import rpc
 from nova import test
+from nova import utils
 from nova import volume
 from nova.compute import instance_types
+from nova.db.sqlalchemy import api as sqlalchemy_api
+from nova.db.sqlalchemy import models
+from nova.db.sqlalchemy.session import get_session
 from nova.scheduler import driver as scheduler_driver
+from nova.scheduler import manager as scheduler_manager
 
 
 FLAGS = flags.FLAGS
@@ -400,3 +405,156 @@ class QuotaTestCase(test.TestCase):
         files = [(path, 'config = quotatest')]
         self.assertRaises(quota.QuotaError,
                           self._create_with_injected_files, files)
+
+    def _get_usage(self, resource):
+        usages = db.quota_usage_get_all_by_project(self.context,
+                                                   self.project_id)
+        return usages.get(resource, dict(in_use=0, reserved=0))
+
+    def test_usage_follows_instances(self):
+        instance_id = self._create_instance(cores=2)
+        self.assertEqual(self._get_usage('instances')['in_use'], 1)
+        self.assertEqual(self._get_usage('cores')['in_use'], 2)
+        db.instance_update(self.context, instance_id, {'vcpus': 3})
+        self.assertEqual(self._get_usage('instances')['in_use'], 1)
+        self.assertEqual(self._get_usage('cores')['in_use'], 3)
+        db.instance_destroy(self.context, instance_id)
+        self.assertEqual(self._get_usage('instances')['in_use'], 0)
+        self.assertEqual(self._get_usage('cores')['in_use'], 0)
+
+    def test_usage_follows_volumes(self):
+        volume_id = self._create_volume(size=5)
+        db.volume_update(self.context, volume_id, {'size': 7})
+        self.assertEqual(self._get_usage('volumes')['in_use'], 1)
+        self.assertEqual(self._get_usage('gigabytes')['in_use'], 7)
+        db.volume_destroy(self.context, volume_id)
+        self.assertEqual(self._get_usage('gigabytes')['in_use'], 0)
+
+    def test_usage_follows_floating_ips(self):
+        admin_context = context.get_admin_context()
+        address = '192.168.0.100'
+        db.floating_ip_create(admin_context, {'address': address})
+        self.assertEqual(self._get_usage('floating_ips')['in_use'], 0)
+        db.floating_ip_allocate_address(self.context, self.project_id)
+        self.assertEqual(self._get_usage('floating_ips')['in_use'], 1)
+        db.floating_ip_set_auto_assigned(admin_context, address)
+        self.assertEqual(self._get_usage('floating_ips')['in_use'], 0)
+        db.floating_ip_update(admin_context, address,
+                              {'auto_assigned': False})
+        self.assertEqual(self._get_usage('floating_ips')['in_use'], 1)
+        db.floating_ip_deallocate(admin_context, address)
+        self.assertEqual(self._get_usage('floating_ips')['in_use'], 0)
+        db.floating_ip_destroy(admin_context, address)
+
+    def test_reservations_count_against_quota(self):
+        instance_type = self._get_instance_type('m1.small')
+        num, reservations = quota.reserve_instances(self.context, 1, 5,
+                                                    instance_type, 'r-1')
+        self.assertEqual(num, 2)
+        self.assertEqual(len(reservations), 3)
+        self.assertEqual(self._get_usage('instances'),
+                         dict(in_use=0, reserved=2))
+        self.assertEqual(quota.allowed_instances(self.context, 1,
+                                                 instance_type), 0)
+        num, more = quota.reserve_instances(self.context, 1, 1,
+                                            instance_type, 'r-2')
+        self.assertEqual((num, more), (0, []))
+        quota.release(self.context, reservations)
+        self.assertEqual(self._get_usage('instances'),
+                         dict(in_use=0, reserved=0))
+        self.assertEqual(quota.allowed_instances(self.context, 5,
+                                                 instance_type), 2)
+
+    def test_instances_use_up_reservations(self):
+        instance_type = self._get_instance_type('m1.medium')
+        num, reservations = quota.reserve_instances(self.context, 1, 2,
+                                                    instance_type, 'r-fakeres')
+        self.assertEqual(num, 2)
+        self.assertEqual(self._get_usage('cores')['reserved'], 4)
+        self._create_instance(cores=2)
+        self.assertEqual(self._get_usage('cores'),
+                         dict(in_use=2, reserved=2))
+        self.assertEqual(self._get_usage('instances'),
+                         dict(in_use=1, reserved=1))
+        quota.release(self.context, reservations)
+        self.assertEqual(self._get_usage('cores'),
+                         dict(in_use=2, reserved=0))
+
+    def test_scheduler_gives_back_leftover_reservations(self):
+        def fake_schedule(*args, **kwargs):
+            self._create_instance(cores=2)
+            raise rpc.RemoteError('NoValidHost', '', '')
+
+        instance_type = self._get_instance_type('m1.medium')
+        quota.reserve_instances(self.context, 1, 2, instance_type,
+                                'r-fakeres')
+        scheduler = scheduler_manager.SchedulerManager()
+        self.stubs.Set(scheduler.driver, 'schedule_run_instance',
+                       fake_schedule)
+        request_spec = {'instance_properties': {'project_id': self.project_id,
+                                                'reservation_id': 'r-fakeres'}}
+        self.assertRaises(rpc.RemoteError, scheduler.run_instance,
+                          self.context, 'compute', request_spec=request_spec)
+        self.assertEqual(self._get_usage('cores'),
+                         dict(in_use=2, reserved=0))
+        self.assertEqual(self._get_usage('instances'),
+                         dict(in_use=1, reserved=0))
+
+    def test_usage_insert_loses_race_quietly(self):
+        self._create_volume(size=5)
+        session = get_session()
+        with session.begin():
+            self.assertFalse(sqlalchemy_api._quota_usage_insert(
+                    session, self.project_id, 'gigabytes', 3))
+            sqlalchemy_api._quota_usage_add(session, self.project_id,
+                                            {'gigabytes': 3})
+        self.assertEqual(self._get_usage('gigabytes')['in_use'], 8)
+
+    def test_reservations_expire(self):
+        self.flags(reservation_expire=60)
+        utils.set_time_override()
+        try:
+            num, reservations = quota.reserve_volume(self.context, 10)
+            self.assertEqual((num, len(reservations)), (1, 2))
+            admin_context = context.get_admin_context()
+            self.assertEqual(db.reservation_expire(admin_context), 0)
+            utils.advance_time_seconds(61)
+            self.assertEqual(db.reservation_expire(admin_context), 2)
+            self.assertEqual(self._get_usage('gigabytes'),
+                             dict(in_use=0, reserved=0))
+        finally:
+            utils.clear_time_override()
+
+    def test_failed_create_gives_back_reservations(self):
+        def fake_schedule(*args, **kwargs):
+            raise rpc.RemoteError('NoValidHost', '', '')
+
+        api = compute.API()
+        self.stubs.Set(api, '_schedule_run_instance', fake_schedule)
+        inst_type = instance_types.get_instance_type_by_name('m1.small')
+        image_uuid = 'cedef40a-ed67-4d10-800e-17455edce175'
+        self.assertRaises(rpc.RemoteError, api.create, self.context,
+                          instance_type=inst_type, image_href=image_uuid)
+        self.assertEqual(self._get_usage('instances'),
+                         dict(in_use=0, reserved=0))
+
+    def test_quota_usage_reconcile(self):
+        admin_context = context.get_admin_context()
+        self._create_volume(size=5)
+        session = get_session()
+        session.query(models.QuotaUsage).\
+                filter_by(project_id=self.project_id).\
+                filter_by(resource='gigabytes').\
+                update({'in_use': 8})
+        drift = db.quota_usage_reconcile(admin_context)
+        self.assertEqual(drift, {(self.project_id, 'gigabytes'): (8, 5)})
+        self.assertEqual(self._get_usage('gigabytes')['in_use'], 5)
+        self.assertEqual(db.quota_usage_reconcile(admin_context), {})
+
+        session.query(models.QuotaUsage).\
+                filter_by(project_id=self.project_id).\
+                delete()
+        drift = db.quota_usage_reconcile(admin_context)
+        self.assertEqual(drift, {(self.project_id, 'volumes'): (0, 1),
+                                 (self.project_id, 'gigabytes'): (0, 5)})
+        self.assertEqual(self._get_usage('volumes')['in_use'], 1)
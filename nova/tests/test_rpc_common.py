@@ -128,8 +128,8 @@ class _BaseRpcTestCase(test.TestCase):
             @staticmethod
             def echo(context, queue, value):
                 """Calls echo in the passed queue"""
-                LOG.debug(_("Nested received %(queue)s, %(value)s")
-                        % locals())
+                LOG.debug(_("Nested received %(queue)s, %(value)s"),
+                        locals())
                 # TODO: so, it will replay the context and use the same REQID?
                 # that's bizarre.
                 ret = self.rpc.call(context,
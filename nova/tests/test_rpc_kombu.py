@@ -65,6 +65,24 @@ class RpcKombuTestCase(test_rpc_common._BaseRpcTestCase):
 
         self.assertEqual(self.received_message, message)
 
+    def test_topic_send_many_receive(self):
+        """Test sending a batch of messages to a topic exchange/queue"""
+
+        conn = self.rpc.create_connection()
+        messages = ['first message', 'second message', 'third message']
+
+        self.received_messages = []
+
+        def _callback(message):
+            self.received_messages.append(message)
+
+        conn.declare_topic_consumer('a_topic', _callback)
+        conn.topic_send_many('a_topic', messages)
+        conn.consume(limit=3)
+        conn.close()
+
+        self.assertEqual(self.received_messages, messages)
+
     def test_direct_send_receive(self):
         """Test sending to a direct exchange/queue"""
         conn = self.rpc.create_connection()
@@ -0,0 +1,190 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests for the SSH connection handling of the SAN volume drivers.
+
+"""
+
+import eventlet
+import paramiko
+
+from nova import test
+from nova.volume import san
+
+
+class FakeSANServer(object):
+    """Stands in for the SAN's SSH server, recording every command."""
+
+    def __init__(self):
+        self.commands = []
+        self.connections = []
+        self.active = 0
+        self.max_active = 0
+        self.delay = 0
+        self.fail_open = False
+        self.fail_next = False
+
+    def connect(self):
+        client = FakeSSHClient(self)
+        self.connections.append(client)
+        return client
+
+
+class FakeTransport(object):
+
+    def __init__(self, server):
+        self.server = server
+        self.active = True
+        self.keepalive = None
+
+    def is_active(self):
+        return self.active
+
+    def set_keepalive(self, interval):
+        self.keepalive = interval
+
+    def open_session(self):
+        if self.server.fail_open:
+            self.server.fail_open = False
+            raise paramiko.SSHException('connection reset')
+        return FakeChannel(self.server)
+
+
+class FakeStream(object):
+
+    def __init__(self, data='', exit_status=0):
+        self.data = data
+        self.channel = self
+        self.exit_status = exit_status
+
+    def read(self):
+        return self.data
+
+    def close(self):
+        pass
+
+    def recv_exit_status(self):
+        return self.exit_status
+
+
+class FakeChannel(object):
+
+    def __init__(self, server):
+        self.server = server
+
+    def exec_command(self, command):
+        self.server.commands.append(command)
+        if self.server.fail_next:
+            self.server.fail_next = False
+            raise paramiko.SSHException('connection reset')
+        self.server.active += 1
+        self.server.max_active = max(self.server.max_active,
+                                     self.server.active)
+        eventlet.sleep(self.server.delay)
+        self.server.active -= 1
+
+    def makefile(self, mode, bufsize):
+        return FakeStream()
+
+    def makefile_stderr(self, mode, bufsize):
+        return FakeStream()
+
+
+class FakeSSHClient(object):
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = FakeTransport(server)
+        self.closed = False
+
+    def get_transport(self):
+        return self.transport
+
+    def close(self):
+        self.closed = True
+
+
+class SanSSHPoolTestCase(test.TestCase):
+
+    def setUp(self):
+        super(SanSSHPoolTestCase, self).setUp()
+        self.flags(san_ip='10.0.0.1', san_password='secret',
+                   san_ssh_pool_size=2, san_ssh_keepalive=15)
+        self.server = FakeSANServer()
+        self.stubs.Set(san, '_ssh_pools', {})
+        self.stubs.Set(san.SanISCSIDriver, '_connect_to_ssh',
+                       lambda driver: self.server.connect())
+        self.driver = san.SolarisISCSIDriver()
+
+    def test_connection_is_reused(self):
+        for i in xrange(3):
+            self.driver._run_ssh('true')
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(self.server.connections[0].transport.keepalive, 15)
+
+    def test_pool_is_shared_between_drivers(self):
+        self.driver._run_ssh('true')
+        san.HpSanISCSIDriver()._run_ssh('true')
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_dead_connection_is_replaced(self):
+        self.driver._run_ssh('true')
+        self.server.connections[0].transport.active = False
+        self.driver._run_ssh('true')
+        self.assertEqual(len(self.server.connections), 2)
+        self.assertTrue(self.server.connections[0].closed)
+
+    def test_idle_connection_is_replaced(self):
+        self.flags(san_ssh_idle_timeout=0)
+        self.driver._run_ssh('true')
+        self.driver._run_ssh('true')
+        self.assertEqual(len(self.server.connections), 2)
+
+    def test_dropped_connection_is_retried(self):
+        self.driver._run_ssh('true')
+        self.server.fail_open = True
+        self.driver._run_ssh('uptime')
+        self.assertEqual(self.server.commands, ['true', 'uptime'])
+        self.assertTrue(self.server.connections[0].closed)
+        self.assertEqual(len(self.server.connections), 2)
+
+    def test_sent_command_is_not_retried(self):
+        self.driver._run_ssh('true')
+        self.server.fail_next = True
+        self.assertRaises(paramiko.SSHException,
+                          self.driver._run_ssh, 'create-lu')
+        self.assertEqual(self.server.commands, ['true', 'create-lu'])
+        self.assertTrue(self.server.connections[0].closed)
+
+    def test_pool_is_bounded(self):
+        self.server.delay = 0.01
+        pool = eventlet.GreenPool()
+        for i in xrange(6):
+            pool.spawn_n(self.driver._run_ssh, 'true')
+        pool.waitall()
+        self.assertEqual(len(self.server.commands), 6)
+        self.assertEqual(self.server.max_active, 2)
+        self.assertEqual(len(self.server.connections), 2)
+
+    def test_create_export_is_pipelined(self):
+        self.stubs.Set(self.driver, '_get_luid', lambda volume: 'luid')
+        self.driver.create_export(None, {'name': 'volume-00000001'})
+        self.assertEqual(len(self.server.commands), 2)
+        self.assertEqual(self.server.commands[1].count(' && '), 3)
+
+    def test_pipeline_runs_serially_without_shell(self):
+        san.HpSanISCSIDriver()._run_ssh_pipeline(['a', 'b'])
+        self.assertEqual(self.server.commands, ['a', 'b'])
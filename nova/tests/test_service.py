@@ -21,6 +21,7 @@ Unit Tests for remote procedure calls using queue
 """
 
 import mox
+import time
 
 from nova import context
 from nova import db
@@ -68,6 +69,72 @@ class ServiceManagerTestCase(test.TestCase):
         self.assertEqual(serv.test_method(), 'service')
 
 
+class PeriodicTaskManager(manager.Manager):
+    def __init__(self, *args, **kwargs):
+        super(PeriodicTaskManager, self).__init__(*args, **kwargs)
+        self.calls = []
+
+    @manager.periodic_task
+    def _every_tick(self, context):
+        self.calls.append('every_tick')
+
+    @manager.periodic_task(interval=3600)
+    def _hourly(self, context):
+        self.calls.append('hourly')
+
+    @manager.periodic_task(budget=0.000001)
+    def _failing(self, context):
+        raise exception.Error('broken')
+
+
+class PeriodicTaskTestCase(test.TestCase):
+    def test_tasks_are_collected_in_order(self):
+        self.assertEqual(PeriodicTaskManager._periodic_tasks,
+                         ['_every_tick', '_hourly', '_failing'])
+
+    def test_interval_and_errors(self):
+        mgr = PeriodicTaskManager()
+        errors = mgr.periodic_tasks(context.get_admin_context())
+        self.assertEqual(len(errors), 1)
+        mgr.periodic_tasks(context.get_admin_context())
+        self.assertEqual(mgr.calls, ['every_tick', 'hourly', 'every_tick'])
+
+        stats = mgr.get_periodic_task_stats()
+        self.assertEqual(stats['_every_tick']['runs'], 2)
+        self.assertEqual(stats['_hourly']['runs'], 1)
+        self.assertEqual(stats['_failing']['errors'], 2)
+        self.assertEqual(stats['_failing']['overruns'], 2)
+
+    def test_interval_from_flag(self):
+        class FlagIntervalManager(manager.Manager):
+            @manager.periodic_task(interval='report_interval', jitter=True)
+            def _task(self, context):
+                pass
+
+        self.flags(report_interval=5)
+        mgr = FlagIntervalManager()
+        mgr.periodic_tasks(context.get_admin_context())
+        next_run = mgr.get_periodic_task_stats()['_task']['next_run']
+        self.assertTrue(next_run > time.time())
+
+    def test_overrunning_task(self):
+        class SlowManager(manager.Manager):
+            @manager.periodic_task(budget=0.01)
+            def _slow(self, context):
+                time.sleep(0.05)
+
+            @manager.periodic_task(budget=10)
+            def _fast(self, context):
+                pass
+
+        mgr = SlowManager()
+        mgr.periodic_tasks(context.get_admin_context())
+        stats = mgr.get_periodic_task_stats()
+        self.assertEqual(stats['_slow']['overruns'], 1)
+        self.assertTrue(stats['_slow']['last_duration'] >= 0.05)
+        self.assertEqual(stats['_fast']['overruns'], 0)
+
+
 class ServiceFlagsTestCase(test.TestCase):
     def test_service_enabled_on_create_based_on_flag(self):
         self.flags(enable_new_services=True)
@@ -98,6 +165,7 @@ class ServiceTestCase(test.TestCase):
     def setUp(self):
         super(ServiceTestCase, self).setUp()
         self.mox.StubOutWithMock(service, 'db')
+        self.mox.StubOutWithMock(service.heartbeat, 'heartbeat')
 
     def test_create(self):
         host = 'foo'
@@ -131,8 +199,8 @@ class ServiceTestCase(test.TestCase):
                                       binary).AndRaise(exception.NotFound())
         service.db.service_create(mox.IgnoreArg(),
                                   service_create).AndReturn(service_ref)
-        service.db.service_get(mox.IgnoreArg(),
-                               mox.IgnoreArg()).AndRaise(Exception())
+        service.heartbeat.heartbeat(mox.IgnoreArg(),
+                                    mox.IgnoreArg()).AndRaise(Exception())
 
         self.mox.ReplayAll()
         serv = service.Service(host,
@@ -164,10 +232,7 @@ class ServiceTestCase(test.TestCase):
                                       binary).AndRaise(exception.NotFound())
         service.db.service_create(mox.IgnoreArg(),
                                   service_create).AndReturn(service_ref)
-        service.db.service_get(mox.IgnoreArg(),
-                               service_ref['id']).AndReturn(service_ref)
-        service.db.service_update(mox.IgnoreArg(), service_ref['id'],
-                                  mox.ContainsKeyValue('report_count', 1))
+        service.heartbeat.heartbeat(mox.IgnoreArg(), mox.IgnoreArg())
 
         self.mox.ReplayAll()
         serv = service.Service(host,
@@ -180,6 +245,37 @@ class ServiceTestCase(test.TestCase):
 
         self.assert_(not serv.model_disconnected)
 
+    def test_report_state_recreates_missing_service(self):
+        host = 'foo'
+        binary = 'bar'
+        topic = 'test'
+        service_create = {'host': host,
+                          'binary': binary,
+                          'topic': topic,
+                          'report_count': 0,
+                          'availability_zone': 'nova'}
+        service_ref = {'id': 1}
+
+        service.db.service_get_by_args(mox.IgnoreArg(),
+                                      host,
+                                      binary).AndReturn({'id': 2})
+        service.heartbeat.heartbeat(mox.IgnoreArg(), mox.IgnoreArg()).\
+                AndRaise(exception.ServiceNotFound(service_id=2))
+        service.db.service_create(mox.IgnoreArg(),
+                                  service_create).AndReturn(service_ref)
+        service.heartbeat.heartbeat(mox.IgnoreArg(), mox.IgnoreArg())
+
+        self.mox.ReplayAll()
+        serv = service.Service(host,
+                               binary,
+                               topic,
+                               'nova.tests.test_service.FakeManager')
+        serv.start()
+        serv.report_state()
+
+        self.assertEqual(serv.service_id, 1)
+        self.assert_(not serv.model_disconnected)
+
 
 class TestWSGIService(test.TestCase):
 
@@ -23,6 +23,7 @@ from nova import exception
 from nova import flags
 from nova import test
 from nova import utils
+from nova.db.sqlalchemy import models
 
 
 FLAGS = flags.FLAGS
@@ -405,6 +406,48 @@ class ToPrimitiveTestCase(test.TestCase):
         self.assertTrue(ret[1].startswith(u'<function foo at 0x'))
         self.assertEquals(ret[2], u'<built-in function dir>')
 
+    def test_cycles(self):
+        x = {'a': [1]}
+        x['a'].append(x)
+        self.assertEquals(utils.to_primitive(x), {'a': [1, '?']})
+
+    def test_shared_values_are_not_cycles(self):
+        shared = [1, 2]
+        self.assertEquals(utils.to_primitive([shared, shared]),
+                          [[1, 2], [1, 2]])
+
+    def test_instance_cycles(self):
+        class MysteryClass(object):
+            def __init__(self):
+                self.b = 1
+                self.me = self
+
+        self.assertEquals(utils.to_primitive(MysteryClass(),
+                                             convert_instances=True),
+                          dict(b=1, me='?'))
+
+    def test_model(self):
+        instance = models.Instance(id=1, display_name='name',
+                                   launched_at=datetime.datetime(1, 2, 3))
+        instance.instance_type = models.InstanceTypes(id=2)
+        ret = utils.to_primitive(instance)
+        self.assertEquals(ret['id'], 1)
+        self.assertEquals(ret['display_name'], 'name')
+        self.assertEquals(ret['launched_at'], '0001-02-03 00:00:00')
+        self.assertEquals(ret['user_data'], None)
+        self.assertFalse('instance_type' in ret)
+
+    def test_dumps(self):
+        x = {'a': datetime.datetime(1, 2, 3), 'b': set([1])}
+        self.assertEquals(utils.loads(utils.dumps(x)),
+                          {'a': '0001-02-03 00:00:00', 'b': [1]})
+
+    def test_dumps_unserializable(self):
+        class MysteryClass(object):
+            pass
+
+        self.assertRaises(TypeError, utils.dumps, MysteryClass())
+
 
 class MonkeyPatchTestCase(test.TestCase):
     """Unit test for utils.monkey_patch()."""
@@ -0,0 +1,130 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import tempfile
+
+from nova import exception
+from nova import test
+from nova import utils
+from nova.virt import disk
+
+
+class NbdDeviceTestCase(test.TestCase):
+
+    def setUp(self):
+        super(NbdDeviceTestCase, self).setUp()
+        self.lock_path = tempfile.mkdtemp()
+        self.flags(lock_path=self.lock_path, max_nbd_devices=4,
+                   timeout_nbd=1)
+        self.used = set(['nbd0', 'nbd1'])
+        self.cmds = []
+        real_exists = os.path.exists
+
+        def fake_exists(path):
+            if path.startswith('/sys/block/'):
+                return path.split('/')[3] in self.used
+            return real_exists(path)
+
+        def fake_execute(*cmd, **kwargs):
+            self.cmds.append(cmd)
+            if cmd[:2] == ('qemu-nbd', '-c'):
+                self.used.add(os.path.basename(cmd[2]))
+            return '', ''
+
+        self.stubs.Set(os.path, 'exists', fake_exists)
+        self.stubs.Set(utils, 'execute', fake_execute)
+        self.stubs.Set(disk.time, 'sleep', lambda secs: None)
+
+    def tearDown(self):
+        shutil.rmtree(self.lock_path)
+        super(NbdDeviceTestCase, self).tearDown()
+
+    def test_link_device_skips_used_devices(self):
+        self.assertEqual(disk._link_device('image', True), '/dev/nbd2')
+        self.assertEqual(disk._link_device('image', True), '/dev/nbd3')
+        self.assertEqual(self.cmds,
+                         [('qemu-nbd', '-c', '/dev/nbd2', 'image'),
+                          ('qemu-nbd', '-c', '/dev/nbd3', 'image')])
+
+    def test_link_device_no_free_devices(self):
+        self.used.update(['nbd2', 'nbd3'])
+        self.flags(timeout_nbd=0)
+        failures = disk.get_injection_stats()['nbd_failures']
+        self.assertRaises(exception.Error, disk._link_device, 'image', True)
+        self.assertEqual(disk.get_injection_stats()['nbd_failures'],
+                         failures + 1)
+        self.assertEqual(self.cmds, [])
+
+    def test_device_disconnected_if_it_never_shows_up(self):
+        def fake_execute(*cmd, **kwargs):
+            self.cmds.append(cmd)
+            return '', ''
+
+        self.stubs.Set(utils, 'execute', fake_execute)
+        self.assertRaises(exception.Error, disk._link_device, 'image', True)
+        self.assertEqual(self.cmds,
+                         [('qemu-nbd', '-c', '/dev/nbd2', 'image'),
+                          ('qemu-nbd', '-d', '/dev/nbd2')])
+
+    def test_allocation_stats(self):
+        before = disk.get_injection_stats()['nbd_allocations']
+        disk._link_device('image', True)
+        self.assertEqual(disk.get_injection_stats()['nbd_allocations'],
+                         before + 1)
+
+
+class GuestfsInjectionTestCase(test.TestCase):
+
+    def setUp(self):
+        super(GuestfsInjectionTestCase, self).setUp()
+        self.flags(inject_with_guestfs=True)
+        self.cmds = []
+
+        def fake_execute(*cmd, **kwargs):
+            self.cmds.append((cmd, kwargs.get('process_input')))
+            return '', ''
+
+        self.stubs.Set(utils, 'execute', fake_execute)
+
+    def test_quote(self):
+        self.assertEqual(disk._guestfish_quote('a "b"\\\nc'),
+                         '"a \\"b\\"\\\\\\nc"')
+
+    def test_inject_key_and_net(self):
+        disk.inject_data('image', key='ssh-rsa AAA', net='auto lo\n',
+                         partition=1, nbd=True)
+        self.assertEqual(len(self.cmds), 1)
+        cmd, script = self.cmds[0]
+        self.assertEqual(cmd, ('guestfish', '--rw', '-a', 'image',
+                               '-m', '/dev/sda1'))
+        lines = script.splitlines()
+        self.assertTrue('mkdir-p /root/.ssh' in lines)
+        self.assertTrue('write-append /root/.ssh/authorized_keys '
+                        '"\\nssh-rsa AAA\\n"' in lines)
+        self.assertTrue('write /etc/network/interfaces "auto lo\\n"'
+                        in lines)
+
+    def test_nothing_to_inject(self):
+        disk.inject_data('image', nbd=True)
+        self.assertEqual(self.cmds, [])
+
+    def test_raw_images_are_mounted(self):
+        self.stubs.Set(disk, '_inject_data_with_mount',
+                       lambda *args: self.cmds.append(('mount', args)))
+        disk.inject_data('image', key='ssh-rsa AAA', nbd=False)
+        self.assertEqual(self.cmds[0][0], 'mount')
@@ -0,0 +1,189 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Tests For the VNC console proxy.
+"""
+
+import gzip
+import os
+import shutil
+import StringIO
+import struct
+import tempfile
+
+import eventlet
+from eventlet import wsgi
+from eventlet.green import socket
+import webob
+
+from nova import test
+from nova.vnc import hybi
+from nova.vnc import proxy
+
+
+def _client_frame(opcode, payload, final=True):
+    """Return a frame as a client sends it, masked."""
+    mask = '\x01\x02\x03\x04'
+    header = hybi.frame_header(opcode, len(payload), mask)
+    if not final:
+        header = chr(ord(header[0]) & 0x7f) + header[1:]
+    return header + hybi.apply_mask(payload, mask)
+
+
+def _read_frame(sock):
+    """Read an unmasked frame as the server sends it."""
+    data = ''
+    while len(data) < 2:
+        data += sock.recv(2 - len(data))
+    first, second = struct.unpack('!BB', data)
+    length = second & 0x7f
+    if length == 126:
+        length = struct.unpack('!H', sock.recv(2))[0]
+    payload = ''
+    while len(payload) < length:
+        payload += sock.recv(length - len(payload))
+    return first & 0x0f, payload
+
+
+class HybiWebSocketTestCase(test.TestCase):
+    def setUp(self):
+        super(HybiWebSocketTestCase, self).setUp()
+        self.client, server = socket.socketpair()
+        self.ws = hybi.HybiWebSocket(server, {}, 'binary')
+
+    def test_accept_key(self):
+        self.assertEqual(hybi.accept_key('dGhlIHNhbXBsZSBub25jZQ=='),
+                         's3pPLMBiTxaQ9kYGzzhZRbK+xOo=')
+
+    def test_wait_unmasks_and_joins_fragments(self):
+        self.client.sendall(_client_frame(hybi.OPCODE_BINARY, 'abc', False) +
+                            _client_frame(hybi.OPCODE_CONTINUATION, 'x' * 300))
+        self.assertEqual(self.ws.wait(), 'abc' + 'x' * 300)
+
+    def test_ping_is_answered(self):
+        self.client.sendall(_client_frame(hybi.OPCODE_PING, 'hi') +
+                            _client_frame(hybi.OPCODE_BINARY, 'data'))
+        self.assertEqual(self.ws.wait(), 'data')
+        self.assertEqual(_read_frame(self.client), (hybi.OPCODE_PONG, 'hi'))
+
+    def test_close_is_answered(self):
+        self.client.sendall(_client_frame(hybi.OPCODE_CLOSE, '\x03\xe8'))
+        self.assertEqual(self.ws.wait(), None)
+        self.assertEqual(_read_frame(self.client),
+                         (hybi.OPCODE_CLOSE, '\x03\xe8'))
+
+    def test_send_buffer(self):
+        buf = bytearray(hybi.HEADER_ROOM + 200)
+        view = memoryview(buf)
+        view[hybi.HEADER_ROOM:] = 'y' * 200
+        self.ws.send_buffer(view, hybi.HEADER_ROOM, 150)
+        self.assertEqual(_read_frame(self.client),
+                         (hybi.OPCODE_BINARY, 'y' * 150))
+
+
+class WebsocketVNCProxyTestCase(test.TestCase):
+    def setUp(self):
+        super(WebsocketVNCProxyTestCase, self).setUp()
+        self.wwwroot = tempfile.mkdtemp(prefix='test_vncproxy-')
+        with open(os.path.join(self.wwwroot, 'vnc_auto.html'), 'w') as f:
+            f.write('<html>%s</html>' % ('console ' * 100))
+        with open(os.path.join(self.wwwroot, 'logo.png'), 'w') as f:
+            f.write('png')
+        self.proxy = proxy.WebsocketVNCProxy(self.wwwroot,
+                                             max_sessions=2,
+                                             max_sessions_per_host=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.wwwroot)
+        super(WebsocketVNCProxyTestCase, self).tearDown()
+
+    def test_static_files_are_cached_with_etag(self):
+        response = webob.Request.blank('/').get_response(self.proxy)
+        self.assertEqual(response.status_int, 200)
+        self.assertTrue(response.body.startswith('<html>console'))
+        etag = response.headers['etag']
+
+        request = webob.Request.blank('/')
+        request.headers['If-None-Match'] = etag
+        self.assertEqual(request.get_response(self.proxy).status_int, 304)
+
+        request = webob.Request.blank('/')
+        request.headers['Accept-Encoding'] = 'gzip, deflate'
+        response = request.get_response(self.proxy)
+        self.assertEqual(response.headers['content-encoding'], 'gzip')
+        body = gzip.GzipFile(fileobj=StringIO.StringIO(response.body)).read()
+        self.assertTrue(body.startswith('<html>console'))
+
+        request = webob.Request.blank('/logo.png')
+        request.headers['Accept-Encoding'] = 'gzip'
+        response = request.get_response(self.proxy)
+        self.assertEqual(response.body, 'png')
+        self.assertFalse('content-encoding' in response.headers)
+
+    def test_session_caps(self):
+        self.assertTrue(self.proxy._start_session('host1'))
+        self.assertFalse(self.proxy._start_session('host1'))
+        self.assertTrue(self.proxy._start_session('host2'))
+        self.assertFalse(self.proxy._start_session('host3'))
+        self.proxy._end_session('host1')
+
+        request = webob.Request.blank(proxy.WS_ENDPOINT)
+        request.environ['vnc_host'] = 'host2'
+        self.assertEqual(request.get_response(self.proxy).status_int, 503)
+        metrics = self.proxy.get_metrics()
+        self.assertEqual(metrics['active_sessions'], 1)
+        self.assertEqual(metrics['rejected_sessions'], 3)
+
+    def test_binary_relay(self):
+        vnc_listener = eventlet.listen(('127.0.0.1', 0))
+        vnc_port = vnc_listener.getsockname()[1]
+        proxy_listener = eventlet.listen(('127.0.0.1', 0))
+        app = proxy.DebugMiddleware(self.proxy)
+        server = eventlet.spawn(wsgi.server, proxy_listener, app,
+                                log=StringIO.StringIO())
+
+        client = eventlet.connect(proxy_listener.getsockname())
+        client.sendall('GET %s?host=127.0.0.1&port=%d HTTP/1.1\r\n'
+                       'Host: localhost\r\n'
+                       'Upgrade: websocket\r\n'
+                       'Connection: Upgrade\r\n'
+                       'Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n'
+                       'Sec-WebSocket-Protocol: base64, binary\r\n'
+                       'Sec-WebSocket-Version: 13\r\n\r\n'
+                       % (proxy.WS_ENDPOINT, vnc_port))
+        vnc, addr = vnc_listener.accept()
+        reply = ''
+        while not reply.endswith('\r\n\r\n'):
+            reply += client.recv(1)
+        self.assertTrue(reply.startswith('HTTP/1.1 101'))
+        self.assertTrue('Sec-WebSocket-Protocol: binary\r\n' in reply)
+
+        vnc.sendall('RFB 003.008\n')
+        self.assertEqual(_read_frame(client),
+                         (hybi.OPCODE_BINARY, 'RFB 003.008\n'))
+        client.sendall(_client_frame(hybi.OPCODE_BINARY, '\x00\x01'))
+        self.assertEqual(vnc.recv(2), '\x00\x01')
+
+        vnc.close()
+        self.assertEqual(_read_frame(client)[0], hybi.OPCODE_CLOSE)
+        metrics = self.proxy.get_metrics()
+        self.assertEqual(metrics['bytes_to_client'], 12)
+        self.assertEqual(metrics['bytes_to_server'], 2)
+        self.assertEqual(metrics['active_sessions'], 0)
+        client.close()
+        server.kill()
@@ -366,3 +366,163 @@ class ISCSITestCase(DriverTestCase):
         self.mox.UnsetStubs()
 
         self._detach_volume(volume_id_list)
+
+    def test_ensure_exports_only_recreates_missing(self):
+        volume_id_list = self._attach_volume()
+        volumes = [db.volume_get(self.context, i) for i in volume_id_list]
+        tids = [db.volume_get_iscsi_target_num(self.context, i)
+                for i in volume_id_list]
+
+        paths = ['/dev/nova-volumes/%s' % volume['name']
+                 for volume in volumes]
+        # the first export is complete, the second lost its logical unit
+        self.mox.StubOutWithMock(self.volume.driver.tgtadm, 'list_targets')
+        self.volume.driver.tgtadm.list_targets().AndReturn(
+                {tids[0]: set([paths[0]]), tids[1]: set()})
+        self.mox.ReplayAll()
+        exported = []
+
+        def _fake_ensure_export(volume, tid):
+            exported.append(tid)
+            if tid == tids[1]:
+                raise exception.ProcessExecutionError()
+        self.stubs.Set(self.volume.driver, '_ensure_export',
+                       _fake_ensure_export)
+        self.volume.driver.ensure_exports(self.context, volumes)
+        self.assertEqual(sorted(exported), sorted(tids[1:]))
+        msg = _("Could not recreate export for volume %s") % volumes[1]['name']
+        self.assertTrue(msg in self.stream.getvalue())
+        self.mox.UnsetStubs()
+
+        self._detach_volume(volume_id_list)
+
+
+class VolumeWipeTestCase(DriverTestCase):
+    """Test Case for the background volume wiper."""
+    driver_name = "nova.volume.driver.ISCSIDriver"
+
+    def setUp(self):
+        super(VolumeWipeTestCase, self).setUp()
+        self.flags(volume_wipe_async=True, volume_wipe_chunk_mb=100,
+                   volume_wipe_bandwidth_mb=0)
+        self.driver = self.volume.driver
+        self.cmds = []
+        self.lvs = ''
+
+        def _fake_execute(*cmd, **kwargs):
+            self.cmds.append(cmd)
+            if cmd[0] == 'lvs':
+                return self.lvs, None
+            return '', None
+        self.driver.set_execute(_fake_execute)
+        self.stubs.Set(self.driver, '_discard_zeroes_data',
+                       lambda path: False)
+
+    def test_delete_renames_volume(self):
+        self.driver._delete_volume({'name': 'volume-00000001'}, 1)
+        self.assertFalse([cmd for cmd in self.cmds if 'dd' in cmd])
+        self.assertEqual(self.cmds[-1], ('lvrename', 'nova-volumes',
+                                         'volume-00000001',
+                                         'wipe-volume-00000001'))
+
+    def test_wipe_resumes_from_tag(self):
+        self.lvs = ('  volume-00000002:1024.00:\n'
+                    '  wipe-volume-00000001:250.00:wiped_100\n')
+        self.driver.wipe_pending_volumes()
+        dd = [cmd for cmd in self.cmds if 'dd' in cmd]
+        self.assertEqual(len(dd), 2)
+        self.assertEqual(dd[0][:2], ('ionice', '-c3'))
+        self.assertTrue('seek=100' in dd[0] and 'count=100' in dd[0])
+        self.assertTrue('seek=200' in dd[1] and 'count=50' in dd[1])
+        self.assertTrue(('lvchange', '--addtag', 'wiped_250',
+                         '--deltag', 'wiped_200',
+                         'nova-volumes/wipe-volume-00000001') in self.cmds)
+        self.assertEqual(self.cmds[-1], ('lvremove', '-f',
+                                         'nova-volumes/wipe-volume-00000001'))
+
+    def test_volume_stats_count_wiping_volumes(self):
+        self.lvs = ('  volume-00000002:1024.00:\n'
+                    '  wipe-volume-00000001:3072.00:wiped_1024\n')
+        self.assertEqual(self.driver.get_volume_stats(refresh=True),
+                         {'volumes_wiping': 1, 'gigabytes_wiping': 2})
+
+
+class VolumeCloneTestCase(DriverTestCase):
+    """Test Case for creating volumes from snapshots."""
+    driver_name = "nova.volume.driver.ISCSIDriver"
+
+    def setUp(self):
+        super(VolumeCloneTestCase, self).setUp()
+        self.flags(volume_copy_chunk_mb=1000, volume_copy_bs_mb=4)
+        self.driver = self.volume.driver
+        self.cmds = []
+        self.attr = '  owi-a-'
+        self.pools = '  volume-00000002:-wi-a-\n'
+
+        def _fake_execute(*cmd, **kwargs):
+            self.cmds.append(cmd)
+            if cmd[:4] == ('lvs', '--noheadings', '-o', 'lv_attr'):
+                return self.attr, None
+            if cmd[0] == 'lvs':
+                return self.pools, None
+            return '', None
+        self.driver.set_execute(_fake_execute)
+        self.volume_id = db.volume_create(self.context, {'size': 2})['id']
+        self.snapshot = {'name': 'snapshot-00000001', 'volume_size': 2}
+
+    def test_chunked_copy_reports_progress(self):
+        volume = db.volume_get(self.context, self.volume_id)
+        self.driver.create_volume_from_snapshot(volume, self.snapshot)
+        dd = [cmd for cmd in self.cmds if cmd[0] == 'dd']
+        self.assertEqual(len(dd), 3)
+        self.assertTrue('skip=250' in dd[1] and 'seek=250' in dd[1])
+        self.assertTrue('count=12' in dd[2] and 'oflag=direct' in dd[2])
+        self.assertTrue('conv=sparse,notrunc' in dd[0])
+        volume = db.volume_get(self.context, self.volume_id)
+        self.assertEqual(volume['progress'], 100)
+
+    def test_dense_copy(self):
+        self.flags(volume_copy_sparse=False)
+        volume = db.volume_get(self.context, self.volume_id)
+        self.driver.create_volume_from_snapshot(volume, self.snapshot)
+        dd = [cmd for cmd in self.cmds if cmd[0] == 'dd']
+        self.assertTrue('conv=notrunc' in dd[0])
+
+    def test_copy_goes_to_thin_pool(self):
+        self.pools += '  pool:twi-a-tz-\n'
+        volume = db.volume_get(self.context, self.volume_id)
+        self.driver.create_volume_from_snapshot(volume, self.snapshot)
+        self.assertTrue(('lvcreate', '-T', 'nova-volumes/pool', '-V', '2G',
+                         '-n', volume['name']) in self.cmds)
+
+    def test_thin_pool_must_zero_blocks(self):
+        self.pools += '  pool:twi-a-t--\n'
+        volume = db.volume_get(self.context, self.volume_id)
+        self.driver.create_volume_from_snapshot(volume, self.snapshot)
+        self.assertTrue(('lvcreate', '-L', '2G', '-n', volume['name'],
+                         'nova-volumes') in self.cmds)
+
+    def test_thin_snapshot_is_cloned_without_copy(self):
+        self.attr = '  Vwi-a-tz-'
+        volume = db.volume_get(self.context, self.volume_id)
+        self.driver.create_volume_from_snapshot(volume, self.snapshot)
+        self.assertFalse([cmd for cmd in self.cmds if cmd[0] == 'dd'])
+        self.assertEqual(self.cmds[-1],
+                         ('lvcreate', '-s', '-kn', '-n', volume['name'],
+                          'nova-volumes/_snapshot-00000001'))
+        volume = db.volume_get(self.context, self.volume_id)
+        self.assertEqual(volume['progress'], 100)
+
+    def test_thin_volume_is_snapshotted_and_removed_without_wipe(self):
+        self.attr = '  Vwi-a-tz-'
+        snapshot = {'name': 'snapshot-00000001', 'volume_size': 2,
+                    'volume_name': 'volume-00000002'}
+        self.driver.create_snapshot(snapshot)
+        self.assertEqual(self.cmds[-1],
+                         ('lvcreate', '-s', '-kn',
+                          '--name', '_snapshot-00000001',
+                          'nova-volumes/volume-00000002'))
+        self.driver.delete_snapshot(snapshot)
+        self.assertFalse([cmd for cmd in self.cmds if cmd[0] == 'dd'])
+        self.assertEqual(self.cmds[-1],
+                         ('lvremove', '-f', 'nova-volumes/_snapshot-00000001'))
@@ -577,8 +577,8 @@ class XenAPIVMTestCase(test.TestCase):
 
             # mount point will be the last item of the command list
             self._tmpdir = cmd[len(cmd) - 1]
-            LOG.debug(_('Creating files in %s to simulate guest agent' %
-                self._tmpdir))
+            LOG.debug(_('Creating files in %s to simulate guest agent'),
+                self._tmpdir)
             os.makedirs(os.path.join(self._tmpdir, 'usr', 'sbin'))
             # Touch the file using open
             open(os.path.join(self._tmpdir, 'usr', 'sbin',
@@ -588,8 +588,8 @@ class XenAPIVMTestCase(test.TestCase):
         def _umount_handler(cmd, *ignore_args, **ignore_kwargs):
             # Umount would normall make files in the m,ounted filesystem
             # disappear, so do that here
-            LOG.debug(_('Removing simulated guest agent files in %s' %
-                self._tmpdir))
+            LOG.debug(_('Removing simulated guest agent files in %s'),
+                self._tmpdir)
             os.remove(os.path.join(self._tmpdir, 'usr', 'sbin',
                 'xe-update-networking'))
             os.rmdir(os.path.join(self._tmpdir, 'usr', 'sbin'))
@@ -1048,6 +1048,33 @@ class CompareVersionTestCase(test.TestCase):
         self.assertTrue(vmops.cmp_version('1.2.3', '1.2.3.4') < 0)
 
 
+class RRDUpdateTestCase(test.TestCase):
+    RRD_XML = ('<xport><meta><start>0</start><step>10</step><end>20</end>'
+               '<rows>2</rows><columns>2</columns><legend>'
+               '<entry>AVERAGE:vm:abc:cpu0</entry>'
+               '<entry>AVERAGE:vm:abc:vif_0_tx</entry>'
+               '</legend></meta><data>'
+               '<row><t>20</t><v>0.5000</v><v>10.0</v></row>'
+               '<row><t>10</t><v>NaN</v><v>20.0</v></row>'
+               '</data></xport>')
+
+    def test_parse_rrd(self):
+        meta, times, rows = vm_utils.parse_rrd(self.RRD_XML)
+        self.assertEqual(meta['step'], 10)
+        self.assertEqual(len(meta['legend']), 2)
+        self.assertEqual(times, [20, 10])
+        self.assertEqual(list(rows[0]), [0.5, 10.0])
+
+    def test_parse_rrd_update(self):
+        """vif columns are integrated, NaN samples are skipped on average"""
+        data = vm_utils.parse_rrd_update(self.RRD_XML, 0)
+        self.assertEqual(data, {'abc': {'cpu0': 0.5, 'vif_0_tx': 350.0}})
+
+    def test_parse_rrd_update_until(self):
+        data = vm_utils.parse_rrd_update(self.RRD_XML, 0, 10)
+        self.assertEqual(data, {'abc': {'cpu0': 0.0, 'vif_0_tx': 200.0}})
+
+
 class FakeXenApi(object):
     """Fake XenApi for testing HostState."""
 
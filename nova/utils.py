@@ -124,7 +124,7 @@ def vpn_ping(address, port, timeout=0.05, session_id=None):
 
 
 def fetchfile(url, target):
-    LOG.debug(_('Fetching %s') % url)
+    LOG.debug(_('Fetching %s'), url)
     execute('curl', '--fail', url, '-o', target)
 
 
@@ -181,7 +181,7 @@ def execute(*cmd, **kwargs):
             obj.stdin.close()  # pylint: disable=E1101
             _returncode = obj.returncode  # pylint: disable=E1101
             if _returncode:
-                LOG.debug(_('Result was %s') % _returncode)
+                LOG.debug(_('Result was %s'), _returncode)
                 if type(check_exit_code) == types.IntType \
                         and _returncode != check_exit_code:
                     (stdout, stderr) = result
@@ -231,7 +231,7 @@ def ssh_execute(ssh, cmd, process_input=None,
 
     # exit_status == -1 if no exit code was returned
     if exit_status != -1:
-        LOG.debug(_('Result was %s') % exit_status)
+        LOG.debug(_('Result was %s'), exit_status)
         if check_exit_code and exit_status != 0:
             raise exception.ProcessExecutionError(exit_code=exit_status,
                                                   stdout=stdout,
@@ -521,11 +521,13 @@ class LoopingCall(object):
         self.f = f
         self._running = False
 
-    def start(self, interval, now=True):
+    def start(self, interval, now=True, initial_delay=None):
         self._running = True
         done = event.Event()
 
         def _inner():
+            if initial_delay:
+                greenthread.sleep(initial_delay)
             if not now:
                 greenthread.sleep(interval)
             try:
@@ -579,26 +581,75 @@ def utf8(value):
     return value
 
 
+_PRIMITIVE_TYPES = frozenset([types.NoneType, bool, int, long, float,
+                              str, unicode])
+
+_NASTY_PREDICATES = (inspect.ismodule, inspect.isclass, inspect.ismethod,
+                     inspect.isfunction, inspect.isgeneratorfunction,
+                     inspect.isgenerator, inspect.istraceback,
+                     inspect.isframe, inspect.iscode, inspect.isbuiltin,
+                     inspect.isroutine, inspect.isabstract)
+
+_MODEL_COLUMNS = {}
+
+
+def _model_columns(cls):
+    """Return the names of the mapped columns of a model class."""
+    columns = _MODEL_COLUMNS.get(cls)
+    if columns is None:
+        columns = [column.name for column in cls.__mapper__.columns]
+        _MODEL_COLUMNS[cls] = columns
+    return columns
+
+
 def to_primitive(value, convert_instances=False, level=0):
     """Convert a complex object into primitives.
 
     Handy for JSON serialization. We can optionally handle instances,
-    but since this is a recursive function, we could have cyclical
-    data structures.
-
-    To handle cyclical data structures we could track the actual objects
-    visited in a set, but not all objects are hashable. Instead we just
-    track the depth of the object inspections and don't go too deep.
+    which are converted through their __dict__ down to a few levels of
+    nesting, so convert_instances=True is lossy ... be aware.
 
-    Therefore, convert_instances=True is lossy ... be aware.
+    Database model rows are converted to a dict of their column
+    attributes.  Containers and instances already being converted
+    further up are cyclical references and converted to '?'.
 
     """
-    nasty = [inspect.ismodule, inspect.isclass, inspect.ismethod,
-             inspect.isfunction, inspect.isgeneratorfunction,
-             inspect.isgenerator, inspect.istraceback, inspect.isframe,
-             inspect.iscode, inspect.isbuiltin, inspect.isroutine,
-             inspect.isabstract]
-    for test in nasty:
+    return _to_primitive(value, convert_instances, level, set())
+
+
+def _to_primitive(value, convert_instances, level, parents):
+    value_type = type(value)
+    if value_type in _PRIMITIVE_TYPES:
+        return value
+    if value_type is datetime.datetime:
+        return str(value)
+
+    if id(value) in parents:
+        return '?'
+    parents.add(id(value))
+    try:
+        if value_type is list or value_type is tuple:
+            return [_to_primitive(v, convert_instances, level, parents)
+                    for v in value]
+        elif value_type is dict:
+            o = {}
+            for k, v in value.iteritems():
+                o[k] = _to_primitive(v, convert_instances, level, parents)
+            return o
+        elif hasattr(value_type, '__mapper__'):
+            o = {}
+            for name in _model_columns(value_type):
+                o[name] = _to_primitive(getattr(value, name),
+                                        convert_instances, level, parents)
+            return o
+        return _object_to_primitive(value, convert_instances, level,
+                                    parents)
+    finally:
+        parents.discard(id(value))
+
+
+def _object_to_primitive(value, convert_instances, level, parents):
+    for test in _NASTY_PREDICATES:
         if test(value):
             return unicode(value)
 
@@ -608,32 +659,18 @@ def to_primitive(value, convert_instances=False, level=0):
     # The try block may not be necessary after the class check above,
     # but just in case ...
     try:
-        if type(value) is type([]) or type(value) is type((None,)):
-            o = []
-            for v in value:
-                o.append(to_primitive(v, convert_instances=convert_instances,
-                                      level=level))
-            return o
-        elif type(value) is type({}):
-            o = {}
-            for k, v in value.iteritems():
-                o[k] = to_primitive(v, convert_instances=convert_instances,
-                                    level=level)
-            return o
-        elif isinstance(value, datetime.datetime):
+        if isinstance(value, datetime.datetime):
             return str(value)
         elif hasattr(value, 'iteritems'):
-            return to_primitive(dict(value.iteritems()),
-                                convert_instances=convert_instances,
-                                level=level)
+            return _to_primitive(dict(value.iteritems()), convert_instances,
+                                 level, parents)
         elif hasattr(value, '__iter__'):
-            return to_primitive(list(value), level)
+            return _to_primitive(list(value), convert_instances, level,
+                                 parents)
         elif convert_instances and hasattr(value, '__dict__'):
-            # Likely an instance of something. Watch for cycles.
-            # Ignore class member vars.
-            return to_primitive(value.__dict__,
-                                convert_instances=convert_instances,
-                                level=level + 1)
+            # Likely an instance of something. Ignore class member vars.
+            return _to_primitive(value.__dict__, convert_instances,
+                                 level + 1, parents)
         else:
             return value
     except TypeError, e:
@@ -642,12 +679,15 @@ def to_primitive(value, convert_instances=False, level=0):
         return unicode(value)
 
 
+def _json_default(value):
+    primitive = to_primitive(value)
+    if primitive is value:
+        raise TypeError(_('%r is not JSON serializable') % value)
+    return primitive
+
+
 def dumps(value):
-    try:
-        return json.dumps(value)
-    except TypeError:
-        pass
-    return json.dumps(to_primitive(value))
+    return json.dumps(value, default=_json_default)
 
 
 def loads(s):
@@ -713,13 +753,13 @@ def synchronized(name, external=False):
                 _semaphores[name] = semaphore.Semaphore()
             sem = _semaphores[name]
             LOG.debug(_('Attempting to grab semaphore "%(lock)s" for method '
-                        '"%(method)s"...' % {'lock': name,
-                                             'method': f.__name__}))
+                        '"%(method)s"...'), {'lock': name,
+                                             'method': f.__name__})
             with sem:
                 if external:
                     LOG.debug(_('Attempting to grab file lock "%(lock)s" for '
-                                'method "%(method)s"...' %
-                                {'lock': name, 'method': f.__name__}))
+                                'method "%(method)s"...'),
+                              {'lock': name, 'method': f.__name__})
                     lock_file_path = os.path.join(FLAGS.lock_path,
                                                   'nova-%s.lock' % name)
                     lock = lockfile.FileLock(lock_file_path)
@@ -863,7 +903,7 @@ def parse_server_string(server_str):
         return (address, port)
 
     except Exception:
-        LOG.debug(_('Invalid server_string: %s' % server_str))
+        LOG.debug(_('Invalid server_string: %s'), server_str)
         return ('', '')
 
 
@@ -966,7 +1006,7 @@ def timefunc(func):
             return func(*args, **kwargs)
         finally:
             total_time = time.time() - start_time
-            LOG.debug(_("timefunc: '%(name)s' took %(total_time).2f secs") %
+            LOG.debug(_("timefunc: '%(name)s' took %(total_time).2f secs"),
                       dict(name=func.__name__, total_time=total_time))
     return inner
 
@@ -30,6 +30,8 @@ import os
 import tempfile
 import time
 
+from eventlet import semaphore
+
 from nova import context
 from nova import db
 from nova import exception
@@ -51,6 +53,11 @@ flags.DEFINE_integer('timeout_nbd', 10,
                      'time to wait for a NBD device coming up')
 flags.DEFINE_integer('max_nbd_devices', 16,
                      'maximum number of possible nbd devices')
+flags.DEFINE_integer('disk_injection_slots', 4,
+                     'maximum number of images injected into concurrently')
+flags.DEFINE_bool('inject_with_guestfs', False,
+                  'inject data into copy on write images with guestfish '
+                  'instead of mounting them through nbd')
 
 # NOTE(yamahata): DEFINE_list() doesn't work because the command may
 #                 include ','. For example,
@@ -105,6 +112,26 @@ def extend(image, size):
     utils.execute('resize2fs', image, check_exit_code=False)
 
 
+_STATS = {'nbd_allocations': 0,
+          'nbd_failures': 0,
+          'nbd_wait_time': 0.0,
+          'nbd_max_wait_time': 0.0,
+          'slot_wait_time': 0.0}
+_injection_slots = None
+
+
+def get_injection_stats():
+    """Return counters about nbd allocation and injection slot waits."""
+    return dict(_STATS)
+
+
+def _get_injection_slots():
+    global _injection_slots
+    if _injection_slots is None:
+        _injection_slots = semaphore.Semaphore(FLAGS.disk_injection_slots)
+    return _injection_slots
+
+
 def inject_data(image, key=None, net=None, metadata=None,
                 partition=None, nbd=False, tune2fs=True):
     """Injects a ssh key and optionally net data into a disk image.
@@ -114,7 +141,21 @@ def inject_data(image, key=None, net=None, metadata=None,
 
     If partition is not specified it mounts the image as a single partition.
 
+    At most disk_injection_slots images are injected into at the same time.
+
     """
+    start = time.time()
+    with _get_injection_slots():
+        _STATS['slot_wait_time'] += time.time() - start
+        if nbd and FLAGS.inject_with_guestfs:
+            _inject_data_with_guestfs(image, key, net, metadata, partition)
+        else:
+            _inject_data_with_mount(image, key, net, metadata, partition,
+                                    nbd, tune2fs)
+
+
+def _inject_data_with_mount(image, key, net, metadata, partition, nbd,
+                            tune2fs):
     device = _link_device(image, nbd)
     try:
         if not partition is None:
@@ -165,6 +206,49 @@ def inject_data(image, key=None, net=None, metadata=None,
         _unlink_device(device, nbd)
 
 
+def _guestfish_quote(value):
+    """Quote a string as a double quoted guestfish argument."""
+    value = value.replace('\\', '\\\\').replace('"', '\\"')
+    return '"%s"' % value.replace('\n', '\\n')
+
+
+def _inject_data_with_guestfs(image, key, net, metadata, partition):
+    """Inject data through libguestfs without mounting the image on the host.
+
+    The image is never attached to a host block device, so concurrent
+    spawns do not compete for nbd devices or mount points.
+
+    """
+    if partition is None:
+        root = '/dev/sda'
+    else:
+        root = '/dev/sda%s' % partition
+
+    commands = []
+    if key:
+        commands.extend(['mkdir-p /root/.ssh',
+                         'chown 0 0 /root/.ssh',
+                         'chmod 0700 /root/.ssh',
+                         'write-append /root/.ssh/authorized_keys %s' %
+                         _guestfish_quote('\n' + key.strip() + '\n')])
+    if net:
+        commands.extend(['mkdir-p /etc/network',
+                         'chown 0 0 /etc/network',
+                         'chmod 0755 /etc/network',
+                         'write /etc/network/interfaces %s' %
+                         _guestfish_quote(net)])
+    if metadata:
+        metadata = dict([(m.key, m.value) for m in metadata])
+        commands.append('write /meta.js %s' %
+                        _guestfish_quote(json.dumps(metadata)))
+    if not commands:
+        return
+
+    utils.execute('guestfish', '--rw', '-a', image, '-m', root,
+                  process_input='\n'.join(commands) + '\n',
+                  run_as_root=True)
+
+
 def setup_container(image, container_dir=None, nbd=False):
     """Setup the LXC container.
 
@@ -206,15 +290,23 @@ def _link_device(image, nbd):
     """Link image to device using loopback or nbd"""
 
     if nbd:
-        device = _allocate_device()
-        utils.execute('qemu-nbd', '-c', device, image, run_as_root=True)
-        # NOTE(vish): this forks into another process, so give it a chance
-        #             to set up before continuuing
-        for i in xrange(FLAGS.timeout_nbd):
-            if os.path.exists("/sys/block/%s/pid" % os.path.basename(device)):
-                return device
+        start = time.time()
+        while True:
+            device = _connect_nbd_device(image)
+            if device:
+                break
+            if time.time() - start > FLAGS.timeout_nbd:
+                _STATS['nbd_failures'] += 1
+                raise exception.Error(_('No free nbd devices'))
             time.sleep(1)
-        raise exception.Error(_('nbd device %s did not show up') % device)
+        waited = time.time() - start
+        _STATS['nbd_allocations'] += 1
+        _STATS['nbd_wait_time'] += waited
+        _STATS['nbd_max_wait_time'] = max(_STATS['nbd_max_wait_time'],
+                                          waited)
+        LOG.debug(_('Allocated %(device)s for %(image)s after %(waited).2fs'),
+                  locals())
+        return device
     else:
         out, err = utils.execute('losetup', '--find', '--show', image,
                                  run_as_root=True)
@@ -228,30 +320,39 @@ def _unlink_device(device, nbd):
     """Unlink image from device using loopback or nbd"""
     if nbd:
         utils.execute('qemu-nbd', '-d', device, run_as_root=True)
-        _free_device(device)
     else:
         utils.execute('losetup', '--detach', device, run_as_root=True)
 
 
-_DEVICES = ['/dev/nbd%s' % i for i in xrange(FLAGS.max_nbd_devices)]
-
+def _find_free_device():
+    for i in xrange(FLAGS.max_nbd_devices):
+        device = '/dev/nbd%s' % i
+        if not os.path.exists('/sys/block/nbd%s/pid' % i):
+            return device
+    return None
 
-def _allocate_device():
-    # NOTE(vish): This assumes no other processes are allocating nbd devices.
-    #             It may race cause a race condition if multiple
-    #             workers are running on a given machine.
 
-    while True:
-        if not _DEVICES:
-            raise exception.Error(_('No free nbd devices'))
-        device = _DEVICES.pop()
-        if not os.path.exists("/sys/block/%s/pid" % os.path.basename(device)):
-            break
-    return device
+@utils.synchronized('nbd', external=True)
+def _connect_nbd_device(image):
+    """Attach image to a free nbd device, or return None if there is none.
 
+    A device counts as used once the kernel publishes the pid of its
+    qemu-nbd server, so the external lock is held until that happens to
+    keep other workers on this host from picking the same device.
 
-def _free_device(device):
-    _DEVICES.append(device)
+    """
+    device = _find_free_device()
+    if device is None:
+        return None
+    utils.execute('qemu-nbd', '-c', device, image, run_as_root=True)
+    # NOTE(vish): this forks into another process, so give it a chance
+    #             to set up before continuuing
+    for i in xrange(FLAGS.timeout_nbd):
+        if os.path.exists("/sys/block/%s/pid" % os.path.basename(device)):
+            return device
+        time.sleep(1)
+    utils.execute('qemu-nbd', '-d', device, run_as_root=True)
+    raise exception.Error(_('nbd device %s did not show up') % device)
 
 
 def inject_data_into_fs(fs, key, net, metadata, execute):
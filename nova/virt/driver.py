@@ -127,6 +127,15 @@ class ComputeDriver(object):
         # TODO(Vek): Need to pass context in for access to auth_token
         raise NotImplementedError()
 
+    def register_power_state_listener(self, callback):
+        """Ask the hypervisor to report domain lifecycle changes.
+
+        callback is called from a greenthread as callback(InstanceInfo)
+        whenever an instance's power state changes.  Drivers that cannot
+        deliver events raise NotImplementedError.
+        """
+        raise NotImplementedError()
+
     def spawn(self, context, instance,
               network_info=None, block_device_info=None):
         """
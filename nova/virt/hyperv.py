@@ -218,7 +218,7 @@ class HyperVConnection(driver.ComputeDriver):
     def _create_disk(self, vm_name, vhdfile):
         """Create a disk and attach it to the vm"""
         LOG.debug(_('Creating disk for %(vm_name)s by attaching'
-                ' disk file %(vhdfile)s') % locals())
+                ' disk file %(vhdfile)s'), locals())
         #Find the IDE controller for the vm.
         vms = self._conn.MSVM_ComputerSystem(ElementName=vm_name)
         vm = vms[0]
@@ -291,8 +291,8 @@ class HyperVConnection(driver.ComputeDriver):
             raise Exception(_('Failed creating port for %s'),
                     vm_name)
         ext_path = extswitch.path_()
-        LOG.debug(_("Created switch port %(vm_name)s on switch %(ext_path)s")
-                % locals())
+        LOG.debug(_("Created switch port %(vm_name)s on switch %(ext_path)s"),
+                locals())
         #Connect the new nic to the new port.
         new_nic_data.Connection = [new_port]
         new_nic_data.ElementName = vm_name + ' nic'
@@ -340,8 +340,8 @@ class HyperVConnection(driver.ComputeDriver):
             return False
         desc = job.Description
         elap = job.ElapsedTime
-        LOG.debug(_("WMI job succeeded: %(desc)s, Elapsed=%(elap)s ")
-                % locals())
+        LOG.debug(_("WMI job succeeded: %(desc)s, Elapsed=%(elap)s "),
+                locals())
         return True
 
     def _find_external_network(self):
@@ -409,8 +409,8 @@ class HyperVConnection(driver.ComputeDriver):
             for vf in vhdfile:
                 vf.Delete()
                 instance_name = instance.name
-                LOG.debug(_("Del: disk %(vhdfile)s vm %(instance_name)s")
-                        % locals())
+                LOG.debug(_("Del: disk %(vhdfile)s vm %(instance_name)s"),
+                        locals())
 
     def get_info(self, instance_id):
         """Get information about the VM"""
@@ -433,7 +433,7 @@ class HyperVConnection(driver.ComputeDriver):
 
         LOG.debug(_("Got Info for vm %(instance_id)s: state=%(state)s,"
                 " mem=%(memusage)s, num_cpu=%(numprocs)s,"
-                " cpu_time=%(uptime)s") % locals())
+                " cpu_time=%(uptime)s"), locals())
 
         return {'state': HYPERV_POWER_STATE[info.EnabledState],
                 'max_mem': info.MemoryUsage,
@@ -83,7 +83,7 @@ def fetch_to_raw(context, image_href, path, user_id, project_id):
             raise exception.ImageUnacceptable(image_id=image_href,
                 reason=_("fmt=%(fmt)s backed by: %(backing_file)s") % locals())
 
-        LOG.debug("%s was %s, converting to raw" % (image_href, fmt))
+        LOG.debug("%s was %s, converting to raw", image_href, fmt)
         out, err = utils.execute('qemu-img', 'convert', '-O', 'raw',
                                  path_tmp, staged)
         os.unlink(path_tmp)
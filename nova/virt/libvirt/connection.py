@@ -53,6 +53,8 @@ from xml.dom import minidom
 from xml.etree import ElementTree
 
 from eventlet import greenthread
+from eventlet import hubs
+from eventlet import patcher
 from eventlet import tpool
 
 from nova import block_device
@@ -80,6 +82,12 @@ Template = None
 
 LOG = logging.getLogger('nova.virt.libvirt_conn')
 
+# libvirt's event loop blocks in C, so it needs a real OS thread and a
+# queue that is safe to share with it.
+native_threading = patcher.original('threading')
+native_Queue = patcher.original('Queue')
+native_os = patcher.original('os')
+
 
 FLAGS = flags.FLAGS
 flags.DECLARE('live_migration_retry_count', 'nova.compute.manager')
@@ -147,6 +155,10 @@ flags.DEFINE_string('default_local_format',
 flags.DEFINE_bool('libvirt_use_virtio_for_bridges',
                   False,
                   'Use virtio for bridge interfaces')
+flags.DEFINE_integer('libvirt_domain_cache_ttl',
+                     5,
+                     'Seconds a snapshot of running domains is reused for '
+                     'resource and device lookups')
 
 
 def get_connection(read_only):
@@ -186,6 +198,10 @@ class LibvirtConnection(driver.ComputeDriver):
         self.cpuinfo_xml = open(FLAGS.cpuinfo_xml_template).read()
         self._wrapped_conn = None
         self.read_only = read_only
+        self._event_queue = None
+        self._event_listeners = []
+        self._domain_inventory = None
+        self._domain_inventory_time = 0
 
         fw_class = utils.import_class(FLAGS.firewall_driver)
         self.firewall_driver = fw_class(get_connection=self._get_connection)
@@ -205,9 +221,61 @@ class LibvirtConnection(driver.ComputeDriver):
             LOG.debug(_('Connecting to libvirt: %s'), self.libvirt_uri)
             self._wrapped_conn = self._connect(self.libvirt_uri,
                                                self.read_only)
+            if self._event_queue is not None:
+                self._wrapped_conn.domainEventRegisterAny(None,
+                        libvirt.VIR_DOMAIN_EVENT_ID_LIFECYCLE,
+                        self._queue_domain_event, None)
         return self._wrapped_conn
     _conn = property(_get_connection)
 
+    def register_power_state_listener(self, callback):
+        """Deliver libvirt domain lifecycle events to callback."""
+        if self._event_queue is None:
+            # The default event implementation has to be registered before
+            # the connection we subscribe on is opened.
+            libvirt.virEventRegisterDefaultImpl()
+            self._event_queue = native_Queue.Queue()
+            # NOTE: the native thread writes a byte per event to this pipe,
+            #       which the hub can wait on without tying up a thread
+            self._event_notify_recv, self._event_notify_send = os.pipe()
+            event_thread = native_threading.Thread(
+                    target=self._run_native_event_loop)
+            event_thread.setDaemon(True)
+            event_thread.start()
+            greenthread.spawn(self._dispatch_domain_events)
+            self._wrapped_conn = None
+        self._event_listeners.append(callback)
+        self._get_connection()
+
+    def _run_native_event_loop(self):
+        while True:
+            libvirt.virEventRunDefaultImpl()
+
+    def _queue_domain_event(self, conn, domain, event, detail, opaque):
+        """Runs on the native event thread; only hands the event over."""
+        try:
+            state = domain.info()[0]
+        except libvirt.libvirtError:
+            state = power_state.NOSTATE
+        self._event_queue.put(driver.InstanceInfo(domain.name(), state))
+        native_os.write(self._event_notify_send, ' ')
+
+    def _dispatch_domain_events(self):
+        while True:
+            hubs.trampoline(self._event_notify_recv, read=True)
+            native_os.read(self._event_notify_recv, 512)
+            while True:
+                try:
+                    info = self._event_queue.get_nowait()
+                except native_Queue.Empty:
+                    break
+                for callback in self._event_listeners:
+                    try:
+                        callback(info)
+                    except Exception:
+                        LOG.exception(_('Error handling power state event '
+                                        'for %s'), info.name)
+
     def _test_connection(self):
         try:
             self._wrapped_conn.getCapabilities()
@@ -240,32 +308,46 @@ class LibvirtConnection(driver.ComputeDriver):
         else:
             return libvirt.openAuth(uri, auth, 0)
 
-    def list_instances(self):
-        return [self._conn.lookupByID(x).name()
-                for x in self._conn.listDomainsID()]
-
-    def _map_to_instance_info(self, domain):
-        """Gets info from a virsh domain object into an InstanceInfo"""
+    def _get_domain_inventory(self, refresh=False):
+        """Return a snapshot of the running domains on this host.
 
-        # domain.info() returns a list of:
-        #    state:       one of the state values (virDomainState)
-        #    maxMemory:   the maximum memory used by the domain
-        #    memory:      the current amount of memory used by the domain
-        #    nbVirtCPU:   the number of virtual CPU
-        #    puTime:      the time used by the domain in nanoseconds
+        The snapshot maps domain names to a dict holding the domain object,
+        its info() tuple and, once requested, its parsed device lists.  It
+        is rebuilt when refresh is set or libvirt_domain_cache_ttl elapsed.
 
-        (state, _max_mem, _mem, _num_cpu, _cpu_time) = domain.info()
-        name = domain.name()
+        """
+        age = time.time() - self._domain_inventory_time
+        if (refresh or self._domain_inventory is None or
+            age > FLAGS.libvirt_domain_cache_ttl):
+            inventory = {}
+            for domain_id in self._conn.listDomainsID():
+                try:
+                    domain = self._conn.lookupByID(domain_id)
+                    inventory[domain.name()] = {'domain': domain,
+                                                'info': domain.info()}
+                except libvirt.libvirtError:
+                    # NOTE: the domain went away while we were listing.
+                    continue
+            self._domain_inventory = inventory
+            self._domain_inventory_time = time.time()
+        return self._domain_inventory
+
+    def _invalidate_domain_inventory(self, instance_name=None):
+        """Forget cached device lists, or the whole snapshot."""
+        if instance_name is None:
+            self._domain_inventory = None
+        elif self._domain_inventory is not None:
+            entry = self._domain_inventory.get(instance_name)
+            if entry is not None:
+                entry.pop('devices', None)
 
-        return driver.InstanceInfo(name, state)
+    def list_instances(self):
+        return self._get_domain_inventory(refresh=True).keys()
 
     def list_instances_detail(self):
-        infos = []
-        for domain_id in self._conn.listDomainsID():
-            domain = self._conn.lookupByID(domain_id)
-            info = self._map_to_instance_info(domain)
-            infos.append(info)
-        return infos
+        inventory = self._get_domain_inventory(refresh=True)
+        return [driver.InstanceInfo(name, entry['info'][0])
+                for name, entry in inventory.iteritems()]
 
     def plug_vifs(self, instance, network_info):
         """Plugin VIFs into networks."""
@@ -333,6 +415,7 @@ class LibvirtConnection(driver.ComputeDriver):
 
         timer = utils.LoopingCall(_wait_for_destroy)
         timer.start(interval=0.5, now=True)
+        self._invalidate_domain_inventory()
 
         self.firewall_driver.unfilter_instance(instance,
                                                network_info=network_info)
@@ -378,6 +461,7 @@ class LibvirtConnection(driver.ComputeDriver):
                                         connection_info,
                                         mount_device)
         virt_dom.attachDevice(xml)
+        self._invalidate_domain_inventory(instance_name)
 
     def _get_disk_xml(self, xml, device):
         """Returns the xml for the disk mounted at device"""
@@ -411,6 +495,7 @@ class LibvirtConnection(driver.ComputeDriver):
             if not xml:
                 raise exception.DiskNotFound(location=mount_device)
             virt_dom.detachDevice(xml)
+            self._invalidate_domain_inventory(instance_name)
         finally:
             self.volume_driver_method('disconnect_volume',
                                       connection_info,
@@ -1255,52 +1340,59 @@ class LibvirtConnection(driver.ComputeDriver):
             # createXML call creates a transient domain
             domain = self._conn.createXML(xml, launch_flags)
 
+        self._invalidate_domain_inventory()
         return domain
 
     def get_diagnostics(self, instance_name):
         raise exception.ApiError(_("diagnostics are not supported "
                                    "for libvirt"))
 
-    def get_disks(self, instance_name):
-        """
-        Note that this function takes an instance name.
-
-        Returns a list of all block devices for this domain.
-        """
-        domain = self._lookup_by_name(instance_name)
-        # TODO(devcamcar): Replace libxml2 with etree.
-        xml = domain.XMLDesc(0)
-        doc = None
+    def _get_running_domain(self, instance_name):
+        """Return the domain object from the snapshot or from libvirt."""
+        entry = self._get_domain_inventory().get(instance_name)
+        if entry is None:
+            return self._lookup_by_name(instance_name)
+        return entry['domain']
 
+    def _parse_domain_devices(self, xml):
+        """Extract disk and interface target devices from domain xml."""
+        devices = {'disks': [], 'interfaces': []}
         try:
-            doc = libxml2.parseDoc(xml)
+            doc = ElementTree.fromstring(xml)
         except Exception:
-            return []
+            return devices
 
-        ctx = doc.xpathNewContext()
-        disks = []
+        for kind, path in (('disks', 'devices/disk/target'),
+                           ('interfaces', 'devices/interface/target')):
+            for target in doc.findall(path):
+                devdst = target.get('dev')
+                if devdst is not None:
+                    devices[kind].append(devdst)
+        return devices
 
-        try:
-            ret = ctx.xpathEval('/domain/devices/disk')
-
-            for node in ret:
-                devdst = None
+    def _get_domain_devices(self, instance_name):
+        """Return the parsed device lists of a domain, cached per snapshot.
 
-                for child in node.children:
-                    if child.name == 'target':
-                        devdst = child.prop('dev')
+        Domains which are not running are not part of the snapshot and are
+        looked up and parsed on every call.
 
-                if devdst is None:
-                    continue
+        """
+        entry = self._get_domain_inventory().get(instance_name)
+        if entry is None:
+            domain = self._lookup_by_name(instance_name)
+            return self._parse_domain_devices(domain.XMLDesc(0))
+        if 'devices' not in entry:
+            xml = entry['domain'].XMLDesc(0)
+            entry['devices'] = self._parse_domain_devices(xml)
+        return entry['devices']
 
-                disks.append(devdst)
-        finally:
-            if ctx is not None:
-                ctx.xpathFreeContext()
-            if doc is not None:
-                doc.freeDoc()
+    def get_disks(self, instance_name):
+        """
+        Note that this function takes an instance name.
 
-        return disks
+        Returns a list of all block devices for this domain.
+        """
+        return list(self._get_domain_devices(instance_name)['disks'])
 
     def get_interfaces(self, instance_name):
         """
@@ -1308,40 +1400,7 @@ class LibvirtConnection(driver.ComputeDriver):
 
         Returns a list of all network interfaces for this instance.
         """
-        domain = self._lookup_by_name(instance_name)
-        # TODO(devcamcar): Replace libxml2 with etree.
-        xml = domain.XMLDesc(0)
-        doc = None
-
-        try:
-            doc = libxml2.parseDoc(xml)
-        except Exception:
-            return []
-
-        ctx = doc.xpathNewContext()
-        interfaces = []
-
-        try:
-            ret = ctx.xpathEval('/domain/devices/interface')
-
-            for node in ret:
-                devdst = None
-
-                for child in node.children:
-                    if child.name == 'target':
-                        devdst = child.prop('dev')
-
-                if devdst is None:
-                    continue
-
-                interfaces.append(devdst)
-        finally:
-            if ctx is not None:
-                ctx.xpathFreeContext()
-            if doc is not None:
-                doc.freeDoc()
-
-        return interfaces
+        return list(self._get_domain_devices(instance_name)['interfaces'])
 
     def get_vcpu_total(self):
         """Get vcpu number of physical computer.
@@ -1394,11 +1453,9 @@ class LibvirtConnection(driver.ComputeDriver):
 
         """
 
-        total = 0
-        for dom_id in self._conn.listDomainsID():
-            dom = self._conn.lookupByID(dom_id)
-            total += len(dom.vcpus()[1])
-        return total
+        # NOTE: info()[3] is the number of virtual cpus of the domain.
+        return sum(entry['info'][3]
+                   for entry in self._get_domain_inventory().itervalues())
 
     def get_memory_mb_used(self):
         """Get the free memory size(MB) of physical computer.
@@ -1521,14 +1578,14 @@ class LibvirtConnection(driver.ComputeDriver):
         """
         Note that this function takes an instance name.
         """
-        domain = self._lookup_by_name(instance_name)
+        domain = self._get_running_domain(instance_name)
         return domain.blockStats(disk)
 
     def interface_stats(self, instance_name, interface):
         """
         Note that this function takes an instance name.
         """
-        domain = self._lookup_by_name(instance_name)
+        domain = self._get_running_domain(instance_name)
         return domain.interfaceStats(interface)
 
     def get_console_pool_info(self, console_type):
@@ -1564,6 +1621,7 @@ class LibvirtConnection(driver.ComputeDriver):
         except exception.NotFound:
             raise exception.ComputeServiceUnavailable(host=host)
 
+        self._get_domain_inventory(refresh=True)
         # Updating host information
         dic = {'vcpus': self.get_vcpu_total(),
                'memory_mb': self.get_memory_mb_total(),
@@ -1882,7 +1940,7 @@ class LibvirtConnection(driver.ComputeDriver):
             path = path_node.get_properties().getContent()
 
             if disk_type != 'file':
-                LOG.debug(_('skipping %(path)s since it looks like volume') %
+                LOG.debug(_('skipping %(path)s since it looks like volume'),
                           locals())
                 continue
 
@@ -307,7 +307,7 @@ class NWFilterFirewall(FirewallDriver):
                                                     undefine()
             except libvirt.libvirtError:
                 LOG.debug(_('The nwfilter(%(instance_filter_name)s) '
-                            'for %(instance_name)s is not found.') % locals())
+                            'for %(instance_name)s is not found.'), locals())
 
         instance_secgroup_filter_name =\
             '%s-secgroup' % (self._instance_filter_name(instance))
@@ -317,7 +317,7 @@ class NWFilterFirewall(FirewallDriver):
                                             .undefine()
         except libvirt.libvirtError:
             LOG.debug(_('The nwfilter(%(instance_secgroup_filter_name)s) '
-                        'for %(instance_name)s is not found.') % locals())
+                        'for %(instance_name)s is not found.'), locals())
 
     def prepare_instance_filter(self, instance, network_info):
         """Creates an NWFilter for the given instance.
@@ -498,7 +498,7 @@ class NWFilterFirewall(FirewallDriver):
             except libvirt.libvirtError:
                 name = instance.name
                 LOG.debug(_('The nwfilter(%(instance_filter_name)s) for'
-                            '%(name)s is not found.') % locals())
+                            '%(name)s is not found.'), locals())
                 return False
         return True
 
@@ -72,8 +72,8 @@ class LibvirtISCSIVolumeDriver(LibvirtVolumeDriver):
                                    iscsi_properties['target_iqn'],
                                    '-p', iscsi_properties['target_portal'],
                                    *iscsi_command, run_as_root=True)
-        LOG.debug("iscsiadm %s: stdout=%s stderr=%s" %
-                  (iscsi_command, out, err))
+        LOG.debug("iscsiadm %s: stdout=%s stderr=%s",
+                  iscsi_command, out, err)
         return (out, err)
 
     def _iscsiadm_update(self, iscsi_properties, property_key, property_value):
@@ -132,7 +132,7 @@ class LibvirtISCSIVolumeDriver(LibvirtVolumeDriver):
 
         if tries != 0:
             LOG.debug(_("Found iSCSI node %(mount_device)s "
-                        "(after %(tries)s rescans)") %
+                        "(after %(tries)s rescans)"),
                       locals())
 
         connection_info['data']['device_path'] = host_device
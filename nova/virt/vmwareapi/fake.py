@@ -42,7 +42,7 @@ def log_db_contents(msg=None):
     """Log DB Contents."""
     text = msg or ""
     content = pformat(_db_content)
-    LOG.debug(_("%(text)s: _db_content => %(content)s") % locals())
+    LOG.debug(_("%(text)s: _db_content => %(content)s"), locals())
 
 
 def reset():
@@ -153,7 +153,7 @@ def create_port_group(session, pg_name, vswitch_name, vlan_id=0):
         "get_dynamic_property", host_mor,
         "HostSystem", "configManager.networkSystem")
     LOG.debug(_("Creating Port Group with name %s on "
-                "the ESX host") % pg_name)
+                "the ESX host"), pg_name)
     try:
         session._call_method(session._get_vim(),
                 "AddPortGroup", network_system_mor,
@@ -167,4 +167,4 @@ def create_port_group(session, pg_name, vswitch_name, vlan_id=0):
         if error_util.FAULT_ALREADY_EXISTS not in exc.fault_list:
             raise exception.Error(exc)
     LOG.debug(_("Created Port Group with name %s on "
-                "the ESX host") % pg_name)
+                "the ESX host"), pg_name)
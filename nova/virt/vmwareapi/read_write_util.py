@@ -151,7 +151,7 @@ class VMWareHTTPWriteFile(VMwareHTTPFile):
             self.conn.getresponse()
         except Exception, excep:
             LOG.debug(_("Exception during HTTP connection close in "
-                      "VMWareHTTpWrite. Exception is %s") % excep)
+                      "VMWareHTTpWrite. Exception is %s"), excep)
         super(VMWareHTTPWriteFile, self).close()
 
 
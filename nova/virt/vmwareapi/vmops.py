@@ -76,7 +76,7 @@ class VMWareVMOps(object):
             # Ignoring the oprhaned or inaccessible VMs
             if conn_state not in ["orphaned", "inaccessible"]:
                 lst_vm_names.append(vm_name)
-        LOG.debug(_("Got total of %s instances") % str(len(lst_vm_names)))
+        LOG.debug(_("Got total of %s instances"), str(len(lst_vm_names)))
         return lst_vm_names
 
     def spawn(self, context, instance, network_info):
@@ -189,7 +189,7 @@ class VMWareVMOps(object):
 
         def _execute_create_vm():
             """Create VM on ESX host."""
-            LOG.debug(_("Creating VM with the name %s on the ESX  host") %
+            LOG.debug(_("Creating VM with the name %s on the ESX  host"),
                       instance.name)
             # Create the VM on the ESX host
             vm_create_task = self._session._call_method(
@@ -198,7 +198,7 @@ class VMWareVMOps(object):
                                     config=config_spec, pool=res_pool_mor)
             self._session._wait_for_task(instance.id, vm_create_task)
 
-            LOG.debug(_("Created VM with the name %s on the ESX  host") %
+            LOG.debug(_("Created VM with the name %s on the ESX  host"),
                       instance.name)
 
         _execute_create_vm()
@@ -230,7 +230,7 @@ class VMWareVMOps(object):
             LOG.debug(_("Creating Virtual Disk of size  "
                       "%(vmdk_file_size_in_kb)s KB and adapter type  "
                       "%(adapter_type)s on the ESX host local store"
-                      " %(data_store_name)s") %
+                      " %(data_store_name)s"),
                        {"vmdk_file_size_in_kb": vmdk_file_size_in_kb,
                         "adapter_type": adapter_type,
                         "data_store_name": data_store_name})
@@ -246,7 +246,7 @@ class VMWareVMOps(object):
             self._session._wait_for_task(instance.id, vmdk_create_task)
             LOG.debug(_("Created Virtual Disk of size %(vmdk_file_size_in_kb)s"
                         " KB on the ESX host local store "
-                        "%(data_store_name)s") %
+                        "%(data_store_name)s"),
                         {"vmdk_file_size_in_kb": vmdk_file_size_in_kb,
                          "data_store_name": data_store_name})
 
@@ -255,7 +255,7 @@ class VMWareVMOps(object):
         def _delete_disk_file():
             LOG.debug(_("Deleting the file %(flat_uploaded_vmdk_path)s "
                         "on the ESX host local"
-                        "store %(data_store_name)s") %
+                        "store %(data_store_name)s"),
                         {"flat_uploaded_vmdk_path": flat_uploaded_vmdk_path,
                          "data_store_name": data_store_name})
             # Delete the -flat.vmdk file created. .vmdk file is retained.
@@ -266,7 +266,7 @@ class VMWareVMOps(object):
                         name=flat_uploaded_vmdk_path)
             self._session._wait_for_task(instance.id, vmdk_delete_task)
             LOG.debug(_("Deleted the file %(flat_uploaded_vmdk_path)s on the "
-                        "ESX host local store %(data_store_name)s") %
+                        "ESX host local store %(data_store_name)s"),
                         {"flat_uploaded_vmdk_path": flat_uploaded_vmdk_path,
                          "data_store_name": data_store_name})
 
@@ -277,7 +277,7 @@ class VMWareVMOps(object):
         def _fetch_image_on_esx_datastore():
             """Fetch image from Glance to ESX datastore."""
             LOG.debug(_("Downloading image file data %(image_ref)s to the ESX "
-                        "data store %(data_store_name)s") %
+                        "data store %(data_store_name)s"),
                         ({'image_ref': instance.image_ref,
                           'data_store_name': data_store_name}))
             # Upload the -flat.vmdk file whose meta-data file we just created
@@ -292,7 +292,7 @@ class VMWareVMOps(object):
                 cookies=cookies,
                 file_path=flat_uploaded_vmdk_name)
             LOG.debug(_("Downloaded image file data %(image_ref)s to the ESX "
-                        "data store %(data_store_name)s") %
+                        "data store %(data_store_name)s"),
                         ({'image_ref': instance.image_ref,
                          'data_store_name': data_store_name}))
         _fetch_image_on_esx_datastore()
@@ -309,26 +309,26 @@ class VMWareVMOps(object):
                                 vmdk_file_size_in_kb, uploaded_vmdk_path,
                                 adapter_type)
             LOG.debug(_("Reconfiguring VM instance %s to attach the image "
-                      "disk") % instance.name)
+                      "disk"), instance.name)
             reconfig_task = self._session._call_method(
                                self._session._get_vim(),
                                "ReconfigVM_Task", vm_ref,
                                spec=vmdk_attach_config_spec)
             self._session._wait_for_task(instance.id, reconfig_task)
             LOG.debug(_("Reconfigured VM instance %s to attach the image "
-                      "disk") % instance.name)
+                      "disk"), instance.name)
 
         _attach_vmdk_to_the_vm()
 
         def _power_on_vm():
             """Power on the VM."""
-            LOG.debug(_("Powering on the VM instance %s") % instance.name)
+            LOG.debug(_("Powering on the VM instance %s"), instance.name)
             # Power On the VM
             power_on_task = self._session._call_method(
                                self._session._get_vim(),
                                "PowerOnVM_Task", vm_ref)
             self._session._wait_for_task(instance.id, power_on_task)
-            LOG.debug(_("Powered on the VM instance %s") % instance.name)
+            LOG.debug(_("Powered on the VM instance %s"), instance.name)
         _power_on_vm()
 
     def snapshot(self, context, instance, snapshot_name):
@@ -373,7 +373,7 @@ class VMWareVMOps(object):
 
         def _create_vm_snapshot():
             # Create a snapshot of the VM
-            LOG.debug(_("Creating Snapshot of the VM instance %s ") %
+            LOG.debug(_("Creating Snapshot of the VM instance %s "),
                         instance.name)
             snapshot_task = self._session._call_method(
                         self._session._get_vim(),
@@ -383,7 +383,7 @@ class VMWareVMOps(object):
                         memory=True,
                         quiesce=True)
             self._session._wait_for_task(instance.id, snapshot_task)
-            LOG.debug(_("Created Snapshot of the VM instance %s ") %
+            LOG.debug(_("Created Snapshot of the VM instance %s "),
                       instance.name)
 
         _create_vm_snapshot()
@@ -427,7 +427,7 @@ class VMWareVMOps(object):
             copy_spec = vm_util.get_copy_virtual_disk_spec(client_factory,
                                                             adapter_type)
             LOG.debug(_("Copying disk data before snapshot of the VM "
-                        " instance %s") % instance.name)
+                        " instance %s"), instance.name)
             copy_disk_task = self._session._call_method(
                 self._session._get_vim(),
                 "CopyVirtualDisk_Task",
@@ -440,7 +440,7 @@ class VMWareVMOps(object):
                 force=False)
             self._session._wait_for_task(instance.id, copy_disk_task)
             LOG.debug(_("Copied disk data before snapshot of the VM "
-                        "instance %s") % instance.name)
+                        "instance %s"), instance.name)
 
         _copy_vmdk_content()
 
@@ -448,7 +448,7 @@ class VMWareVMOps(object):
 
         def _upload_vmdk_to_image_repository():
             # Upload the contents of -flat.vmdk file which has the disk data.
-            LOG.debug(_("Uploading image %s") % snapshot_name)
+            LOG.debug(_("Uploading image %s"), snapshot_name)
             vmware_images.upload_image(
                 context,
                 snapshot_name,
@@ -461,7 +461,7 @@ class VMWareVMOps(object):
                 datastore_name=datastore_name,
                 cookies=cookies,
                 file_path="vmware-tmp/%s-flat.vmdk" % random_name)
-            LOG.debug(_("Uploaded image %s") % snapshot_name)
+            LOG.debug(_("Uploaded image %s"), snapshot_name)
 
         _upload_vmdk_to_image_repository()
 
@@ -471,8 +471,8 @@ class VMWareVMOps(object):
             operations.
             """
             # Delete the temporary vmdk created above.
-            LOG.debug(_("Deleting temporary vmdk file %s")
-                        % dest_vmdk_file_location)
+            LOG.debug(_("Deleting temporary vmdk file %s"),
+                        dest_vmdk_file_location)
             remove_disk_task = self._session._call_method(
                 self._session._get_vim(),
                 "DeleteVirtualDisk_Task",
@@ -480,8 +480,8 @@ class VMWareVMOps(object):
                 name=dest_vmdk_file_location,
                 datacenter=dc_ref)
             self._session._wait_for_task(instance.id, remove_disk_task)
-            LOG.debug(_("Deleted temporary vmdk file %s")
-                        % dest_vmdk_file_location)
+            LOG.debug(_("Deleted temporary vmdk file %s"),
+                        dest_vmdk_file_location)
 
         _clean_temp_data()
 
@@ -519,16 +519,16 @@ class VMWareVMOps(object):
         # are running, then only do a guest reboot. Otherwise do a hard reset.
         if (tools_status == "toolsOk" and
                 tools_running_status == "guestToolsRunning"):
-            LOG.debug(_("Rebooting guest OS of VM %s") % instance.name)
+            LOG.debug(_("Rebooting guest OS of VM %s"), instance.name)
             self._session._call_method(self._session._get_vim(), "RebootGuest",
                                        vm_ref)
-            LOG.debug(_("Rebooted guest OS of VM %s") % instance.name)
+            LOG.debug(_("Rebooted guest OS of VM %s"), instance.name)
         else:
-            LOG.debug(_("Doing hard reboot of VM %s") % instance.name)
+            LOG.debug(_("Doing hard reboot of VM %s"), instance.name)
             reset_task = self._session._call_method(self._session._get_vim(),
                                                     "ResetVM_Task", vm_ref)
             self._session._wait_for_task(instance.id, reset_task)
-            LOG.debug(_("Did hard reboot of VM %s") % instance.name)
+            LOG.debug(_("Did hard reboot of VM %s"), instance.name)
 
     def destroy(self, instance, network_info):
         """
@@ -540,7 +540,7 @@ class VMWareVMOps(object):
         try:
             vm_ref = self._get_vm_ref_from_the_name(instance.name)
             if vm_ref is None:
-                LOG.debug(_("instance - %s not present") % instance.name)
+                LOG.debug(_("instance - %s not present"), instance.name)
                 return
             lst_properties = ["config.files.vmPathName", "runtime.powerState"]
             props = self._session._call_method(vim_util,
@@ -559,19 +559,19 @@ class VMWareVMOps(object):
                             vm_util.split_datastore_path(vm_config_pathname)
             # Power off the VM if it is in PoweredOn state.
             if pwr_state == "poweredOn":
-                LOG.debug(_("Powering off the VM %s") % instance.name)
+                LOG.debug(_("Powering off the VM %s"), instance.name)
                 poweroff_task = self._session._call_method(
                        self._session._get_vim(),
                        "PowerOffVM_Task", vm_ref)
                 self._session._wait_for_task(instance.id, poweroff_task)
-                LOG.debug(_("Powered off the VM %s") % instance.name)
+                LOG.debug(_("Powered off the VM %s"), instance.name)
 
             # Un-register the VM
             try:
-                LOG.debug(_("Unregistering the VM %s") % instance.name)
+                LOG.debug(_("Unregistering the VM %s"), instance.name)
                 self._session._call_method(self._session._get_vim(),
                         "UnregisterVM", vm_ref)
-                LOG.debug(_("Unregistered the VM %s") % instance.name)
+                LOG.debug(_("Unregistered the VM %s"), instance.name)
             except Exception, excep:
                 LOG.warn(_("In vmwareapi:vmops:destroy, got this exception"
                            " while un-registering the VM: %s") % str(excep))
@@ -585,7 +585,7 @@ class VMWareVMOps(object):
                                  datastore_name,
                                  os.path.dirname(vmx_file_path))
                 LOG.debug(_("Deleting contents of the VM %(name)s from "
-                            "datastore %(datastore_name)s") %
+                            "datastore %(datastore_name)s"),
                            ({'name': instance.name,
                              'datastore_name': datastore_name}))
                 delete_task = self._session._call_method(
@@ -595,7 +595,7 @@ class VMWareVMOps(object):
                     name=dir_ds_compliant_path)
                 self._session._wait_for_task(instance.id, delete_task)
                 LOG.debug(_("Deleted contents of the VM %(name)s from "
-                            "datastore %(datastore_name)s") %
+                            "datastore %(datastore_name)s"),
                            ({'name': instance.name,
                              'datastore_name': datastore_name}))
             except Exception, excep:
@@ -625,18 +625,18 @@ class VMWareVMOps(object):
                     "VirtualMachine", "runtime.powerState")
         # Only PoweredOn VMs can be suspended.
         if pwr_state == "poweredOn":
-            LOG.debug(_("Suspending the VM %s ") % instance.name)
+            LOG.debug(_("Suspending the VM %s "), instance.name)
             suspend_task = self._session._call_method(self._session._get_vim(),
                     "SuspendVM_Task", vm_ref)
             self._session._wait_for_task(instance.id, suspend_task)
-            LOG.debug(_("Suspended the VM %s ") % instance.name)
+            LOG.debug(_("Suspended the VM %s "), instance.name)
         # Raise Exception if VM is poweredOff
         elif pwr_state == "poweredOff":
             reason = _("instance is powered off and can not be suspended.")
             raise exception.InstanceSuspendFailure(reason=reason)
 
         LOG.debug(_("VM %s was already in suspended state. So returning "
-                    "without doing anything") % instance.name)
+                    "without doing anything"), instance.name)
 
     def resume(self, instance):
         """Resume the specified instance."""
@@ -648,12 +648,12 @@ class VMWareVMOps(object):
                                      "get_dynamic_property", vm_ref,
                                      "VirtualMachine", "runtime.powerState")
         if pwr_state.lower() == "suspended":
-            LOG.debug(_("Resuming the VM %s") % instance.name)
+            LOG.debug(_("Resuming the VM %s"), instance.name)
             suspend_task = self._session._call_method(
                                         self._session._get_vim(),
                                        "PowerOnVM_Task", vm_ref)
             self._session._wait_for_task(instance.id, suspend_task)
-            LOG.debug(_("Resumed the VM %s ") % instance.name)
+            LOG.debug(_("Resumed the VM %s "), instance.name)
         else:
             reason = _("instance is not in a suspended state")
             raise exception.InstanceResumeFailure(reason=reason)
@@ -755,7 +755,7 @@ class VMWareVMOps(object):
             vm_util.get_machine_id_change_spec(client_factory, machine_id_str)
 
         LOG.debug(_("Reconfiguring VM instance %(name)s to set the machine id "
-                  "with ip - %(ip_addr)s") %
+                  "with ip - %(ip_addr)s"),
                   ({'name': instance.name,
                    'ip_addr': ip_v4['ip']}))
         reconfig_task = self._session._call_method(self._session._get_vim(),
@@ -763,7 +763,7 @@ class VMWareVMOps(object):
                            spec=machine_id_change_spec)
         self._session._wait_for_task(instance.id, reconfig_task)
         LOG.debug(_("Reconfigured VM instance %(name)s to set the machine id "
-                  "with ip - %(ip_addr)s") %
+                  "with ip - %(ip_addr)s"),
                   ({'name': instance.name,
                    'ip_addr': ip_v4['ip']}))
 
@@ -799,11 +799,11 @@ class VMWareVMOps(object):
         then a directory with this name is created at the topmost level of the
         DataStore.
         """
-        LOG.debug(_("Creating directory with path %s") % ds_path)
+        LOG.debug(_("Creating directory with path %s"), ds_path)
         self._session._call_method(self._session._get_vim(), "MakeDirectory",
                     self._session._get_vim().get_service_content().fileManager,
                     name=ds_path, createParentDirectories=False)
-        LOG.debug(_("Created directory with path %s") % ds_path)
+        LOG.debug(_("Created directory with path %s"), ds_path)
 
     def _get_vm_ref_from_the_name(self, vm_name):
         """Get reference to the VM with the name specified."""
@@ -87,7 +87,7 @@ def start_transfer(read_file_handle, data_size, write_file_handle=None,
 
 def fetch_image(context, image, instance, **kwargs):
     """Download image from the glance image server."""
-    LOG.debug(_("Downloading image %s from glance image server") % image)
+    LOG.debug(_("Downloading image %s from glance image server"), image)
     (glance_client, image_id) = glance.get_glance_client(context, image)
     metadata, read_iter = glance_client.get_image(image_id)
     read_file_handle = read_write_util.GlanceFileRead(read_iter)
@@ -101,12 +101,12 @@ def fetch_image(context, image, instance, **kwargs):
                                 file_size)
     start_transfer(read_file_handle, file_size,
                    write_file_handle=write_file_handle)
-    LOG.debug(_("Downloaded image %s from glance image server") % image)
+    LOG.debug(_("Downloaded image %s from glance image server"), image)
 
 
 def upload_image(context, image, instance, **kwargs):
     """Upload the snapshotted vm disk file to Glance image server."""
-    LOG.debug(_("Uploading image %s to the Glance image server") % image)
+    LOG.debug(_("Uploading image %s to the Glance image server"), image)
     read_file_handle = read_write_util.VmWareHTTPReadFile(
                                 kwargs.get("host"),
                                 kwargs.get("data_center_name"),
@@ -127,7 +127,7 @@ def upload_image(context, image, instance, **kwargs):
                                             kwargs.get("image_version")}}
     start_transfer(read_file_handle, file_size, glance_client=glance_client,
                         image_id=image_id, image_meta=image_metadata)
-    LOG.debug(_("Uploaded image %s to the Glance image server") % image)
+    LOG.debug(_("Uploaded image %s to the Glance image server"), image)
 
 
 def get_vmdk_size_and_properties(context, image, instance):
@@ -137,10 +137,10 @@ def get_vmdk_size_and_properties(context, image, instance):
     geometry of the disk created depends on the size.
     """
 
-    LOG.debug(_("Getting image size for the image %s") % image)
+    LOG.debug(_("Getting image size for the image %s"), image)
     (glance_client, image_id) = glance.get_glance_client(context, image)
     meta_data = glance_client.get_image_meta(image_id)
     size, properties = meta_data["size"], meta_data["properties"]
-    LOG.debug(_("Got image size of %(size)s for the image %(image)s") %
+    LOG.debug(_("Got image size of %(size)s for the image %(image)s"),
               locals())
     return size, properties
@@ -378,7 +378,7 @@ class VMWareAPISession(object):
                 return
             elif task_info.state == 'success':
                 LOG.debug(_("Task [%(task_name)s] %(task_ref)s "
-                            "status: success") % locals())
+                            "status: success"), locals())
                 done.send("success")
             else:
                 error_info = str(task_info.error.localizedMessage)
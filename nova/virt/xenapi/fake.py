@@ -72,7 +72,7 @@ LOG = logging.getLogger("nova.virt.xenapi.fake")
 def log_db_contents(msg=None):
     text = msg or ""
     content = pformat(_db_content)
-    LOG.debug(_("%(text)s: _db_content => %(content)s") % locals())
+    LOG.debug(_("%(text)s: _db_content => %(content)s"), locals())
 
 
 def reset():
@@ -434,7 +434,7 @@ class SessionBase(object):
 
                 def callit(*params):
                     localname = name
-                    LOG.debug(_('Calling %(localname)s %(impl)s') % locals())
+                    LOG.debug(_('Calling %(localname)s %(impl)s'), locals())
                     self._check_session(params)
                     return impl(*params)
                 return callit
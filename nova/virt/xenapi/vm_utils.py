@@ -20,19 +20,21 @@ Helper methods for operations related to the management of VM records and
 their attributes like VDIs, VIFs, as well as their lookup functions.
 """
 
+import array
 import contextlib
 import json
 import math
 import os
 import pickle
 import re
+import StringIO
 import sys
 import tempfile
 import time
 import urllib
 import uuid
-from decimal import Decimal
 from xml.dom import minidom
+from xml.etree import cElementTree
 
 from nova import db
 from nova import exception
@@ -195,7 +197,7 @@ class VMHelper(HelperBase):
         LOG.debug(_('Created VM %s...'), instance.name)
         vm_ref = session.call_xenapi('VM.create', rec)
         instance_name = instance.name
-        LOG.debug(_('Created VM %(instance_name)s as %(vm_ref)s.') % locals())
+        LOG.debug(_('Created VM %(instance_name)s as %(vm_ref)s.'), locals())
         return vm_ref
 
     @classmethod
@@ -227,10 +229,10 @@ class VMHelper(HelperBase):
         vbd_rec['qos_algorithm_params'] = {}
         vbd_rec['qos_supported_algorithms'] = []
         LOG.debug(_('Creating VBD for VM %(vm_ref)s,'
-                ' VDI %(vdi_ref)s ... ') % locals())
+                ' VDI %(vdi_ref)s ... '), locals())
         vbd_ref = session.call_xenapi('VBD.create', vbd_rec)
         LOG.debug(_('Created VBD %(vbd_ref)s for VM %(vm_ref)s,'
-                ' VDI %(vdi_ref)s.') % locals())
+                ' VDI %(vdi_ref)s.'), locals())
         return vbd_ref
 
     @classmethod
@@ -251,10 +253,10 @@ class VMHelper(HelperBase):
         vbd_rec['qos_algorithm_params'] = {}
         vbd_rec['qos_supported_algorithms'] = []
         LOG.debug(_('Creating a CDROM-specific VBD for VM %(vm_ref)s,'
-                ' VDI %(vdi_ref)s ... ') % locals())
+                ' VDI %(vdi_ref)s ... '), locals())
         vbd_ref = session.call_xenapi('VBD.create', vbd_rec)
         LOG.debug(_('Created a CDROM-specific VBD %(vbd_ref)s '
-                ' for VM %(vm_ref)s, VDI %(vdi_ref)s.') % locals())
+                ' for VM %(vm_ref)s, VDI %(vdi_ref)s.'), locals())
         return vbd_ref
 
     @classmethod
@@ -316,8 +318,8 @@ class VMHelper(HelperBase):
               'sm_config': {},
               'tags': []})
         LOG.debug(_('Created VDI %(vdi_ref)s (%(name_label)s,'
-                ' %(virtual_size)s, %(read_only)s) on %(sr_ref)s.')
-                % locals())
+                ' %(virtual_size)s, %(read_only)s) on %(sr_ref)s.'),
+                locals())
         return vdi_ref
 
     @classmethod
@@ -344,8 +346,8 @@ class VMHelper(HelperBase):
         Snapshot VHD"""
         #TODO(sirp): Add quiesce and VSS locking support when Windows support
         # is added
-        LOG.debug(_("Snapshotting VM %(vm_ref)s with label '%(label)s'...")
-                % locals())
+        LOG.debug(_("Snapshotting VM %(vm_ref)s with label '%(label)s'..."),
+                locals())
 
         vm_vdi_ref, vm_vdi_rec = cls.get_vdi_for_vm_safely(session, vm_ref)
         sr_ref = vm_vdi_rec["SR"]
@@ -359,7 +361,7 @@ class VMHelper(HelperBase):
         template_vdi_uuid = template_vdi_rec["uuid"]
 
         LOG.debug(_('Created snapshot %(template_vm_ref)s from'
-                ' VM %(vm_ref)s.') % locals())
+                ' VM %(vm_ref)s.'), locals())
 
         parent_uuid = wait_for_vhd_coalesce(
             session, instance_id, sr_ref, vm_vdi_ref, original_parent_uuid)
@@ -390,7 +392,7 @@ class VMHelper(HelperBase):
         # NOTE(sirp): Currently we only support uploading images as VHD, there
         # is no RAW equivalent (yet)
         logging.debug(_("Asking xapi to upload %(vdi_uuids)s as"
-                " ID %(image_id)s") % locals())
+                " ID %(image_id)s"), locals())
 
         os_type = instance.os_type or FLAGS.default_os_type
 
@@ -443,7 +445,7 @@ class VMHelper(HelperBase):
         num_partitions = len(partitions)
         fs_type = partitions[0].split(':')[4]
         LOG.debug(_("Found %(num_partitions)s partitions, the first with"
-                    " fs_type '%(fs_type)s'") % locals())
+                    " fs_type '%(fs_type)s'"), locals())
 
         allowed_fs = fs_type in ('ext3', 'ext4')
         return num_partitions == 1 and allowed_fs
@@ -533,8 +535,8 @@ w
         req_type = instance_types.get_instance_type(instance_type_id)
         req_size = req_type['local_gb']
 
-        LOG.debug("Creating blank HD of size %(req_size)d gigs"
-                    % locals())
+        LOG.debug("Creating blank HD of size %(req_size)d gigs",
+                    locals())
         vdi_size = one_gig * req_size
 
         LOG.debug("ISO vm create: Looking for the SR")
@@ -566,8 +568,8 @@ w
         Returns: A list of dictionaries that describe VDIs
         """
         instance_id = instance.id
-        LOG.debug(_("Asking xapi to fetch vhd image %(image)s")
-                    % locals())
+        LOG.debug(_("Asking xapi to fetch vhd image %(image)s"),
+                    locals())
         sr_ref = safe_find_sr(session)
 
         # NOTE(sirp): The Glance plugin runs under Python 2.4
@@ -595,7 +597,7 @@ w
         vdis = json.loads(result)
         for vdi in vdis:
             LOG.debug(_("xapi 'download_vhd' returned VDI of "
-                    "type '%(vdi_type)s' with UUID '%(vdi_uuid)s'" % vdi))
+                    "type '%(vdi_type)s' with UUID '%(vdi_uuid)s'"), vdi)
 
         cls.scan_sr(session, instance_id, sr_ref)
 
@@ -623,7 +625,7 @@ w
             cur_vdi_uuid = vdi_rec['uuid']
             vdi_size_bytes = int(vdi_rec['physical_utilisation'])
             LOG.debug(_('vdi_uuid=%(cur_vdi_uuid)s vdi_size_bytes='
-                        '%(vdi_size_bytes)d' % locals()))
+                        '%(vdi_size_bytes)d'), locals())
             size_bytes += vdi_size_bytes
         return size_bytes
 
@@ -639,7 +641,7 @@ w
         allowed_size_bytes = allowed_size_gb * 1024 * 1024 * 1024
 
         LOG.debug(_("image_size_bytes=%(size_bytes)d, allowed_size_bytes="
-                    "%(allowed_size_bytes)d") % locals())
+                    "%(allowed_size_bytes)d"), locals())
 
         if size_bytes > allowed_size_bytes:
             LOG.info(_("Image size %(size_bytes)d exceeded"
@@ -665,7 +667,7 @@ w
         # FIXME(sirp): Since the Glance plugin seems to be required for the
         # VHD disk, it may be worth using the plugin for both VHD and RAW and
         # DISK restores
-        LOG.debug(_("Fetching image %(image)s") % locals())
+        LOG.debug(_("Fetching image %(image)s"), locals())
         LOG.debug(_("Image Type: %s"), ImageType.to_string(image_type))
 
         if image_type == ImageType.DISK_ISO:
@@ -680,7 +682,7 @@ w
         virtual_size = int(meta['size'])
         vdi_size = virtual_size
         LOG.debug(_("Size for image %(image)s:" +
-                    "%(virtual_size)d") % locals())
+                    "%(virtual_size)d"), locals())
         if image_type == ImageType.DISK:
             # Make room for MBR.
             vdi_size += MBR_SIZE_BYTES
@@ -756,7 +758,7 @@ w
             image_ref = instance.image_ref
             instance_id = instance.id
             LOG.debug(_("Detected %(disk_format)s format for image "
-                        "%(image_ref)s, instance %(instance_id)s") % locals())
+                        "%(image_ref)s, instance %(instance_id)s"), locals())
 
         def determine_from_glance():
             glance_disk_format2nova_type = {
@@ -943,8 +945,7 @@ w
 
         xml = get_rrd_updates(host_ip, start_time)
         if xml:
-            doc = minidom.parseString(xml)
-            return parse_rrd_update(doc, start_time, stop_time)
+            return parse_rrd_update(xml, start_time, stop_time)
 
         raise exception.CouldNotFetchMetrics()
 
@@ -989,73 +990,96 @@ def get_rrd_updates(host, start_time):
         return None
 
 
-def parse_rrd_meta(doc):
-    data = {}
-    meta = doc.getElementsByTagName('meta')[0]
-    for tag in ('start', 'end', 'step'):
-        data[tag] = int(meta.getElementsByTagName(tag)[0].firstChild.data)
-    legend = meta.getElementsByTagName('legend')[0]
-    data['legend'] = [child.firstChild.data for child in legend.childNodes]
-    return data
-
-
-def parse_rrd_data(doc):
-    dnode = doc.getElementsByTagName('data')[0]
-    return [dict(
-            time=int(child.getElementsByTagName('t')[0].firstChild.data),
-            values=[Decimal(valnode.firstChild.data)
-                  for valnode in child.getElementsByTagName('v')])
-            for child in dnode.childNodes]
+def parse_rrd(xml):
+    """Parse rrd_updates XML in a single streaming pass.
 
+    Returns a tuple of (meta, times, rows) where meta holds start, end,
+    step and the legend, times is the list of sample timestamps and rows
+    holds one float array per sample, in the same (newest first) order
+    the host reports them.
+    """
+    meta = {'legend': []}
+    times = []
+    rows = []
+    row = None
+    for event, elem in cElementTree.iterparse(StringIO.StringIO(xml),
+                                              events=('start', 'end')):
+        tag = elem.tag
+        if event == 'start':
+            if tag == 'row':
+                row = array.array('d')
+            continue
+        if tag == 'v':
+            row.append(float(elem.text))
+        elif tag == 't':
+            times.append(int(elem.text))
+        elif tag == 'row':
+            rows.append(row)
+            row = None
+            elem.clear()
+        elif tag == 'entry':
+            meta['legend'].append(elem.text)
+        elif tag in ('start', 'end', 'step'):
+            meta[tag] = int(elem.text)
+    return meta, times, rows
+
+
+def parse_rrd_update(xml, start, until=None):
+    """Summarize rrd_updates XML per VM.
+
+    vif columns are integrated over time (yielding bytes transferred),
+    every other column is averaged.  All columns are accumulated in one
+    pass over the samples.
+    """
+    meta, times, rows = parse_rrd(xml)
+    legend = meta['legend']
+    averages, integrals = summarize_series(times, rows, len(legend),
+                                           start, until)
 
-def parse_rrd_update(doc, start, until=None):
     sum_data = {}
-    meta = parse_rrd_meta(doc)
-    data = parse_rrd_data(doc)
-    for col, collabel in enumerate(meta['legend']):
+    for col, collabel in enumerate(legend):
         datatype, objtype, uuid, name = collabel.split(':')
-        vm_data = sum_data.get(uuid, dict())
+        vm_data = sum_data.setdefault(uuid, {})
         if name.startswith('vif'):
-            vm_data[name] = integrate_series(data, col, start, until)
+            vm_data[name] = integrals[col]
         else:
-            vm_data[name] = average_series(data, col, start, until)
-        sum_data[uuid] = vm_data
+            vm_data[name] = averages[col]
     return sum_data
 
 
-def average_series(data, col, start, until=None):
-    vals = [row['values'][col] for row in data
-            if (not until or (row['time'] <= until)) and
-                not row['values'][col].is_nan()]
-    if vals:
-        return (sum(vals) / len(vals)).quantize(Decimal('1.0000'))
-    else:
-        return Decimal('0.0000')
-
+def summarize_series(times, rows, columns, start, until=None):
+    """Average and integrate every column of an RRD sample set at once.
 
-def integrate_series(data, col, start, until=None):
-    total = Decimal('0.0000')
+    Rows are walked oldest first; NaN samples are skipped when averaging
+    and count as zero when integrating.  Returns a tuple of
+    (averages, integrals), each a list with one value per column rounded
+    to four decimal places.
+    """
+    sums = [0.0] * columns
+    counts = [0] * columns
+    totals = [0.0] * columns
     prev_time = int(start)
-    prev_val = None
-    for row in reversed(data):
-        if not until or (row['time'] <= until):
-            time = row['time']
-            val = row['values'][col]
-            if val.is_nan():
-                val = Decimal('0.0000')
-            if prev_val is None:
-                prev_val = val
-            if prev_val >= val:
-                total += ((val * (time - prev_time)) +
-                          (Decimal('0.5000') * (prev_val - val) *
-                          (time - prev_time)))
-            else:
-                total += ((prev_val * (time - prev_time)) +
-                          (Decimal('0.5000') * (val - prev_val) *
-                          (time - prev_time)))
-            prev_time = time
-            prev_val = val
-    return total.quantize(Decimal('1.0000'))
+    prev_vals = None
+    for sample_time, row in reversed(zip(times, rows)):
+        if until and sample_time > until:
+            continue
+        present = [val == val for val in row]
+        vals = [val if ok else 0.0 for val, ok in zip(row, present)]
+        if prev_vals is None:
+            prev_vals = vals
+        half_delta = 0.5 * (sample_time - prev_time)
+        sums = [acc + val for acc, val in zip(sums, vals)]
+        counts = [acc + ok for acc, ok in zip(counts, present)]
+        # Trapezoidal area between the previous and current sample.
+        totals = [acc + (prev + val) * half_delta
+                  for acc, prev, val in zip(totals, prev_vals, vals)]
+        prev_time = sample_time
+        prev_vals = vals
+
+    averages = [round(sums[col] / counts[col], 4) if counts[col] else 0.0
+                for col in xrange(columns)]
+    integrals = [round(total, 4) for total in totals]
+    return averages, integrals
 
 
 #TODO(sirp): This code comes from XS5.6 pluginlib.py, we should refactor to
@@ -1070,7 +1094,7 @@ def get_vhd_parent(session, vdi_rec):
         parent_ref = session.call_xenapi("VDI.get_by_uuid", parent_uuid)
         parent_rec = session.call_xenapi("VDI.get_record", parent_ref)
         vdi_uuid = vdi_rec['uuid']
-        LOG.debug(_("VHD %(vdi_uuid)s has parent %(parent_ref)s") % locals())
+        LOG.debug(_("VHD %(vdi_uuid)s has parent %(parent_ref)s"), locals())
         return parent_ref, parent_rec
     else:
         return None
@@ -1129,8 +1153,8 @@ def wait_for_vhd_coalesce(session, instance_id, sr_ref, vdi_ref,
         parent_uuid = get_vhd_parent_uuid(session, vdi_ref)
         if original_parent_uuid and (parent_uuid != original_parent_uuid):
             LOG.debug(_("Parent %(parent_uuid)s doesn't match original parent"
-                    " %(original_parent_uuid)s, waiting for coalesce...")
-                    % locals())
+                    " %(original_parent_uuid)s, waiting for coalesce..."),
+                    locals())
         else:
             # Breakout of the loop (normally) and return the parent_uuid
             raise utils.LoopingCallDone(parent_uuid)
@@ -1184,7 +1208,7 @@ def find_iso_sr(session):
     for sr_ref in sr_refs:
         sr_rec = session.call_xenapi("SR.get_record", sr_ref)
 
-        LOG.debug(_("ISO: looking at SR %(sr_rec)s") % locals())
+        LOG.debug(_("ISO: looking at SR %(sr_rec)s"), locals())
         if not sr_rec['content_type'] == 'iso':
             LOG.debug(_("ISO: not iso content"))
             continue
@@ -1201,7 +1225,7 @@ def find_iso_sr(session):
             LOG.debug(_("ISO: ISO, looking to see if it is host local"))
             pbd_rec = session.call_xenapi("PBD.get_record", pbd_ref)
             pbd_rec_host = pbd_rec['host']
-            LOG.debug(_("ISO: PBD matching, want %(pbd_rec)s, have %(host)s") %
+            LOG.debug(_("ISO: PBD matching, want %(pbd_rec)s, have %(host)s"),
                       locals())
             if pbd_rec_host == host:
                 LOG.debug(_("ISO: SR with local PBD"))
@@ -1266,11 +1290,11 @@ def vdi_attached_here(session, vdi_ref, read_only=False):
         try:
             LOG.debug(_('Plugging VBD %s done.'), vbd_ref)
             orig_dev = session.call_xenapi("VBD.get_device", vbd_ref)
-            LOG.debug(_('VBD %(vbd_ref)s plugged as %(orig_dev)s') % locals())
+            LOG.debug(_('VBD %(vbd_ref)s plugged as %(orig_dev)s'), locals())
             dev = remap_vbd_dev(orig_dev)
             if dev != orig_dev:
                 LOG.debug(_('VBD %(vbd_ref)s plugged into wrong dev, '
-                            'remapping to %(dev)s') % locals())
+                            'remapping to %(dev)s'), locals())
             if dev != 'autodetect':
                 # NOTE(johannes): Unit tests will end up with a device called
                 # 'autodetect' which obviously won't exist. It's not ideal,
@@ -1337,7 +1361,7 @@ def _is_vdi_pv(dev):
         #try to find kernel string
         m = re.search('(?<=kernel:)/.*(?:>)', line)
         if m and m.group(0).find('xen') != -1:
-            LOG.debug(_("Found Xen kernel %s") % m.group(0))
+            LOG.debug(_("Found Xen kernel %s"), m.group(0))
             return True
     LOG.debug(_("No Xen kernel found.  Booting HVM."))
     return False
@@ -1364,7 +1388,7 @@ def _write_partition(virtual_size, dev):
     primary_last = MBR_SIZE_SECTORS + (virtual_size / SECTOR_SIZE) - 1
 
     LOG.debug(_('Writing partition table %(primary_first)d %(primary_last)d'
-            ' to %(dev_path)s...') % locals())
+            ' to %(dev_path)s...'), locals())
 
     def execute(*cmd, **kwargs):
         return utils.execute(*cmd, **kwargs)
@@ -89,6 +89,7 @@ class VMOps(object):
         self.compute_api = compute.API()
         self._session = session
         self.poll_rescue_last_ran = None
+        self._vif_maps = {}
         VMHelper.XenAPI = self.XenAPI
         self.vif_driver = utils.import_object(FLAGS.xenapi_vif_driver)
 
@@ -341,13 +342,13 @@ class VMOps(object):
         else:
             if instance.managed_disk:
                 LOG.debug(_("Managed disk set for instance %(instance_id)s,"
-                            " attempting to resize partition") % locals())
+                            " attempting to resize partition"), locals())
                 VMHelper.create_managed_disk(session=self._session,
                                              vdi_ref=first_vdi_ref)
             else:
                 LOG.debug(_("Managed disk NOT set for instance"
-                            " %(instance_id)s, skipping resize partition")
-                            % locals())
+                            " %(instance_id)s, skipping resize partition"),
+                            locals())
 
             VMHelper.create_vbd(session=self._session, vm_ref=vm_ref,
                 vdi_ref=first_vdi_ref, userdevice=userdevice, bootable=True)
@@ -428,7 +429,7 @@ class VMOps(object):
                         injected_files = []
                 # Inject any files, if specified
                 for path, contents in instance.injected_files:
-                    LOG.debug(_("Injecting file path: '%s'") % path)
+                    LOG.debug(_("Injecting file path: '%s'"), path)
                     self.inject_file(instance, path, contents)
 
         def _set_admin_password():
@@ -640,7 +641,7 @@ class VMOps(object):
         progress = round(float(step) / total_steps * 100)
         instance_id = instance['id']
         LOG.debug(_("Updating instance '%(instance_id)s' progress to"
-                    " %(progress)d") % locals())
+                    " %(progress)d"), locals())
         db.instance_update(context, instance_id, {'progress': progress})
 
     def migrate_disk_and_power_off(self, context, instance, dest):
@@ -747,12 +748,12 @@ class VMOps(object):
             instance_local_gb = instance.local_gb
             LOG.debug(_("Resizing VDI %(vdi_uuid)s for instance"
                         "%(instance_name)s. Expanding to %(instance_local_gb)d"
-                        " GB") % locals())
+                        " GB"), locals())
             vdi_ref = self._session.call_xenapi('VDI.get_by_uuid', vdi_uuid)
             # for an instance with no local storage
             self._session.call_xenapi('VDI.resize_online', vdi_ref,
                     str(new_disk_size))
-            LOG.debug(_("Resize instance %s complete") % (instance.name))
+            LOG.debug(_("Resize instance %s complete"), instance.name)
 
     def reboot(self, instance, reboot_type):
         """Reboot VM instance."""
@@ -894,8 +895,8 @@ class VMOps(object):
             return
 
         instance_id = instance.id
-        LOG.debug(_("Shutting down VM for Instance %(instance_id)s")
-                  % locals())
+        LOG.debug(_("Shutting down VM for Instance %(instance_id)s"),
+                  locals())
         try:
             task = None
             if hard:
@@ -926,8 +927,8 @@ class VMOps(object):
     def _destroy_vdis(self, instance, vm_ref):
         """Destroys all VDIs associated with a VM."""
         instance_id = instance.id
-        LOG.debug(_("Destroying VDIs for Instance %(instance_id)s")
-                  % locals())
+        LOG.debug(_("Destroying VDIs for Instance %(instance_id)s"),
+                  locals())
         vdi_refs = VMHelper.lookup_vm_vdis(self._session, vm_ref)
 
         if not vdi_refs:
@@ -985,7 +986,7 @@ class VMOps(object):
         if not instance.kernel_id and not instance.ramdisk_id:
             # 1. No kernel or ramdisk
             LOG.debug(_("Instance %(instance_id)s using RAW or VHD, "
-                        "skipping kernel and ramdisk deletion") % locals())
+                        "skipping kernel and ramdisk deletion"), locals())
             return
 
         if not (instance.kernel_id and instance.ramdisk_id):
@@ -1009,7 +1010,7 @@ class VMOps(object):
         except self.XenAPI.Failure, exc:
             LOG.exception(exc)
 
-        LOG.debug(_("Instance %(instance_id)s VM destroyed") % locals())
+        LOG.debug(_("Instance %(instance_id)s VM destroyed"), locals())
 
     def _destroy_rescue_instance(self, rescue_vm_ref):
         """Destroy a rescue instance."""
@@ -1244,6 +1245,19 @@ class VMOps(object):
         vm_rec = self._session.call_xenapi("VM.get_record", vm_ref)
         return VMHelper.compile_diagnostics(self._session, vm_rec)
 
+    def _get_vif_map(self, vm_uuid, refresh=False):
+        """Return (name_label, {device: MAC}) for a VM, caching the result
+        so bandwidth polling doesn't re-query XenAPI for every VM."""
+        if refresh or vm_uuid not in self._vif_maps:
+            vm_ref = self._session.call_xenapi("VM.get_by_uuid", vm_uuid)
+            vm_rec = self._session.call_xenapi("VM.get_record", vm_ref)
+            vif_map = {}
+            for vif_ref in vm_rec['VIFs']:
+                vif = self._session.call_xenapi("VIF.get_record", vif_ref)
+                vif_map[vif['device']] = vif['MAC']
+            self._vif_maps[vm_uuid] = (vm_rec['name_label'], vif_map)
+        return self._vif_maps[vm_uuid]
+
     def get_all_bw_usage(self, start_time, stop_time=None):
         """Return bandwidth usage info for each interface on each
            running VM"""
@@ -1254,21 +1268,24 @@ class VMOps(object):
         except exception.CouldNotFetchMetrics:
             LOG.exception(_("Could not get bandwidth info."),
                           exc_info=sys.exc_info())
+            return {}
+
+        # Forget VMs that are no longer reported by the host.
+        for vm_uuid in set(self._vif_maps) - set(metrics):
+            del self._vif_maps[vm_uuid]
+
         bw = {}
         for uuid, data in metrics.iteritems():
-            vm_ref = self._session.call_xenapi("VM.get_by_uuid", uuid)
-            vm_rec = self._session.call_xenapi("VM.get_record", vm_ref)
-            vif_map = {}
-            for vif in [self._session.call_xenapi("VIF.get_record", vrec)
-                        for vrec in vm_rec['VIFs']]:
-                vif_map[vif['device']] = vif['MAC']
-            name = vm_rec['name_label']
+            name, vif_map = self._get_vif_map(uuid)
             if name.startswith('Control domain'):
                 continue
             vifs_bw = bw.setdefault(name, {})
             for key, val in data.iteritems():
                 if key.startswith('vif_'):
                     vname = key.split('_')[1]
+                    if vname not in vif_map:
+                        # VIFs were plugged since we cached the map.
+                        name, vif_map = self._get_vif_map(uuid, refresh=True)
                     vif_bw = vifs_bw.setdefault(vif_map[vname], {})
                     if key.endswith('tx'):
                         vif_bw['bw_out'] = int(val)
@@ -1363,10 +1380,10 @@ class VMOps(object):
                     vm_ref, instance, device, network, info)
             network_ref = vif_rec['network']
             LOG.debug(_('Creating VIF for VM %(vm_ref)s,' \
-                ' network %(network_ref)s.') % locals())
+                ' network %(network_ref)s.'), locals())
             vif_ref = self._session.call_xenapi('VIF.create', vif_rec)
             LOG.debug(_('Created VIF %(vif_ref)s for VM %(vm_ref)s,'
-                ' network %(network_ref)s.') % locals())
+                ' network %(network_ref)s.'), locals())
 
     def plug_vifs(self, instance, network_info):
         """Set up VIF networking on the host."""
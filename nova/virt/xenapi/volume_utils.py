@@ -71,7 +71,7 @@ class VolumeHelper(HelperBase):
                     session.get_xenapi_host(),
                     record,
                     '0', label, description, 'iscsi', '', False, {})
-                LOG.debug(_('Introduced %(label)s as %(sr_ref)s.') % locals())
+                LOG.debug(_('Introduced %(label)s as %(sr_ref)s.'), locals())
                 return sr_ref
             except cls.XenAPI.Failure, exc:
                 LOG.exception(exc)
@@ -48,7 +48,7 @@ class VolumeOps(object):
             raise exception.InstanceNotFound(instance_id=instance_name)
         # NOTE: No Resource Pool concept so far
         LOG.debug(_("Attach_volume: %(connection_info)s, %(instance_name)s,"
-                " %(mountpoint)s") % locals())
+                " %(mountpoint)s"), locals())
         driver_type = connection_info['driver_volume_type']
         if driver_type != 'iscsi':
             raise exception.VolumeDriverNotFound(driver_type=driver_type)
@@ -102,8 +102,8 @@ class VolumeOps(object):
         if vm_ref is None:
             raise exception.InstanceNotFound(instance_id=instance_name)
         # Detach VBD from VM
-        LOG.debug(_("Detach_volume: %(instance_name)s, %(mountpoint)s")
-                % locals())
+        LOG.debug(_("Detach_volume: %(instance_name)s, %(mountpoint)s"),
+                locals())
         device_number = VolumeHelper.mountpoint_to_number(mountpoint)
         try:
             vbd_ref = VMHelper.find_vbd_by_number(self._session,
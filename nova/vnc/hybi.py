@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2011 Openstack, LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+"""RFC 6455 (hybi) websockets for eventlet.wsgi.  No nova deps.
+
+eventlet.websocket only speaks the older hixie drafts, which carry nothing
+but text frames.  Hybi adds binary frames, so a VNC stream can be relayed
+as is instead of base64 encoded.
+"""
+
+import base64
+import binascii
+import errno
+import hashlib
+import struct
+
+from eventlet import semaphore
+from eventlet import wsgi
+from eventlet.green import socket
+
+
+GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+# Room to leave in front of a payload for the header of an unmasked frame.
+HEADER_ROOM = 10
+
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+ACCEPTABLE_CLIENT_ERRORS = set((errno.ECONNRESET, errno.EPIPE))
+
+
+def is_hybi_request(environ):
+    return 'HTTP_SEC_WEBSOCKET_KEY' in environ
+
+
+def accept_key(key):
+    return base64.b64encode(hashlib.sha1(key + GUID).digest())
+
+
+def frame_header(opcode, length, mask=None):
+    """Return the header of a final frame of length bytes."""
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, mask_bit | length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, mask_bit | 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, mask_bit | 127, length)
+    return header + (mask or '')
+
+
+def apply_mask(data, mask):
+    """XOR data with a 4 byte mask, a whole frame at a time."""
+    if not data:
+        return data
+    count = len(data)
+    key = (mask * (count // 4 + 1))[:count]
+    value = int(binascii.hexlify(data), 16) ^ int(binascii.hexlify(key), 16)
+    return binascii.unhexlify('%0*x' % (count * 2, value))
+
+
+class HybiWebSocketWSGI(object):
+    """Wraps a websocket handler function in a WSGI application, like
+    eventlet.websocket.WebSocketWSGI but for hybi clients.
+
+    The first of protocols the client offers is chosen as the subprotocol;
+    ws.protocol is None if it offers none of them.
+
+    """
+
+    def __init__(self, handler, protocols=()):
+        self.handler = handler
+        self.protocols = protocols
+
+    def __call__(self, environ, start_response):
+        key = environ.get('HTTP_SEC_WEBSOCKET_KEY')
+        if 'websocket' not in environ.get('HTTP_UPGRADE', '').lower() or \
+           not key:
+            start_response('400 Bad Request', [('Connection', 'close')])
+            return []
+
+        offered = [protocol.strip() for protocol in
+                   environ.get('HTTP_SEC_WEBSOCKET_PROTOCOL', '').split(',')]
+        protocol = None
+        for candidate in self.protocols:
+            if candidate in offered:
+                protocol = candidate
+                break
+
+        reply = ('HTTP/1.1 101 Switching Protocols\r\n'
+                 'Upgrade: websocket\r\n'
+                 'Connection: Upgrade\r\n'
+                 'Sec-WebSocket-Accept: %s\r\n' % accept_key(key))
+        if protocol:
+            reply += 'Sec-WebSocket-Protocol: %s\r\n' % protocol
+        sock = environ['eventlet.input'].get_socket()
+        sock.sendall(reply + '\r\n')
+
+        ws = HybiWebSocket(sock, environ, protocol)
+        try:
+            self.handler(ws)
+        except socket.error, e:
+            if e.args[0] not in ACCEPTABLE_CLIENT_ERRORS:
+                raise
+        ws.close()
+        return wsgi.ALREADY_HANDLED
+
+
+class HybiWebSocket(object):
+    """Sends and receives the messages of a hybi websocket.
+
+    Messages are sent as binary frames if the binary subprotocol was
+    negotiated and as text frames otherwise.
+
+    """
+
+    def __init__(self, sock, environ, protocol=None):
+        self.socket = sock
+        self.environ = environ
+        self.protocol = protocol
+        self.binary = protocol == 'binary'
+        self.closed = False
+        self._buf = ''
+        self._sendlock = semaphore.Semaphore()
+
+    def _sendall(self, data):
+        # pongs are sent from the reading greenthread, so keep frames
+        # from interleaving
+        self._sendlock.acquire()
+        try:
+            self.socket.sendall(data)
+        finally:
+            self._sendlock.release()
+
+    def send(self, message, opcode=None):
+        if isinstance(message, unicode):
+            message = message.encode('utf-8')
+        if opcode is None:
+            opcode = OPCODE_BINARY if self.binary else OPCODE_TEXT
+        self._sendall(frame_header(opcode, len(message)) + message)
+
+    def send_buffer(self, view, start, length):
+        """Send length bytes of a writable buffer starting at start as one
+        message, writing the frame header into the HEADER_ROOM bytes in
+        front of it so the payload is not copied."""
+        opcode = OPCODE_BINARY if self.binary else OPCODE_TEXT
+        header = frame_header(opcode, length)
+        view[start - len(header):start] = header
+        self._sendall(view[start - len(header):start + length])
+
+    def _recv(self):
+        data = self.socket.recv(65536)
+        if not data:
+            raise EOFError()
+        self._buf += data
+
+    def _read(self, count):
+        while len(self._buf) < count:
+            self._recv()
+        data, self._buf = self._buf[:count], self._buf[count:]
+        return data
+
+    def _read_frame(self):
+        first, second = struct.unpack('!BB', self._read(2))
+        length = second & 0x7f
+        if length == 126:
+            length = struct.unpack('!H', self._read(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self._read(8))[0]
+        if length > MAX_MESSAGE_SIZE:
+            raise ValueError('Websocket frame of %d bytes is too large'
+                             % length)
+        mask = self._read(4) if second & 0x80 else None
+        payload = self._read(length)
+        if mask:
+            payload = apply_mask(payload, mask)
+        return bool(first & 0x80), first & 0x0f, payload
+
+    def wait(self):
+        """Return the next message, or None once the client has closed."""
+        pieces = []
+        while not self.closed:
+            try:
+                final, opcode, payload = self._read_frame()
+            except EOFError:
+                self.closed = True
+                break
+            if opcode == OPCODE_PING:
+                self.send(payload, OPCODE_PONG)
+            elif opcode == OPCODE_CLOSE:
+                self.close(payload[:2])
+            elif opcode != OPCODE_PONG:
+                pieces.append(payload)
+                if final:
+                    return ''.join(pieces)
+        return None
+
+    def close(self, status=''):
+        """Send a close frame unless one has been sent already."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.send(status, OPCODE_CLOSE)
+        except socket.error:
+            pass
@@ -19,24 +19,52 @@
 """Eventlet WSGI Services to proxy VNC.  No nova deps."""
 
 import base64
+import gzip
+import hashlib
 import os
+import StringIO
 
 import eventlet
 from eventlet import wsgi
 from eventlet import websocket
+from eventlet.green import socket
 
 import webob
 
+from nova.vnc import hybi
+
 
 WS_ENDPOINT = '/data'
 
+# Static files of these types are also kept gzipped for clients that accept
+# it.
+COMPRESSIBLE_TYPES = ('application/javascript', 'text/css', 'text/html')
+
 
 class WebsocketVNCProxy(object):
-    """Class to proxy from websocket to vnc server."""
+    """Class to proxy from websocket to vnc server.
+
+    Clients that speak hybi websockets and offer the binary subprotocol
+    get the VNC stream as is; others get it base64 encoded.  max_sessions
+    and max_sessions_per_host cap the sessions relayed in total and to any
+    one VNC host, 0 meaning no cap.
+
+    """
 
-    def __init__(self, wwwroot):
+    def __init__(self, wwwroot, buffer_size=65536, max_sessions=0,
+                 max_sessions_per_host=0):
         self.wwwroot = wwwroot
+        self.buffer_size = buffer_size
+        self.max_sessions = max_sessions
+        self.max_sessions_per_host = max_sessions_per_host
         self.whitelist = {}
+        self.static_cache = {}
+        self.sessions_by_host = {}
+        self.metrics = {'active_sessions': 0,
+                        'total_sessions': 0,
+                        'rejected_sessions': 0,
+                        'bytes_to_client': 0,
+                        'bytes_to_server': 0}
         for root, dirs, files in os.walk(wwwroot):
             hidden_dirs = []
             for d in dirs:
@@ -52,40 +80,145 @@ class WebsocketVNCProxy(object):
     def get_whitelist(self):
         return self.whitelist.keys()
 
+    def get_metrics(self):
+        return dict(self.metrics)
+
     def sock2ws(self, source, dest):
+        """Relay from the VNC server to the websocket client."""
+        binary = getattr(dest, 'binary', False)
+        if binary:
+            buf = bytearray(hybi.HEADER_ROOM + self.buffer_size)
+            view = memoryview(buf)
+            payload = view[hybi.HEADER_ROOM:]
         try:
             while True:
-                d = source.recv(32384)
-                if d == '':
-                    break
-                d = base64.b64encode(d)
-                dest.send(d)
+                if binary:
+                    length = source.recv_into(payload)
+                    if not length:
+                        break
+                    dest.send_buffer(view, hybi.HEADER_ROOM, length)
+                else:
+                    d = source.recv(self.buffer_size)
+                    if d == '':
+                        break
+                    length = len(d)
+                    dest.send(base64.b64encode(d))
+                self.metrics['bytes_to_client'] += length
         except Exception:
-            source.close()
-            dest.close()
+            pass
 
     def ws2sock(self, source, dest):
+        """Relay from the websocket client to the VNC server."""
+        binary = getattr(source, 'binary', False)
         try:
             while True:
                 d = source.wait()
                 if d is None:
                     break
-                d = base64.b64decode(d)
+                if not binary:
+                    d = base64.b64decode(d)
                 dest.sendall(d)
+                self.metrics['bytes_to_server'] += len(d)
         except Exception:
-            source.close()
-            dest.close()
+            pass
+        try:
+            dest.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+
+    def _relay(self, client):
+        server = eventlet.connect((client.environ['vnc_host'],
+                                   client.environ['vnc_port']))
+        receiver = eventlet.spawn(self.ws2sock, client, server)
+        try:
+            self.sock2ws(server, client)
+        finally:
+            receiver.kill()
+            server.close()
+
+    def _start_session(self, host):
+        """Count a session to host, returning False if it is over a cap."""
+        host_sessions = self.sessions_by_host.get(host, 0)
+        if (self.max_sessions and
+            self.metrics['active_sessions'] >= self.max_sessions) or \
+           (self.max_sessions_per_host and
+            host_sessions >= self.max_sessions_per_host):
+            self.metrics['rejected_sessions'] += 1
+            return False
+        self.sessions_by_host[host] = host_sessions + 1
+        self.metrics['active_sessions'] += 1
+        self.metrics['total_sessions'] += 1
+        return True
+
+    def _end_session(self, host):
+        self.metrics['active_sessions'] -= 1
+        self.sessions_by_host[host] -= 1
+        if not self.sessions_by_host[host]:
+            del self.sessions_by_host[host]
 
     def proxy_connection(self, environ, start_response):
-        @websocket.WebSocketWSGI
-        def _handle(client):
-            server = eventlet.connect((client.environ['vnc_host'],
-                                       client.environ['vnc_port']))
-            t1 = eventlet.spawn(self.ws2sock, client, server)
-            t2 = eventlet.spawn(self.sock2ws, server, client)
-            t1.wait()
-            t2.wait()
-        _handle(environ, start_response)
+        host = environ['vnc_host']
+        if not self._start_session(host):
+            start_response('503 Service Unavailable',
+                           [('content-type', 'text/html')])
+            return "Too many console sessions"
+        try:
+            if hybi.is_hybi_request(environ):
+                handler = hybi.HybiWebSocketWSGI(self._relay,
+                                                 ('binary', 'base64'))
+            else:
+                handler = websocket.WebSocketWSGI(self._relay)
+            return handler(environ, start_response)
+        finally:
+            self._end_session(host)
+
+    def _load_static(self, fname, mtime):
+        base, ext = os.path.splitext(fname)
+        if ext == '.js':
+            mimetype = 'application/javascript'
+        elif ext == '.css':
+            mimetype = 'text/css'
+        elif ext in ['.svg', '.jpg', '.png', '.gif']:
+            mimetype = 'image'
+        else:
+            mimetype = 'text/html'
+
+        with open(fname) as static_file:
+            body = static_file.read()
+        gzipped = None
+        if mimetype in COMPRESSIBLE_TYPES:
+            buf = StringIO.StringIO()
+            gzip_file = gzip.GzipFile(fileobj=buf, mode='wb', mtime=0)
+            gzip_file.write(body)
+            gzip_file.close()
+            if len(buf.getvalue()) < len(body):
+                gzipped = buf.getvalue()
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        self.static_cache[fname] = (mtime, mimetype, etag, body, gzipped)
+        return self.static_cache[fname]
+
+    def serve_static(self, environ, start_response, fname):
+        """Serve a whitelisted file from memory, reloading it if it has
+        changed on disk."""
+        mtime = os.stat(fname).st_mtime
+        cached = self.static_cache.get(fname)
+        if cached is None or cached[0] != mtime:
+            cached = self._load_static(fname, mtime)
+        mtime, mimetype, etag, body, gzipped = cached
+
+        headers = [('content-type', mimetype), ('etag', etag)]
+        if gzipped is not None:
+            headers.append(('vary', 'Accept-Encoding'))
+        if environ.get('HTTP_IF_NONE_MATCH') == etag:
+            start_response('304 Not Modified', headers)
+            return []
+        if gzipped is not None and \
+           'gzip' in environ.get('HTTP_ACCEPT_ENCODING', ''):
+            body = gzipped
+            headers.append(('content-encoding', 'gzip'))
+        headers.append(('content-length', str(len(body))))
+        start_response('200 OK', headers)
+        return [body]
 
     def __call__(self, environ, start_response):
         req = webob.Request(environ)
@@ -103,18 +236,7 @@ class WebsocketVNCProxy(object):
                                [('content-type', 'text/html')])
                 return "Not Found"
 
-            base, ext = os.path.splitext(fname)
-            if ext == '.js':
-                mimetype = 'application/javascript'
-            elif ext == '.css':
-                mimetype = 'text/css'
-            elif ext in ['.svg', '.jpg', '.png', '.gif']:
-                mimetype = 'image'
-            else:
-                mimetype = 'text/html'
-
-            start_response('200 OK', [('content-type', mimetype)])
-            return open(os.path.join(fname)).read()
+            return self.serve_static(environ, start_response, fname)
 
 
 class DebugMiddleware(object):
@@ -23,6 +23,7 @@ import sys
 
 from nova import flags
 from nova import log as logging
+from nova import utils
 from nova import version
 from nova import wsgi
 from nova.vnc import auth
@@ -43,6 +44,17 @@ flags.DEFINE_integer('vnc_token_ttl', 300,
                      'How many seconds before deleting tokens')
 flags.DEFINE_string('vncproxy_manager', 'nova.vnc.auth.VNCProxyAuthManager',
                     'Manager for vncproxy auth')
+flags.DEFINE_integer('vncproxy_buffer_size', 65536,
+                     'Bytes to read from a VNC server at a time')
+flags.DEFINE_integer('vncproxy_max_sessions', 0,
+                     'Maximum console sessions to proxy at once, 0 for'
+                     ' no limit')
+flags.DEFINE_integer('vncproxy_max_sessions_per_host', 0,
+                     'Maximum console sessions to proxy to any one host at'
+                     ' once, 0 for no limit')
+flags.DEFINE_integer('vncproxy_metrics_interval', 60,
+                     'Seconds between logging proxy session and traffic'
+                     ' counts, 0 to disable')
 
 
 def get_wsgi_server():
@@ -60,11 +72,18 @@ def get_wsgi_server():
         LOG.info(_("And drop it in %s"), FLAGS.vncproxy_wwwroot)
         sys.exit(1)
 
-    app = proxy.WebsocketVNCProxy(FLAGS.vncproxy_wwwroot)
+    app = proxy.WebsocketVNCProxy(FLAGS.vncproxy_wwwroot,
+                                  FLAGS.vncproxy_buffer_size,
+                                  FLAGS.vncproxy_max_sessions,
+                                  FLAGS.vncproxy_max_sessions_per_host)
 
     LOG.audit(_("Allowing access to the following files: %s"),
               app.get_whitelist())
 
+    if FLAGS.vncproxy_metrics_interval:
+        utils.LoopingCall(log_metrics, app).start(
+                FLAGS.vncproxy_metrics_interval, now=False)
+
     with_logging = auth.LoggingMiddleware(app)
 
     if FLAGS.vnc_debug:
@@ -82,6 +101,13 @@ def get_wsgi_server():
     return wsgi_server
 
 
+def log_metrics(app):
+    LOG.info(_("%(active_sessions)d active console sessions, "
+               "%(total_sessions)d started, %(rejected_sessions)d rejected, "
+               "%(bytes_to_client)d bytes to clients, "
+               "%(bytes_to_server)d bytes to servers"), app.get_metrics())
+
+
 def handle_flash_socket_policy(socket):
     LOG.info(_("Received connection on flash socket policy port"))
 
@@ -50,7 +50,8 @@ class API(base.Base):
             if not size:
                 size = snapshot['volume_size']
 
-        if quota.allowed_volumes(context, 1, size) < 1:
+        num_volumes, reservations = quota.reserve_volume(context, size)
+        if num_volumes < 1:
             pid = context.project_id
             LOG.warn(_("Quota exceeded for %(pid)s, tried to create"
                     " %(size)sG volume") % locals())
@@ -79,7 +80,10 @@ class API(base.Base):
             'metadata': metadata,
             }
 
-        volume = self.db.volume_create(context, options)
+        try:
+            volume = self.db.volume_create(context, options)
+        finally:
+            quota.release(context, reservations)
         rpc.cast(context,
                  FLAGS.scheduler_topic,
                  {"method": "create_volume",
@@ -124,7 +128,7 @@ class API(base.Base):
                                     context.project_id)
 
         if search_opts:
-            LOG.debug(_("Searching by: %s") % str(search_opts))
+            LOG.debug(_("Searching by: %s"), str(search_opts))
 
             def _check_metadata_match(volume, searchdict):
                 volume_metadata = {}
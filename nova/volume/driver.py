@@ -24,6 +24,9 @@ import os
 import time
 from xml.etree import ElementTree
 
+from eventlet import greenpool
+
+from nova import context
 from nova import exception
 from nova import flags
 from nova import log as logging
@@ -49,6 +52,30 @@ flags.DEFINE_string('iscsi_ip_address', '$my_ip',
                     'use this ip for iscsi')
 flags.DEFINE_string('rbd_pool', 'rbd',
                     'the rbd pool in which volumes are stored')
+flags.DEFINE_boolean('volume_wipe_async', False,
+                     'if True, deleted volumes are renamed and zeroed later '
+                     'by a background wiper instead of during the delete')
+flags.DEFINE_string('volume_wipe_prefix', 'wipe-',
+                    'prefix of logical volumes waiting to be zeroed')
+flags.DEFINE_integer('volume_wipe_chunk_mb', 256,
+                     'megabytes zeroed by the background wiper per dd run')
+flags.DEFINE_integer('volume_wipe_bandwidth_mb', 50,
+                     'megabytes per second the background wiper may write, '
+                     '0 for unlimited')
+flags.DEFINE_string('volume_wipe_ionice', '-c3',
+                    'ionice arguments the background wiper runs dd with, '
+                    'empty to run it at normal priority')
+flags.DEFINE_integer('volume_export_concurrency', 8,
+                     'number of exports recreated in parallel at startup')
+flags.DEFINE_integer('volume_copy_bs_mb', 4,
+                     'dd block size in megabytes for snapshot clones')
+flags.DEFINE_integer('volume_copy_chunk_mb', 4096,
+                     'megabytes copied per dd run when cloning a snapshot; '
+                     'progress is recorded after each run')
+flags.DEFINE_boolean('volume_copy_sparse', True,
+                     'if True, zero blocks are not written when cloning a '
+                     'snapshot. Only safe while freed extents are always '
+                     'zeroed, as delete_volume does')
 
 
 class VolumeDriver(object):
@@ -88,14 +115,78 @@ class VolumeDriver(object):
                                   % FLAGS.volume_group)
 
     def _create_volume(self, volume_name, sizestr):
+        pool = self._thin_pool()
+        if pool:
+            self._try_execute('lvcreate', '-T',
+                              '%s/%s' % (FLAGS.volume_group, pool),
+                              '-V', sizestr, '-n', volume_name,
+                              run_as_root=True)
+            return
         self._try_execute('lvcreate', '-L', sizestr, '-n',
                           volume_name, FLAGS.volume_group, run_as_root=True)
 
+    def _thin_pool(self):
+        """Return the name of the thin pool in the volume group, if any.
+
+        Pools that do not zero newly provisioned blocks are ignored, since
+        thin volumes are removed without being wiped.
+
+        """
+        out, _err = self._execute('lvs', '--noheadings', '--separator', ':',
+                                  '-o', 'lv_name,lv_attr',
+                                  FLAGS.volume_group, run_as_root=True)
+        for line in (out or '').splitlines():
+            fields = line.strip().split(':')
+            if (len(fields) == 2 and fields[1].startswith('t') and
+                fields[1][7:8] == 'z'):
+                return fields[0]
+        return None
+
+    def _is_thin_volume(self, volume_name):
+        out, _err = self._execute('lvs', '--noheadings', '-o', 'lv_attr',
+                                  '%s/%s' % (FLAGS.volume_group, volume_name),
+                                  run_as_root=True)
+        return bool(out) and out.strip().startswith('V')
+
     def _copy_volume(self, srcstr, deststr, size_in_g):
         self._execute('dd', 'if=%s' % srcstr, 'of=%s' % deststr,
                       'count=%d' % (size_in_g * 1024), 'bs=1M',
                       run_as_root=True)
 
+    def _clone_volume(self, srcstr, volume, size_in_g):
+        """Copy size_in_g gigabytes from srcstr into volume.
+
+        The copy runs with direct IO in volume_copy_chunk_mb pieces and
+        records its progress in the volume row after each of them.
+
+        """
+        deststr = self.local_path(volume)
+        bs_mb = FLAGS.volume_copy_bs_mb
+        chunk_mb = FLAGS.volume_copy_chunk_mb
+        chunk_mb = max(bs_mb, chunk_mb - chunk_mb % bs_mb)
+        size_mb = size_in_g * 1024
+        conv = 'conv=notrunc'
+        if FLAGS.volume_copy_sparse:
+            conv = 'conv=sparse,notrunc'
+        offset_mb = 0
+        while offset_mb < size_mb:
+            count_mb = min(chunk_mb, size_mb - offset_mb)
+            self._execute('dd', 'if=%s' % srcstr, 'of=%s' % deststr,
+                          'bs=%dM' % bs_mb,
+                          'skip=%d' % (offset_mb / bs_mb),
+                          'seek=%d' % (offset_mb / bs_mb),
+                          'count=%d' % ((count_mb + bs_mb - 1) / bs_mb),
+                          'iflag=direct', 'oflag=direct', conv,
+                          run_as_root=True)
+            offset_mb += count_mb
+            self._report_copy_progress(volume, offset_mb * 100 / size_mb)
+
+    def _report_copy_progress(self, volume, percent):
+        if self.db is None or not volume.get('id'):
+            return
+        self.db.volume_update(context.get_admin_context(), volume['id'],
+                              {'progress': percent})
+
     def _volume_not_present(self, volume_name):
         path_name = '%s/%s' % (FLAGS.volume_group, volume_name)
         try:
@@ -107,14 +198,104 @@ class VolumeDriver(object):
 
     def _delete_volume(self, volume, size_in_g):
         """Deletes a logical volume."""
+        lv_name = self._escape_snapshot(volume['name'])
+        if self._is_thin_volume(lv_name):
+            # NOTE: the blocks go back to the thin pool, which zeroes them
+            #       before they are provisioned again.
+            self._try_execute('lvremove', '-f', '%s/%s' %
+                              (FLAGS.volume_group, lv_name),
+                              run_as_root=True)
+            return
+        if FLAGS.volume_wipe_async:
+            # NOTE: wipe_pending_volumes zeroes and removes it later
+            self._try_execute('lvrename', FLAGS.volume_group, lv_name,
+                              FLAGS.volume_wipe_prefix + lv_name,
+                              run_as_root=True)
+            return
         # zero out old volumes to prevent data leaking between users
-        # TODO(ja): reclaiming space should be done lazy and low priority
         self._copy_volume('/dev/zero', self.local_path(volume), size_in_g)
         self._try_execute('lvremove', '-f', "%s/%s" %
-                          (FLAGS.volume_group,
-                           self._escape_snapshot(volume['name'])),
+                          (FLAGS.volume_group, lv_name),
                           run_as_root=True)
 
+    def _pending_wipes(self):
+        """Return the logical volumes queued for wiping.
+
+        Progress is kept in a wiped_<megabytes> tag on each volume, so the
+        wiper resumes where it stopped after a restart.
+
+        """
+        out, _err = self._execute('lvs', '--noheadings', '--nosuffix',
+                                  '--units', 'm', '--separator', ':',
+                                  '-o', 'lv_name,lv_size,lv_tags',
+                                  FLAGS.volume_group, run_as_root=True)
+        pending = []
+        for line in (out or '').splitlines():
+            fields = line.strip().split(':')
+            if (len(fields) < 3 or
+                not fields[0].startswith(FLAGS.volume_wipe_prefix)):
+                continue
+            wiped_mb = 0
+            for tag in fields[2].split(','):
+                if tag.startswith('wiped_'):
+                    wiped_mb = max(wiped_mb, int(tag[len('wiped_'):]))
+            pending.append({'name': fields[0],
+                            'size_mb': int(float(fields[1])),
+                            'wiped_mb': wiped_mb})
+        return pending
+
+    def _discard_zeroes_data(self, path):
+        """Whether discarding the device guarantees it reads back zeroes."""
+        device = os.path.basename(os.path.realpath(path))
+        try:
+            with open('/sys/block/%s/queue/discard_zeroes_data' % device) as f:
+                return f.read().strip() == '1'
+        except IOError:
+            return False
+
+    def _wipe_volume(self, lv):
+        lv_path = '%s/%s' % (FLAGS.volume_group, lv['name'])
+        dev_path = self.local_path(lv)
+        if self._discard_zeroes_data(dev_path):
+            self._execute('blkdiscard', dev_path, run_as_root=True)
+        else:
+            ionice = []
+            if FLAGS.volume_wipe_ionice:
+                ionice = ['ionice'] + FLAGS.volume_wipe_ionice.split()
+            offset = lv['wiped_mb']
+            while offset < lv['size_mb']:
+                count = min(FLAGS.volume_wipe_chunk_mb,
+                            lv['size_mb'] - offset)
+                start = time.time()
+                self._execute(*(ionice + ['dd', 'if=/dev/zero',
+                                          'of=%s' % dev_path, 'bs=1M',
+                                          'seek=%d' % offset,
+                                          'count=%d' % count,
+                                          'oflag=direct', 'conv=notrunc']),
+                              run_as_root=True)
+                tags = ['--addtag', 'wiped_%d' % (offset + count)]
+                if offset:
+                    tags += ['--deltag', 'wiped_%d' % offset]
+                self._execute('lvchange', *(tags + [lv_path]),
+                              run_as_root=True)
+                offset += count
+                if FLAGS.volume_wipe_bandwidth_mb:
+                    delay = (float(count) / FLAGS.volume_wipe_bandwidth_mb -
+                             (time.time() - start))
+                    if delay > 0:
+                        time.sleep(delay)
+        self._try_execute('lvremove', '-f', lv_path, run_as_root=True)
+
+    def wipe_pending_volumes(self):
+        """Zero and remove the volumes queued by an asynchronous delete."""
+        for lv in self._pending_wipes():
+            LOG.debug(_("%(name)s: wiping from %(wiped_mb)s of %(size_mb)s "
+                        "MB"), lv)
+            try:
+                self._wipe_volume(lv)
+            except Exception:
+                LOG.exception(_("%s: failed to wipe volume"), lv['name'])
+
     def _sizestr(self, size_in_g):
         if int(size_in_g) == 0:
             return '100M'
@@ -134,9 +315,24 @@ class VolumeDriver(object):
 
     def create_volume_from_snapshot(self, volume, snapshot):
         """Creates a volume from a snapshot."""
+        snapshot_name = self._escape_snapshot(snapshot['name'])
+        if self._is_thin_volume(snapshot_name):
+            # NOTE: a snapshot of a thin snapshot shares its blocks, so
+            #       the clone is available without copying anything.
+            self._try_execute('lvcreate', '-s', '-kn', '-n', volume['name'],
+                              '%s/%s' % (FLAGS.volume_group, snapshot_name),
+                              run_as_root=True)
+            if volume['size'] > snapshot['volume_size']:
+                self._try_execute('lvextend', '-L',
+                                  self._sizestr(volume['size']),
+                                  '%s/%s' % (FLAGS.volume_group,
+                                             volume['name']),
+                                  run_as_root=True)
+            self._report_copy_progress(volume, 100)
+            return
         self._create_volume(volume['name'], self._sizestr(volume['size']))
-        self._copy_volume(self.local_path(snapshot), self.local_path(volume),
-                          snapshot['volume_size'])
+        self._clone_volume(self.local_path(snapshot), volume,
+                           snapshot['volume_size'])
 
     def delete_volume(self, volume):
         """Deletes a logical volume."""
@@ -162,9 +358,15 @@ class VolumeDriver(object):
     def create_snapshot(self, snapshot):
         """Creates a snapshot."""
         orig_lv_name = "%s/%s" % (FLAGS.volume_group, snapshot['volume_name'])
+        snapshot_name = self._escape_snapshot(snapshot['name'])
+        if self._is_thin_volume(snapshot['volume_name']):
+            # NOTE: thin snapshots take no size and share the origin's blocks
+            self._try_execute('lvcreate', '-s', '-kn', '--name', snapshot_name,
+                              orig_lv_name, run_as_root=True)
+            return
         self._try_execute('lvcreate', '-L',
                           self._sizestr(snapshot['volume_size']),
-                          '--name', self._escape_snapshot(snapshot['name']),
+                          '--name', snapshot_name,
                           '--snapshot', orig_lv_name, run_as_root=True)
 
     def delete_snapshot(self, snapshot):
@@ -187,6 +389,11 @@ class VolumeDriver(object):
         """Synchronously recreates an export for a logical volume."""
         raise NotImplementedError()
 
+    def ensure_exports(self, context, volumes):
+        """Recreates the exports for all given volumes at startup."""
+        for volume in volumes:
+            self.ensure_export(context, volume)
+
     def create_export(self, context, volume):
         """Exports the volume. Can optionally return a Dictionary of changes
         to the volume object to be persisted."""
@@ -211,7 +418,12 @@ class VolumeDriver(object):
     def get_volume_stats(self, refresh=False):
         """Return the current state of the volume service. If 'refresh' is
            True, run the update first."""
-        return None
+        if not FLAGS.volume_wipe_async:
+            return None
+        pending = self._pending_wipes()
+        remaining_mb = sum([lv['size_mb'] - lv['wiped_mb'] for lv in pending])
+        return {'volumes_wiping': len(pending),
+                'gigabytes_wiping': remaining_mb / 1024}
 
 
 class ISCSIDriver(VolumeDriver):
@@ -246,6 +458,9 @@ class ISCSIDriver(VolumeDriver):
                        "provisioned for volume: %d"), volume['id'])
             return
 
+        self._ensure_export(volume, iscsi_target)
+
+    def _ensure_export(self, volume, iscsi_target):
         iscsi_name = "%s%s" % (FLAGS.iscsi_target_prefix, volume['name'])
         volume_path = "/dev/%s/%s" % (FLAGS.volume_group, volume['name'])
 
@@ -253,6 +468,50 @@ class ISCSIDriver(VolumeDriver):
         self.tgtadm.new_logicalunit(iscsi_target, 0, volume_path,
                                     check_exit_code=False)
 
+    def ensure_exports(self, context, volumes):
+        """Recreates only the exports the target daemon is missing.
+
+        Target ids come from one db query and the running targets and
+        their logical units from one call to the target admin tool; the
+        exports whose target or logical unit is missing are then created
+        volume_export_concurrency at a time.
+
+        """
+        if not volumes:
+            return
+        targets = self.db.volume_get_iscsi_target_nums_by_host(
+                context, volumes[0]['host'])
+        try:
+            exported = self.tgtadm.list_targets()
+        except (NotImplementedError, exception.ProcessExecutionError):
+            LOG.exception(_("Could not list iscsi targets, recreating all"))
+            exported = {}
+
+        missing = []
+        for volume in volumes:
+            iscsi_target = targets.get(volume['id'])
+            if iscsi_target is None:
+                LOG.info(_("Skipping ensure_export. No iscsi_target " +
+                           "provisioned for volume: %d"), volume['id'])
+            else:
+                volume_path = "/dev/%s/%s" % (FLAGS.volume_group,
+                                              volume['name'])
+                if volume_path not in exported.get(iscsi_target, ()):
+                    missing.append((volume, iscsi_target))
+        LOG.debug(_("Recreating %(missing)d of %(total)d exports"),
+                  {'missing': len(missing), 'total': len(volumes)})
+
+        pool = greenpool.GreenPool(FLAGS.volume_export_concurrency)
+        threads = [(volume, pool.spawn(self._ensure_export, volume,
+                                       iscsi_target))
+                   for volume, iscsi_target in missing]
+        for volume, thread in threads:
+            try:
+                thread.wait()
+            except Exception:
+                LOG.exception(_("Could not recreate export for volume %s"),
+                              volume['name'])
+
     def _ensure_iscsi_targets(self, context, host):
         """Ensure that target ids have been created in datastore."""
         host_iscsi_targets = self.db.iscsi_target_count_by_host(context, host)
@@ -349,7 +608,7 @@ class ISCSIDriver(VolumeDriver):
                                         " for volume %s") %
                                       (volume['name']))
 
-            LOG.debug(_("ISCSI Discovery: Found %s") % (location))
+            LOG.debug(_("ISCSI Discovery: Found %s"), location)
             properties['target_discovered'] = True
 
         (iscsi_target, _sep, iscsi_name) = location.partition(" ")
@@ -376,8 +635,8 @@ class ISCSIDriver(VolumeDriver):
                                    iscsi_properties['target_iqn'],
                                    '-p', iscsi_properties['target_portal'],
                                    *iscsi_command, run_as_root=True)
-        LOG.debug("iscsiadm %s: stdout=%s stderr=%s" %
-                  (iscsi_command, out, err))
+        LOG.debug("iscsiadm %s: stdout=%s stderr=%s",
+                  iscsi_command, out, err)
         return (out, err)
 
     def _iscsiadm_update(self, iscsi_properties, property_key, property_value):
@@ -629,12 +888,12 @@ class LoggingVolumeDriver(VolumeDriver):
     @staticmethod
     def log_action(action, parameters):
         """Logs the command."""
-        LOG.debug(_("LoggingVolumeDriver: %s") % (action))
+        LOG.debug(_("LoggingVolumeDriver: %s"), action)
         log_dictionary = {}
         if parameters:
             log_dictionary = dict(parameters)
         log_dictionary['action'] = action
-        LOG.debug(_("LoggingVolumeDriver: %s") % (log_dictionary))
+        LOG.debug(_("LoggingVolumeDriver: %s"), log_dictionary)
         LoggingVolumeDriver._LOGS.append(log_dictionary)
 
     @staticmethod
@@ -792,7 +1051,7 @@ class ZadaraBEDriver(ISCSIDriver):
 
         if tries != 0:
             LOG.debug(_("Found iSCSI node %(mount_device)s "
-                        "(after %(tries)s rescans)") %
+                        "(after %(tries)s rescans)"),
                       locals())
 
         return mount_device
@@ -835,6 +1094,10 @@ class ZadaraBEDriver(ISCSIDriver):
             return
         return ret
 
+    def ensure_exports(self, context, volumes):
+        """VSA volumes are exported differently, so go one at a time."""
+        VolumeDriver.ensure_exports(self, context, volumes)
+
     def create_export(self, context, volume):
         """create BE export for a volume"""
         if self._not_vsa_volume_or_drive(volume):
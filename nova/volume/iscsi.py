@@ -44,7 +44,7 @@ class TargetAdmin(object):
         self._execute = execute
 
     def _run(self, *args, **kwargs):
-        self._execute(self._cmd, *args, run_as_root=True, **kwargs)
+        return self._execute(self._cmd, *args, run_as_root=True, **kwargs)
 
     def new_target(self, name, tid, **kwargs):
         """Create a new iSCSI target."""
@@ -66,6 +66,11 @@ class TargetAdmin(object):
         """Delete a logical unit from a target."""
         raise NotImplementedError()
 
+    def list_targets(self):
+        """Return a dict of the exported target IDs to the set of paths
+        backing their logical units."""
+        raise NotImplementedError()
+
 
 class TgtAdm(TargetAdmin):
     """iSCSI target administration using tgtadm."""
@@ -112,6 +117,24 @@ class TgtAdm(TargetAdmin):
                   '--lun=%d' % (lun + 1),
                   **kwargs)
 
+    def list_targets(self):
+        out, _err = self._run('--op', 'show',
+                              '--lld=iscsi', '--mode=target')
+        targets = {}
+        paths = None
+        for line in (out or '').splitlines():
+            # Target 1: iqn.2010-10.org.openstack:volume-00000001
+            if line.startswith('Target '):
+                paths = targets.setdefault(int(line.split()[1].rstrip(':')),
+                                           set())
+            # Backing store path: /dev/nova-volumes/volume-00000001
+            elif (paths is not None and
+                  line.strip().startswith('Backing store path:')):
+                path = line.split(':', 1)[1].strip()
+                if path != 'None':
+                    paths.add(path)
+        return targets
+
 
 class IetAdm(TargetAdmin):
     """iSCSI target administration using ietadm."""
@@ -148,6 +171,22 @@ class IetAdm(TargetAdmin):
                   '--lun=%d' % lun,
                   **kwargs)
 
+    def list_targets(self):
+        out, _err = self._execute('cat', '/proc/net/iet/volume')
+        targets = {}
+        paths = None
+        for line in (out or '').splitlines():
+            # tid:1 name:iqn.2010-10.org.openstack:volume-00000001
+            if line.startswith('tid:'):
+                paths = targets.setdefault(
+                        int(line.split()[0][len('tid:'):]), set())
+            #     lun:0 state:0 iotype:fileio path:/dev/nova/volume-00000001
+            elif paths is not None and line.strip().startswith('lun:'):
+                for field in line.split():
+                    if field.startswith('path:'):
+                        paths.add(field[len('path:'):])
+        return targets
+
 
 def get_target_admin():
     if FLAGS.iscsi_helper == 'tgtadm':
@@ -40,6 +40,8 @@ intact.
 
 import sys
 
+from eventlet import greenthread
+
 from nova import context
 from nova import exception
 from nova import flags
@@ -61,6 +63,7 @@ flags.DEFINE_boolean('use_local_volumes', True,
                      'if True, will not discover local volumes')
 flags.DEFINE_boolean('volume_force_update_capabilities', False,
                      'if True will force update capabilities on each check')
+flags.DECLARE('volume_wipe_async', 'nova.volume.driver')
 
 
 class VolumeManager(manager.SchedulerDependentManager):
@@ -76,6 +79,7 @@ class VolumeManager(manager.SchedulerDependentManager):
         #             by the driver.
         self.driver.db = self.db
         self._last_volume_stats = []
+        self._wiper = None
 
     def init_host(self):
         """Do any initialization that needs to be run if this is a
@@ -84,11 +88,19 @@ class VolumeManager(manager.SchedulerDependentManager):
         ctxt = context.get_admin_context()
         volumes = self.db.volume_get_all_by_host(ctxt, self.host)
         LOG.debug(_("Re-exporting %s volumes"), len(volumes))
+        exportable = []
         for volume in volumes:
             if volume['status'] in ['available', 'in-use']:
-                self.driver.ensure_export(ctxt, volume)
+                exportable.append(volume)
             else:
                 LOG.info(_("volume %s: skipping export"), volume['name'])
+        start = utils.utcnow()
+        self.driver.ensure_exports(ctxt, exportable)
+        elapsed = utils.utcnow() - start
+        LOG.info(_("Re-exported %(count)d volumes in %(seconds)s seconds") %
+                 {'count': len(exportable),
+                  'seconds': elapsed.seconds +
+                             elapsed.microseconds / 1000000.0})
 
     def create_volume(self, context, volume_id, snapshot_id=None):
         """Creates and exports the volume."""
@@ -107,7 +119,7 @@ class VolumeManager(manager.SchedulerDependentManager):
             vol_name = volume_ref['name']
             vol_size = volume_ref['size']
             LOG.debug(_("volume %(vol_name)s: creating lv of"
-                    " size %(vol_size)sG") % locals())
+                    " size %(vol_size)sG"), locals())
             if snapshot_id == None:
                 model_update = self.driver.create_volume(volume_ref)
             else:
@@ -197,7 +209,7 @@ class VolumeManager(manager.SchedulerDependentManager):
 
         try:
             snap_name = snapshot_ref['name']
-            LOG.debug(_("snapshot %(snap_name)s: creating") % locals())
+            LOG.debug(_("snapshot %(snap_name)s: creating"), locals())
             model_update = self.driver.create_snapshot(snapshot_ref)
             if model_update:
                 self.db.snapshot_update(context, snapshot_ref['id'],
@@ -277,21 +289,6 @@ class VolumeManager(manager.SchedulerDependentManager):
         for volume in instance_ref['volumes']:
             self.driver.check_for_export(context, volume['id'])
 
-    def periodic_tasks(self, context=None):
-        """Tasks to be run at a periodic interval."""
-
-        error_list = []
-        try:
-            self._report_driver_status()
-        except Exception as ex:
-            LOG.warning(_("Error during report_driver_status(): %s"),
-                        unicode(ex))
-            error_list.append(ex)
-
-        super(VolumeManager, self).periodic_tasks(context)
-
-        return error_list
-
     def _volume_stats_changed(self, stat1, stat2):
         if FLAGS.volume_force_update_capabilities:
             return True
@@ -302,7 +299,8 @@ class VolumeManager(manager.SchedulerDependentManager):
                 return True
         return False
 
-    def _report_driver_status(self):
+    @manager.periodic_task
+    def _report_driver_status(self, context):
         volume_stats = self.driver.get_volume_stats(refresh=True)
         if volume_stats:
             LOG.info(_("Checking volume capabilities"))
@@ -319,6 +317,14 @@ class VolumeManager(manager.SchedulerDependentManager):
                 # avoid repeating fanouts
                 self.update_service_capabilities(None)
 
+    @manager.periodic_task
+    def _wipe_deleted_volumes(self, context):
+        """Keep the background wiper running while volumes wait for it."""
+        if not FLAGS.volume_wipe_async:
+            return
+        if self._wiper is None or self._wiper.dead:
+            self._wiper = greenthread.spawn(self.driver.wipe_pending_volumes)
+
     def _reset_stats(self):
         LOG.info(_("Clear capabilities"))
         self._last_volume_stats = []
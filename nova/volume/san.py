@@ -21,9 +21,12 @@ The unique thing about a SAN is that we don't expect that we can run the volume
 controller on the SAN hardware.  We expect to access it over SSH or some API.
 """
 
+import contextlib
 import os
 import paramiko
+import time
 
+from eventlet import semaphore
 from xml.etree import ElementTree
 
 from nova import exception
@@ -31,6 +34,7 @@ from nova import flags
 from nova import log as logging
 from nova.utils import ssh_execute
 from nova.volume.driver import ISCSIDriver
+from nova.volume.driver import VolumeDriver
 
 LOG = logging.getLogger("nova.volume.driver")
 FLAGS = flags.FLAGS
@@ -48,6 +52,82 @@ flags.DEFINE_string('san_clustername', '',
                     'Cluster name to use for creating volumes')
 flags.DEFINE_integer('san_ssh_port', 22,
                     'SSH port to use with SAN')
+flags.DEFINE_integer('san_ssh_pool_size', 4,
+                     'Maximum number of SSH connections to the SAN')
+flags.DEFINE_integer('san_ssh_idle_timeout', 300,
+                     'Seconds an unused SSH connection to the SAN is kept')
+flags.DEFINE_integer('san_ssh_keepalive', 30,
+                     'Seconds between keepalives on SSH connections to the '
+                     'SAN, 0 to disable')
+
+
+class SSHPool(object):
+    """A bounded pool of SSH connections to one SAN controller.
+
+    Connections are checked for a live transport and for the idle timeout
+    when they are taken from the pool.  A connection that fails with
+    anything but a command error is closed instead of returned.
+    """
+
+    def __init__(self, connect, max_size):
+        self._connect = connect
+        self._semaphore = semaphore.Semaphore(max_size)
+        self._free = []
+        self.connections_made = 0
+
+    def _get(self):
+        now = time.time()
+        while self._free:
+            ssh, last_used = self._free.pop()
+            transport = ssh.get_transport()
+            if (now - last_used < FLAGS.san_ssh_idle_timeout and
+                transport is not None and transport.is_active()):
+                return ssh
+            ssh.close()
+        ssh = self._connect()
+        self.connections_made += 1
+        if FLAGS.san_ssh_keepalive:
+            ssh.get_transport().set_keepalive(FLAGS.san_ssh_keepalive)
+        return ssh
+
+    @contextlib.contextmanager
+    def item(self):
+        with self._semaphore:
+            ssh = self._get()
+            try:
+                yield ssh
+            except exception.ProcessExecutionError:
+                self._free.append((ssh, time.time()))
+                raise
+            except Exception:
+                ssh.close()
+                raise
+            self._free.append((ssh, time.time()))
+
+
+class SSHSession(object):
+    """An SSH session that is already open, for ssh_execute to run a
+    command on as it would on an SSHClient."""
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    def exec_command(self, command):
+        self.channel.exec_command(command)
+        return (self.channel.makefile('wb', -1),
+                self.channel.makefile('rb', -1),
+                self.channel.makefile_stderr('rb', -1))
+
+
+_ssh_pools = {}
+
+
+def _get_ssh_pool(connect):
+    """Return the pool shared by all drivers talking to the same SAN."""
+    key = (FLAGS.san_ip, FLAGS.san_ssh_port, FLAGS.san_login)
+    if key not in _ssh_pools:
+        _ssh_pools[key] = SSHPool(connect, FLAGS.san_ssh_pool_size)
+    return _ssh_pools[key]
 
 
 class SanISCSIDriver(ISCSIDriver):
@@ -82,21 +162,50 @@ class SanISCSIDriver(ISCSIDriver):
             raise exception.Error(_("Specify san_password or san_privatekey"))
         return ssh
 
-    def _run_ssh(self, command, check_exit_code=True):
-        #TODO(justinsb): SSH connection caching (?)
-        ssh = self._connect_to_ssh()
-
-        #TODO(justinsb): Reintroduce the retry hack
-        ret = ssh_execute(ssh, command, check_exit_code=check_exit_code)
-
-        ssh.close()
+    # Whether commands can be chained with && in the SAN's shell
+    supports_pipelining = False
 
-        return ret
+    def _run_ssh(self, command, check_exit_code=True):
+        """Run command on a pooled connection to the SAN.
+
+        Failing to open a session on a connection the SAN dropped is
+        retried once on a new connection.  Failures after that are not,
+        since the command may have run and creating or deleting a LU twice
+        is not safe.
+        """
+        pool = _get_ssh_pool(self._connect_to_ssh)
+        for attempt in xrange(2):
+            opened = False
+            try:
+                with pool.item() as ssh:
+                    channel = ssh.get_transport().open_session()
+                    opened = True
+                    return ssh_execute(SSHSession(channel), command,
+                                       check_exit_code=check_exit_code)
+            except paramiko.SSHException:
+                if opened or attempt:
+                    raise
+                LOG.exception(_("Could not open an SSH session, retrying:"
+                                " %s"), command)
+
+    def _run_ssh_pipeline(self, commands):
+        """Run commands in order, stopping at the first one that fails."""
+        if not commands:
+            return
+        if self.supports_pipelining:
+            self._run_ssh(' && '.join(commands))
+        else:
+            for command in commands:
+                self._run_ssh(command)
 
     def ensure_export(self, context, volume):
         """Synchronously recreates an export for a logical volume."""
         pass
 
+    def ensure_exports(self, context, volumes):
+        """Exports live on the SAN, so recreate them one at a time."""
+        VolumeDriver.ensure_exports(self, context, volumes)
+
     def create_export(self, context, volume):
         """Exports the volume."""
         pass
@@ -165,6 +274,8 @@ class SolarisISCSIDriver(SanISCSIDriver):
     Also make sure you can login using san_login & san_password/san_privatekey
     """
 
+    supports_pipelining = True
+
     def _view_exists(self, luid):
         cmd = "pfexec /usr/sbin/stmfadm list-view -l %s" % (luid)
         (out, _err) = self._run_ssh(cmd,
@@ -181,7 +292,7 @@ class SolarisISCSIDriver(SanISCSIDriver):
         """Gets list of target groups from host."""
         (out, _err) = self._run_ssh("pfexec /usr/sbin/stmfadm list-tg")
         matches = _get_prefixed_values(out, 'Target group: ')
-        LOG.debug("target_groups=%s" % matches)
+        LOG.debug("target_groups=%s", matches)
         return matches
 
     def _target_group_exists(self, target_group_name):
@@ -191,7 +302,7 @@ class SolarisISCSIDriver(SanISCSIDriver):
         (out, _err) = self._run_ssh("pfexec /usr/sbin/stmfadm list-tg -v %s" %
                                     (target_group_name))
         matches = _get_prefixed_values(out, 'Member: ')
-        LOG.debug("members of %s=%s" % (target_group_name, matches))
+        LOG.debug("members of %s=%s", target_group_name, matches)
         return matches
 
     def _is_target_group_member(self, target_group_name, iscsi_target_name):
@@ -203,7 +314,7 @@ class SolarisISCSIDriver(SanISCSIDriver):
                "awk '{print $1}' | grep -v ^TARGET")
         (out, _err) = self._run_ssh(cmd)
         matches = _collect_lines(out)
-        LOG.debug("_get_iscsi_targets=%s" % (matches))
+        LOG.debug("_get_iscsi_targets=%s", matches)
         return matches
 
     def _iscsi_target_exists(self, iscsi_target_name):
@@ -283,22 +394,30 @@ class SolarisISCSIDriver(SanISCSIDriver):
         target_group_name = 'tg-%s' % volume['name']
 
         # Create a iSCSI target, mapped to just this volume
-        if force_create or not self._target_group_exists(target_group_name):
-            self._run_ssh("pfexec /usr/sbin/stmfadm create-tg %s" %
-                          (target_group_name))
-
+        create_tg = ("pfexec /usr/sbin/stmfadm create-tg %s" %
+                     (target_group_name))
         # Yes, we add the initiatior before we create it!
         # Otherwise, it complains that the target is already active
-        if force_create or not self._is_target_group_member(target_group_name,
-                                                            iscsi_name):
-            self._run_ssh("pfexec /usr/sbin/stmfadm add-tg-member -g %s %s" %
-                          (target_group_name, iscsi_name))
-        if force_create or not self._iscsi_target_exists(iscsi_name):
-            self._run_ssh("pfexec /usr/sbin/itadm create-target -n %s" %
-                          (iscsi_name))
-        if force_create or not self._view_exists(luid):
-            self._run_ssh("pfexec /usr/sbin/stmfadm add-view -t %s %s" %
-                          (target_group_name, luid))
+        add_member = ("pfexec /usr/sbin/stmfadm add-tg-member -g %s %s" %
+                      (target_group_name, iscsi_name))
+        create_target = ("pfexec /usr/sbin/itadm create-target -n %s" %
+                         (iscsi_name))
+        add_view = ("pfexec /usr/sbin/stmfadm add-view -t %s %s" %
+                    (target_group_name, luid))
+
+        if force_create:
+            self._run_ssh_pipeline([create_tg, add_member, create_target,
+                                    add_view])
+        else:
+            if not self._target_group_exists(target_group_name):
+                self._run_ssh(create_tg)
+            if not self._is_target_group_member(target_group_name,
+                                                iscsi_name):
+                self._run_ssh(add_member)
+            if not self._iscsi_target_exists(iscsi_name):
+                self._run_ssh(create_target)
+            if not self._view_exists(luid):
+                self._run_ssh(add_view)
 
         #TODO(justinsb): Is this always 1? Does it matter?
         iscsi_portal_interface = '1'
@@ -324,10 +443,9 @@ class SolarisISCSIDriver(SanISCSIDriver):
                           (luid))
 
         if self._iscsi_target_exists(iscsi_name):
-            self._run_ssh("pfexec /usr/sbin/stmfadm offline-target %s" %
-                          (iscsi_name))
-            self._run_ssh("pfexec /usr/sbin/itadm delete-target %s" %
-                          (iscsi_name))
+            self._run_ssh_pipeline(
+                ["pfexec /usr/sbin/stmfadm offline-target %s" % (iscsi_name),
+                 "pfexec /usr/sbin/itadm delete-target %s" % (iscsi_name)])
 
         # We don't delete the tg-member; we delete the whole tg!
 
@@ -475,7 +593,7 @@ class HpSanISCSIDriver(SanISCSIDriver):
             for k, v in status_node.attrib.items():
                 volume_attributes["permission." + k] = v
 
-        LOG.debug(_("Volume info: %(volume_name)s => %(volume_attributes)s") %
+        LOG.debug(_("Volume info: %(volume_name)s => %(volume_attributes)s"),
                   locals())
         return volume_attributes
 
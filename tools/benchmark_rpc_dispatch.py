@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Times dispatching rpc casts to a manager with DEBUG logging off and on
+
+Usage: benchmark_rpc_dispatch.py [messages]
+"""
+
+import gettext
+import os
+import sys
+import time
+
+possible_topdir = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                   os.pardir,
+                                   os.pardir))
+if os.path.exists(os.path.join(possible_topdir, 'nova', '__init__.py')):
+    sys.path.insert(0, possible_topdir)
+
+gettext.install('nova', unicode=1)
+
+from nova import context
+from nova import log as logging
+from nova.rpc import impl_kombu
+
+
+class Manager(object):
+    def echo(self, context, value):
+        return value
+
+
+def _messages(count):
+    ctxt = context.get_admin_context()
+    messages = []
+    for i in xrange(count):
+        msg = {'method': 'echo', 'args': {'value': i}}
+        impl_kombu._pack_context(msg, ctxt)
+        messages.append(msg)
+    return messages
+
+
+def _dispatch(count, level):
+    root = logging.getLogger()
+    root.setLevel(level)
+    callback = impl_kombu.ProxyCallback(Manager())
+    messages = _messages(count)
+    start = time.time()
+    for msg in messages:
+        callback(msg)
+    callback.pool.waitall()
+    return time.time() - start
+
+
+def main(count):
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.StreamHandler(open(os.devnull, 'w')))
+    for name, level in (('DEBUG off', logging.INFO),
+                        ('DEBUG on', logging.DEBUG)):
+        seconds = min(_dispatch(count, level) for i in xrange(3))
+        print '%-10s %8.1f us per message' % (name,
+                                              seconds * 1000000 / count)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Times PUT, GET and ranged GET of large objects through the S3 objectstore
+and reports how far they push the peak RSS of the process
+
+The server and client run in the same process; the client streams in both
+directions, so growth in peak RSS is what the server buffers.  Sizes are in
+GB and need that much free space in the temporary directory.
+
+Usage: benchmark_s3_objectstore.py [size_gb ...]
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import httplib
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+possible_topdir = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                   os.pardir,
+                                   os.pardir))
+if os.path.exists(os.path.join(possible_topdir, 'nova', '__init__.py')):
+    sys.path.insert(0, possible_topdir)
+
+from nova import wsgi
+from nova.objectstore import s3server
+
+
+CHUNK = 'x' * (1024 * 1024)
+GB = 1024 * 1024 * 1024
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _request(port, method, path, size=0, headers=None):
+    """Send size bytes as the body of a request and drain the response."""
+    conn = httplib.HTTPConnection('127.0.0.1', port)
+    conn.putrequest(method, path)
+    conn.putheader('Content-Length', str(size))
+    for header, value in (headers or {}).items():
+        conn.putheader(header, value)
+    conn.endheaders()
+    for i in xrange(size / len(CHUNK)):
+        conn.send(CHUNK)
+    response = conn.getresponse()
+    received = 0
+    while True:
+        data = response.read(len(CHUNK))
+        if not data:
+            break
+        received += len(data)
+    conn.close()
+    return response.status, received
+
+
+def main(sizes):
+    buckets_path = tempfile.mkdtemp(prefix='benchmark_s3-')
+    server = wsgi.Server('S3 Objectstore',
+                         s3server.S3Application(buckets_path),
+                         host='127.0.0.1', port=0)
+    server.start()
+    try:
+        _request(server.port, 'PUT', '/bench/')
+        print 'baseline peak RSS %8.1f MB' % _peak_rss_mb()
+        for size_gb in sizes:
+            size = int(size_gb * GB) / len(CHUNK) * len(CHUNK)
+            path = '/bench/object-%s' % size_gb
+            half = 'bytes=%d-%d' % (size / 2, size - 1)
+            for name, method, body, headers in (
+                    ('PUT', 'PUT', size, None),
+                    ('GET', 'GET', 0, None),
+                    ('GET half', 'GET', 0, {'Range': half})):
+                start = time.time()
+                status, received = _request(server.port, method, path,
+                                            body, headers)
+                seconds = time.time() - start
+                moved = body or received
+                print '%5s GB %-9s %d %8.1f MB/s  peak RSS %8.1f MB' % (
+                        size_gb, name, status,
+                        moved / seconds / 1024 / 1024, _peak_rss_mb())
+            _request(server.port, 'DELETE', path)
+    finally:
+        server.stop()
+        shutil.rmtree(buckets_path)
+
+
+if __name__ == '__main__':
+    main([float(size) for size in sys.argv[1:]] or [1])
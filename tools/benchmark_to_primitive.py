@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Times utils.to_primitive and utils.dumps on instance payloads
+
+Usage: benchmark_to_primitive.py [iterations]
+"""
+
+import datetime
+import os
+import sys
+import timeit
+
+possible_topdir = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                   os.pardir,
+                                   os.pardir))
+if os.path.exists(os.path.join(possible_topdir, 'nova', '__init__.py')):
+    sys.path.insert(0, possible_topdir)
+
+from nova import utils
+from nova.db.sqlalchemy import models
+
+
+def _instance(instance_id):
+    now = datetime.datetime.utcnow()
+    instance = models.Instance(id=instance_id,
+                               user_id='fake-user',
+                               project_id='fake-project',
+                               image_ref='1',
+                               kernel_id='2',
+                               ramdisk_id='3',
+                               display_name='server-%d' % instance_id,
+                               hostname='server-%d' % instance_id,
+                               host='compute-1',
+                               instance_type_id=1,
+                               vm_state='active',
+                               memory_mb=2048,
+                               vcpus=2,
+                               local_gb=20,
+                               created_at=now,
+                               updated_at=now,
+                               launched_at=now,
+                               user_data='x' * 1024,
+                               uuid=str(utils.gen_uuid()))
+    instance.instance_type = models.InstanceTypes(id=1, name='m1.small',
+                                                  memory_mb=2048, vcpus=2,
+                                                  local_gb=20)
+    instance.fixed_ips = [models.FixedIp(address='10.0.0.%d' % i)
+                          for i in xrange(2, 4)]
+    return instance
+
+
+def main(iterations):
+    instances = [_instance(i) for i in xrange(100)]
+    payloads = {
+        'instance rows': instances,
+        'usage payloads': [utils.usage_from_instance(instance,
+                                                     network_info=[])
+                           for instance in instances],
+        'notify payloads': [dict(instance_id=instance['id'],
+                                 created_at=instance['created_at'],
+                                 metadata={'key': 'value'},
+                                 args=[instance['uuid'], (1, 2, 3)])
+                            for instance in instances],
+    }
+    for name, payload in sorted(payloads.items()):
+        for func in ('to_primitive', 'dumps'):
+            timer = timeit.Timer(lambda: getattr(utils, func)(payload))
+            seconds = min(timer.repeat(3, iterations)) / iterations
+            print '%-16s %-13s %8.3f ms per 100' % (name, func,
+                                                    seconds * 1000)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
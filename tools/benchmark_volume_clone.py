@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Times how long a volume cloned from a snapshot takes to become available
+
+For each size a source volume is created, snapshotted and cloned through
+VolumeDriver.create_volume_from_snapshot, which takes a thin snapshot when
+the volume group has a thin pool and copies otherwise.  Every volume is
+removed again without being zeroed.  Must run as a user that may run the
+LVM commands, against a volume group with room for three volumes of each
+size.  Sizes are in GB.
+
+Usage: benchmark_volume_clone.py [--volume_group=<vg>] [size_gb ...]
+"""
+
+import os
+import sys
+import time
+
+possible_topdir = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                   os.pardir,
+                                   os.pardir))
+if os.path.exists(os.path.join(possible_topdir, 'nova', '__init__.py')):
+    sys.path.insert(0, possible_topdir)
+
+from nova import flags
+from nova import utils
+from nova.volume import driver
+
+
+FLAGS = flags.FLAGS
+
+
+def _remove(lv_name):
+    utils.execute('lvremove', '-f', '%s/%s' % (FLAGS.volume_group, lv_name),
+                  run_as_root=True)
+
+
+def main(sizes):
+    volume_driver = driver.VolumeDriver()
+    volume_driver.check_for_setup_error()
+    print 'volume group %s, thin pool %s, sparse copy %s' % (
+            FLAGS.volume_group, volume_driver._thin_pool(),
+            FLAGS.volume_copy_sparse)
+    for size_gb in sizes:
+        source = {'name': 'benchmark-source', 'size': size_gb}
+        snapshot = {'name': 'snapshot-benchmark', 'volume_size': size_gb,
+                    'volume_name': source['name']}
+        clone = {'name': 'benchmark-clone', 'size': size_gb}
+        volume_driver.create_volume(source)
+        try:
+            volume_driver.create_snapshot(snapshot)
+            try:
+                start = time.time()
+                volume_driver.create_volume_from_snapshot(clone, snapshot)
+                seconds = time.time() - start
+                _remove(clone['name'])
+            finally:
+                _remove(volume_driver._escape_snapshot(snapshot['name']))
+        finally:
+            _remove(source['name'])
+        print '%5s GB clone available in %8.1f s  %8.1f MB/s' % (
+                size_gb, seconds, size_gb * 1024 / seconds)
+
+
+if __name__ == '__main__':
+    utils.default_flagfile()
+    argv = FLAGS(sys.argv)
+    main([int(size) for size in argv[1:]] or [10, 100])
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Times rendering a /servers/detail response as JSON and as XML
+
+Usage: benchmark_xml_serialization.py [servers]
+"""
+
+import gettext
+import os
+import sys
+import timeit
+
+possible_topdir = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                   os.pardir,
+                                   os.pardir))
+if os.path.exists(os.path.join(possible_topdir, 'nova', '__init__.py')):
+    sys.path.insert(0, possible_topdir)
+
+gettext.install('nova', unicode=1)
+
+from lxml import etree
+
+from nova import utils
+from nova.api.openstack import servers
+from nova.api.openstack import wsgi
+
+
+def _links(kind, item_id):
+    href = 'http://localhost/v1.1/fake/%s/%s' % (kind, item_id)
+    return [{'rel': 'self', 'href': href},
+            {'rel': 'bookmark', 'href': href.replace('/v1.1', '')}]
+
+
+def _server(server_id):
+    return {
+        'id': server_id,
+        'uuid': str(utils.gen_uuid()),
+        'name': 'server-%d' % server_id,
+        'user_id': 'fake-user',
+        'tenant_id': 'fake-project',
+        'created': '2011-11-11T11:11:11Z',
+        'updated': '2011-11-11T11:11:11Z',
+        'hostId': 'e4d909c290d0fb1ca068ffaddf22cbd0',
+        'accessIPv4': '',
+        'accessIPv6': '',
+        'status': 'ACTIVE',
+        'progress': 100,
+        'image': {'id': '1', 'links': _links('images', 1)},
+        'flavor': {'id': '1', 'links': _links('flavors', 1)},
+        'metadata': {'key1': 'value1', 'key2': 'value2'},
+        'addresses': {'private': [{'version': 4, 'addr': '10.0.0.%d' % i}
+                                  for i in xrange(2, 4)]},
+        'security_groups': [{'name': 'default'}],
+        'links': _links('servers', server_id),
+    }
+
+
+def _uncompiled(template, data):
+    elem = template._serialize(None, data, template._siblings(),
+                               template._nsmap())
+    return etree.tostring(elem, encoding='UTF-8', xml_declaration=True)
+
+
+def main(count):
+    data = {'servers': [_server(i) for i in xrange(count)]}
+    serializer = servers.ServerXMLSerializer()
+    template = serializer.get_template('detail')
+
+    renderers = (
+        ('JSON', lambda: wsgi.JSONDictSerializer().serialize(data)),
+        ('XML (minidom)', lambda: wsgi.XMLDictSerializer().serialize(data)),
+        ('XML (uncompiled)', lambda: _uncompiled(template, data)),
+        ('XML (compiled)', lambda: serializer.serialize(data, 'detail')),
+        ('XML (streamed)',
+         lambda: ''.join(serializer.serialize_iter(data, 'detail'))),
+    )
+    for name, func in renderers:
+        seconds = min(timeit.Timer(func).repeat(3, 1))
+        print '%-17s %8.1f ms per %d servers' % (name, seconds * 1000, count)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)